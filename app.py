@@ -6,11 +6,13 @@ from flask import Flask, render_template, jsonify
 from flask_cors import CORS
 from flask_bcrypt import Bcrypt
 from flask_session import Session
+import importlib
 import os
 
 # Import extensions
 from models import db
 from config import config_by_name
+from services.startup import StartupTimer, ensure_schema, register_lazy_blueprint
 
 # Initialize extensions
 bcrypt = Bcrypt()
@@ -21,13 +23,64 @@ def create_app(config_name=None):
     if config_name is None:
         config_name = os.environ.get('FLASK_ENV', 'default')
     
+    timer = StartupTimer()
     app = Flask(__name__, template_folder='templates/templates', static_folder='static/static')
     app.config.from_object(config_by_name[config_name])
     
+    # msgspec-backed jsonify/get_json (typed payloads in utils/payloads.py)
+    from utils.json_provider import MsgspecJSONProvider
+    app.json = MsgspecJSONProvider(app)
+    
     # Initialize extensions with app
     db.init_app(app)
     bcrypt.init_app(app)
     sess.init_app(app)
+    timer.phase('extensions')
+    
+    # gzip/brotli for large JSON bodies; first so its after_request hook runs last
+    from services.compression import init_compression
+    init_compression(app)
+    
+    # Table version counters behind the @conditional_get ETags
+    from services.http_cache import init_http_cache
+    init_http_cache(app, db)
+    
+    # FTS5 trigram index behind student search, created with the users table
+    from services.user_search import init_user_search
+    init_user_search(app, db)
+    
+    # attendance_months bitmaps behind the compact monthly sheet, synced by triggers
+    from services.attendance_bitmap import init_attendance_bitmaps
+    init_attendance_bitmaps(app, db)
+    
+    # attendance_monthly_stats counts read by rankings, results and summaries, synced by triggers
+    from services.attendance_stats import init_attendance_stats
+    init_attendance_stats(app, db)
+    
+    # Weekly off-days of the working-day calendar behind attendance marks and percentages
+    from services.work_calendar import init_work_calendar
+    init_work_calendar(app)
+    
+    # SQLite PRAGMA profile on every connection (WAL, busy_timeout, ...)
+    from services.sqlite_tuning import init_sqlite_tuning
+    init_sqlite_tuning(app, db)
+    
+    # Optional SQL capture for the query plan auditor
+    from services.query_audit import init_query_capture
+    init_query_capture(app, db)
+    
+    # Per-request query counts, DB time and N+1 warnings
+    from services.sql_instrumentation import init_sql_instrumentation
+    init_sql_instrumentation(app, db)
+    
+    # Request/DB/SMS/session metrics served at /metrics
+    from services.metrics import init_metrics
+    init_metrics(app)
+    
+    # Super users can profile any request with X-Profile: 1 (see routes/profiles.py)
+    from services.request_profiler import init_request_profiler
+    init_request_profiler(app, db)
+    timer.phase('instrumentation')
     
     # Enable CORS for all domains on all routes
     CORS(app, supports_credentials=True)
@@ -43,15 +96,12 @@ def create_app(config_name=None):
     from routes.sms_templates import sms_templates_bp
     from routes.attendance import attendance_bp
     from routes.results import results_bp
-    from routes.ai import ai_bp
     from routes.dashboard import dashboard_bp
     from routes.settings import settings_bp
     from routes.students import students_bp
     from routes.monthly_exams import monthly_exams_bp
     from routes.online_exams import online_exams_bp  # NEW: Online MCQ Exam System
-    from routes.debug import debug_bp
-    from routes.documents import documents_bp
-    from routes.database import database_bp
+    from routes.profiles import profiles_bp
     
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(users_bp, url_prefix='/api/users')
@@ -64,18 +114,29 @@ def create_app(config_name=None):
     app.register_blueprint(sms_templates_bp, url_prefix='/api/sms/templates')
     app.register_blueprint(attendance_bp, url_prefix='/api/attendance')
     app.register_blueprint(results_bp, url_prefix='/api/results')
-    app.register_blueprint(ai_bp, url_prefix='/api/ai')
     app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
     app.register_blueprint(settings_bp, url_prefix='/api/settings')
     app.register_blueprint(monthly_exams_bp, url_prefix='/api/monthly-exams')
     app.register_blueprint(online_exams_bp)  # Uses /api/online-exams prefix from blueprint
-    app.register_blueprint(debug_bp, url_prefix='/api/debug')
-    app.register_blueprint(documents_bp, url_prefix='/api/documents')
-    app.register_blueprint(database_bp, url_prefix='/api/database')
+    app.register_blueprint(profiles_bp, url_prefix='/api/profiles')
+    
+    # Rarely used blueprints are imported on their first request
+    lazy_blueprints = [
+        ('routes.ai', 'ai_bp', '/api/ai'),
+        ('routes.debug', 'debug_bp', '/api/debug'),
+        ('routes.documents', 'documents_bp', '/api/documents'),
+        ('routes.database', 'database_bp', '/api/database'),
+    ]
+    for import_name, attribute, url_prefix in lazy_blueprints:
+        if app.config.get('LAZY_BLUEPRINTS', True):
+            register_lazy_blueprint(app, import_name, attribute, url_prefix)
+        else:
+            app.register_blueprint(getattr(importlib.import_module(import_name), attribute), url_prefix=url_prefix)
     
     # Register template routes
     from routes.templates import templates_bp
     app.register_blueprint(templates_bp)
+    timer.phase('blueprints')
     
     # Add favicon route
     @app.route('/favicon.ico')
@@ -135,34 +196,35 @@ def create_app(config_name=None):
         return jsonify({
             'status': 'healthy',
             'app': app.config['APP_NAME'],
-            'environment': config_name
+            'environment': config_name,
+            'startup': app.extensions.get('startup_report')
         })
     
     # Database health check endpoint
     @app.route('/health/db')
     def database_health():
-        """Database health check endpoint"""
+        """Database health check with the active SQLite PRAGMA values"""
+        from services.sqlite_tuning import database_health as sqlite_database_health
         try:
-            from services.database import health_check as db_health_check
-            return jsonify(db_health_check())
-        except ImportError:
-            # Fallback if service not available
-            try:
-                db.session.execute('SELECT 1')
-                return jsonify({'status': 'healthy', 'message': 'Database connection OK'})
-            except Exception as e:
-                return jsonify({'status': 'unhealthy', 'error': str(e)}), 500
+            return jsonify(sqlite_database_health(db))
+        except Exception as e:
+            return jsonify({'status': 'unhealthy', 'error': str(e)}), 500
     
     # Root endpoint handled by templates blueprint
+    timer.phase('routes')
     
-    # Create database tables
+    # Create database tables when the models changed since the last start
     with app.app_context():
         try:
-            db.create_all()
-            print("Database tables created successfully!")
+            if ensure_schema(db):
+                timer.notes.append('database tables created/updated')
+            else:
+                timer.notes.append('schema current, create_all skipped')
         except Exception as e:
-            print(f"Error creating database tables: {str(e)}")
+            app.logger.error(f"Error creating database tables: {str(e)}")
+    timer.phase('schema')
     
+    app.extensions['startup_report'] = timer.log()
     return app
 
 if __name__ == '__main__':
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Query Plan Audit
+Replays captured SQL through EXPLAIN QUERY PLAN and fails on full table scans.
+
+Capture statements by running the app with SQL_CAPTURE_FILE=/path/queries.jsonl,
+then audit them before deploying:
+
+    python audit_query_plans.py queries.jsonl                    # schema from models.py
+    python audit_query_plans.py queries.jsonl --database smartgardenhub.db
+    python audit_query_plans.py queries.jsonl --allow batches,users
+
+Exits with status 1 when any statement scans a table outside the allow list.
+"""
+import argparse
+import sys
+
+from sqlalchemy import create_engine
+
+from services.query_audit import DEFAULT_ALLOWED_SCANS, audit_queries, load_capture
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Flag full table scans in captured SQL')
+    parser.add_argument('captures', nargs='+', help='JSON lines files written via SQL_CAPTURE_FILE')
+    parser.add_argument('--database', help='SQLite file to audit against (default: fresh schema from models.py)')
+    parser.add_argument('--allow', default='', help='Comma separated tables that may be scanned')
+    parser.add_argument('--verbose', action='store_true', help='Print every plan, not only findings')
+    args = parser.parse_args()
+
+    queries = []
+    for path in args.captures:
+        queries.extend(load_capture(path))
+
+    allowed = set(DEFAULT_ALLOWED_SCANS) | {t.strip() for t in args.allow.split(',') if t.strip()}
+
+    if args.database:
+        engine = create_engine(f'sqlite:///{args.database}')
+        findings = audit_queries(engine, queries, allowed)
+    else:
+        from app import create_app
+        from models import db
+        app = create_app('testing')
+        with app.app_context():
+            findings = audit_queries(db.engine, queries, allowed)
+
+    flagged = [f for f in findings if f['full_scans']]
+    errors = [f for f in findings if f.get('error')]
+    for finding in findings:
+        if finding in flagged or args.verbose:
+            marker = 'SCAN' if finding in flagged else 'ok'
+            print(f"[{marker}] {' '.join(finding['statement'].split())[:200]}")
+            for detail in finding['plan']:
+                print(f"        {detail}")
+    for finding in errors:
+        print(f"[error] {' '.join(finding['statement'].split())[:200]}: {finding['error']}")
+
+    print(f"\n{len(findings)} statements audited, {len(flagged)} with full table scans, {len(errors)} not explainable")
+    return 1 if flagged else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Yearly Attendance Export Benchmark
+Seeds one batch with a year of daily attendance into an in-memory database
+and compares, through the Flask test client:
+- monthly x12: twelve GET /api/attendance/monthly calls, the only way to
+  get a year before the export existed
+- export csv / export ndjson: one streamed GET /api/attendance/yearly/export
+Reports wall time, peak Python memory (tracemalloc) and bytes sent. The
+streamed exports are consumed chunk by chunk, as a client download would.
+
+Usage: python benchmarks/bench_attendance_export.py [--students 500]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+
+from synthetic_data import generate
+
+
+def measure(run):
+    """Seconds, peak traced MiB and bytes of run(); timed without tracemalloc, which slows Python down"""
+    started = time.perf_counter()
+    size = run()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024, size
+
+
+def streamed(client, url):
+    response = client.get(url, buffered=False)
+    size = sum(len(chunk) for chunk in response.response)
+    response.close()
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare twelve monthly sheets with the streamed yearly export')
+    parser.add_argument('--students', type=int, default=500)
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app('testing')
+
+    with app.app_context():
+        data = generate('small', batches=1, students=args.students, months=12, subjects=1, sms_per_student=0,
+                        online_exams=0, attempts_per_student=0)
+        batch_id, year = data['batch_ids'][0], data['year']
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = data['teacher_id']
+            sess['user_role'] = 'teacher'
+
+        def monthly():
+            with contextlib.redirect_stdout(io.StringIO()):
+                return sum(len(client.get(f'/api/attendance/monthly?batch_id={batch_id}&month={month}'
+                                          f'&year={year}').data) for month in range(1, 13))
+
+        runs = {
+            'monthly x12': monthly,
+            'export csv': lambda: streamed(client, f'/api/attendance/yearly/export?batch_id={batch_id}&year={year}'),
+            'export ndjson': lambda: streamed(client, f'/api/attendance/yearly/export?batch_id={batch_id}'
+                                                      f'&year={year}&format=ndjson'),
+        }
+
+        print(f"{args.students} students, {data['counts']['attendance']} attendance rows")
+        print(f"{'request':<16}{'seconds':>10}{'peak MiB':>12}{'KiB':>12}")
+        for name, run in runs.items():
+            elapsed, peak, size = measure(run)
+            print(f"{name:<16}{elapsed:>10.2f}{peak:>12.1f}{size / 1024:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Endpoint Benchmark Suite
+Seeds the synthetic workload (benchmarks/synthetic_data.py) into an
+in-memory database and drives the hot endpoints through the Flask test
+client, logged in with the role each page is used by. For every endpoint
+it records p50/p95/mean latency, SQL statements per request, peak Python
+memory per request (tracemalloc) and response size.
+
+Results are written as JSON (default benchmarks/results/<commit>.json);
+--compare prints the change against an earlier result file.
+
+Usage: python benchmarks/bench_endpoints.py [--scale small] [--seed 42] [--repeat 20]
+                                            [--only students,fees] [--output file] [--compare old.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event
+
+from app import create_app
+from models import db
+
+from synthetic_data import SCALES, generate
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def endpoints(data):
+    """(name, role, url) of the benchmarked requests for a generated dataset"""
+    batch_id = data['batch_ids'][0]
+    month = data['months'][-1]
+    year = data['year']
+    exam_id = data['monthly_exam_ids'][-1]
+    return [
+        ('students.list', 'teacher', '/api/students'),
+        ('students.by_batch', 'teacher', f'/api/students?batch_id={batch_id}'),
+        ('students.search', 'teacher', '/api/students?search=rahim'),
+        ('students.archived', 'teacher', '/api/students/archived'),
+        ('batches.list', 'teacher', '/api/batches'),
+        ('attendance.day', 'teacher', f'/api/attendance?batch_id={batch_id}&date={year}-{month:02d}-02'),
+        ('attendance.monthly', 'teacher', f'/api/attendance/monthly?batch_id={batch_id}&month={month}&year={year}'),
+        ('fees.load_monthly', 'teacher', f'/api/fees/load-monthly?batch_id={batch_id}&year={year}'),
+        ('monthly_exams.list', 'teacher', '/api/monthly-exams'),
+        ('monthly_exams.comprehensive_ranking', 'teacher', f'/api/monthly-exams/{exam_id}/comprehensive-ranking'),
+        ('sms.logs', 'teacher', '/api/sms/logs'),
+        ('dashboard.stats', 'teacher', '/api/dashboard/stats'),
+        ('online_exams.list', 'student', '/api/online-exams'),
+        ('results.my_results', 'student', '/api/results/my-results'),
+    ]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def bench_endpoint(client, url, repeat, statements):
+    """Latencies, per-request query count, peak memory and size of one URL"""
+    quiet = io.StringIO()
+    with contextlib.redirect_stdout(quiet):
+        response = client.get(url)  # Warm-up: template/regex caches, first ranking build
+        latencies = []
+        for _ in range(repeat):
+            statements.clear()
+            started = time.perf_counter()
+            response = client.get(url)
+            latencies.append((time.perf_counter() - started) * 1000)
+        queries = len(statements)
+
+        # Separate pass: tracemalloc slows allocation-heavy code down
+        tracemalloc.start()
+        client.get(url)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        'status': response.status_code,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'mean_ms': round(sum(latencies) / len(latencies), 2),
+        'queries': queries,
+        'peak_kb': round(peak / 1024, 1),
+        'bytes': len(response.data)
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline['meta']['commit']} ({baseline_path})")
+    print(f"{'endpoint':<40} {'p50 ms':>18} {'p95 ms':>18} {'queries':>12}")
+    for name, current in results['endpoints'].items():
+        previous = baseline['endpoints'].get(name)
+        if not previous:
+            print(f"{name:<40} {'(new)':>18}")
+            continue
+        print(f"{name:<40} "
+              f"{previous['p50_ms']:>8.1f} → {current['p50_ms']:<7.1f} "
+              f"{previous['p95_ms']:>8.1f} → {current['p95_ms']:<7.1f} "
+              f"{previous['queries']:>5} → {current['queries']:<4}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark hot endpoints against synthetic data')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=20, help='Timed requests per endpoint')
+    parser.add_argument('--only', help='Comma-separated endpoint name prefixes')
+    parser.add_argument('--output', help='Result file (default benchmarks/results/<commit>.json)')
+    parser.add_argument('--compare', help='Earlier result file to compare with')
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app('testing')
+    app.config['SQL_INSTRUMENTATION_HEADERS'] = False
+    # Query counts are reported per endpoint below; N+1 warnings would drown the table
+    logging.getLogger('sql.instrumentation').setLevel(logging.ERROR)
+
+    with app.app_context():
+        started = time.perf_counter()
+        data = generate(args.scale, args.seed)
+        print(f"Seeded scale={args.scale} seed={args.seed} "
+              f"({sum(data['counts'].values())} rows) in {time.perf_counter() - started:.1f}s")
+
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+        clients = {}
+        for role, user_id in (('teacher', data['teacher_id']), ('student', data['student_id'])):
+            client = app.test_client()
+            with client.session_transaction() as sess:
+                sess['user_id'] = user_id
+                sess['user_role'] = role
+            clients[role] = client
+
+        prefixes = args.only.split(',') if args.only else None
+        results = {
+            'meta': {
+                'commit': git_commit(),
+                'created_at': datetime.utcnow().isoformat() + 'Z',
+                'scale': args.scale,
+                'seed': args.seed,
+                'repeat': args.repeat,
+                'rows': data['counts'],
+                'python': platform.python_version(),
+                'sqlite': sqlite3.sqlite_version
+            },
+            'endpoints': {}
+        }
+
+        print(f"{'endpoint':<40} {'status':>6} {'p50 ms':>9} {'p95 ms':>9} {'queries':>8} {'peak KB':>9} {'bytes':>9}")
+        for name, role, url in endpoints(data):
+            if prefixes and not name.startswith(tuple(prefixes)):
+                continue
+            db.session.remove()
+            result = bench_endpoint(clients[role], url, args.repeat, statements)
+            results['endpoints'][name] = dict(result, url=url, role=role)
+            print(f"{name:<40} {result['status']:>6} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} "
+                  f"{result['queries']:>8} {result['peak_kb']:>9.1f} {result['bytes']:>9}")
+
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{results['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+JSON Serialization Benchmark
+Compares the two ways GET /api/students can turn a large student list into
+a response body, on the same loaded rows (SQL is not part of the timing):
+- dicts: serialize_user() dicts with the frontend aliases, deep-copied by
+  serialize_data() and encoded by Flask's default json provider
+- structs: utils/payloads.py StudentListItem rows encoded by the msgspec
+  provider (utils/json_provider.py)
+Most of the dict path's time is serialize_user() counting the students of
+every batch once per student, so the encoders are also compared on rows
+built beforehand (the "encode" lines).
+Reports median time and the tracemalloc peak of one pass.
+
+Usage: python benchmarks/bench_json.py [--students 5000] [--repeat 5]
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy.orm import selectinload
+
+from app import create_app
+from models import User, UserRole
+from utils.payloads import student_list_item
+from utils.response import serialize_data, serialize_user
+
+from synthetic_data import generate
+
+
+def dict_rows(students):
+    """The student list as GET /api/students built it before the typed payloads"""
+    rows = []
+    for student in students:
+        data = serialize_user(student)
+        batches = [{'id': b.id, 'name': b.name, 'description': b.description} for b in student.batches]
+        data['batch'] = batches[0] if batches else None
+        data['batchId'] = batches[0]['id'] if batches else None
+        data['batches'] = batches
+        data['batchIds'] = [b['id'] for b in batches]
+        data['firstName'] = data.get('first_name', '')
+        data['lastName'] = data.get('last_name', '')
+        data['phoneNumber'] = data.get('phoneNumber', '')
+        data['studentId'] = data.get('student_id', '')
+        data['isActive'] = data.get('is_active', True)
+        data['guardianPhone'] = data.get('guardian_phone', '')
+        data['guardianName'] = data.get('guardian_name', '')
+        data['motherName'] = data.get('mother_name', '')
+        data['address'] = data.get('address', '')
+        data['school'] = data.get('address', '')
+        rows.append(data)
+    return rows
+
+
+def measure(encode, repeat):
+    """Median seconds and peak traced bytes of encode()"""
+    size = len(encode())  # Warm-up (also loads every batch's students for serialize_user)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        encode()
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    encode()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings), peak, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare dict and Struct serialization of the student list')
+    parser.add_argument('--students', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app('testing')
+
+    with app.app_context():
+        generate('small', students=args.students, sms_per_student=0, attempts_per_student=0)
+        students = User.query.options(selectinload(User.batches)).filter(
+            User.role == UserRole.STUDENT, User.is_active == True, User.is_archived == False
+        ).order_by(User.first_name, User.last_name).all()
+
+        stdlib = DefaultJSONProvider(app)
+        msgspec_provider = app.json
+
+        def encode_dicts():
+            return stdlib.dumps({'success': True, 'data': serialize_data(dict_rows(students))}).encode('utf-8')
+
+        def encode_structs():
+            return msgspec_provider.encode({'success': True,
+                                            'data': serialize_data([student_list_item(s) for s in students])})
+
+        prebuilt_dicts = dict_rows(students)
+        prebuilt_structs = [student_list_item(s) for s in students]
+
+        def encode_prebuilt_dicts():
+            return stdlib.dumps({'success': True, 'data': serialize_data(prebuilt_dicts)}).encode('utf-8')
+
+        def encode_prebuilt_structs():
+            return msgspec_provider.encode({'success': True, 'data': serialize_data(prebuilt_structs)})
+
+        print(f"{len(students)} students, median of {args.repeat} runs")
+        print(f"{'path':<20} {'time ms':>9} {'peak KB':>10} {'bytes':>10}")
+        results = {}
+        for name, encode in (('build+encode dicts', encode_dicts), ('build+encode structs', encode_structs),
+                             ('encode dicts', encode_prebuilt_dicts), ('encode structs', encode_prebuilt_structs)):
+            seconds, peak, size = measure(encode, args.repeat)
+            results[name] = (seconds, peak)
+            print(f"{name:<20} {seconds * 1000:>9.1f} {peak / 1024:>10.1f} {size:>10}")
+
+        for step in ('build+encode', 'encode'):
+            (dict_time, dict_peak), (struct_time, struct_peak) = results[f'{step} dicts'], results[f'{step} structs']
+            print(f"{step}: structs {dict_time / struct_time:.1f}x faster, "
+                  f"{(1 - struct_peak / dict_peak) * 100:.0f}% less peak memory")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Comprehensive Ranking Query Benchmark
+Seeds batches of increasing size into an in-memory database and reports how
+many SQL statements and how much time compute_comprehensive_ranking needs.
+
+Usage: python benchmarks/bench_ranking_queries.py [sizes...]
+"""
+import os
+import sys
+import time
+from datetime import datetime, date, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event
+
+from app import create_app
+from models import (db, User, UserRole, Batch, MonthlyExam, IndividualExam, MonthlyMark,
+                    Attendance, AttendanceStatus)
+from services.ranking_engine import compute_comprehensive_ranking
+
+SUBJECTS = ('Bangla', 'English', 'Math', 'Physics', 'Chemistry', 'Biology')
+
+
+def seed_batch(size, teacher, index):
+    """Create a batch with `size` students, 6 individual exams, marks and attendance"""
+    batch = Batch(name=f'Bench Batch {index}', start_date=date(2025, 1, 1))
+    db.session.add(batch)
+    db.session.flush()
+
+    exam = MonthlyExam(title=f'Bench {index}', month=3, year=2025, total_marks=300, pass_marks=99,
+                       start_date=datetime(2025, 3, 1), end_date=datetime(2025, 3, 31),
+                       batch_id=batch.id, created_by=teacher.id)
+    db.session.add(exam)
+    db.session.flush()
+
+    individual_exams = []
+    for idx, subject in enumerate(SUBJECTS):
+        individual_exam = IndividualExam(monthly_exam_id=exam.id, title=subject, subject=subject, marks=50,
+                                         exam_date=datetime(2025, 3, 3 + idx), duration=60, order_index=idx + 1)
+        db.session.add(individual_exam)
+        individual_exams.append(individual_exam)
+    db.session.flush()
+
+    for i in range(size):
+        student = User(phoneNumber=f'01{index:02d}{i:07d}', first_name=f'S{i}', last_name='Bench',
+                       role=UserRole.STUDENT)
+        student.batches.append(batch)
+        db.session.add(student)
+        db.session.flush()
+        for individual_exam in individual_exams:
+            score = (i * 7 + individual_exam.id) % 51
+            db.session.add(MonthlyMark(monthly_exam_id=exam.id, individual_exam_id=individual_exam.id,
+                                       user_id=student.id, marks_obtained=score, total_marks=50,
+                                       percentage=score * 2))
+        day = date(2025, 3, 1)
+        while day.month == 3:
+            if day.weekday() < 5:
+                status = AttendanceStatus.PRESENT if (i + day.day) % 4 else AttendanceStatus.ABSENT
+                db.session.add(Attendance(user_id=student.id, batch_id=batch.id, date=day, status=status))
+            day += timedelta(days=1)
+    db.session.commit()
+    return exam
+
+
+def run(sizes):
+    app = create_app('testing')
+    with app.app_context():
+        teacher = User(phoneNumber='01500000000', first_name='Bench', last_name='Teacher', role=UserRole.TEACHER)
+        db.session.add(teacher)
+        db.session.commit()
+
+        print(f"{'students':>10} {'queries':>8} {'ms':>10}")
+        for index, size in enumerate(sizes):
+            exam = seed_batch(size, teacher, index)
+            db.session.expire_all()
+
+            statements = []
+
+            def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+                statements.append(statement)
+
+            event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+            started = time.perf_counter()
+            snapshot = compute_comprehensive_ranking(exam)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+            assert len(snapshot.rankings) == size
+            print(f"{size:>10} {len(statements):>8} {elapsed_ms:>10.1f}")
+
+
+if __name__ == '__main__':
+    run([int(arg) for arg in sys.argv[1:]] or [30, 120, 480])
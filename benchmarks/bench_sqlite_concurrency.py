@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+SQLite Concurrency Benchmark
+Runs several processes against one database file, the way gunicorn sync
+workers do, and compares PRAGMA profiles. Each operation is a short
+request: readers page through attendance, writers save a batch's
+attendance for a day. Reports the lock error rate and p50/p99 latency.
+
+Usage: python benchmarks/bench_sqlite_concurrency.py [--workers 9] [--ops 200] [--write-ratio 0.3] [--profiles default,server]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from services.sqlite_tuning import SQLITE_PROFILES, install_pragma_listener
+
+STUDENTS = 60
+ROWS_PER_WRITE = 40
+
+
+def setup_database(path):
+    engine = create_engine(f'sqlite:///{path}')
+    with engine.begin() as connection:
+        connection.execute(text(
+            'CREATE TABLE attendance (id INTEGER PRIMARY KEY, user_id INTEGER, batch_id INTEGER, '
+            'date TEXT, status TEXT, UNIQUE (user_id, batch_id, date))'
+        ))
+        connection.execute(text('INSERT INTO attendance (user_id, batch_id, date, status) VALUES (:u, :b, :d, :s)'), [
+            {'u': u, 'b': u % 5, 'd': f'2025-01-{day:02d}', 's': 'present'}
+            for u in range(STUDENTS) for day in range(1, 29)
+        ])
+    engine.dispose()
+
+
+def worker(path, profile, ops, write_ratio, seed, results):
+    engine = create_engine(f'sqlite:///{path}')
+    install_pragma_listener(engine, SQLITE_PROFILES[profile])
+    rng = random.Random(seed)
+    latencies = []
+    errors = 0
+
+    for _ in range(ops):
+        started = time.perf_counter()
+        try:
+            with engine.begin() as connection:
+                if rng.random() < write_ratio:
+                    # Read the batch, then write its attendance for the day in the same transaction
+                    batch_id = rng.randrange(5)
+                    day = f'2025-02-{rng.randrange(1, 29):02d}'
+                    connection.execute(text('SELECT id FROM attendance WHERE batch_id = :b AND date = :d'),
+                                       {'b': batch_id, 'd': day}).all()
+                    connection.execute(text(
+                        'INSERT INTO attendance (user_id, batch_id, date, status) VALUES (:u, :b, :d, :s) '
+                        'ON CONFLICT (user_id, batch_id, date) DO UPDATE SET status = excluded.status'
+                    ), [{'u': rng.randrange(STUDENTS), 'b': batch_id, 'd': day,
+                         's': rng.choice(('present', 'absent'))} for _ in range(ROWS_PER_WRITE)])
+                else:
+                    connection.execute(text(
+                        'SELECT user_id, status, count(*) FROM attendance WHERE batch_id = :b GROUP BY user_id, status'
+                    ), {'b': rng.randrange(5)}).all()
+        except OperationalError as e:
+            if 'locked' not in str(e) and 'busy' not in str(e):
+                raise
+            errors += 1
+        latencies.append(time.perf_counter() - started)
+
+    engine.dispose()
+    results.put((latencies, errors))
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run_profile(profile, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        setup_database(path)
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=worker, args=(path, profile, args.ops, args.write_ratio, seed, results))
+            for seed in range(args.workers)
+        ]
+        started = time.perf_counter()
+        for process in processes:
+            process.start()
+        collected = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+
+    latencies = [value for values, _ in collected for value in values]
+    errors = sum(count for _, count in collected)
+    print(f"profile={profile} workers={args.workers} ops={len(latencies)} elapsed={elapsed:.2f}s "
+          f"lock_errors={errors} ({errors * 100 / len(latencies):.1f}%) "
+          f"p50={percentile(latencies, 50) * 1000:.1f}ms p99={percentile(latencies, 99) * 1000:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare SQLite PRAGMA profiles under concurrent workers')
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count() * 2 + 1)
+    parser.add_argument('--ops', type=int, default=200, help='Operations per worker')
+    parser.add_argument('--write-ratio', type=float, default=0.3)
+    parser.add_argument('--profiles', default='default,server')
+    args = parser.parse_args()
+
+    for profile in args.profiles.split(','):
+        run_profile(profile, args)
+
+
+if __name__ == '__main__':
+    main()
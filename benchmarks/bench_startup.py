@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Application Startup Benchmark
+Measures what a gunicorn worker pays before serving its first request,
+against a file database that is already up to date:
+- cold start: a fresh interpreter importing app and calling create_app
+- recycle: create_app again in a process that has the imports cached
+Prints the per-phase startup report of the last create_app call.
+
+Usage: python benchmarks/bench_startup.py [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+CREATE_APP = """
+import sys, time, json
+started = time.perf_counter()
+sys.path.insert(0, {root!r})
+import config
+class BenchConfig(config.DevelopmentConfig):
+    SQLALCHEMY_DATABASE_URI = {uri!r}
+config.config_by_name['bench'] = BenchConfig
+from app import create_app
+app = create_app('bench')
+print(json.dumps({{'seconds': time.perf_counter() - started,
+                   'report': app.extensions.get('startup_report')}}))
+"""
+
+
+def run_cold(uri):
+    output = subprocess.check_output([sys.executable, '-c', CREATE_APP.format(root=ROOT, uri=uri)],
+                                     cwd=ROOT, text=True, stderr=subprocess.DEVNULL)
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure create_app cold start and worker recycle time')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        uri = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        run_cold(uri)  # Creates the schema once
+
+        cold = [run_cold(uri) for _ in range(args.runs)]
+        print(f"cold start: median {statistics.median(r['seconds'] for r in cold) * 1000:.0f}ms "
+              f"over {args.runs} runs")
+
+        import config
+        config.config_by_name['bench'] = type('BenchConfig', (config.DevelopmentConfig,),
+                                              {'SQLALCHEMY_DATABASE_URI': uri})
+        from app import create_app
+        create_app('bench')
+        recycle = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            app = create_app('bench')
+            recycle.append(time.perf_counter() - started)
+        print(f"recycle:    median {statistics.median(recycle) * 1000:.0f}ms over {args.runs} runs")
+        report = app.extensions.get('startup_report')
+        if report:
+            print(f"last report: {json.dumps(report)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Student Search Benchmark
+Seeds synthetic students into an in-memory database and compares the
+student search filters on the same terms:
+- ilike: the five ILIKE '%term%' clauses GET /api/students used before
+- fts: services/user_search.py search_filter() (users_fts trigram index)
+- ranked: ranked_search(), the query behind GET /api/students/search
+Reports the median time of each query and how many students it found.
+
+Usage: python benchmarks/bench_user_search.py [--students 50000] [--repeat 20]
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import or_
+
+from app import create_app
+from models import User, UserRole
+from services.user_search import ranked_search, search_filter
+
+from synthetic_data import generate
+
+TERMS = ('rahim', 'ossai', 'Nusrat Akter', '0171', '56789', 'zzz')
+
+
+def students():
+    return User.query.filter(User.role == UserRole.STUDENT, User.is_active == True, User.is_archived == False)
+
+
+def ilike(term):
+    return students().filter(or_(
+        User.first_name.ilike(f'%{term}%'),
+        User.last_name.ilike(f'%{term}%'),
+        User.phoneNumber.ilike(f'%{term}%'),
+        User.guardian_name.ilike(f'%{term}%'),
+        User.guardian_phone.ilike(f'%{term}%')
+    ))
+
+
+def measure(run, repeat):
+    """Median milliseconds and row count of run()"""
+    count = len(run())
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare ILIKE and FTS5 student search')
+    parser.add_argument('--students', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app('testing')
+
+    with app.app_context():
+        generate('small', students=args.students, months=0, sms_per_student=0, attempts_per_student=0)
+        queries = {
+            'ilike': lambda term: ilike(term).with_entities(User.id).order_by(User.first_name, User.id).all(),
+            'fts': lambda term: students().filter(search_filter(term)).with_entities(User.id).order_by(
+                User.first_name, User.id).all(),
+            'ranked top 20': lambda term: ranked_search(students(), term).with_entities(User.id).limit(20).all(),
+        }
+
+        print(f"{args.students} students, median of {args.repeat} runs (ms, rows)")
+        print(f"{'term':<14}" + ''.join(f"{name:>22}" for name in queries))
+        for term in TERMS:
+            cells = []
+            for name, query in queries.items():
+                ms, count = measure(lambda: query(term), args.repeat)
+                cells.append(f"{ms:>13.2f} {count:>8}")
+            print(f"{term:<14}" + ''.join(cells))
+
+
+if __name__ == '__main__':
+    main()
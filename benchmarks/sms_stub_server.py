@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+BulkSMSBD Stub Server
+Local stand-in for bulksmsbd.net/api/smsapi used by tests and throughput
+benchmarks. Answers every request with a success JSON after an optional
+artificial latency and counts requests and recipients.
+
+Usage: python benchmarks/sms_stub_server.py [--port 8099] [--latency-ms 80]
+       then run the app or dispatcher with SMS_PROVIDER_URL=http://127.0.0.1:8099/api/smsapi
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class StubState:
+    """Counters shared by the handler threads"""
+
+    def __init__(self, latency_ms=0):
+        self.latency = latency_ms / 1000.0
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.recipients = 0
+        self.connections = set()
+
+    def record(self, numbers, client_address):
+        with self.lock:
+            self.requests += 1
+            self.recipients += len([n for n in numbers.split(',') if n])
+            self.connections.add(client_address)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real gateway
+
+    def _handle(self, params):
+        state = self.server.state
+        if state.latency:
+            time.sleep(state.latency)
+        state.record(params.get('number', [''])[0], self.client_address)
+
+        body = json.dumps({'response_code': 202, 'success_message': 'SMS Submitted Successfully',
+                           'error_message': ''}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._handle(parse_qs(urlparse(self.path).query))
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self._handle(parse_qs(self.rfile.read(length).decode('utf-8')))
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(port=0, latency_ms=0):
+    """Start the stub in a daemon thread and return (server, url)"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+    server.daemon_threads = True
+    server.state = StubState(latency_ms)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/api/smsapi"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local BulkSMSBD stub')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency-ms', type=int, default=80)
+    args = parser.parse_args()
+
+    server, url = start_stub_server(args.port, args.latency_ms)
+    print(f"SMS stub listening on {url} (latency {args.latency_ms} ms)")
+    try:
+        while True:
+            time.sleep(5)
+            state = server.state
+            print(f"requests={state.requests} recipients={state.recipients} connections={len(state.connections)}")
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Synthetic Data Generator
+Fills the real schema with a seeded, realistic coaching-centre workload:
+batches with enrolled students, a year of daily attendance, one monthly
+exam per batch and month with individual subject exams and marks, monthly
+fees, SMS logs, and published online exams with student attempts.
+
+The same scale and seed always produce the same rows, so benchmark results
+from different commits are comparable. Rows go in through bulk Core
+inserts with precomputed ids; the `full` scale (5,000 students, 12 months)
+writes about two million rows.
+
+Usage: python benchmarks/synthetic_data.py bench.db [--scale small] [--seed 42]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+from sqlalchemy import func, insert
+
+from models import (db, User, UserRole, Batch, user_batches, Attendance, AttendanceStatus, MonthlyExam,
+                    IndividualExam, MonthlyMark, Fee, FeeStatus, SmsLog, SmsStatus, OnlineExam,
+                    OnlineQuestion, OnlineExamAttempt, OnlineStudentAnswer)
+
+SCALES = {
+    'tiny': {'batches': 2, 'students': 24, 'months': 2, 'subjects': 3, 'sms_per_student': 2,
+             'online_exams': 2, 'questions': 5, 'attempts_per_student': 1},
+    'small': {'batches': 5, 'students': 300, 'months': 3, 'subjects': 6, 'sms_per_student': 6,
+              'online_exams': 8, 'questions': 20, 'attempts_per_student': 2},
+    'medium': {'batches': 20, 'students': 2000, 'months': 6, 'subjects': 6, 'sms_per_student': 12,
+               'online_exams': 20, 'questions': 30, 'attempts_per_student': 3},
+    'full': {'batches': 50, 'students': 5000, 'months': 12, 'subjects': 6, 'sms_per_student': 24,
+             'online_exams': 40, 'questions': 40, 'attempts_per_student': 4},
+}
+
+YEAR = 2025
+WEEKLY_OFF_DAY = 4  # Friday
+SUBJECTS = ('Bangla', 'English', 'Math', 'Physics', 'Chemistry', 'Biology', 'ICT', 'Higher Math')
+FIRST_NAMES = ('Rahim', 'Karim', 'Fatema', 'Ayesha', 'Nusrat', 'Tanvir', 'Sadia', 'Mahin', 'Rafi', 'Jannat',
+               'Arif', 'Sumaiya', 'Imran', 'Tasnim', 'Shakil', 'Nadia', 'Hasan', 'Mim', 'Sabbir', 'Riya')
+LAST_NAMES = ('Ahmed', 'Hossain', 'Islam', 'Rahman', 'Khan', 'Chowdhury', 'Akter', 'Uddin', 'Sarkar', 'Das')
+CLASS_NAMES = ('Class 9', 'Class 10', 'HSC 1st Year', 'HSC 2nd Year')
+BATCH_SIZE = 5000  # Rows per executemany call
+
+
+def _next_id(model):
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+
+def _insert(table, rows, counts):
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(insert(table), rows[start:start + BATCH_SIZE])
+    counts[table.name] = counts.get(table.name, 0) + len(rows)
+
+
+def _month_days(month):
+    day = date(YEAR, month, 1)
+    while day.month == month:
+        if day.weekday() != WEEKLY_OFF_DAY:
+            yield day
+        day += timedelta(days=1)
+
+
+def generate(scale='small', seed=42, **overrides):
+    """
+    Insert a synthetic workload into the current app's database.
+
+    `scale` names an entry of SCALES; keyword overrides replace single
+    parameters. Returns the ids benchmarks need (teacher, super user,
+    batches, monthly exams, a sample student, online exams) and the
+    number of rows written per table.
+    """
+    params = dict(SCALES[scale], **overrides)
+    rng = random.Random(seed)
+    counts = {}
+    created_at = datetime(YEAR, 1, 1, 9, 0)
+
+    # Staff
+    user_id = _next_id(User)
+    teacher_id, super_user_id = user_id, user_id + 1
+    _insert(User.__table__, [
+        {'id': teacher_id, 'phoneNumber': '01500000001', 'first_name': 'Bench', 'last_name': 'Teacher',
+         'role': UserRole.TEACHER, 'is_active': True, 'is_archived': False, 'created_at': created_at},
+        {'id': super_user_id, 'phoneNumber': '01500000002', 'first_name': 'Bench', 'last_name': 'Admin',
+         'role': UserRole.SUPER_USER, 'is_active': True, 'is_archived': False, 'created_at': created_at},
+    ], counts)
+
+    # Batches and students, one batch each
+    first_batch_id = _next_id(Batch)
+    batch_ids = list(range(first_batch_id, first_batch_id + params['batches']))
+    _insert(Batch.__table__, [{
+        'id': batch_id, 'name': f'{CLASS_NAMES[i % len(CLASS_NAMES)]} Batch {i + 1}', 'code': f'BENCH-{seed}-{i + 1}',
+        'description': f'{CLASS_NAMES[i % len(CLASS_NAMES)]} - {SUBJECTS[i % len(SUBJECTS)]}',
+        'start_date': date(YEAR, 1, 1), 'fee_amount': 1000 + 100 * (i % 5), 'max_students': 200,
+        'status': 'active', 'is_active': True, 'is_archived': False, 'created_at': created_at
+    } for i, batch_id in enumerate(batch_ids)], counts)
+
+    first_student_id = teacher_id + 2
+    student_ids = list(range(first_student_id, first_student_id + params['students']))
+    students_by_batch = {batch_id: [] for batch_id in batch_ids}
+    student_rows, enrollment_rows = [], []
+    for i, student_id in enumerate(student_ids):
+        batch_id = batch_ids[i % len(batch_ids)]
+        students_by_batch[batch_id].append(student_id)
+        # A few percent have left and are archived
+        archived = rng.random() < 0.03
+        student_rows.append({
+            'id': student_id, 'phoneNumber': f'017{rng.randrange(10 ** 8):08d}',
+            'first_name': rng.choice(FIRST_NAMES), 'last_name': rng.choice(LAST_NAMES),
+            'role': UserRole.STUDENT, 'guardian_name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+            'guardian_phone': f'018{rng.randrange(10 ** 8):08d}', 'admission_date': date(YEAR, 1, 1),
+            'sms_count': 0, 'is_active': True, 'is_archived': archived,
+            'archived_at': datetime(YEAR, 6, 1) if archived else None, 'created_at': created_at
+        })
+        enrollment_rows.append({'user_id': student_id, 'batch_id': batch_id, 'enrollment_date': created_at,
+                                'is_active': True})
+    _insert(User.__table__, student_rows, counts)
+    _insert(user_batches, enrollment_rows, counts)
+
+    # Attendance: each student has a personal attendance habit
+    habit = {student_id: rng.uniform(0.6, 0.98) for student_id in student_ids}
+    months = list(range(1, params['months'] + 1))
+    attendance_rows = []
+    for month in months:
+        for day in _month_days(month):
+            for batch_id, members in students_by_batch.items():
+                for student_id in members:
+                    roll = rng.random()
+                    if roll < habit[student_id]:
+                        status = AttendanceStatus.PRESENT
+                    elif roll < habit[student_id] + 0.03:
+                        status = AttendanceStatus.LATE
+                    else:
+                        status = AttendanceStatus.ABSENT
+                    attendance_rows.append({'user_id': student_id, 'batch_id': batch_id, 'date': day,
+                                            'status': status, 'marked_by': teacher_id,
+                                            'created_at': datetime.combine(day, datetime.min.time())})
+        _insert(Attendance.__table__, attendance_rows, counts)
+        attendance_rows = []
+
+    # Monthly exams with individual subject exams and marks
+    exam_id = _next_id(MonthlyExam)
+    individual_id = _next_id(IndividualExam)
+    subjects = SUBJECTS[:params['subjects']]
+    exam_rows, individual_rows, mark_rows = [], [], []
+    monthly_exam_ids = []
+    ability = {student_id: rng.gauss(0.65, 0.15) for student_id in student_ids}
+    for month in months:
+        for batch_id in batch_ids:
+            exam_rows.append({
+                'id': exam_id, 'title': f'Monthly Exam {month}/{YEAR}', 'month': month, 'year': YEAR,
+                'total_marks': 50 * len(subjects), 'pass_marks': 17 * len(subjects),
+                'start_date': datetime(YEAR, month, 1), 'end_date': datetime(YEAR, month, 28),
+                'batch_id': batch_id, 'status': 'completed', 'show_results': True,
+                'created_by': teacher_id, 'created_at': datetime(YEAR, month, 1)
+            })
+            monthly_exam_ids.append(exam_id)
+            for index, subject in enumerate(subjects):
+                individual_rows.append({
+                    'id': individual_id, 'monthly_exam_id': exam_id, 'title': f'{subject} Test',
+                    'subject': subject, 'marks': 50, 'exam_date': datetime(YEAR, month, 3 + 3 * index),
+                    'duration': 60, 'order_index': index + 1, 'is_completed': True,
+                    'created_at': datetime(YEAR, month, 1)
+                })
+                for student_id in students_by_batch[batch_id]:
+                    absent = rng.random() < 0.04
+                    score = 0 if absent else max(0, min(50, round(rng.gauss(ability[student_id], 0.12) * 50)))
+                    mark_rows.append({
+                        'monthly_exam_id': exam_id, 'individual_exam_id': individual_id, 'user_id': student_id,
+                        'marks_obtained': score, 'total_marks': 50, 'percentage': score * 2.0,
+                        'is_absent': absent, 'created_at': datetime(YEAR, month, 28)
+                    })
+                individual_id += 1
+            exam_id += 1
+    _insert(MonthlyExam.__table__, exam_rows, counts)
+    _insert(IndividualExam.__table__, individual_rows, counts)
+    _insert(MonthlyMark.__table__, mark_rows, counts)
+
+    # Monthly fees, mostly paid, recent months more often pending
+    fee_rows = []
+    for batch_index, batch_id in enumerate(batch_ids):
+        amount = 1000 + 100 * (batch_index % 5)
+        for student_id in students_by_batch[batch_id]:
+            for month in months:
+                paid = rng.random() < (0.95 if month < months[-1] else 0.5)
+                fee_rows.append({
+                    'user_id': student_id, 'batch_id': batch_id, 'amount': amount, 'tf_amount': amount,
+                    'jf_amount': 0, 'exam_fee': 0, 'others_fee': 0, 'late_fee': 0, 'discount': 0,
+                    'due_date': date(YEAR, month, 10),
+                    'paid_date': date(YEAR, month, rng.randrange(1, 28)) if paid else None,
+                    'status': FeeStatus.PAID if paid else FeeStatus.PENDING,
+                    'payment_method': 'cash' if paid else None, 'created_at': datetime(YEAR, month, 1)
+                })
+    _insert(Fee.__table__, fee_rows, counts)
+
+    # SMS logs spread over the generated months
+    sms_rows = []
+    for student_id in student_ids:
+        for _ in range(params['sms_per_student']):
+            sent_at = datetime(YEAR, rng.choice(months), rng.randrange(1, 29), rng.randrange(8, 20), rng.randrange(60))
+            failed = rng.random() < 0.02
+            sms_rows.append({
+                'user_id': student_id, 'phone_number': f'88018{rng.randrange(10 ** 8):08d}',
+                'message': 'Dear Parent, your child was PRESENT today. Keep up the good work!',
+                'status': SmsStatus.FAILED if failed else SmsStatus.SENT, 'sent_by': teacher_id, 'cost': 1,
+                'sent_at': None if failed else sent_at, 'created_at': sent_at
+            })
+    _insert(SmsLog.__table__, sms_rows, counts)
+
+    # Published online exams with questions, attempts and answers
+    online_exam_id = _next_id(OnlineExam)
+    question_id = _next_id(OnlineQuestion)
+    online_exam_ids = list(range(online_exam_id, online_exam_id + params['online_exams']))
+    online_rows, question_rows, questions_by_exam = [], [], {}
+    for index, exam_id in enumerate(online_exam_ids):
+        subject = SUBJECTS[index % len(SUBJECTS)]
+        online_rows.append({
+            'id': exam_id, 'title': f'{subject} Chapter {index + 1} Quiz', 'class_name': CLASS_NAMES[index % len(CLASS_NAMES)],
+            'book_name': subject, 'chapter_name': f'Chapter {index + 1}', 'duration': 30,
+            'total_questions': params['questions'], 'pass_percentage': 40.0, 'allow_retake': True,
+            'is_active': True, 'is_published': True, 'created_by': teacher_id,
+            'created_at': created_at + timedelta(days=index)
+        })
+        questions_by_exam[exam_id] = []
+        for order in range(params['questions']):
+            question_rows.append({
+                'id': question_id, 'exam_id': exam_id, 'question_text': f'{subject} question {order + 1}?',
+                'option_a': 'Option A', 'option_b': 'Option B', 'option_c': 'Option C', 'option_d': 'Option D',
+                'correct_answer': 'ABCD'[rng.randrange(4)], 'question_order': order + 1, 'marks': 1,
+                'created_at': created_at
+            })
+            questions_by_exam[exam_id].append((question_id, question_rows[-1]['correct_answer']))
+            question_id += 1
+    _insert(OnlineExam.__table__, online_rows, counts)
+    _insert(OnlineQuestion.__table__, question_rows, counts)
+
+    attempt_id = _next_id(OnlineExamAttempt)
+    attempt_rows, answer_rows = [], []
+    for student_id in student_ids:
+        for exam_id in rng.sample(online_exam_ids, min(params['attempts_per_student'], len(online_exam_ids))):
+            started_at = datetime(YEAR, rng.choice(months), rng.randrange(1, 29), rng.randrange(8, 22))
+            score = 0
+            for question, correct in questions_by_exam[exam_id]:
+                answer = correct if rng.random() < ability[student_id] else 'ABCD'[rng.randrange(4)]
+                is_correct = answer == correct
+                score += is_correct
+                answer_rows.append({'attempt_id': attempt_id, 'question_id': question, 'selected_answer': answer,
+                                    'is_correct': is_correct, 'marks_obtained': int(is_correct),
+                                    'answered_at': started_at})
+            total = len(questions_by_exam[exam_id])
+            percentage = score * 100.0 / total if total else 0.0
+            attempt_rows.append({
+                'id': attempt_id, 'exam_id': exam_id, 'student_id': student_id, 'attempt_number': 1,
+                'started_at': started_at, 'submitted_at': started_at + timedelta(minutes=25), 'time_taken': 1500,
+                'is_submitted': True, 'auto_submitted': False, 'score': score, 'total_marks': total,
+                'percentage': percentage, 'is_passed': percentage >= 40.0
+            })
+            attempt_id += 1
+    _insert(OnlineExamAttempt.__table__, attempt_rows, counts)
+    _insert(OnlineStudentAnswer.__table__, answer_rows, counts)
+
+    db.session.commit()
+    return {
+        'teacher_id': teacher_id,
+        'super_user_id': super_user_id,
+        'student_id': next(s['id'] for s in student_rows if not s['is_archived']),
+        'batch_ids': batch_ids,
+        'monthly_exam_ids': monthly_exam_ids,
+        'online_exam_ids': online_exam_ids,
+        'year': YEAR,
+        'months': months,
+        'counts': counts
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fill a new SQLite database with seeded synthetic data')
+    parser.add_argument('database', help='SQLite file to create')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    if os.path.exists(args.database):
+        parser.error(f'{args.database} already exists')
+
+    # A bare app so the real application database is never touched
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.abspath(args.database)}'
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        result = generate(args.scale, args.seed)
+        elapsed = time.perf_counter() - started
+        for table, count in result['counts'].items():
+            print(f"{table:>24} {count:>10}")
+        print(f"Generated scale={args.scale} seed={args.seed} in {elapsed:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -19,6 +19,63 @@ class Config:
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
     UPLOAD_FOLDER = 'static/uploads'
 
+    # BulkSMSBD provider client (point SMS_PROVIDER_URL at a stub server for tests/benchmarks)
+    SMS_PROVIDER_URL = os.environ.get('SMS_PROVIDER_URL', 'http://bulksmsbd.net/api/smsapi')
+    SMS_PROVIDER_API_KEY = os.environ.get('BULKSMSBD_API_KEY', 'gsOKLO6XtKsANCvgPHNt')
+    SMS_PROVIDER_SENDER_ID = os.environ.get('BULKSMSBD_SENDER_ID', '8809617628909')
+    SMS_PROVIDER_POOL_SIZE = int(os.environ.get('SMS_PROVIDER_POOL_SIZE', 10))  # Keep-alive connections per process
+    SMS_PROVIDER_CONNECT_TIMEOUT = float(os.environ.get('SMS_PROVIDER_CONNECT_TIMEOUT', 5))
+    SMS_PROVIDER_READ_TIMEOUT = float(os.environ.get('SMS_PROVIDER_READ_TIMEOUT', 20))
+    SMS_PROVIDER_MAX_RECIPIENTS = int(os.environ.get('SMS_PROVIDER_MAX_RECIPIENTS', 100))  # Numbers per multi-number call
+
+    # SMS outbox dispatcher (sms_dispatcher.py)
+    SMS_OUTBOX_BATCH_SIZE = int(os.environ.get('SMS_OUTBOX_BATCH_SIZE', 200))  # Rows claimed per cycle
+    SMS_OUTBOX_CONCURRENCY = int(os.environ.get('SMS_OUTBOX_CONCURRENCY', 8))  # Parallel provider calls
+    SMS_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('SMS_OUTBOX_MAX_ATTEMPTS', 5))
+    SMS_OUTBOX_RETRY_BASE_SECONDS = int(os.environ.get('SMS_OUTBOX_RETRY_BASE_SECONDS', 30))  # Doubles per attempt
+    SMS_OUTBOX_RETRY_MAX_SECONDS = int(os.environ.get('SMS_OUTBOX_RETRY_MAX_SECONDS', 3600))
+    SMS_OUTBOX_LEASE_SECONDS = int(os.environ.get('SMS_OUTBOX_LEASE_SECONDS', 300))  # Reclaim rows of a dead dispatcher
+    SMS_DISPATCHER_POLL_SECONDS = float(os.environ.get('SMS_DISPATCHER_POLL_SECONDS', 2))
+
+    # SQLite PRAGMA profile applied to every connection (see services/sqlite_tuning.py)
+    SQLITE_PRAGMA_PROFILE = os.environ.get('SQLITE_PRAGMA_PROFILE', 'server')
+    SQLITE_PRAGMAS = {}  # Per-pragma overrides, e.g. {'busy_timeout': 10000}
+    SQLITE_MAINTENANCE_SECONDS = 0  # WAL checkpoint + PRAGMA optimize interval; 0 disables
+
+    # Append every distinct SQL statement here for audit_query_plans.py (off when unset)
+    SQL_CAPTURE_FILE = os.environ.get('SQL_CAPTURE_FILE')
+
+    # Per-request SQL counts/timing; warn when one statement shape repeats more than the threshold
+    SQL_INSTRUMENTATION_ENABLED = True
+    SQL_N_PLUS_ONE_THRESHOLD = int(os.environ.get('SQL_N_PLUS_ONE_THRESHOLD', 10))
+    SQL_INSTRUMENTATION_HEADERS = True  # X-DB-Queries / Server-Timing response headers
+
+    # Prometheus metrics at /metrics, shared across workers through files in METRICS_DIR
+    METRICS_DIR = os.environ.get('METRICS_DIR')  # Defaults to <instance>/metrics
+    METRICS_FLUSH_SECONDS = 5
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # Require "Authorization: Bearer <token>" when set
+    METRICS_LOCAL_ONLY = False  # Without a token, only serve /metrics to clients on this host
+
+    # Super-user request profiling (X-Profile: 1 or ?_profile=1)
+    PROFILER_ENABLED = True
+    PROFILER_DIR = os.environ.get('PROFILER_DIR')  # Defaults to <instance>/profiles
+    PROFILER_MAX_STORED = 50
+
+    # Import the ai/debug/documents/database blueprints on their first request
+    LAZY_BLUEPRINTS = True
+
+    # ETag/304 from table version counters on read-heavy endpoints (services/http_cache.py)
+    CONDITIONAL_GET_ENABLED = True
+
+    # gzip/brotli JSON responses; turn off when the proxy in front compresses
+    COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))  # Bytes
+    COMPRESSION_LEVEL = int(os.environ.get('COMPRESSION_LEVEL', 6))
+    COMPRESSION_MIMETYPES = ['application/json']
+
+    # Weekly days without classes (services/work_calendar.py); 'fri,sat' for the Bangladesh weekend
+    WEEKLY_OFF_DAYS = os.environ.get('WEEKLY_OFF_DAYS', 'sat,sun')
+
 class DevelopmentConfig(Config):
     """Development configuration with SQLite"""
     DEBUG = True
@@ -39,9 +96,27 @@ class ProductionConfig(Config):
     SQLALCHEMY_DATABASE_URI = "sqlite:////var/www/saroyarsir/smartgardenhub.db"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = False
+    SQLITE_MAINTENANCE_SECONDS = int(os.environ.get('SQLITE_MAINTENANCE_SECONDS', 900))
+    SQL_INSTRUMENTATION_HEADERS = False
+    METRICS_LOCAL_ONLY = True
+
+class TestingConfig(Config):
+    """Testing configuration with in-memory SQLite"""
+    TESTING = True
+    
+    SQLALCHEMY_DATABASE_URI = "sqlite://"
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ECHO = False
+    SQLITE_PRAGMA_PROFILE = 'testing'
+    
+    # Keep test session files out of the working tree
+    SESSION_FILE_DIR = os.path.join(os.environ.get('TMPDIR', '/tmp'), 'smartgardenhub_test_sessions')
+    METRICS_DIR = os.path.join(os.environ.get('TMPDIR', '/tmp'), 'smartgardenhub_test_metrics')
+    METRICS_FLUSH_SECONDS = 0
 
 config_by_name = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
+    'testing': TestingConfig,
     'default': DevelopmentConfig
 }
@@ -68,6 +68,14 @@ def post_fork(server, worker):
     """Called just after a worker has been forked."""
     server.log.info(f"Worker spawned (pid: {worker.pid})")
 
+def post_worker_init(worker):
+    """Called just after a worker has initialized the application."""
+    # The master preloaded the app: drop its pooled SQLite connections and
+    # start the WAL maintenance thread here, in one worker per host
+    from models import db
+    from services.sqlite_tuning import after_fork
+    after_fork(worker.wsgi, db)
+
 def worker_abort(worker):
     """Called when a worker received the SIGABRT signal."""
     worker.log.info("Worker received SIGABRT signal")
\ No newline at end of file
@@ -0,0 +1,51 @@
+"""
+Migration script to add the batch_holidays table behind the working-day
+calendar (services/work_calendar.py) and record the days on which a batch's
+attendance already marks every active enrolled student holiday.
+Safe to re-run: days already in batch_holidays are skipped.
+"""
+from app import create_app
+from models import db, BatchHoliday
+from services.work_calendar import ATTENDANCE_HOLIDAY_REASON
+from sqlalchemy import text
+
+BACKFILL_SQL = """
+    INSERT INTO batch_holidays (batch_id, date, reason, from_attendance, created_at)
+    SELECT attendance.batch_id, attendance.date, :reason, 1, CURRENT_TIMESTAMP
+    FROM attendance
+    JOIN user_batches ON user_batches.user_id = attendance.user_id AND user_batches.batch_id = attendance.batch_id
+    JOIN users ON users.id = attendance.user_id
+    WHERE attendance.status = 'HOLIDAY'
+      AND users.role = 'STUDENT' AND users.is_active = 1 AND users.is_archived = 0
+      AND NOT EXISTS (
+        SELECT 1 FROM batch_holidays
+        WHERE batch_holidays.batch_id = attendance.batch_id AND batch_holidays.date = attendance.date
+      )
+    GROUP BY attendance.batch_id, attendance.date
+    HAVING COUNT(*) = (
+        SELECT COUNT(*) FROM users AS roster
+        JOIN user_batches AS enrolled ON enrolled.user_id = roster.id
+        WHERE enrolled.batch_id = attendance.batch_id
+          AND roster.role = 'STUDENT' AND roster.is_active = 1 AND roster.is_archived = 0
+    )
+"""
+
+def migrate():
+    """Create batch_holidays and fill it from all-holiday attendance sheets"""
+    app = create_app()
+    with app.app_context():
+        try:
+            print("📝 Creating 'batch_holidays' table...")
+            BatchHoliday.__table__.create(db.engine, checkfirst=True)
+
+            print("📝 Recording days marked holiday in attendance...")
+            with db.engine.begin() as connection:
+                added = connection.execute(text(BACKFILL_SQL), {'reason': ATTENDANCE_HOLIDAY_REASON}).rowcount
+            print(f"✅ Recorded {added} holiday(s); set WEEKLY_OFF_DAYS (e.g. 'fri,sat') for the weekly off-days")
+
+        except Exception as e:
+            print(f"❌ Error during migration: {e}")
+            db.session.rollback()
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,53 @@
+"""
+Migration script to add secondary indexes on hot query paths
+Safe to re-run: existing indexes are skipped.
+"""
+from app import create_app
+from models import db
+from sqlalchemy import inspect, text
+
+# (table, index name) as declared in models.py
+HOT_PATH_INDEXES = [
+    ('attendance', 'idx_attendance_batch_date_status'),
+    ('monthly_marks', 'idx_monthly_marks_exam_user'),
+    ('fees', 'idx_fees_batch_due_date'),
+    ('sms_logs', 'idx_sms_logs_sent_by_created_at'),
+    ('monthly_rankings', 'idx_monthly_rankings_exam_final_position'),
+    ('user_batches', 'idx_user_batches_batch_id'),
+    ('online_exam_attempts', 'idx_online_exam_attempts_submitted_started'),
+    ('users', 'idx_users_role_name'),
+    ('users', 'idx_users_archived_at'),
+    ('documents', 'idx_documents_active_created'),
+    ('sms_logs', 'idx_sms_logs_created_at'),
+    ('online_exams', 'idx_online_exams_created_at'),
+]
+
+def migrate():
+    """Create the hot-path indexes declared in models.py and refresh planner statistics"""
+    app = create_app()
+    with app.app_context():
+        try:
+            inspector = inspect(db.engine)
+            created = 0
+            for table_name, index_name in HOT_PATH_INDEXES:
+                existing = {index['name'] for index in inspector.get_indexes(table_name)}
+                if index_name in existing:
+                    print(f"✅ Index '{index_name}' already exists on {table_name}")
+                    continue
+
+                index = next(i for i in db.metadata.tables[table_name].indexes if i.name == index_name)
+                print(f"📝 Creating index '{index_name}' on {table_name}...")
+                index.create(db.engine)
+                created += 1
+
+            # Let the query planner see the new indexes' selectivity
+            with db.engine.begin() as connection:
+                connection.execute(text('ANALYZE'))
+            print(f"✅ Created {created} index(es) and refreshed statistics")
+
+        except Exception as e:
+            print(f"❌ Error during migration: {e}")
+            db.session.rollback()
+
+if __name__ == '__main__':
+    migrate()
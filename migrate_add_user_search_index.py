@@ -0,0 +1,31 @@
+"""
+Migration script to add the FTS5 trigram index behind student search
+(services/user_search.py) to an existing SQLite database.
+Safe to re-run: the index is rebuilt from the users table.
+"""
+from app import create_app
+from models import db
+from services.user_search import create_search_index, SEARCH_TABLE
+from sqlalchemy import text
+
+def migrate():
+    """Create users_fts and its sync triggers, then fill it from users"""
+    app = create_app()
+    with app.app_context():
+        try:
+            if db.engine.dialect.name != 'sqlite':
+                print("⚠️ Not an SQLite database; student search keeps using ILIKE")
+                return
+
+            print(f"📝 Creating and filling '{SEARCH_TABLE}'...")
+            with db.engine.begin() as connection:
+                create_search_index(connection)
+                count = connection.execute(text(f'SELECT count(*) FROM {SEARCH_TABLE}')).scalar()
+            print(f"✅ Indexed {count} user(s); restart the app to start using the index")
+
+        except Exception as e:
+            print(f"❌ Error during migration: {e}")
+            db.session.rollback()
+
+if __name__ == '__main__':
+    migrate()
@@ -43,6 +43,12 @@ class SmsStatus(Enum):
     SENT = "sent"
     FAILED = "failed"
 
+class SmsOutboxStatus(Enum):
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    FAILED = "failed"
+
 class AttendanceStatus(Enum):
     PRESENT = "present"
     ABSENT = "absent"
@@ -54,7 +60,8 @@ user_batches = db.Table('user_batches',
     db.Column('user_id', db.Integer, db.ForeignKey('users.id'), primary_key=True),
     db.Column('batch_id', db.Integer, db.ForeignKey('batches.id'), primary_key=True),
     db.Column('enrollment_date', db.DateTime, default=datetime.utcnow),
-    db.Column('is_active', db.Boolean, default=True)
+    db.Column('is_active', db.Boolean, default=True),
+    db.Index('idx_user_batches_batch_id', 'batch_id')  # Batch roster lookups; the PK leads with user_id
 )
 
 exam_batches = db.Table('exam_batches',
@@ -66,6 +73,10 @@ exam_batches = db.Table('exam_batches',
 class User(db.Model):
     """User model for students, teachers, and super users"""
     __tablename__ = 'users'
+    __table_args__ = (
+        db.Index('idx_users_role_name', 'role', 'first_name', 'last_name', 'id'),  # Student list order
+        db.Index('idx_users_archived_at', 'is_archived', 'archived_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     phoneNumber = db.Column(db.String(20), unique=False, nullable=False, index=True)  # Allow multiple students with same phone
@@ -96,6 +107,7 @@ class User(db.Model):
     
     # Relationships
     batches = db.relationship('Batch', secondary=user_batches, back_populates='students')
+    archived_by_user = db.relationship('User', remote_side=[id], foreign_keys=[archived_by])
     exam_submissions = db.relationship('ExamSubmission', back_populates='user')
     exam_answers = db.relationship('ExamAnswer', back_populates='user')
     fees = db.relationship('Fee', back_populates='user')
@@ -310,6 +322,8 @@ class Fee(db.Model):
     user = db.relationship('User', back_populates='fees')
     batch = db.relationship('Batch', back_populates='fees')
     
+    __table_args__ = (db.Index('idx_fees_batch_due_date', 'batch_id', 'due_date'),)
+    
     def __repr__(self):
         return f'<Fee {self.user_id} - {self.amount}>'
 
@@ -332,9 +346,73 @@ class SmsLog(db.Model):
     user = db.relationship('User', back_populates='sms_logs', foreign_keys=[user_id])
     sent_by_user = db.relationship('User', foreign_keys=[sent_by])
     
+    __table_args__ = (
+        db.Index('idx_sms_logs_sent_by_created_at', 'sent_by', 'created_at'),
+        db.Index('idx_sms_logs_created_at', 'created_at'),
+    )
+    
     def __repr__(self):
         return f'<SmsLog {self.phone_number}: {self.status}>'
 
+class SmsOutbox(db.Model):
+    """Queued SMS waiting to be sent by the background dispatcher (sms_dispatcher.py)"""
+    __tablename__ = 'sms_outbox'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(32), nullable=False, index=True)  # Groups the messages of one send request
+    source = db.Column(db.String(50), nullable=True)  # bulk, attendance, exam_result, ...
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    phone_number = db.Column(db.String(20), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    status = db.Column(db.Enum(SmsOutboxStatus), nullable=False, default=SmsOutboxStatus.PENDING)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(64), nullable=True)  # Dispatcher worker holding the row
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    charge_sender = db.Column(db.Boolean, nullable=False, default=False)  # Also deduct sender's sms_count
+    reserved_cost = db.Column(db.Integer, nullable=False, default=0)  # Balance held in the ledger for this row
+    sent_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    sms_log_id = db.Column(db.Integer, db.ForeignKey('sms_logs.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (db.Index('idx_sms_outbox_status_next_attempt', 'status', 'next_attempt_at'),)
+    
+    def __repr__(self):
+        return f'<SmsOutbox {self.job_id} {self.phone_number}: {self.status}>'
+
+class SmsAccount(db.Model):
+    """System-wide SMS balance; changed only through services/sms_ledger.py"""
+    __tablename__ = 'sms_accounts'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    balance = db.Column(db.Integer, nullable=False, default=0)  # Settled balance in SMS units
+    reserved = db.Column(db.Integer, nullable=False, default=0)  # Held for queued messages
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<SmsAccount balance={self.balance} reserved={self.reserved}>'
+
+class SmsLedgerEntry(db.Model):
+    """Append-only history of every SMS balance movement"""
+    __tablename__ = 'sms_ledger'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    account_id = db.Column(db.Integer, db.ForeignKey('sms_accounts.id'), nullable=False)
+    entry_type = db.Column(db.String(20), nullable=False)  # opening, credit, reserve, settle, adjust
+    amount = db.Column(db.Integer, nullable=False, default=0)  # Change of the settled balance
+    reserved_change = db.Column(db.Integer, nullable=False, default=0)  # Change of the reserved amount
+    balance_after = db.Column(db.Integer, nullable=False)
+    reserved_after = db.Column(db.Integer, nullable=False)
+    job_id = db.Column(db.String(32), nullable=True, index=True)  # SMS outbox job the entry belongs to
+    note = db.Column(db.String(255), nullable=True)
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f'<SmsLedgerEntry {self.entry_type} {self.amount}>'
+
 class Attendance(db.Model):
     """Attendance tracking model"""
     __tablename__ = 'attendance'
@@ -356,11 +434,72 @@ class Attendance(db.Model):
     batch = db.relationship('Batch', back_populates='attendance_records')
     marked_by_user = db.relationship('User', foreign_keys=[marked_by])
     
-    __table_args__ = (db.UniqueConstraint('user_id', 'batch_id', 'date', name='unique_user_batch_date'),)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'batch_id', 'date', name='unique_user_batch_date'),
+        db.Index('idx_attendance_batch_date_status', 'batch_id', 'date', 'status'),
+    )
     
     def __repr__(self):
         return f'<Attendance {self.user_id} - {self.date}: {self.status}>'
 
+class AttendanceMonth(db.Model):
+    """One student's month of attendance in a batch as 2-bit status codes, maintained from attendance by triggers"""
+    __tablename__ = 'attendance_months'
+    
+    batch_id = db.Column(db.Integer, db.ForeignKey('batches.id'), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)  # 1-12
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    marked = db.Column(db.Integer, nullable=False, default=0)  # Bit d-1 set when day d has a record
+    codes = db.Column(db.BigInteger, nullable=False, default=0)  # Bits 2(d-1)..2d-1: status code of day d
+    
+    # Clustered on the primary key so a batch's month is one range read
+    __table_args__ = ({'sqlite_with_rowid': False},)
+    
+    def __repr__(self):
+        return f'<AttendanceMonth {self.user_id} - {self.year}-{self.month:02d}>'
+
+class AttendanceMonthlyStats(db.Model):
+    """One student's attendance counts for a month in a batch, maintained from attendance by triggers"""
+    __tablename__ = 'attendance_monthly_stats'
+    
+    batch_id = db.Column(db.Integer, db.ForeignKey('batches.id'), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)  # 1-12
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    present = db.Column(db.Integer, nullable=False, default=0)
+    absent = db.Column(db.Integer, nullable=False, default=0)
+    late = db.Column(db.Integer, nullable=False, default=0)
+    holiday = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.Index('idx_attendance_monthly_stats_user', 'user_id', 'year', 'month'),
+        {'sqlite_with_rowid': False},
+    )
+    
+    def __repr__(self):
+        return f'<AttendanceMonthlyStats {self.user_id} - {self.year}-{self.month:02d}>'
+
+class BatchHoliday(db.Model):
+    """A day without classes for one batch, or for every batch when batch_id is NULL"""
+    __tablename__ = 'batch_holidays'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    batch_id = db.Column(db.Integer, db.ForeignKey('batches.id'), nullable=True)  # NULL: all batches
+    date = db.Column(db.Date, nullable=False)
+    reason = db.Column(db.String(255), nullable=True)
+    from_attendance = db.Column(db.Boolean, default=False, nullable=False)  # A sheet marked holiday for everyone
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('batch_id', 'date', name='unique_batch_holiday_date'),
+        db.Index('idx_batch_holidays_date', 'date'),
+    )
+    
+    def __repr__(self):
+        return f'<BatchHoliday {self.batch_id} - {self.date}>'
+
 class MonthlyResult(db.Model):
     """Monthly result calculation model"""
     __tablename__ = 'monthly_results'
@@ -543,7 +682,10 @@ class MonthlyMark(db.Model):
     individual_exam = db.relationship('IndividualExam', back_populates='monthly_marks')
     user = db.relationship('User')
     
-    __table_args__ = (db.UniqueConstraint('monthly_exam_id', 'individual_exam_id', 'user_id', name='unique_monthly_mark'),)
+    __table_args__ = (
+        db.UniqueConstraint('monthly_exam_id', 'individual_exam_id', 'user_id', name='unique_monthly_mark'),
+        db.Index('idx_monthly_marks_exam_user', 'monthly_exam_id', 'user_id'),
+    )
     
     def __repr__(self):
         return f'<MonthlyMark {self.user_id} - {self.marks_obtained}/{self.total_marks}>'
@@ -596,15 +738,47 @@ class MonthlyRanking(db.Model):
     monthly_exam = db.relationship('MonthlyExam')
     user = db.relationship('User')
     
-    __table_args__ = (db.UniqueConstraint('monthly_exam_id', 'user_id', name='unique_monthly_ranking'),)
+    __table_args__ = (
+        db.UniqueConstraint('monthly_exam_id', 'user_id', name='unique_monthly_ranking'),
+        db.Index('idx_monthly_rankings_exam_final_position', 'monthly_exam_id', 'is_final', 'position'),
+    )
     
     def __repr__(self):
         return f'<MonthlyRanking {self.position} - User {self.user_id}>'
 
+class MonthlyRankingCache(db.Model):
+    """Cached comprehensive ranking snapshot per monthly exam (shared by all workers)"""
+    __tablename__ = 'monthly_ranking_cache'
+
+    id = db.Column(db.Integer, primary_key=True)
+    monthly_exam_id = db.Column(db.Integer, db.ForeignKey('monthly_exams.id'), nullable=False, unique=True)
+    batch_id = db.Column(db.Integer, db.ForeignKey('batches.id'), nullable=False, index=True)
+    month = db.Column(db.Integer, nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=0)  # Bumped on every invalidation
+    payload = db.Column(db.JSON, nullable=True)  # NULL means stale, rebuild on next read
+    etag = db.Column(db.String(64), nullable=True)
+    computed_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<MonthlyRankingCache exam={self.monthly_exam_id} v{self.version}>'
+
+class CacheVersion(db.Model):
+    """Version counter per cached resource family, bumped on writes so every worker drops its copy"""
+    __tablename__ = 'cache_versions'
+
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CacheVersion {self.name} v{self.version}>'
+
 
 class Document(db.Model):
     """PDF/Document storage for online exams and study materials"""
     __tablename__ = 'documents'
+    __table_args__ = (db.Index('idx_documents_active_created', 'is_active', 'created_at'),)
     
     id = db.Column(db.Integer, primary_key=True)
     class_name = db.Column(db.String(200), nullable=False)  # e.g., "HSC", "Class 10"
@@ -653,6 +827,7 @@ class Document(db.Model):
 class OnlineExam(db.Model):
     """Online exam model for class-wise MCQ exams"""
     __tablename__ = 'online_exams'
+    __table_args__ = (db.Index('idx_online_exams_created_at', 'created_at'),)
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
@@ -726,7 +901,10 @@ class OnlineExamAttempt(db.Model):
     student = db.relationship('User', foreign_keys=[student_id])
     answers = db.relationship('OnlineStudentAnswer', back_populates='attempt', cascade='all, delete-orphan')
     
-    __table_args__ = (db.Index('idx_exam_student', 'exam_id', 'student_id'),)
+    __table_args__ = (
+        db.Index('idx_exam_student', 'exam_id', 'student_id'),
+        db.Index('idx_online_exam_attempts_submitted_started', 'is_submitted', 'started_at'),
+    )
     
     def __repr__(self):
         return f'<OnlineExamAttempt {self.id} - Student {self.student_id} - Exam {self.exam_id}>'
@@ -0,0 +1,37 @@
+"""
+Rebuild the attendance rollups from the attendance table:
+- attendance_monthly_stats (services/attendance_stats.py)
+- attendance_months bitmaps (services/attendance_bitmap.py)
+Also creates their sync triggers, so it doubles as the migration for an
+existing SQLite database. Safe to re-run at any time.
+"""
+from app import create_app
+from models import db
+from services.attendance_bitmap import create_bitmap_triggers, rebuild_attendance_bitmaps
+from services.attendance_stats import create_stats_triggers, rebuild_attendance_stats
+
+def rebuild():
+    """Create the rollup tables and triggers, then recompute both rollups in one transaction"""
+    app = create_app()
+    with app.app_context():
+        try:
+            if db.engine.dialect.name != 'sqlite':
+                print("⚠️ Not an SQLite database; attendance counts are aggregated on read")
+                return
+
+            db.create_all()
+            with db.engine.begin() as connection:
+                print("📝 Rebuilding attendance_monthly_stats...")
+                create_stats_triggers(connection)
+                stats = rebuild_attendance_stats(connection)
+                print("📝 Rebuilding attendance_months...")
+                create_bitmap_triggers(connection)
+                bitmaps = rebuild_attendance_bitmaps(connection)
+            print(f"✅ {stats} monthly stats row(s) and {bitmaps} bitmap row(s) rebuilt")
+
+        except Exception as e:
+            print(f"❌ Error during rebuild: {e}")
+            db.session.rollback()
+
+if __name__ == '__main__':
+    rebuild()
@@ -7,12 +7,18 @@ from utils.auth import login_required, require_role
 from utils.response import success_response, error_response
 from models import UserRole
 from data.nctb_curriculum import NCTB_CURRICULUM, get_subjects_for_class, get_chapters_for_subject, get_available_classes
+from services.http_cache import conditional_get
 import asyncio
+import hashlib
+import json
 import logging
 
 ai_bp = Blueprint('ai', __name__)
 logger = logging.getLogger(__name__)
 
+# ETag component of the static curriculum; changes only with the data file
+CURRICULUM_VERSION = hashlib.sha1(json.dumps(NCTB_CURRICULUM, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
 @ai_bp.route('/api-status', methods=['GET'])
 @login_required
 @require_role(UserRole.TEACHER, UserRole.SUPER_USER)
@@ -193,6 +199,7 @@ def get_curriculum_chapters(class_name, subject_name):
 @ai_bp.route('/curriculum/full', methods=['GET'])
 @login_required
 @require_role(UserRole.TEACHER, UserRole.SUPER_USER)
+@conditional_get(key=CURRICULUM_VERSION)
 def get_full_curriculum():
     """Get complete NCTB curriculum structure"""
     try:
@@ -1,16 +1,63 @@
 """
 Attendance Management Routes - Enhanced for Mobile & PC Responsiveness
 """
-from flask import Blueprint, request
-from models import db, Attendance, User, Batch, UserRole, AttendanceStatus
+from flask import Blueprint, Response, request, stream_with_context
+from models import db, Attendance, BatchHoliday, User, Batch, UserRole, AttendanceStatus
 from utils.auth import login_required, require_role, get_current_user
 from utils.response import success_response, error_response
+from utils.payloads import AttendanceSheetRow
+from services.attendance_bitmap import CODE_STATUSES, encode_row, month_bitmaps, unpack_days
+from services.attendance_bulk import parse_attendance_entries, batch_members, mark_batch_attendance
+from services.attendance_report import REPORT_FORMATS, csv_lines, export_filename, ndjson_lines
+from services.attendance_stats import range_counts
+from services.work_calendar import (WEEKDAY_NAMES, add_holiday, remove_holiday, sync_attendance_holiday,
+                                    weekly_off_days, working_dates, working_days, working_days_between)
+from services.ranking_cache import invalidate_ranking_cache
+from services.sms_ledger import InsufficientSmsBalance
+from services.sms_outbox import enqueue_sms
+from services.sms_template_registry import get_template
 from datetime import datetime, timedelta
-from sqlalchemy import func, and_, extract
+from sqlalchemy import and_, extract, or_
+from sqlalchemy.orm import load_only
 import calendar
 
 attendance_bp = Blueprint('attendance', __name__)
 
+DEFAULT_ATTENDANCE_TEMPLATES = {
+    'attendance_present': 'Dear Parent, {student_name} was PRESENT today in {batch_name} on {date}. Keep up the good work!',
+    'attendance_absent': 'Dear Parent, {student_name} was ABSENT today in {batch_name} on {date}. Please ensure regular attendance.'
+}
+
+def attendance_templates(user_id):
+    """Compiled present/absent templates for a teacher, resolved once per request"""
+    return {
+        template_id: get_template(template_id, user_id=user_id, default=default)
+        for template_id, default in DEFAULT_ATTENDANCE_TEMPLATES.items()
+    }
+
+def build_attendance_message(templates, status, student, batch, attendance_date):
+    """Render the attendance SMS for a student using the teacher's saved template if any"""
+    template_id = 'attendance_present' if status.lower() == 'present' else 'attendance_absent'
+    return templates[template_id].render({
+        'student_name': student.full_name,
+        'batch_name': batch.name,
+        'date': attendance_date.strftime('%d/%m/%Y')
+    })
+
+def attendance_sms_phones(student):
+    """Guardian and student phone numbers for attendance SMS, without duplicates"""
+    phone_numbers = []
+    if getattr(student, 'guardian_phone', None):
+        phone_numbers.append(student.guardian_phone)
+    if student.phone:
+        phone_numbers.append(student.phone)
+    return list(dict.fromkeys(phone_numbers))
+
+def serialize_changes(changes):
+    """Changed attendance rows for the response"""
+    return [{'userId': change['user_id'], 'status': change['status'].value, 'action': change['action']}
+            for change in changes]
+
 @attendance_bp.route('', methods=['GET'])
 @login_required
 def get_attendance():
@@ -104,143 +151,55 @@ def bulk_mark_attendance():
         if not batch:
             return error_response('Batch not found', 404)
         
-        attendance_updates = []
-        
-        for student_attendance in attendance_data:
-            user_id = student_attendance.get('userId')
-            status = student_attendance.get('status', 'present')
-            
-            if not user_id:
-                continue
-                
-            # Validate user is in the batch
-            user = User.query.get(user_id)
-            if not user or batch not in user.batches:
-                continue
-            
-            existing = Attendance.query.filter_by(
-                user_id=user_id,
-                batch_id=batch_id,
-                date=attendance_date
-            ).first()
-            
-            if existing:
-                existing.status = AttendanceStatus(status)
-                existing.marked_by = current_user.id
-                existing.updated_at = datetime.utcnow()
-                attendance_updates.append({
-                    'student': user,
-                    'status': status,
-                    'action': 'updated'
-                })
-            else:
-                new_attendance = Attendance(
-                    user_id=user_id,
-                    batch_id=batch_id,
-                    date=attendance_date,
-                    status=AttendanceStatus(status),
-                    marked_by=current_user.id,
-                    created_at=datetime.utcnow()
-                )
-                db.session.add(new_attendance)
-                attendance_updates.append({
-                    'student': user,
-                    'status': status,
-                    'action': 'created'
-                })
+        try:
+            entries = parse_attendance_entries(attendance_data)
+        except ValueError as e:
+            return error_response(str(e), 400)
+        
+        # Validate batch membership of all submitted students at once, then upsert the sheet
+        students = batch_members(batch.id, entries)
+        statuses = {user_id: entries[user_id] for user_id in students}
+        changes = mark_batch_attendance(batch.id, attendance_date, statuses, current_user.id)
+        # A day whose stored sheet marks the whole roster holiday leaves the batch's working days
+        holiday_changed = sync_attendance_holiday(batch.id, attendance_date, current_user.id)
+        
+        # Attendance marks feed the monthly ranking: stale this month's cached snapshots
+        if changes or holiday_changed:
+            invalidate_ranking_cache(batch.id, attendance_date.month, attendance_date.year)
+        
+        # Render the SMS before committing, while the loaded students are current
+        messages = []
+        if send_sms and students:
+            templates = attendance_templates(current_user.id)
+            for user_id, student in students.items():
+                message = build_attendance_message(templates, entries[user_id].value, student, batch, attendance_date)
+                for phone in attendance_sms_phones(student):
+                    messages.append({'phone': phone, 'message': message, 'user_id': student.id})
         
         db.session.commit()
         
-        # Send SMS notifications if requested
-        sms_sent = 0
-        sms_sent_numbers = []
-        if send_sms and attendance_updates:
-            # Import SMS sending function (no balance check - API handles it)
-            from routes.sms import send_sms_via_api
-            from models import SmsLog, SmsStatus
-            
-            for update in attendance_updates:
-                student = update['student']
-                status = update['status']
-                
-                # Prepare SMS message using templates
-                from flask import session
-                custom_templates = session.get('custom_templates', {})
-                
-                # Get the appropriate template based on attendance status
-                if status.lower() == 'present':
-                    template = custom_templates.get('attendance_present', 'Dear Parent, {student_name} was PRESENT today in {batch_name} on {date}. Keep up the good work!')
-                else:  # absent
-                    template = custom_templates.get('attendance_absent', 'Dear Parent, {student_name} was ABSENT today in {batch_name} on {date}. Please ensure regular attendance.')
-                
-                # Replace template variables with actual data
-                message = template.format(
-                    student_name=student.full_name,
-                    batch_name=batch.name,
-                    date=attendance_date.strftime('%d/%m/%Y')
-                )
-                
-                # Collect phone numbers to send SMS
-                phone_numbers = []
-                
-                # Add guardian/parent phone number if exists
-                if hasattr(student, 'guardian_phone') and student.guardian_phone:
-                    phone_numbers.append(student.guardian_phone)
-                
-                # Add student's own phone number
-                if student.phone:
-                    phone_numbers.append(student.phone)
-                
-                # Remove duplicates
-                phone_numbers = list(set(phone_numbers))
-                
-                # Send SMS to each phone number
-                for phone in phone_numbers:
-                    if not phone:
-                        continue
-                    
-                    # Check if teacher still has SMS balance
-                    if current_user.sms_count <= 0:
-                        break
-                    
-                    try:
-                        # Send SMS
-                        result = send_sms_via_api(phone, message)
-                        
-                        # Calculate SMS cost based on message content
-                        from routes.sms import calculate_sms_cost, deduct_sms_balance
-                        sms_cost = calculate_sms_cost(message) if result.get('success') else 0
-                        
-                        # Create SMS log
-                        sms_log = SmsLog(
-                            user_id=student.id,
-                            phone_number=phone,
-                            message=message,
-                            status=SmsStatus.SENT if result.get('success') else SmsStatus.FAILED,
-                            sent_by=current_user.id,
-                            api_response=result,
-                            cost=sms_cost,
-                            sent_at=datetime.utcnow() if result.get('success') else None
-                        )
-                        db.session.add(sms_log)
-                        
-                        if result.get('success'):
-                            # Deduct from local balance
-                            deduct_sms_balance(sms_cost)
-                            sms_sent += 1
-                            sms_sent_numbers.append(phone)
-                            # Deduct 1 SMS from teacher's balance
-                            current_user.sms_count -= 1
-                            
-                    except Exception as sms_error:
-                        print(f"Failed to send SMS to {phone}: {sms_error}")
-            
-            # Commit SMS logs and balance update
-            db.session.commit()
+        # Queue SMS notifications if requested; the SMS dispatcher sends them in the background
+        sms_queued = 0
+        sms_job_id = None
+        sms_error = None
+        # Never queue more than the teacher's remaining SMS balance
+        messages = messages[:max(0, current_user.sms_count or 0)]
+        if messages:
+            try:
+                sms_job_id = enqueue_sms(messages, sent_by=current_user.id, source='attendance', charge_sender=True)
+                db.session.commit()
+                sms_queued = len(messages)
+            except InsufficientSmsBalance as e:
+                db.session.rollback()
+                sms_error = str(e)
         
         response_data = {
-            'attendance_marked': len(attendance_updates),
-            'sms_sent': sms_sent,
+            'attendance_marked': len(students),
+            'attendance_changed': len(changes),
+            'changes': serialize_changes(changes),
+            'sms_queued': sms_queued,
+            'sms_job_id': sms_job_id,
+            'sms_error': sms_error,
             'sms_balance': current_user.sms_count,
             'date': attendance_date.isoformat(),
             'batch_name': batch.name
@@ -274,150 +233,64 @@ def bulk_mark_attendance_send_absent_sms():
         if not batch:
             return error_response('Batch not found', 404)
         
-        attendance_updates = []
-        absent_students = []
+        try:
+            entries = parse_attendance_entries(attendance_data)
+        except ValueError as e:
+            return error_response(str(e), 400)
         
-        # Process all attendance data
-        for student_attendance in attendance_data:
-            user_id = student_attendance.get('userId')
-            status = student_attendance.get('status', 'present')
-            
-            if not user_id:
-                continue
-                
-            # Validate user is in the batch
-            user = User.query.get(user_id)
-            if not user or batch not in user.batches:
-                continue
-            
-            existing = Attendance.query.filter_by(
-                user_id=user_id,
-                batch_id=batch_id,
-                date=attendance_date
-            ).first()
-            
-            if existing:
-                existing.status = AttendanceStatus(status)
-                existing.marked_by = current_user.id
-                existing.updated_at = datetime.utcnow()
-                attendance_updates.append({
-                    'student': user,
-                    'status': status,
-                    'action': 'updated'
-                })
-            else:
-                new_attendance = Attendance(
-                    user_id=user_id,
-                    batch_id=batch_id,
-                    date=attendance_date,
-                    status=AttendanceStatus(status),
-                    marked_by=current_user.id,
-                    created_at=datetime.utcnow()
-                )
-                db.session.add(new_attendance)
-                attendance_updates.append({
-                    'student': user,
-                    'status': status,
-                    'action': 'created'
-                })
-            
-            # Collect absent students
-            if status.lower() == 'absent':
-                absent_students.append(user)
+        # Validate batch membership of all submitted students at once, then upsert the sheet
+        students = batch_members(batch.id, entries)
+        statuses = {user_id: entries[user_id] for user_id in students}
+        changes = mark_batch_attendance(batch.id, attendance_date, statuses, current_user.id)
+        # A day whose stored sheet marks the whole roster holiday leaves the batch's working days
+        holiday_changed = sync_attendance_holiday(batch.id, attendance_date, current_user.id)
         
-        db.session.commit()
+        # Every absent student is notified, whether or not this save changed their row
+        absent_students = [student for user_id, student in students.items()
+                           if entries[user_id] == AttendanceStatus.ABSENT]
         
-        # Send SMS only to absent students
-        sms_sent = 0
-        sms_failed = 0
+        # Attendance marks feed the monthly ranking: stale this month's cached snapshots
+        if changes or holiday_changed:
+            invalidate_ranking_cache(batch.id, attendance_date.month, attendance_date.year)
         
+        # Render the SMS before committing, while the loaded students are current
+        messages = []
         if absent_students:
-            # Check teacher's SMS balance
-            # Import SMS sending function (no balance check - API handles it)
-            from routes.sms import send_sms_via_api
-            from models import SmsLog, SmsStatus
-            
+            templates = attendance_templates(current_user.id)
             for student in absent_students:
-                # Get absent message template
-                from flask import session
-                custom_templates = session.get('custom_templates', {})
-                template = custom_templates.get(
-                    'attendance_absent', 
-                    'Dear Parent, {student_name} was ABSENT today in {batch_name} on {date}. Please ensure regular attendance.'
-                )
-                
-                # Replace template variables with actual data
-                message = template.format(
-                    student_name=student.full_name,
-                    batch_name=batch.name,
-                    date=attendance_date.strftime('%d/%m/%Y')
-                )
-                
-                # Collect phone numbers to send SMS
-                phone_numbers = []
-                
-                # Add guardian/parent phone number if exists
-                if hasattr(student, 'guardian_phone') and student.guardian_phone:
-                    phone_numbers.append(student.guardian_phone)
-                
-                # Add student's own phone number
-                if student.phone:
-                    phone_numbers.append(student.phone)
-                
-                # Remove duplicates
-                phone_numbers = list(set(phone_numbers))
-                
-                # Send SMS to each phone number
-                for phone in phone_numbers:
-                    if not phone:
-                        continue
-                    
-                    try:
-                        # Send SMS
-                        result = send_sms_via_api(phone, message)
-                        
-                        # Calculate SMS cost based on message content
-                        from routes.sms import calculate_sms_cost, deduct_sms_balance
-                        sms_cost = calculate_sms_cost(message) if result.get('success') else 0
-                        
-                        # Create SMS log
-                        sms_log = SmsLog(
-                            user_id=student.id,
-                            phone_number=phone,
-                            message=message,
-                            status=SmsStatus.SENT if result.get('success') else SmsStatus.FAILED,
-                            sent_by=current_user.id,
-                            api_response=result,
-                            cost=sms_cost,
-                            sent_at=datetime.utcnow() if result.get('success') else None
-                        )
-                        db.session.add(sms_log)
-                        
-                        if result.get('success'):
-                            # Deduct from local balance
-                            deduct_sms_balance(sms_cost)
-                            sms_sent += 1
-                        else:
-                            sms_failed += 1
-                            
-                    except Exception as sms_error:
-                        print(f"Failed to send SMS to {phone}: {sms_error}")
-                        sms_failed += 1
-            
-            # Commit SMS logs and balance update
-            db.session.commit()
+                message = build_attendance_message(templates, 'absent', student, batch, attendance_date)
+                for phone in attendance_sms_phones(student):
+                    messages.append({'phone': phone, 'message': message, 'user_id': student.id})
+        
+        db.session.commit()
+        
+        # Queue SMS only for absent students; the SMS dispatcher sends them in the background
+        sms_queued = 0
+        sms_job_id = None
+        sms_error = None
+        if messages:
+            try:
+                sms_job_id = enqueue_sms(messages, sent_by=current_user.id, source='attendance_absent')
+                db.session.commit()
+                sms_queued = len(messages)
+            except InsufficientSmsBalance as e:
+                db.session.rollback()
+                sms_error = str(e)
         
         response_data = {
-            'attendance_marked': len(attendance_updates),
+            'attendance_marked': len(students),
+            'attendance_changed': len(changes),
+            'changes': serialize_changes(changes),
             'absent_count': len(absent_students),
-            'sms_sent': sms_sent,
-            'sms_failed': sms_failed,
+            'sms_queued': sms_queued,
+            'sms_job_id': sms_job_id,
+            'sms_error': sms_error,
             'sms_balance': current_user.sms_count,
             'date': attendance_date.isoformat(),
             'batch_name': batch.name
         }
         
-        return success_response('Attendance marked and SMS sent to absent students', response_data)
+        return success_response('Attendance marked and SMS queued for absent students', response_data)
         
     except Exception as e:
         db.session.rollback()
@@ -466,38 +339,21 @@ def get_monthly_attendance():
         days_in_month = calendar.monthrange(year, month)[1]
         days = list(range(1, days_in_month + 1))
         
-        # Get attendance records for the month
-        start_date = datetime(year, month, 1).date()
-        end_date = datetime(year, month, days_in_month).date()
-        
-        attendance_records = Attendance.query.filter(
-            and_(
-                Attendance.batch_id == batch_id,
-                Attendance.date >= start_date,
-                Attendance.date <= end_date
-            )
-        ).all()
-        
-        # Organize attendance by student and date
-        attendance_map = {}
-        for record in attendance_records:
-            key = f"{record.user_id}_{record.date.day}"
-            attendance_map[key] = record.status.value
+        # The month's attendance as per-student bitmaps (services/attendance_bitmap.py)
+        bitmaps = month_bitmaps(batch_id, year, month)
         
         # Build response data
         students_data = []
         for student in students:
-            attendance_dict = {}
-            for day in days:
-                key = f"{student.id}_{day}"
-                attendance_dict[day] = attendance_map.get(key, None)
+            marked, codes = bitmaps.get(student.id, (0, 0))
+            attendance_dict = unpack_days(marked, codes, days_in_month)
             
-            students_data.append({
-                'id': student.id,
-                'name': student.full_name,
-                'student_id': getattr(student, 'student_id', ''),
-                'attendance': attendance_dict
-            })
+            students_data.append(AttendanceSheetRow(
+                id=student.id,
+                name=student.full_name,
+                student_id=getattr(student, 'student_id', ''),
+                attendance=attendance_dict
+            ))
         
         month_data = {
             'students': students_data,
@@ -513,6 +369,103 @@ def get_monthly_attendance():
     except Exception as e:
         return error_response(f'Failed to retrieve monthly attendance: {str(e)}', 500)
 
+@attendance_bp.route('/monthly/compact', methods=['GET'])
+@login_required
+def get_monthly_attendance_compact():
+    """
+    Monthly attendance sheet as one encoded row per student.
+    
+    students is [[id, name, row]]. With encoding=base64 (default) a row is
+    12 bytes: a little-endian uint32 with bit d-1 set when day d is marked,
+    then a uint64 holding day d's code at bits 2(d-1)..2d-1. With
+    encoding=array a row lists each day's code, null when unmarked. codes
+    maps a code to its status.
+    """
+    try:
+        current_user = get_current_user()
+        batch_id = request.args.get('batch_id', type=int)
+        month = request.args.get('month', type=int)
+        year = request.args.get('year', type=int)
+        encoding = request.args.get('encoding', 'base64')
+        
+        if not batch_id or not month or not year:
+            return error_response('Batch ID, month, and year are required', 400)
+        if not 1 <= month <= 12:
+            return error_response('Month must be between 1 and 12', 400)
+        if encoding not in ('base64', 'array'):
+            return error_response("encoding must be 'base64' or 'array'", 400)
+        
+        if current_user.role == UserRole.STUDENT:
+            # Students can only view their own batch attendance
+            user_batch_ids = [b.id for b in current_user.batches if b.is_active]
+            if batch_id not in user_batch_ids:
+                return error_response('Access denied', 403)
+        
+        batch = Batch.query.get(batch_id)
+        if not batch:
+            return error_response('Batch not found', 404)
+        
+        students = db.session.query(User.id, User.first_name, User.last_name).join(User.batches).filter(
+            User.role == UserRole.STUDENT,
+            User.is_active == True,
+            User.is_archived == False,
+            Batch.id == batch_id
+        ).order_by(User.first_name, User.last_name).all()
+        
+        days_in_month = calendar.monthrange(year, month)[1]
+        bitmaps = month_bitmaps(batch_id, year, month)
+        
+        rows = []
+        for user_id, first_name, last_name in students:
+            marked, codes = bitmaps.get(user_id, (0, 0))
+            if encoding == 'base64':
+                row = encode_row(marked, codes)
+            else:
+                row = [(codes >> (2 * day)) & 3 if marked >> day & 1 else None for day in range(days_in_month)]
+            rows.append([user_id, f"{first_name} {last_name}", row])
+        
+        return success_response('Monthly attendance retrieved', {
+            'students': rows,
+            'days': days_in_month,
+            'encoding': encoding,
+            'codes': CODE_STATUSES,
+            'month': month,
+            'year': year,
+            'batch_name': batch.name
+        })
+        
+    except Exception as e:
+        return error_response(f'Failed to retrieve monthly attendance: {str(e)}', 500)
+
+@attendance_bp.route('/yearly/export', methods=['GET'])
+@login_required
+@require_role(UserRole.TEACHER, UserRole.SUPER_USER)
+def export_yearly_attendance():
+    """Stream a batch's attendance for a year as CSV or NDJSON, one line per student"""
+    try:
+        batch_id = request.args.get('batch_id', type=int)
+        year = request.args.get('year', type=int)
+        report_format = request.args.get('format', 'csv')
+        
+        if not batch_id or not year:
+            return error_response('Batch ID and year are required', 400)
+        if report_format not in REPORT_FORMATS:
+            return error_response(f"Format must be one of: {', '.join(REPORT_FORMATS)}", 400)
+        
+        batch = Batch.query.get(batch_id)
+        if not batch:
+            return error_response('Batch not found', 404)
+        
+        lines = csv_lines if report_format == 'csv' else ndjson_lines
+        response = Response(stream_with_context(lines(batch_id, year)),
+                            mimetype='text/csv' if report_format == 'csv' else 'application/x-ndjson')
+        response.headers['Content-Disposition'] = \
+            f'attachment; filename="{export_filename(batch, year, report_format)}"'
+        return response
+        
+    except Exception as e:
+        return error_response(f'Failed to export attendance: {str(e)}', 500)
+
 @attendance_bp.route('/summary', methods=['GET'])
 @login_required
 def get_attendance_summary():
@@ -523,50 +476,40 @@ def get_attendance_summary():
         start_date_str = request.args.get('start_date')
         end_date_str = request.args.get('end_date')
         
-        query = db.session.query(
-            User.id,
-            User.first_name,
-            User.last_name,
-            func.count(Attendance.id).label('total_days'),
-            func.sum(func.case(
-                (Attendance.status == AttendanceStatus.PRESENT, 1),
-                else_=0
-            )).label('present_days'),
-            func.sum(func.case(
-                (Attendance.status == AttendanceStatus.ABSENT, 1),
-                else_=0
-            )).label('absent_days')
-        ).join(Attendance, User.id == Attendance.user_id).filter(
-            User.is_active == True,
-            User.is_archived == False
-        )
-        
-        if current_user.role == UserRole.STUDENT:
-            query = query.filter(User.id == current_user.id)
-        
-        if batch_id:
-            query = query.filter(Attendance.batch_id == batch_id)
-            
-        if start_date_str:
-            start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-            query = query.filter(Attendance.date >= start_date)
-            
-        if end_date_str:
-            end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
-            query = query.filter(Attendance.date <= end_date)
-        
-        results = query.group_by(User.id, User.first_name, User.last_name).all()
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date() if start_date_str else None
+        end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date() if end_date_str else None
+        user_ids = [current_user.id] if current_user.role == UserRole.STUDENT else None
+        
+        # Per-student counts from the monthly rollup instead of scanning attendance
+        counts = range_counts(start_date, end_date, batch_id=batch_id, user_ids=user_ids)
+        students = []
+        if counts:
+            students = User.query.filter(
+                User.id.in_(list(counts)),
+                User.is_active == True,
+                User.is_archived == False
+            ).options(load_only(User.id, User.first_name, User.last_name)).order_by(User.id).all()
+        
+        # A batch over a closed range is measured against its working days; otherwise
+        # against the student's own records, leaving out days marked holiday
+        total_working_days = None
+        if batch_id and start_date and end_date:
+            total_working_days = working_days_between(batch_id, start_date, end_date)
         
         summary_data = []
-        for result in results:
-            attendance_percentage = (result.present_days / result.total_days * 100) if result.total_days > 0 else 0
+        for student in students:
+            student_counts = counts[student.id]
+            class_days = total_working_days if total_working_days is not None else \
+                student_counts.total - student_counts.holiday
+            attendance_percentage = min(student_counts.present / class_days * 100, 100) if class_days else 0
             
             summary_data.append({
-                'student_id': result.id,
-                'student_name': f"{result.first_name} {result.last_name}",
-                'total_days': result.total_days,
-                'present_days': result.present_days,
-                'absent_days': result.absent_days,
+                'student_id': student.id,
+                'student_name': f"{student.first_name} {student.last_name}",
+                'total_days': student_counts.total,
+                'present_days': student_counts.present,
+                'absent_days': student_counts.absent,
+                'working_days': total_working_days,
                 'attendance_percentage': round(attendance_percentage, 1)
             })
         
@@ -574,3 +517,98 @@ def get_attendance_summary():
         
     except Exception as e:
         return error_response(f'Failed to retrieve attendance summary: {str(e)}', 500)
+
+def serialize_holiday(holiday):
+    return {
+        'id': holiday.id,
+        'batchId': holiday.batch_id,
+        'date': holiday.date.isoformat(),
+        'reason': holiday.reason,
+        'fromAttendance': holiday.from_attendance
+    }
+
+@attendance_bp.route('/holidays', methods=['GET'])
+@login_required
+def get_holidays():
+    """Holidays and working days of a batch for a month"""
+    try:
+        batch_id = request.args.get('batch_id', type=int)
+        month = request.args.get('month', type=int)
+        year = request.args.get('year', type=int)
+        
+        if not batch_id or not month or not year:
+            return error_response('Batch ID, month, and year are required', 400)
+        if not 1 <= month <= 12:
+            return error_response('Month must be between 1 and 12', 400)
+        
+        days_in_month = calendar.monthrange(year, month)[1]
+        holidays = BatchHoliday.query.filter(
+            or_(BatchHoliday.batch_id == batch_id, BatchHoliday.batch_id.is_(None)),
+            BatchHoliday.date >= datetime(year, month, 1).date(),
+            BatchHoliday.date <= datetime(year, month, days_in_month).date()
+        ).order_by(BatchHoliday.date).all()
+        
+        return success_response('Holidays retrieved', {
+            'holidays': [serialize_holiday(holiday) for holiday in holidays],
+            'weekly_off_days': [WEEKDAY_NAMES[day] for day in sorted(weekly_off_days())],
+            'working_dates': list(working_dates(batch_id, year, month)),
+            'working_days': working_days(batch_id, year, month),
+            'month': month,
+            'year': year
+        })
+        
+    except Exception as e:
+        return error_response(f'Failed to retrieve holidays: {str(e)}', 500)
+
+@attendance_bp.route('/holidays', methods=['POST'])
+@login_required
+@require_role(UserRole.TEACHER, UserRole.SUPER_USER)
+def create_holiday():
+    """Record a holiday for a batch, or for every batch when batchId is omitted"""
+    try:
+        data = request.get_json() or {}
+        batch_id = data.get('batchId')
+        holiday_date_str = data.get('date')
+        
+        if not holiday_date_str:
+            return error_response('Date is required', 400)
+        
+        try:
+            holiday_date = datetime.strptime(holiday_date_str, '%Y-%m-%d').date()
+        except ValueError:
+            return error_response('Date must be in YYYY-MM-DD format', 400)
+        
+        if batch_id and not Batch.query.get(batch_id):
+            return error_response('Batch not found', 404)
+        
+        holiday = add_holiday(holiday_date, batch_id=batch_id or None, reason=data.get('reason'),
+                              created_by=get_current_user().id)
+        # Working days set the maximum attendance marks of the monthly ranking
+        invalidate_ranking_cache(batch_id or None, holiday_date.month, holiday_date.year)
+        db.session.commit()
+        
+        return success_response('Holiday saved', serialize_holiday(holiday), 201)
+        
+    except Exception as e:
+        db.session.rollback()
+        return error_response(f'Failed to save holiday: {str(e)}', 500)
+
+@attendance_bp.route('/holidays/<int:holiday_id>', methods=['DELETE'])
+@login_required
+@require_role(UserRole.TEACHER, UserRole.SUPER_USER)
+def delete_holiday(holiday_id):
+    """Remove a holiday"""
+    try:
+        holiday = BatchHoliday.query.get(holiday_id)
+        if not holiday:
+            return error_response('Holiday not found', 404)
+        
+        invalidate_ranking_cache(holiday.batch_id, holiday.date.month, holiday.date.year)
+        remove_holiday(holiday)
+        db.session.commit()
+        
+        return success_response('Holiday removed')
+        
+    except Exception as e:
+        db.session.rollback()
+        return error_response(f'Failed to remove holiday: {str(e)}', 500)
@@ -6,6 +6,8 @@ from flask import Blueprint, request
 from models import db, Batch, User, UserRole, user_batches
 from utils.auth import login_required, require_role, get_current_user
 from utils.response import success_response, error_response, paginated_response, serialize_batch
+from services.http_cache import conditional_get
+from services.ranking_cache import invalidate_roster_rankings
 from sqlalchemy import or_
 from datetime import datetime, date
 from decimal import Decimal
@@ -295,6 +297,7 @@ def delete_batch(batch_id):
         
         # Remove all student associations first
         batch.students.clear()
+        invalidate_roster_rankings([batch.id])
         
         # Delete the batch permanently
         db.session.delete(batch)
@@ -395,6 +398,7 @@ def add_student_to_batch(batch_id):
         
         # Add student to batch
         student.batches.append(batch)
+        invalidate_roster_rankings([batch.id])
         db.session.commit()
         
         return success_response('Student added to batch successfully')
@@ -425,6 +429,7 @@ def remove_student_from_batch(batch_id, student_id):
         
         # Remove student from batch
         student.batches.remove(batch)
+        invalidate_roster_rankings([batch.id])
         db.session.commit()
         
         return success_response('Student removed from batch successfully')
@@ -458,6 +463,7 @@ def get_my_batches():
 
 @batches_bp.route('/active', methods=['GET'])
 @login_required
+@conditional_get('batches', 'user_batches', 'users')
 def get_active_batches():
     """Get all active batches (simplified list) - excludes archived"""
     try:
@@ -512,6 +518,7 @@ def archive_batch(batch_id):
         
         # Archive all students in this batch
         archived_students_count = 0
+        roster_batch_ids = {batch.id}
         for student in batch.students:
             if not student.is_archived and student.role == UserRole.STUDENT:
                 student.is_archived = True
@@ -519,6 +526,8 @@ def archive_batch(batch_id):
                 student.archived_by = current_user.id
                 student.archive_reason = f"Archived with batch: {batch.name}"
                 archived_students_count += 1
+                roster_batch_ids.update(b.id for b in student.batches)
+        invalidate_roster_rankings(roster_batch_ids)
         
         db.session.commit()
         
@@ -561,6 +570,7 @@ def restore_batch(batch_id):
         
         # Restore students if requested
         restored_students_count = 0
+        roster_batch_ids = {batch.id}
         if restore_students:
             for student in batch.students:
                 if student.is_archived and student.role == UserRole.STUDENT:
@@ -571,6 +581,8 @@ def restore_batch(batch_id):
                         student.archived_by = None
                         student.archive_reason = None
                         restored_students_count += 1
+                        roster_batch_ids.update(b.id for b in student.batches)
+        invalidate_roster_rankings(roster_batch_ids)
         
         db.session.commit()
         
@@ -6,11 +6,13 @@ from flask import Blueprint, jsonify, session
 from models import User, Batch, db, UserRole
 from utils.auth import login_required, require_role
 from utils.response import success_response, error_response
+from services.http_cache import conditional_get
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
 @dashboard_bp.route('/stats', methods=['GET'])
 @login_required
+@conditional_get('users', 'batches', 'user_batches')
 def get_dashboard_stats():
     """Get dashboard statistics"""
     try:
@@ -5,7 +5,12 @@ Upload, download, and manage PDF files for online exams
 from flask import Blueprint, request, send_file, jsonify
 from models import db, Document, User, UserRole
 from utils.auth import login_required, require_role, get_current_user
-from utils.response import success_response, error_response
+from utils.response import success_response, error_response, cursor_response
+from utils.list_query import (Field, SortKey, ListQueryError, requested_fields, field_options, project,
+                              page_args, keyset_page)
+from services.http_cache import conditional_get
+from sqlalchemy.orm import joinedload
+from operator import attrgetter
 from werkzeug.utils import secure_filename
 import os
 from datetime import datetime
@@ -17,6 +22,21 @@ UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'upload
 ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'ppt', 'pptx', 'txt'}
 MAX_FILE_SIZE = 60 * 1024 * 1024  # 60 MB in bytes
 
+# ?fields= of the document list; keys as in Document.to_dict()
+DOCUMENT_FIELDS = {name: Field(attrgetter(name), columns=(getattr(Document, name),)) for name in (
+    'id', 'class_name', 'book_name', 'chapter_name', 'file_name', 'file_size', 'file_type', 'description',
+    'uploaded_by', 'download_count', 'created_at', 'updated_at'
+)}
+DOCUMENT_FIELDS.update({
+    'file_size_mb': Field(attrgetter('file_size_mb'), columns=(Document.file_size,)),
+    'uploader_name': Field(lambda d: d.uploader.full_name if d.uploader else 'Unknown',
+                           columns=(Document.uploaded_by,),
+                           options=(joinedload(Document.uploader).load_only(User.first_name, User.last_name),)),
+})
+
+# Served by idx_documents_active_created
+DOCUMENT_SORT = (SortKey(Document.created_at, descending=True), SortKey(Document.id, descending=True))
+
 # Ensure upload directory exists
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
@@ -210,18 +230,32 @@ def get_documents():
         if chapter_name:
             query = query.filter(Document.chapter_name.ilike(f'%{chapter_name}%'))
         
-        documents = query.order_by(Document.created_at.desc()).all()
+        fields = requested_fields(DOCUMENT_FIELDS)
+        limit, cursor = page_args()
+        if fields:
+            query = query.options(*field_options(DOCUMENT_FIELDS, fields, DOCUMENT_SORT))
+        else:
+            query = query.options(joinedload(Document.uploader))
+        
+        documents, next_cursor = keyset_page(query, DOCUMENT_SORT, limit, cursor)
+        documents_data = project(documents, DOCUMENT_FIELDS, fields) if fields else [doc.to_dict() for doc in documents]
         
+        if limit is not None:
+            return cursor_response({'documents': documents_data}, limit, next_cursor,
+                                   'Documents retrieved successfully')
         return success_response('Documents retrieved successfully', {
-            'documents': [doc.to_dict() for doc in documents],
+            'documents': documents_data,
             'total': len(documents)
         })
         
+    except ListQueryError as e:
+        return error_response(str(e), 400)
     except Exception as e:
         return error_response(f'Failed to retrieve documents: {str(e)}', 500)
 
 
 @documents_bp.route('/structure', methods=['GET'])
+@conditional_get('documents', 'users')
 def get_document_structure():
     """Get hierarchical structure of documents (classes -> books -> chapters)"""
     try:
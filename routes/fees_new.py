@@ -6,6 +6,7 @@ from models import db, User, Batch, Fee, UserRole, FeeStatus
 from sqlalchemy import extract
 from datetime import datetime, date
 from decimal import Decimal
+from utils.payloads import FeeGridRow, FeeMonth, EMPTY_FEE_MONTH
 import calendar
 
 fees_bp = Blueprint('fees', __name__)
@@ -99,42 +100,27 @@ def load_monthly_fees():
             if student_id not in fees_lookup:
                 fees_lookup[student_id] = {}
             
-            fees_lookup[student_id][month] = {
-                'jf_amount': float(fee.jf_amount) if hasattr(fee, 'jf_amount') and fee.jf_amount else 0,
-                'tf_amount': float(fee.tf_amount) if hasattr(fee, 'tf_amount') and fee.tf_amount else 0,
-                'amount': float(fee.amount),
-                'fee_id': fee.id,
-                'status': fee.status.value,
-                'paid_date': fee.paid_date.isoformat() if fee.paid_date else None
-            }
+            fees_lookup[student_id][month] = FeeMonth(
+                jf_amount=float(fee.jf_amount) if hasattr(fee, 'jf_amount') and fee.jf_amount else 0,
+                tf_amount=float(fee.tf_amount) if hasattr(fee, 'tf_amount') and fee.tf_amount else 0,
+                amount=float(fee.amount),
+                fee_id=fee.id,
+                status=fee.status.value,
+                paid_date=fee.paid_date
+            )
         
         # Build response data
         result = []
         for student in students:
-            student_data = {
-                'student_id': student.id,
-                'student_name': student.full_name,
-                'exam_fee': float(student.exam_fee) if hasattr(student, 'exam_fee') and student.exam_fee else 0,
-                'other_fee': float(student.others_fee) if hasattr(student, 'others_fee') and student.others_fee else 0,
-                'months': {}
-            }
-            
-            # Add data for all 12 months
-            for month in range(1, 13):
-                if student.id in fees_lookup and month in fees_lookup[student.id]:
-                    student_data['months'][str(month)] = fees_lookup[student.id][month]
-                else:
-                    # No fee record for this month
-                    student_data['months'][str(month)] = {
-                        'jf_amount': 0,
-                        'tf_amount': 0,
-                        'amount': 0,
-                        'fee_id': None,
-                        'status': None,
-                        'paid_date': None
-                    }
-            
-            result.append(student_data)
+            student_fees = fees_lookup.get(student.id, {})
+            result.append(FeeGridRow(
+                student_id=student.id,
+                student_name=student.full_name,
+                exam_fee=float(student.exam_fee) if hasattr(student, 'exam_fee') and student.exam_fee else 0,
+                other_fee=float(student.others_fee) if hasattr(student, 'others_fee') and student.others_fee else 0,
+                # All 12 months; months without a fee record share one empty entry
+                months={str(month): student_fees.get(month, EMPTY_FEE_MONTH) for month in range(1, 13)}
+            ))
         
         return success_response('Fees loaded successfully', {
             'fees': result,
@@ -2,18 +2,24 @@
 Monthly Exam System Routes
 Ranking, GPA calculation, merit lists, and performance analytics
 """
-from flask import Blueprint, request, jsonify, current_app
-from models import (db, MonthlyExam, IndividualExam, MonthlyMark, Batch, User, 
-                   UserRole, Settings, SmsLog, SmsStatus, Attendance, AttendanceStatus, MonthlyRanking)
+from flask import Blueprint, request, jsonify, current_app, session
+from models import (db, MonthlyExam, IndividualExam, MonthlyMark, User, 
+                   UserRole, Settings, MonthlyRanking)
 from utils.auth import login_required, require_role, get_current_user
 from utils.response import success_response, error_response
-from services.sms_service import send_bulk_notification
+from services.sms_outbox import enqueue_sms
+from services.sms_template_registry import get_template
+from services.ranking_engine import (compute_comprehensive_ranking, calculate_grade_and_gpa,
+                                     update_rankings_incrementally)
+from services.ranking_cache import (get_cached_ranking, invalidate_ranking_cache, delete_ranking_cache,
+                                   ranking_cache_version)
+from services.bulk_upsert import upsert_rows
+from services.http_cache import conditional_get
 from sqlalchemy import func, desc, case, and_, or_
 from datetime import datetime, date, timedelta
 from decimal import Decimal
 import calendar
 import logging
-import requests
 import os
 import re
 
@@ -269,8 +275,16 @@ def submit_marks():
         logger.error(f"Error submitting marks: {e}")
         return error_response(f'Failed to submit marks: {str(e)}', 500)
 
+def comprehensive_ranking_etag_key(exam_id):
+    """ETag part of the ranking snapshot's version and, for students, the viewer"""
+    key = f"r{ranking_cache_version(exam_id)}"
+    if session.get('user_role') == UserRole.STUDENT.value:
+        key += f"-u{session.get('user_id')}"
+    return key
+
 @monthly_exams_bp.route('/<int:exam_id>/comprehensive-ranking', methods=['GET'])
 @login_required
+@conditional_get('monthly_exams', 'batches', key=comprehensive_ranking_etag_key)
 def get_comprehensive_monthly_ranking(exam_id):
     """Get comprehensive ranking with individual exams, attendance, roll numbers, and bonus marks"""
     try:
@@ -287,244 +301,44 @@ def get_comprehensive_monthly_ranking(exam_id):
             if monthly_exam.batch_id not in user_batch_ids:
                 return error_response('Access denied', 403)
         
-        # Get all individual exams for this monthly exam
-        individual_exams = IndividualExam.query.filter_by(
-            monthly_exam_id=exam_id
-        ).order_by(IndividualExam.order_index).all()
-        
-        # Get all students in the batch (exclude archived students)
-        batch_students = User.query.join(
-            User.batches
-        ).filter(
-            User.role == UserRole.STUDENT,
-            User.is_active == True,
-            User.is_archived == False,
-            Batch.id == monthly_exam.batch_id
-        ).all()
-        
-        # Calculate comprehensive rankings
-        rankings = []
-        
-        for student in batch_students:
-            # Get existing ranking to get roll number and previous position
-            existing_ranking = MonthlyRanking.query.filter_by(
-                monthly_exam_id=exam_id,
-                user_id=student.id
-            ).first()
-            
-            # Get individual exam marks
-            individual_marks = {}
-            total_exam_marks = 0
-            total_possible_marks = 0
-            exam_count = len(individual_exams)
-            passed_exams = 0
-            
-            for exam in individual_exams:
-                mark = MonthlyMark.query.filter_by(
-                    monthly_exam_id=exam_id,
-                    individual_exam_id=exam.id,
-                    user_id=student.id
-                ).first()
-                
-                if mark:
-                    individual_marks[exam.id] = {
-                        'exam_title': exam.title,
-                        'subject': exam.subject,
-                        'marks_obtained': mark.marks_obtained,
-                        'total_marks': mark.total_marks,
-                        'percentage': round((mark.marks_obtained / mark.total_marks * 100), 2) if mark.total_marks > 0 else 0,
-                        'is_absent': mark.is_absent,
-                        'grade': calculate_grade_and_gpa((mark.marks_obtained / mark.total_marks * 100) if mark.total_marks > 0 else 0)[0]
-                    }
-                    if not mark.is_absent:
-                        total_exam_marks += mark.marks_obtained
-                        if mark.marks_obtained >= (mark.total_marks * 0.4):  # 40% pass mark
-                            passed_exams += 1
-                    total_possible_marks += mark.total_marks
-                else:
-                    individual_marks[exam.id] = {
-                        'exam_title': exam.title,
-                        'subject': exam.subject,
-                        'marks_obtained': 0,
-                        'total_marks': exam.marks,
-                        'percentage': 0,
-                        'is_absent': True,
-                        'grade': 'F'
-                    }
-                    total_possible_marks += exam.marks
-            
-            # Calculate attendance marks (1 mark per present day in the month)
-            # Only count attendance from the SAME MONTH as the exam
-            attendance_marks = 0
-            total_days = 0
-            max_attendance_marks = 0
-            
-            if monthly_exam.start_date and monthly_exam.end_date:
-                # Get the first and last day of the exam's month
-                exam_month = monthly_exam.month
-                exam_year = monthly_exam.year
-                
-                # First day of the month
-                month_start = datetime(exam_year, exam_month, 1).date()
-                
-                # Last day of the month
-                if exam_month == 12:
-                    month_end = datetime(exam_year + 1, 1, 1).date() - timedelta(days=1)
-                else:
-                    month_end = datetime(exam_year, exam_month + 1, 1).date() - timedelta(days=1)
-                
-                # Count total working days in this specific month (Monday to Friday)
-                current_date = month_start
-                
-                while current_date <= month_end:
-                    # Count only weekdays (Monday to Friday)
-                    if current_date.weekday() < 5:  # 0-4 are Monday to Friday
-                        total_days += 1
-                    current_date += timedelta(days=1)
-                
-                max_attendance_marks = total_days  # Maximum possible attendance marks for the month
-                
-                # Count present days ONLY in this specific month
-                present_count = Attendance.query.filter(
-                    Attendance.user_id == student.id,
-                    Attendance.batch_id == monthly_exam.batch_id,
-                    Attendance.date >= month_start,
-                    Attendance.date <= month_end,
-                    Attendance.status == AttendanceStatus.PRESENT
-                ).count()
-                attendance_marks = present_count
-            
-            # Calculate attendance percentage
-            attendance_percentage = (attendance_marks / total_days * 100) if total_days > 0 else 0
-            
-            # Calculate final totals (NO BONUS - just exam marks + attendance marks)
-            final_total = total_exam_marks + attendance_marks
-            total_possible = total_possible_marks + max_attendance_marks  # Total possible including max attendance
-            
-            # Calculate simple percentage based on obtained vs total possible
-            percentage = (final_total / total_possible * 100) if total_possible > 0 else 0
-            
-            # Calculate grade and GPA based on final percentage
-            grade, gpa = calculate_grade_and_gpa(percentage)
-            exam_gpa = calculate_grade_and_gpa((total_exam_marks / total_possible_marks * 100) if total_possible_marks > 0 else 0)[1]
-            
-            # Get previous month ranking for comparison and roll number
-            previous_position = None
-            previous_roll_number = None
-            
-            if existing_ranking and existing_ranking.previous_position:
-                previous_position = existing_ranking.previous_position
-            
-            # Always try to find previous month ranking for roll number inheritance
-            prev_month = monthly_exam.month - 1 if monthly_exam.month > 1 else 12
-            prev_year = monthly_exam.year if monthly_exam.month > 1 else monthly_exam.year - 1
-            
-            prev_exam = MonthlyExam.query.filter_by(
-                batch_id=monthly_exam.batch_id,
-                month=prev_month,
-                year=prev_year
-            ).first()
-            
-            if prev_exam:
-                prev_ranking = MonthlyRanking.query.filter_by(
-                    monthly_exam_id=prev_exam.id,
-                    user_id=student.id,
-                    is_final=True
-                ).first()
-                if prev_ranking:
-                    previous_position = prev_ranking.position
-                    previous_roll_number = prev_ranking.roll_number
-            
-            # Determine roll number: use existing, or inherit from previous month, or None
-            current_roll_number = None
-            if existing_ranking and existing_ranking.roll_number:
-                current_roll_number = existing_ranking.roll_number
-            elif previous_roll_number:
-                current_roll_number = previous_roll_number  # Inherit from previous month
-            
-            ranking_data = {
-                'user_id': student.id,
-                'student_name': student.full_name,
-                'student_phone': student.phoneNumber,
-                'roll_number': current_roll_number,
-                'individual_marks': individual_marks,
-                'total_exam_marks': total_exam_marks,
-                'total_possible_marks': total_possible_marks,
-                'attendance_marks': attendance_marks,
-                'max_attendance_marks': max_attendance_marks,
-                'total_attendance_days': total_days,
-                'attendance_percentage': round(attendance_percentage, 2),
-                'final_total': final_total,
-                'total_possible': total_possible,
-                'percentage': round(percentage, 2),
-                'grade': grade,
-                'gpa': round(gpa, 2),
-                'exam_gpa': round(exam_gpa, 2),
-                'passed_exams': passed_exams,
-                'total_exams': exam_count,
-                'previous_position': previous_position
-            }
-            
-            rankings.append(ranking_data)
-        
-        # Sort by final percentage (descending), then by total marks, then by name
-        rankings.sort(key=lambda x: (-x['percentage'], -x['final_total'], x['student_name']))
-        
-        # Assign positions and calculate position changes
-        for idx, rank in enumerate(rankings):
-            current_position = idx + 1
-            rank['current_position'] = current_position
-            rank['position'] = current_position  # For compatibility
-            
-            # Calculate position change
-            if rank['previous_position']:
-                rank['position_change'] = rank['previous_position'] - current_position
-                if rank['position_change'] > 0:
-                    rank['position_trend'] = 'up'
-                elif rank['position_change'] < 0:
-                    rank['position_trend'] = 'down'
-                else:
-                    rank['position_trend'] = 'same'
-            else:
-                rank['position_change'] = None
-                rank['position_trend'] = 'new'
-        
-        # Filter out archived students from rankings before returning
-        # (in case any old data exists)
-        active_student_ids = [s.id for s in batch_students]
-        rankings = [r for r in rankings if r['user_id'] in active_student_ids]
+        # Serve the shared ranking snapshot (rebuilt only after marks/attendance/roster changes)
+        payload, _ = get_cached_ranking(monthly_exam)
+        individual_exams = payload.individual_exams
+        rankings = payload.rankings
         
         # If student, only return their data and nearby rankings
         if current_user.role == UserRole.STUDENT:
             student_rank = next(
-                (rank for rank in rankings if rank['user_id'] == current_user.id),
+                (rank for rank in rankings if rank.user_id == current_user.id),
                 None
             )
             
             if student_rank:
-                current_pos = student_rank['position']
+                current_pos = student_rank.position
                 nearby_rankings = [
                     rank for rank in rankings 
-                    if abs(rank['position'] - current_pos) <= 2
+                    if abs(rank.position - current_pos) <= 2
                 ]
                 
-                return success_response('Student comprehensive ranking retrieved', {
+                response, status_code = success_response('Student comprehensive ranking retrieved', {
                     'monthly_exam': serialize_monthly_exam(monthly_exam),
-                    'individual_exams': [{'id': e.id, 'title': e.title, 'exam_title': e.title, 'subject': e.subject, 'marks': e.marks} for e in individual_exams],
+                    'individual_exams': individual_exams,
                     'student_position': current_pos,
                     'total_students': len(rankings),
                     'nearby_rankings': nearby_rankings
                 })
             else:
                 return error_response('No data found for student', 404)
+        else:
+            # For teachers/admin, return full comprehensive ranking
+            response, status_code = success_response('Comprehensive monthly ranking retrieved', {
+                'monthly_exam': serialize_monthly_exam(monthly_exam),
+                'individual_exams': individual_exams,
+                'rankings': rankings,
+                'total_students': len(rankings)
+            })
         
-        # For teachers/admin, return full comprehensive ranking
-        return success_response('Comprehensive monthly ranking retrieved', {
-            'monthly_exam': serialize_monthly_exam(monthly_exam),
-            'individual_exams': [{'id': e.id, 'title': e.title, 'exam_title': e.title, 'subject': e.subject, 'marks': e.marks} for e in individual_exams],
-            'rankings': rankings,
-            'total_students': len(rankings)
-        })
+        return response, status_code
         
     except Exception as e:
         logger.error(f"Error getting comprehensive monthly ranking: {e}")
@@ -579,6 +393,9 @@ def update_bonus_marks(exam_id):
         bonus_setting.updated_at = datetime.utcnow()
         bonus_setting.updated_by = get_current_user().id
         
+        # Bonus marks changed: stale the cached snapshots of this batch
+        invalidate_ranking_cache(monthly_exam.batch_id)
+        
         db.session.commit()
         
         return success_response('Bonus marks updated successfully', {
@@ -642,6 +459,9 @@ def assign_roll_numbers(exam_id):
             
             updated_count += 1
         
+        # Roll numbers changed: stale the cached snapshots of this batch
+        invalidate_ranking_cache(monthly_exam.batch_id)
+        
         db.session.commit()
         
         return success_response('Roll numbers assigned successfully', {
@@ -667,11 +487,7 @@ def auto_assign_roll_numbers(exam_id):
             return error_response('Monthly exam not found', 404)
         
         # Get current comprehensive ranking
-        ranking_response = get_comprehensive_monthly_ranking(exam_id)
-        if not ranking_response.json.get('success'):
-            return error_response('Failed to get current rankings', 500)
-        
-        rankings = ranking_response.json['data']['rankings']
+        rankings = compute_comprehensive_ranking(monthly_exam).rankings
         updated_count = 0
         
         for rank_data in rankings:
@@ -699,6 +515,9 @@ def auto_assign_roll_numbers(exam_id):
             
             updated_count += 1
         
+        # Roll numbers changed: stale the cached snapshots of this batch
+        invalidate_ranking_cache(monthly_exam.batch_id)
+        
         db.session.commit()
         
         return success_response('Roll numbers auto-assigned based on ranking', {
@@ -723,47 +542,13 @@ def generate_monthly_ranking(exam_id):
         if not monthly_exam:
             return error_response('Monthly exam not found', 404)
         
-        # Get comprehensive ranking data (same as the display function)
-        ranking_response_tuple = get_comprehensive_monthly_ranking(exam_id)
-        ranking_response, status_code = ranking_response_tuple
-        
-        if status_code != 200:
-            return error_response('Failed to calculate rankings', 500)
-            
-        ranking_data = ranking_response.get_json()
-        if not ranking_data.get('success'):
-            return error_response('Failed to calculate rankings', 500)
-            
-        rankings = ranking_data['data']['rankings']
+        # Get comprehensive ranking data (same engine as the display function)
+        snapshot = compute_comprehensive_ranking(monthly_exam)
+        rankings = snapshot.rankings
         updated_count = 0
         
-        # Find previous month's exam to get roll numbers
-        prev_month = monthly_exam.month - 1 if monthly_exam.month > 1 else 12
-        prev_year = monthly_exam.year if monthly_exam.month > 1 else monthly_exam.year - 1
-        
-        prev_exam = MonthlyExam.query.filter_by(
-            batch_id=monthly_exam.batch_id,
-            month=prev_month,
-            year=prev_year
-        ).first()
-        
-        # Build a map of user_id to previous roll number
-        prev_roll_map = {}
-        if prev_exam:
-            print(f"\n🔍 Found previous exam: {prev_exam.month}/{prev_exam.year} (ID: {prev_exam.id})")
-            prev_rankings = MonthlyRanking.query.filter_by(
-                monthly_exam_id=prev_exam.id,
-                is_final=True
-            ).all()
-            print(f"📋 Previous rankings count: {len(prev_rankings)}")
-            for pr in prev_rankings:
-                if pr.roll_number:
-                    prev_roll_map[pr.user_id] = pr.roll_number
-                    print(f"  User {pr.user_id} had roll number: {pr.roll_number}")
-        else:
-            print(f"\n⚠️  No previous exam found for {prev_month}/{prev_year}")
-        
-        print(f"📊 Previous roll map: {prev_roll_map}")
+        # Map of user_id to previous month's roll number
+        prev_roll_map = snapshot.previous_roll_numbers
         
         # Clear existing rankings for this exam
         MonthlyRanking.query.filter_by(monthly_exam_id=exam_id).delete()
@@ -803,6 +588,9 @@ def generate_monthly_ranking(exam_id):
             db.session.add(ranking)
             updated_count += 1
         
+        # Rankings changed: stale the cached snapshots of this batch
+        invalidate_ranking_cache(monthly_exam.batch_id)
+        
         db.session.commit()
         
         return success_response('Monthly rankings generated and saved successfully', {
@@ -1038,9 +826,15 @@ def publish_results(exam_id):
             message = f"প্রিয় শিক্ষার্থী, {monthly_exam.title} এর ফলাফল প্রকাশিত হয়েছে। আপনার ফলাফল দেখতে লগইন করুন।"
             
             try:
-                send_bulk_notification(students, message, 'result')
+                enqueue_sms(
+                    [{'phone': s.phoneNumber, 'message': message, 'user_id': s.id} for s in students if s.phoneNumber],
+                    sent_by=get_current_user().id,
+                    source='result_published'
+                )
+                db.session.commit()
             except Exception as e:
-                logger.warning(f"Failed to send result notifications: {e}")
+                db.session.rollback()
+                logger.warning(f"Failed to queue result notifications: {e}")
         
         return success_response('Results published successfully', {
             'monthly_exam': serialize_monthly_exam(monthly_exam),
@@ -1155,6 +949,9 @@ def create_individual_exam(exam_id):
         monthly_exam.total_marks = new_total
         monthly_exam.pass_marks = int(new_total * 0.33)  # Update pass marks to 33% of new total
         
+        # A new exam column changes every ranking row
+        invalidate_ranking_cache(monthly_exam.batch_id)
+        
         db.session.commit()
         
         return success_response('Individual exam created successfully', {
@@ -1236,6 +1033,7 @@ def submit_individual_exam_marks(exam_id, individual_exam_id):
         
         students_data = data['students']  # List of student mark entries
         saved_count = 0
+        saved_user_ids = []  # Students whose saved ranking rows need refreshing
         errors = []  # Track any errors
         sms_notifications = []  # Track SMS notifications to send
         
@@ -1244,174 +1042,206 @@ def submit_individual_exam_marks(exam_id, individual_exam_id):
             logger.error("Empty students data provided")
             return error_response('At least one student mark is required', 400)
         
+        # Pass 1: validate every entry without touching the database
+        valid_entries = {}  # user_id -> (entry index, marks_obtained); last entry wins
         for idx, student_entry in enumerate(students_data):
+            # Validate student entry structure
+            if not isinstance(student_entry, dict):
+                errors.append(f"Student entry {idx + 1}: Must be an object")
+                continue
+            
+            user_id = student_entry.get('user_id')
+            marks_obtained = student_entry.get('marks_obtained')
+            
+            # Validate user_id
+            if not user_id:
+                errors.append(f"Student entry {idx + 1}: user_id is required")
+                continue
             try:
-                # Validate student entry structure
-                if not isinstance(student_entry, dict):
-                    errors.append(f"Student entry {idx + 1}: Must be an object")
-                    continue
-                
-                user_id = student_entry.get('user_id')
-                marks_obtained = student_entry.get('marks_obtained')
-                
-                # Validate user_id
-                if not user_id:
-                    errors.append(f"Student entry {idx + 1}: user_id is required")
-                    continue
-                
-                # Validate marks_obtained
-                if marks_obtained is None or marks_obtained == '':
-                    errors.append(f"Student entry {idx + 1}: marks_obtained is required")
-                    continue
-                
-                # Convert and validate marks
-                try:
-                    marks_obtained = float(marks_obtained)
-                    if marks_obtained < 0:
-                        errors.append(f"Student entry {idx + 1}: marks cannot be negative")
-                        continue
-                    if marks_obtained > individual_exam.marks:
-                        errors.append(f"Student entry {idx + 1}: marks ({marks_obtained}) cannot exceed total marks ({individual_exam.marks})")
-                        continue
-                except (ValueError, TypeError) as e:
-                    errors.append(f"Student entry {idx + 1}: invalid marks format ({marks_obtained})")
+                user_id = int(user_id)
+            except (ValueError, TypeError):
+                errors.append(f"Student entry {idx + 1}: invalid user_id ({user_id})")
+                continue
+            
+            # Validate marks_obtained
+            if marks_obtained is None or marks_obtained == '':
+                errors.append(f"Student entry {idx + 1}: marks_obtained is required")
+                continue
+            
+            # Convert and validate marks
+            try:
+                marks_obtained = float(marks_obtained)
+                if marks_obtained < 0:
+                    errors.append(f"Student entry {idx + 1}: marks cannot be negative")
                     continue
-                
-                # Validate user exists
-                try:
-                    user = User.query.get(user_id)
-                    if not user:
-                        errors.append(f"Student entry {idx + 1}: student not found (ID: {user_id})")
-                        continue
-                except Exception as db_error:
-                    error_msg = f"Student entry {idx + 1}: database error while fetching student {user_id}: {str(db_error)}"
-                    logger.error(error_msg)
-                    errors.append(error_msg)
+                if marks_obtained > individual_exam.marks:
+                    errors.append(f"Student entry {idx + 1}: marks ({marks_obtained}) cannot exceed total marks ({individual_exam.marks})")
                     continue
+            except (ValueError, TypeError) as e:
+                errors.append(f"Student entry {idx + 1}: invalid marks format ({marks_obtained})")
+                continue
             
-                # Check if mark already exists
-                try:
-                    existing_mark = MonthlyMark.query.filter_by(
-                        monthly_exam_id=exam_id,
-                        individual_exam_id=individual_exam_id,
-                        user_id=user_id
-                    ).first()
-                except Exception as db_error:
-                    error_msg = f"Student entry {idx + 1}: database error while checking existing marks: {str(db_error)}"
-                    logger.error(error_msg)
-                    errors.append(error_msg)
-                    continue
-                
-                # Calculate percentage, grade, and GPA
-                percentage = (marks_obtained / individual_exam.marks) * 100 if individual_exam.marks > 0 else 0
-                grade, gpa = calculate_grade_and_gpa(percentage)
-                
-                # Prepare SMS notification data
-                sms_notifications.append({
-                    'student': user,
-                    'marks_obtained': marks_obtained,
-                    'total_marks': individual_exam.marks,
-                    'percentage': percentage,
-                    'grade': grade,
-                    'subject': individual_exam.subject,
-                    'exam_title': individual_exam.title
-                })
-                
-                if existing_mark:
-                    # Update existing mark
-                    existing_mark.marks_obtained = marks_obtained
-                    existing_mark.total_marks = individual_exam.marks
-                    existing_mark.percentage = percentage
-                    existing_mark.grade = grade
-                    existing_mark.gpa = gpa
-                    existing_mark.is_absent = False  # No absent option
-                    existing_mark.remarks = ''      # No remarks option
-                    existing_mark.updated_at = datetime.utcnow()
-                    logger.info(f"Updated mark for user {user_id}: {marks_obtained}/{individual_exam.marks}")
-                else:
-                    # Create new mark
-                    monthly_mark = MonthlyMark(
-                        monthly_exam_id=exam_id,
-                        individual_exam_id=individual_exam_id,
-                        user_id=user_id,
-                        marks_obtained=marks_obtained,
-                        total_marks=individual_exam.marks,
-                        percentage=percentage,
-                        grade=grade,
-                        gpa=gpa,
-                        is_absent=False,  # No absent option
-                        remarks=''        # No remarks option
-                    )
-                    db.session.add(monthly_mark)
-                    logger.info(f"Created new mark for user {user_id}: {marks_obtained}/{individual_exam.marks}")
-                
-                saved_count += 1
-                
-            except Exception as entry_error:
-                error_msg = f"Student entry {idx + 1}: {str(entry_error)}"
-                logger.error(error_msg)
-                errors.append(error_msg)
+            valid_entries[user_id] = (idx, marks_obtained)
+        
+        # Pass 2: check all students with one IN query and load existing marks with another
+        try:
+            users_by_id = {}
+            existing_marks = {}
+            if valid_entries:
+                users_by_id = {
+                    user.id: user for user in User.query.filter(User.id.in_(list(valid_entries))).all()
+                }
+                existing_marks = {
+                    row.user_id: row for row in db.session.query(
+                        MonthlyMark.user_id,
+                        MonthlyMark.marks_obtained,
+                        MonthlyMark.total_marks,
+                        MonthlyMark.is_absent
+                    ).filter(
+                        MonthlyMark.monthly_exam_id == exam_id,
+                        MonthlyMark.individual_exam_id == individual_exam_id,
+                        MonthlyMark.user_id.in_(list(users_by_id))
+                    ).all()
+                }
+        except Exception as db_error:
+            logger.error(f"Database error while loading students and marks: {str(db_error)}")
+            return error_response(f'Database error: {str(db_error)}', 500)
+        
+        now = datetime.utcnow()
+        upsert_values = []
+        created_count = 0
+        updated_count = 0
+        for user_id, (idx, marks_obtained) in sorted(valid_entries.items(), key=lambda item: item[1][0]):
+            user = users_by_id.get(user_id)
+            if not user:
+                errors.append(f"Student entry {idx + 1}: student not found (ID: {user_id})")
                 continue
+            
+            # Calculate percentage, grade, and GPA
+            percentage = (marks_obtained / individual_exam.marks) * 100 if individual_exam.marks > 0 else 0
+            grade, gpa = calculate_grade_and_gpa(percentage)
+            
+            # Prepare SMS notification data
+            sms_notifications.append({
+                'student': user,
+                'marks_obtained': marks_obtained,
+                'total_marks': individual_exam.marks,
+                'percentage': percentage,
+                'grade': grade,
+                'subject': individual_exam.subject,
+                'exam_title': individual_exam.title
+            })
+            saved_count += 1
+            
+            # Skip rows that already hold exactly these marks
+            existing = existing_marks.get(user_id)
+            if existing and existing.marks_obtained == marks_obtained \
+                    and existing.total_marks == individual_exam.marks and not existing.is_absent:
+                continue
+            
+            if existing:
+                updated_count += 1
+            else:
+                created_count += 1
+            saved_user_ids.append(user_id)
+            upsert_values.append({
+                'monthly_exam_id': exam_id,
+                'individual_exam_id': individual_exam_id,
+                'user_id': user_id,
+                'marks_obtained': marks_obtained,
+                'total_marks': individual_exam.marks,
+                'percentage': percentage,
+                'grade': grade,
+                'gpa': gpa,
+                'is_absent': False,  # No absent option
+                'remarks': '',       # No remarks option
+                'created_at': now,
+                'updated_at': now
+            })
         
         # If there were validation errors, return them
         if errors and saved_count == 0:
             return error_response(f'Validation errors: {"; ".join(errors[:5])}', 400)
         
+        # Pass 3: write every changed row with INSERT ... ON CONFLICT(unique_monthly_mark) DO UPDATE
+        try:
+            upsert_rows(
+                MonthlyMark.__table__,
+                upsert_values,
+                conflict_columns=['monthly_exam_id', 'individual_exam_id', 'user_id'],
+                update_columns=['marks_obtained', 'total_marks', 'percentage', 'grade', 'gpa',
+                                'is_absent', 'remarks', 'updated_at']
+            )
+        except Exception as db_error:
+            db.session.rollback()
+            logger.error(f"Bulk marks upsert failed: {str(db_error)}")
+            return error_response(f'Failed to save marks to database: {str(db_error)}', 500)
+        
+        # Refresh only the affected students in already generated rankings; on failure
+        # the savepoint drops any half-updated rows and the saved rankings stay as they were
+        try:
+            with db.session.begin_nested():
+                ranking_stats = update_rankings_incrementally(monthly_exam, saved_user_ids)
+            logger.info(f"Incremental ranking update for exam {exam_id}: {ranking_stats}")
+        except Exception as ranking_error:
+            logger.warning(f"Incremental ranking update failed for exam {exam_id}: {ranking_error}")
+        
+        # Marks changed: stale the cached snapshots of this batch
+        if saved_user_ids:
+            invalidate_ranking_cache(monthly_exam.batch_id)
+        
         # Commit database changes
         try:
             db.session.commit()
-            logger.info(f"Successfully saved {saved_count} marks to database")
+            logger.info(f"Saved {saved_count} marks ({created_count} created, {updated_count} updated)")
         except Exception as db_error:
             db.session.rollback()
             logger.error(f"Database commit failed: {str(db_error)}")
             return error_response(f'Failed to save marks to database: {str(db_error)}', 500)
         
-        # Send SMS notifications after successful save
+        # Queue SMS notifications after successful save; the SMS dispatcher sends them in the background
         current_user = get_current_user()
-        sms_sent_count = 0
-        sms_failed_count = 0
+        sms_queued_count = 0
+        sms_job_id = None
         sms_errors = []
         
         # Check if SMS is enabled and user has SMS balance
         send_sms = data.get('send_sms', False)
         if send_sms and current_user.sms_count > 0:
-            # Get exam result template with better fallback system
-            exam_template_message = get_sms_template('exam_result')
+            # Resolve and compile the exam result template once for every student
+            exam_template = get_template('exam_result', user_id=current_user.id)
             
+            sms_messages = []
             for notification in sms_notifications:
+                student = notification['student']
+                
+                # Determine phone number to send to (prefer parent/guardian phone)
+                target_phone = get_target_phone(student)
+                if not target_phone:
+                    sms_errors.append(f"No valid phone number for {student.full_name}")
+                    continue
+                
+                sms_messages.append({
+                    'phone': target_phone,
+                    'message': generate_exam_result_message(exam_template, notification),
+                    'user_id': student.id
+                })
+            
+            if sms_messages:
                 try:
-                    student = notification['student']
-                    
-                    # Determine phone number to send to (prefer parent/guardian phone)
-                    target_phone = get_target_phone(student)
-                    
-                    if not target_phone:
-                        sms_errors.append(f"No valid phone number for {student.full_name}")
-                        sms_failed_count += 1
-                        continue
-                    
-                    # Generate message using template
-                    message = generate_exam_result_message(exam_template_message, notification)
-                    
-                    # Send SMS
-                    sms_result = send_sms_notification(target_phone, message, current_user)
-                    if sms_result.get('success'):
-                        sms_sent_count += 1
-                        logger.info(f"SMS sent successfully to {target_phone} for {student.full_name}")
-                    else:
-                        error_msg = sms_result.get('error', 'Unknown SMS error')
-                        sms_errors.append(f"SMS failed for {student.full_name}: {error_msg}")
-                        sms_failed_count += 1
-                            
+                    sms_job_id = enqueue_sms(sms_messages, sent_by=current_user.id, source='exam_result', charge_sender=True)
+                    db.session.commit()
+                    sms_queued_count = len(sms_messages)
                 except Exception as sms_error:
-                    error_msg = f"SMS error for {student.full_name}: {str(sms_error)}"
-                    logger.warning(error_msg)
-                    sms_errors.append(error_msg)
-                    sms_failed_count += 1
+                    db.session.rollback()
+                    logger.warning(f"Failed to queue exam result SMS: {sms_error}")
+                    sms_errors.append(f"Failed to queue SMS: {str(sms_error)}")
         
         # Prepare response data
         response_data = {
             'saved_count': saved_count,
+            'created_count': created_count,
+            'updated_count': updated_count,
             'exam_title': individual_exam.title,
             'total_marks': individual_exam.marks
         }
@@ -1420,11 +1250,12 @@ def submit_individual_exam_marks(exam_id, individual_exam_id):
         if errors:
             response_data['validation_errors'] = errors[:10]  # Limit to first 10 errors
         
-        # Add SMS info if SMS was attempted
+        # Add SMS info if SMS was requested
         if send_sms:
             response_data.update({
-                'sms_sent': sms_sent_count,
-                'sms_failed': sms_failed_count,
+                'sms_queued': sms_queued_count,
+                'sms_job_id': sms_job_id,
+                'sms_failed': len(sms_errors),
                 'remaining_sms_balance': current_user.sms_count
             })
             
@@ -1528,6 +1359,9 @@ def delete_individual_exam(exam_id, individual_exam_id):
         monthly_exam.total_marks = new_total
         monthly_exam.pass_marks = int(new_total * 0.33) if new_total > 0 else 0
         
+        # Exam and marks removed: stale the cached snapshots of this batch
+        invalidate_ranking_cache(monthly_exam.batch_id)
+        
         db.session.commit()
         
         return success_response(f'Individual exam deleted successfully. {marks_deleted} marks record(s) removed.', {
@@ -1567,6 +1401,9 @@ def delete_monthly_exam(exam_id):
         # Delete individual exams
         individual_exams_deleted = IndividualExam.query.filter_by(monthly_exam_id=exam_id).delete()
         
+        # Delete the cached ranking snapshot
+        delete_ranking_cache(exam_id)
+        
         # Delete the monthly exam
         db.session.delete(monthly_exam)
         db.session.commit()
@@ -1607,23 +1444,6 @@ def serialize_monthly_exam(exam):
         'created_at': exam.created_at.isoformat()
     }
 
-def calculate_grade_and_gpa(percentage):
-    """Calculate grade and GPA based on percentage"""
-    if percentage >= 80:
-        return 'A+', 5.00
-    elif percentage >= 70:
-        return 'A', 4.00
-    elif percentage >= 60:
-        return 'A-', 3.50
-    elif percentage >= 50:
-        return 'B', 3.00
-    elif percentage >= 40:
-        return 'C', 2.00
-    elif percentage >= 33:
-        return 'D', 1.00
-    else:
-        return 'F', 0.00
-
 def get_bonus_marks_for_exam(exam_id, user_id):
     """Get bonus marks for a student in a monthly exam"""
     try:
@@ -1754,44 +1574,6 @@ def validate_phone_number(phone):
     
     return None
 
-def get_sms_template(template_type):
-    """Get SMS template with fallback to default templates"""
-    try:
-        # PRIORITY 1: Get template from database (permanent storage for all teachers)
-        template_key = f"sms_template_{template_type}"
-        template_setting = Settings.query.filter_by(key=template_key).first()
-        
-        if template_setting and template_setting.value:
-            message = template_setting.value.get('message')
-            if message:
-                return message
-        
-        # PRIORITY 2: Try session as fallback (for backward compatibility)
-        from flask import session
-        custom_templates = session.get('custom_templates', {})
-        custom_template = custom_templates.get(template_type)
-        
-        if custom_template:
-            return custom_template
-        
-        # PRIORITY 3: Return default template
-        return get_default_template(template_type)
-        
-    except Exception as e:
-        logger.warning(f"Error getting SMS template: {e}")
-        return get_default_template(template_type)
-
-def get_default_template(template_type):
-    """Get default short SMS templates (Bangla, optimized for 1 SMS)"""
-    templates = {
-        'exam_result': "{student_name} পেয়েছে {marks}/{total} ({subject}) {date}",
-        'attendance_present': "{student_name} উপস্থিত ({batch_name})",
-        'attendance_absent': "{student_name} অনুপস্থিত {date} ({batch_name})",
-        'fee_reminder': "{student_name} এর ফি {amount}৳ বকেয়া। শেষ তারিখ {due_date}",
-        'general': "{student_name}: {message}"
-    }
-    return templates.get(template_type, templates['general'])
-
 def get_target_phone(student):
     """Get the target phone number for SMS (prefer guardian phone)"""
     try:
@@ -1814,7 +1596,7 @@ def get_target_phone(student):
         return None
 
 def generate_exam_result_message(template, notification):
-    """Generate SMS message using template and notification data"""
+    """Generate SMS message from a compiled template and notification data"""
     try:
         # Prepare template variables (short format with DD/MM date)
         variables = {
@@ -1829,8 +1611,8 @@ def generate_exam_result_message(template, notification):
             'date': datetime.now().strftime('%d/%m')  # Short date format DD/MM
         }
         
-        # Format the template (short Bangla: "{student_name} পেয়েছে {marks}/{total} ({subject}) {date}")
-        message = template.format(**variables)
+        # Fill the template (short Bangla: "{student_name} পেয়েছে {marks}/{total} ({subject}) {date}")
+        message = template.render(variables)
         
         # New short template fits in 1 SMS (100 chars for mixed Bangla/English)
         return message
@@ -1840,83 +1622,8 @@ def generate_exam_result_message(template, notification):
         # Ultimate fallback
         return f"{notification['student'].first_name} scored {int(notification['marks_obtained'])}/{int(notification['total_marks'])} marks in {notification['subject']}"
 
-def send_sms_notification(phone, message, current_user):
-    """Send SMS notification and log the attempt"""
-    try:
-        # Use the BulkSMSBD API
-        api_key = "gsOKLO6XtKsANCvgPHNt"
-        sender_id = "8809617628909"
-        api_url = "http://bulksmsbd.net/api/smsapi"
-        
-        # Format phone number
-        formatted_phone = validate_phone_number(phone)
-        if not formatted_phone:
-            return {'success': False, 'error': 'Invalid phone number format'}
-        
-        # Prepare API payload
-        payload = {
-            'api_key': api_key,
-            'type': 'text',
-            'number': formatted_phone,
-            'senderid': sender_id,
-            'message': message
-        }
-        
-        # Create SMS log entry
-        sms_log = SmsLog(
-            phone_number=formatted_phone,
-            message=message,
-            sent_by=current_user.id,
-            status=SmsStatus.PENDING
-        )
-        
-        # Find user by phone number for logging
-        user = User.query.filter_by(phoneNumber=formatted_phone).first()
-        if user:
-            sms_log.user_id = user.id
-        
-        # Send SMS
-        response = requests.post(api_url, data=payload, timeout=30)
-        
-        if response.status_code == 200:
-            # Check if response contains success indicator
-            response_text = response.text.lower()
-            if 'success' in response_text or 'sent' in response_text:
-                sms_log.status = SmsStatus.SENT
-                sms_log.sent_at = datetime.utcnow()
-                sms_log.cost = 1  # Default cost
-                
-                # Deduct SMS count from user
-                current_user.sms_count = max(0, current_user.sms_count - 1)
-                
-                db.session.add(sms_log)
-                db.session.commit()
-                
-                return {'success': True, 'message_id': None, 'cost': 1}
-            else:
-                sms_log.status = SmsStatus.FAILED
-                sms_log.api_response = {'error': response.text}
-                db.session.add(sms_log)
-                db.session.commit()
-                
-                return {'success': False, 'error': response.text}
-        else:
-            sms_log.status = SmsStatus.FAILED
-            sms_log.api_response = {'error': f'HTTP {response.status_code}: {response.text}'}
-            db.session.add(sms_log)
-            db.session.commit()
-            
-            return {'success': False, 'error': f'HTTP {response.status_code}: {response.text}'}
-    
-    except requests.exceptions.Timeout:
-        return {'success': False, 'error': 'SMS API timeout'}
-    except requests.exceptions.ConnectionError:
-        return {'success': False, 'error': 'SMS API connection error'}
-    except Exception as e:
-        return {'success': False, 'error': f'SMS API error: {str(e)}'}
-
-
 @monthly_exams_bp.route('/homepage-top-performers', methods=['GET'])
+@conditional_get('monthly_exams', 'monthly_rankings', 'users', 'batches')
 def get_homepage_top_performers():
     """Get top 3 students from all monthly exams featured on homepage"""
     try:
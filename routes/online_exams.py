@@ -7,10 +7,15 @@ Students can take exams with auto-submit and instant results
 from flask import Blueprint, request, jsonify, current_app
 from models import db, OnlineExam, OnlineQuestion, OnlineExamAttempt, OnlineStudentAnswer, User, UserRole
 from utils.auth import login_required, get_current_user, require_role
-from utils.response import success_response, error_response
+from utils.response import success_response, error_response, cursor_response
+from utils.payloads import exam_question
+from utils.list_query import (Field, SortKey, ListQueryError, requested_fields, field_options, project,
+                              page_args, keyset_page)
+from services import metrics
 from datetime import datetime, timedelta
 from sqlalchemy import func, and_, or_
 from sqlalchemy.orm import joinedload
+from operator import attrgetter
 
 online_exams_bp = Blueprint('online_exams', __name__, url_prefix='/api/online-exams')
 
@@ -18,6 +23,71 @@ online_exams_bp = Blueprint('online_exams', __name__, url_prefix='/api/online-ex
 # TEACHER ROUTES - Exam Management
 #############################################################################
 
+# ?fields= of the exam list; the attempt fields exist for students only
+EXAM_FIELDS = {name: Field(attrgetter(name), columns=(getattr(OnlineExam, name),)) for name in (
+    'id', 'title', 'description', 'class_name', 'book_name', 'chapter_name', 'duration', 'total_questions',
+    'pass_percentage', 'allow_retake', 'is_active', 'is_published', 'created_at'
+)}
+
+ATTEMPT_FIELDS = frozenset([
+    'attempts_count', 'best_score', 'can_retake', 'has_ongoing_attempt', 'ongoing_attempt_id', 'ongoing_started_at'
+])
+
+# Served by idx_online_exams_created_at
+EXAM_SORT = (SortKey(OnlineExam.created_at, descending=True), SortKey(OnlineExam.id, descending=True))
+
+
+def _question_counts(exam_ids):
+    """{exam_id: question count} in one grouped query"""
+    if not exam_ids:
+        return {}
+    return dict(db.session.query(OnlineQuestion.exam_id, func.count(OnlineQuestion.id)).filter(
+        OnlineQuestion.exam_id.in_(exam_ids)
+    ).group_by(OnlineQuestion.exam_id).all())
+
+
+def _student_attempts(exam_ids, student_id):
+    """{exam_id: (submitted attempts, ongoing attempt or None)} of a student in one query"""
+    attempts = {}
+    if not exam_ids:
+        return attempts
+    rows = OnlineExamAttempt.query.filter(
+        OnlineExamAttempt.exam_id.in_(exam_ids),
+        OnlineExamAttempt.student_id == student_id
+    ).order_by(OnlineExamAttempt.id).all()
+    for attempt in rows:
+        submitted, ongoing = attempts.get(attempt.exam_id, ([], None))
+        if attempt.is_submitted:
+            submitted.append(attempt)
+        elif ongoing is None:
+            ongoing = attempt
+        attempts[attempt.exam_id] = (submitted, ongoing)
+    return attempts
+
+
+def _exam_fields(question_counts, attempts=None):
+    """EXAM_FIELDS plus the fields read from the prefetched counts and attempts"""
+    fields = dict(EXAM_FIELDS, questions_count=Field(lambda e: question_counts.get(e.id, 0)))
+    if attempts is None:
+        return fields
+
+    def submitted(exam):
+        return attempts.get(exam.id, ([], None))[0]
+
+    def ongoing(exam):
+        return attempts.get(exam.id, ([], None))[1]
+
+    fields.update({
+        'attempts_count': Field(lambda e: len(submitted(e))),
+        'best_score': Field(lambda e: max(a.percentage for a in submitted(e)) if submitted(e) else 0),
+        'can_retake': Field(lambda e: e.allow_retake or not submitted(e), columns=(OnlineExam.allow_retake,)),
+        'has_ongoing_attempt': Field(lambda e: ongoing(e) is not None),
+        'ongoing_attempt_id': Field(lambda e: ongoing(e).id if ongoing(e) else None),
+        'ongoing_started_at': Field(lambda e: ongoing(e).started_at.isoformat() if ongoing(e) else None),
+    })
+    return fields
+
+
 @online_exams_bp.route('', methods=['GET'])
 @login_required
 def get_exams():
@@ -25,62 +95,74 @@ def get_exams():
     try:
         current_user = get_current_user()
         current_app.logger.info(f"[online_exams.get_exams] user_id={current_user.id} role={current_user.role}")
+        is_student = current_user.role == UserRole.STUDENT
+        
+        available = _exam_fields({}, {} if is_student else None)
+        fields = requested_fields(available)
+        limit, cursor = page_args()
         
         if current_user.role in [UserRole.TEACHER, UserRole.SUPER_USER]:
             # Teachers see all exams
-            exams = OnlineExam.query.order_by(OnlineExam.created_at.desc()).all()
+            query = OnlineExam.query
         else:
             # Students see only published exams
-            exams = OnlineExam.query.filter_by(is_published=True, is_active=True).order_by(OnlineExam.created_at.desc()).all()
+            query = OnlineExam.query.filter_by(is_published=True, is_active=True)
+        if fields:
+            query = query.options(*field_options(available, fields, EXAM_SORT))
+        exams, next_cursor = keyset_page(query, EXAM_SORT, limit, cursor)
         current_app.logger.info(f"[online_exams.get_exams] total_fetched={len(exams)} for role={current_user.role}")
         
-        exams_data = []
-        for exam in exams:
-            exam_dict = {
-                'id': exam.id,
-                'title': exam.title,
-                'description': exam.description,
-                'class_name': exam.class_name,
-                'book_name': exam.book_name,
-                'chapter_name': exam.chapter_name,
-                'duration': exam.duration,
-                'total_questions': exam.total_questions,
-                'pass_percentage': exam.pass_percentage,
-                'allow_retake': exam.allow_retake,
-                'is_active': exam.is_active,
-                'is_published': exam.is_published,
-                'created_at': exam.created_at.isoformat() if exam.created_at else None,
-                'questions_count': exam.questions.count(),
-            }
-            
-            # Add attempt info for students
-            if current_user.role == UserRole.STUDENT:
-                attempts = OnlineExamAttempt.query.filter_by(
-                    exam_id=exam.id,
-                    student_id=current_user.id,
-                    is_submitted=True
-                ).order_by(OnlineExamAttempt.submitted_at.desc()).all()
+        # Question counts and the student's attempts for all exams at once
+        exam_ids = [exam.id for exam in exams]
+        question_counts = _question_counts(exam_ids) if not fields or 'questions_count' in fields else {}
+        attempts = None
+        if is_student and (not fields or set(fields) & ATTEMPT_FIELDS):
+            attempts = _student_attempts(exam_ids, current_user.id)
+        
+        if fields:
+            exams_data = project(exams, _exam_fields(question_counts, attempts or {}), fields)
+        else:
+            exams_data = []
+            for exam in exams:
+                exam_dict = {
+                    'id': exam.id,
+                    'title': exam.title,
+                    'description': exam.description,
+                    'class_name': exam.class_name,
+                    'book_name': exam.book_name,
+                    'chapter_name': exam.chapter_name,
+                    'duration': exam.duration,
+                    'total_questions': exam.total_questions,
+                    'pass_percentage': exam.pass_percentage,
+                    'allow_retake': exam.allow_retake,
+                    'is_active': exam.is_active,
+                    'is_published': exam.is_published,
+                    'created_at': exam.created_at.isoformat() if exam.created_at else None,
+                    'questions_count': question_counts.get(exam.id, 0),
+                }
                 
-                exam_dict['attempts_count'] = len(attempts)
-                exam_dict['best_score'] = max([a.percentage for a in attempts]) if attempts else 0
-                exam_dict['can_retake'] = exam.allow_retake or len(attempts) == 0
+                # Add attempt info for students
+                if is_student:
+                    submitted, ongoing = attempts.get(exam.id, ([], None))
+                    exam_dict['attempts_count'] = len(submitted)
+                    exam_dict['best_score'] = max([a.percentage for a in submitted]) if submitted else 0
+                    exam_dict['can_retake'] = exam.allow_retake or len(submitted) == 0
+                    
+                    # Check if there's an ongoing attempt
+                    exam_dict['has_ongoing_attempt'] = ongoing is not None
+                    if ongoing:
+                        exam_dict['ongoing_attempt_id'] = ongoing.id
+                        exam_dict['ongoing_started_at'] = ongoing.started_at.isoformat()
                 
-                # Check if there's an ongoing attempt
-                ongoing = OnlineExamAttempt.query.filter_by(
-                    exam_id=exam.id,
-                    student_id=current_user.id,
-                    is_submitted=False
-                ).first()
-                exam_dict['has_ongoing_attempt'] = ongoing is not None
-                if ongoing:
-                    exam_dict['ongoing_attempt_id'] = ongoing.id
-                    exam_dict['ongoing_started_at'] = ongoing.started_at.isoformat()
-            
-            exams_data.append(exam_dict)
+                exams_data.append(exam_dict)
         
         current_app.logger.info(f"[online_exams.get_exams] returning count={len(exams_data)}")
+        if limit is not None:
+            return cursor_response(exams_data, limit, next_cursor, 'Exams retrieved successfully')
         return success_response('Exams retrieved successfully', exams_data)
     
+    except ListQueryError as e:
+        return error_response(str(e), 400)
     except Exception as e:
         current_app.logger.error(f'[online_exams.get_exams] Error: {str(e)}')
         return error_response(f'Failed to get exams: {str(e)}', 500)
@@ -170,18 +252,7 @@ def get_exam_details(exam_id):
         # Include questions for teachers or for students taking the exam
         if current_user.role in [UserRole.TEACHER, UserRole.SUPER_USER]:
             questions = OnlineQuestion.query.filter_by(exam_id=exam_id).order_by(OnlineQuestion.question_order).all()
-            exam_data['questions'] = [{
-                'id': q.id,
-                'question_text': q.question_text,
-                'option_a': q.option_a,
-                'option_b': q.option_b,
-                'option_c': q.option_c,
-                'option_d': q.option_d,
-                'correct_answer': q.correct_answer,
-                'explanation': q.explanation,
-                'question_order': q.question_order,
-                'marks': q.marks
-            } for q in questions]
+            exam_data['questions'] = [exam_question(q, include_answer=True) for q in questions]
         
         return success_response('Exam details retrieved successfully', exam_data)
     
@@ -442,16 +513,7 @@ def start_exam(exam_id):
             
             # Return the ongoing attempt
             questions = OnlineQuestion.query.filter_by(exam_id=exam_id).order_by(OnlineQuestion.question_order).all()
-            questions_data = [{
-                'id': q.id,
-                'question_text': q.question_text,
-                'option_a': q.option_a,
-                'option_b': q.option_b,
-                'option_c': q.option_c,
-                'option_d': q.option_d,
-                'question_order': q.question_order,
-                'marks': q.marks
-            } for q in questions]
+            questions_data = [exam_question(q) for q in questions]
             
             # Get existing answers
             existing_answers = OnlineStudentAnswer.query.filter_by(attempt_id=ongoing.id).all()
@@ -504,16 +566,7 @@ def start_exam(exam_id):
         questions = OnlineQuestion.query.filter_by(exam_id=exam_id).order_by(OnlineQuestion.question_order).all()
         current_app.logger.info(f"[start_exam] Questions loaded: count={len(questions)}")
         
-        questions_data = [{
-            'id': q.id,
-            'question_text': q.question_text,
-            'option_a': q.option_a,
-            'option_b': q.option_b,
-            'option_c': q.option_c,
-            'option_d': q.option_d,
-            'question_order': q.question_order,
-            'marks': q.marks
-        } for q in questions]
+        questions_data = [exam_question(q) for q in questions]
         
         current_app.logger.info(f"[start_exam] Success! Returning attempt_id={attempt.id} with {len(questions_data)} questions")
         
@@ -584,6 +637,7 @@ def save_answer(attempt_id):
             db.session.add(student_answer)
         
         db.session.commit()
+        metrics.inc('online_exam_answers_saved_total')
         
         return success_response('Answer saved successfully')
     
@@ -0,0 +1,70 @@
+"""
+Request Profile Routes
+Browse profiles captured with the X-Profile header (Super user only)
+"""
+import json
+import os
+
+from flask import Blueprint, current_app, send_file
+from models import UserRole
+from services.request_profiler import list_profiles, profile_path
+from utils.auth import login_required, require_role
+from utils.response import success_response, error_response
+
+profiles_bp = Blueprint('profiles', __name__)
+
+
+@profiles_bp.route('', methods=['GET'])
+@login_required
+@require_role(UserRole.SUPER_USER)
+def get_profiles():
+    """List stored request profiles, newest first"""
+    try:
+        profiles = list_profiles(current_app)
+        return success_response('Profiles retrieved successfully', {'profiles': profiles, 'total': len(profiles)})
+    except Exception as e:
+        current_app.logger.error(f"Error listing profiles: {e}")
+        return error_response(f'Failed to list profiles: {str(e)}', 500)
+
+
+@profiles_bp.route('/<profile_id>', methods=['GET'])
+@login_required
+@require_role(UserRole.SUPER_USER)
+def get_profile(profile_id):
+    """Call tree, top functions and SQL timeline of one profile"""
+    try:
+        path = profile_path(current_app, profile_id, 'json')
+        if not path:
+            return error_response('Profile not found', 404)
+        with open(path, encoding='utf-8') as f:
+            profile = json.load(f)
+        return success_response('Profile retrieved successfully', profile)
+    except Exception as e:
+        current_app.logger.error(f"Error reading profile {profile_id}: {e}")
+        return error_response(f'Failed to read profile: {str(e)}', 500)
+
+
+@profiles_bp.route('/<profile_id>/download', methods=['GET'])
+@login_required
+@require_role(UserRole.SUPER_USER)
+def download_profile(profile_id):
+    """Raw pstats file for snakeviz or `python -m pstats`"""
+    path = profile_path(current_app, profile_id, 'prof')
+    if not path:
+        return error_response('Profile not found', 404)
+    return send_file(path, as_attachment=True, download_name=f'{profile_id}.prof',
+                     mimetype='application/octet-stream')
+
+
+@profiles_bp.route('/<profile_id>', methods=['DELETE'])
+@login_required
+@require_role(UserRole.SUPER_USER)
+def delete_profile(profile_id):
+    """Remove a stored profile"""
+    json_path = profile_path(current_app, profile_id, 'json')
+    if not json_path:
+        return error_response('Profile not found', 404)
+    for path in (json_path, profile_path(current_app, profile_id, 'prof')):
+        if path:
+            os.remove(path)
+    return success_response('Profile deleted successfully')
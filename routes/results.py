@@ -3,9 +3,11 @@ Results Management Routes
 Monthly result calculation and reporting
 """
 from flask import Blueprint, request
-from models import db, MonthlyResult, User, Batch, ExamSubmission, Attendance, Fee, UserRole, AttendanceStatus, FeeStatus
+from models import db, MonthlyResult, User, Batch, ExamSubmission, Fee, UserRole, FeeStatus
 from utils.auth import login_required, require_role, get_current_user, check_batch_access
 from utils.response import success_response, error_response, paginated_response
+from services.attendance_stats import month_counts
+from services.work_calendar import working_days
 from sqlalchemy import or_, and_, func, extract, case
 from datetime import datetime, date
 import calendar
@@ -170,6 +172,10 @@ def calculate_monthly_results():
         last_day = calendar.monthrange(year, month)[1]
         end_date = date(year, month, last_day)
         
+        # Attendance counts of the whole batch from the monthly rollup
+        attendance_counts = month_counts(batch_id, year, month, [student.id for student in students])
+        total_working_days = working_days(batch_id, year, month)
+        
         calculated_results = []
         
         for student in students:
@@ -199,17 +205,10 @@ def calculate_monthly_results():
             obtained_marks = sum(submission.obtained_marks for submission in exam_submissions)
             exam_percentage = (obtained_marks / total_marks * 100) if total_marks > 0 else 0
             
-            # Calculate attendance for the month
-            attendance_records = Attendance.query.filter(
-                Attendance.user_id == student.id,
-                Attendance.batch_id == batch_id,
-                Attendance.date >= start_date,
-                Attendance.date <= end_date
-            ).all()
-            
-            if attendance_records:
-                present_count = len([a for a in attendance_records if a.status in [AttendanceStatus.PRESENT, AttendanceStatus.LATE]])
-                attendance_percentage = (present_count / len(attendance_records) * 100)
+            # Attendance for the month: present or late days out of the batch's working days
+            counts = attendance_counts.get(student.id)
+            if counts and total_working_days:
+                attendance_percentage = min(counts.attended / total_working_days * 100, 100)
             else:
                 attendance_percentage = 0
             
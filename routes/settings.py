@@ -6,6 +6,7 @@ from flask import Blueprint, request, session
 from models import db, User, UserRole
 from utils.auth import login_required, require_role
 from utils.response import success_response, error_response
+from services.ranking_cache import invalidate_roster_rankings
 
 settings_bp = Blueprint('settings', __name__)
 
@@ -111,6 +112,10 @@ def update_profile_settings():
         if 'profileImage' in data:
             user.profile_image = data['profileImage']
         
+        # A student's name shows in their batches' rankings
+        if user.role == UserRole.STUDENT and ('firstName' in data or 'lastName' in data):
+            invalidate_roster_rankings([batch.id for batch in user.batches])
+        
         db.session.commit()
         
         return success_response('Profile updated successfully')
@@ -5,10 +5,17 @@ SMS sending, template management, and notification system
 from flask import Blueprint, request, jsonify, session
 from models import db, SmsLog, User, Batch, UserRole, SmsStatus, user_batches
 from utils.auth import login_required, require_role, get_current_user
-from utils.response import success_response, error_response, paginated_response
+from utils.response import success_response, error_response, paginated_response, cursor_response
+from utils.list_query import (Field, SortKey, ListQueryError, requested_fields, field_options, project,
+                              page_args, keyset_page)
+from services.sms_ledger import InsufficientSmsBalance, credit, get_balance, reconciliation_report
+from services.sms_outbox import enqueue_sms, get_job_status
+from services.sms_provider import get_sms_client
+from services.sms_template_registry import compile_template, drop_session_override, get_template, invalidate_templates
 from sqlalchemy import or_, func, extract
+from sqlalchemy.orm import joinedload
+from operator import attrgetter
 from datetime import datetime, date, timedelta
-import requests
 import os
 import re
 
@@ -52,7 +59,8 @@ def build_template_payload(template_def, override_message=None):
         'variables': template_def.get('variables', []),
         'editable': template_def.get('editable', True),
         'message': message,
-        'char_count': count_sms_characters(message)
+        'char_count': count_sms_characters(message),
+        'max_sms': compile_template(message).max_cost
     }
 
 
@@ -64,36 +72,23 @@ def get_template_definition(template_id):
     return None
 
 
+def resolve_template(template_def):
+    """Compiled template for a definition with the current user's saved text applied."""
+    return get_template(template_def['id'], user_id=session.get('user_id'), default=template_def['default_message'])
+
+
 def get_template_payload(template_id):
-    """Return template payload with custom overrides applied."""
+    """Return template payload with saved overrides applied."""
     template_def = get_template_definition(template_id)
     if not template_def:
         return None
-    custom_templates = session.get('custom_templates', {})
-    override = custom_templates.get(template_id)
-    return build_template_payload(template_def, override)
+    return build_template_payload(template_def, resolve_template(template_def).source)
 
 
 def get_all_templates():
-    """Return all templates with database and session overrides applied."""
-    from models import SmsTemplate
-    
-    user_id = session.get('user_id')
-    custom_templates = session.get('custom_templates', {})
-    
-    # Load saved templates from database if user is logged in
-    db_templates = {}
-    if user_id:
-        saved_templates = SmsTemplate.query.filter_by(created_by=user_id, is_active=True).all()
-        for template in saved_templates:
-            db_templates[template.name] = template.content
-    
-    # Merge: Database templates take precedence, then session, then defaults
+    """Return all templates with saved overrides applied."""
     return [
-        build_template_payload(
-            template_def, 
-            custom_templates.get(template_def['id']) or db_templates.get(template_def['id'])
-        )
+        build_template_payload(template_def, resolve_template(template_def).source)
         for template_def in BASE_SMS_TEMPLATES
     ]
 
@@ -146,33 +141,6 @@ def calculate_sms_cost(message):
     
     return sms_count
 
-def deduct_sms_balance(sms_count):
-    """Deduct SMS count from local balance in settings"""
-    try:
-        from models import Settings
-        
-        balance_setting = Settings.query.filter_by(key='sms_balance').first()
-        if not balance_setting:
-            # Initialize with 0 balance (super admin will add balance)
-            balance_setting = Settings(
-                key='sms_balance',
-                value={'balance': 0},
-                category='sms',
-                description='Current SMS balance (managed by super admin)'
-            )
-            db.session.add(balance_setting)
-        
-        current_balance = balance_setting.value.get('balance', 0) if balance_setting.value else 0
-        new_balance = max(0, current_balance - sms_count)
-        
-        balance_setting.value = {'balance': new_balance}
-        db.session.commit()
-        
-        return new_balance
-    except Exception as e:
-        print(f"Error deducting balance: {e}")
-        return 0
-
 def validate_phone_number(phone):
     """Validate and format phone number"""
     # Remove any non-digit characters
@@ -191,87 +159,19 @@ def validate_phone_number(phone):
     return None
 
 def send_sms_via_api(phone, message):
-    """Send SMS using BulkSMSBD API - Hardcoded Configuration"""
-    try:
-        # Hardcoded SMS API Configuration - DO NOT CHANGE
-        api_key = 'gsOKLO6XtKsANCvgPHNt'
-        sender_id = '8809617628909'
-        api_url = 'http://bulksmsbd.net/api/smsapi'
-        
-        # Format phone number - remove any spaces or special characters
-        formatted_phone = phone.strip().replace(' ', '').replace('-', '').replace('+', '')
-        
-        # Ensure phone starts with 88 for Bangladesh
-        if formatted_phone.startswith('0'):
-            formatted_phone = '88' + formatted_phone
-        elif not formatted_phone.startswith('88'):
-            formatted_phone = '88' + formatted_phone
-        
-        # Build URL with GET parameters
-        params = {
-            'api_key': api_key,
-            'type': 'text',
-            'number': formatted_phone,
-            'senderid': sender_id,
-            'message': message
-        }
-        
-        print(f"📤 Sending SMS to {formatted_phone}...")
-        print(f"🔗 URL: {api_url}")
-        print(f"📋 Params: {params}")
-        
-        # Send SMS using GET request
-        response = requests.get(api_url, params=params, timeout=30)
-        
-        print(f"📡 Response Status: {response.status_code}")
-        print(f"📄 Response Text: {response.text}")
-        
-        if response.status_code == 200:
-            try:
-                # Parse JSON response
-                response_data = response.json()
-                response_code = response_data.get('response_code')
-                success_message = response_data.get('success_message', '')
-                error_message = response_data.get('error_message', '')
-                
-                print(f"📊 Response Code: {response_code}")
-                
-                # BulkSMSBD success codes (typically 200 or 202)
-                if response_code in [200, 202]:
-                    print(f"✅ SMS sent successfully to {formatted_phone}")
-                    return {
-                        'success': True,
-                        'message_id': success_message,
-                        'cost': 1
-                    }
-                else:
-                    print(f"❌ SMS API error (code {response_code}): {error_message}")
-                    return {
-                        'success': False,
-                        'error': error_message or f"API Error Code: {response_code}"
-                    }
-            except ValueError:
-                # Not JSON response - treat as error
-                print(f"❌ Invalid JSON response: {response.text}")
-                return {
-                    'success': False,
-                    'error': 'Invalid API response format'
-                }
-        else:
-            error_msg = f'HTTP {response.status_code}: {response.text}'
-            print(f"❌ SMS API HTTP error: {error_msg}")
-            return {'success': False, 'error': error_msg}
-    
-    except requests.exceptions.Timeout:
-        print(f"❌ SMS API timeout for {phone}")
-        return {'success': False, 'error': 'SMS API timeout'}
-    except Exception as e:
-        print(f"❌ SMS API exception: {str(e)}")
-        return {'success': False, 'error': str(e)}
-    except requests.exceptions.ConnectionError:
-        return {'success': False, 'error': 'SMS API connection error'}
-    except Exception as e:
-        return {'success': False, 'error': f'SMS API error: {str(e)}'}
+    """Send SMS using BulkSMSBD API through the shared pooled client"""
+    return get_sms_client().send(phone, message)
+
+def render_bulk_message(template, student, batch, today=None):
+    """Fill the per-student placeholders of a compiled bulk SMS template"""
+    return template.render({
+        'student_name': student.first_name or '',
+        'batch_name': batch.name or '',
+        'date': today or datetime.now().strftime('%d/%m/%Y'),
+        'total': getattr(student, 'total_marks', ''),
+        'marks': getattr(student, 'obtained_marks', ''),
+        'subject': getattr(student, 'subject', '')
+    })
 
 @sms_bp.route('/send', methods=['POST'])
 @login_required
@@ -320,56 +220,31 @@ def send_sms():
         if not phone_numbers:
             return error_response('No valid phone numbers found', 400)
         
-        # Send SMS to each recipient (no balance check - API handles it)
-        sent_count = 0
-        failed_count = 0
-        sms_logs = []
-        
-        for phone in phone_numbers:
-            # Create SMS log entry
-            sms_log = SmsLog(
-                phone_number=phone,
-                message=message,
-                sent_by=current_user.id,
-                status=SmsStatus.PENDING
-            )
-            
-            # Find user by phone number
-            user = User.query.filter_by(phone=phone).first()
-            if user:
-                sms_log.user_id = user.id
-            
-            # Send SMS
-            result = send_sms_via_api(phone, message)
-            
-            if result['success']:
-                sms_log.status = SmsStatus.SENT
-                sms_log.sent_at = datetime.utcnow()
-                sms_log.api_response = result
-                sms_log.cost = result.get('cost', 1)
-                sent_count += 1
-            else:
-                sms_log.status = SmsStatus.FAILED
-                sms_log.api_response = result
-                failed_count += 1
-            
-            db.session.add(sms_log)
-            sms_logs.append(sms_log)
-        
-        # Update user's SMS count
-        current_user.sms_count -= sent_count
-        
+        # Queue one message per recipient; the SMS dispatcher sends them in the background
+        users_by_phone = {
+            user.phoneNumber: user.id
+            for user in User.query.filter(User.phoneNumber.in_(phone_numbers)).all()
+        }
+        job_id = enqueue_sms(
+            [{'phone': phone, 'message': message, 'user_id': users_by_phone.get(phone)} for phone in phone_numbers],
+            sent_by=current_user.id,
+            source='direct',
+            charge_sender=True
+        )
         db.session.commit()
         
         result_data = {
+            'job_id': job_id,
             'total_recipients': len(phone_numbers),
-            'sent_count': sent_count,
-            'failed_count': failed_count,
+            'queued': len(phone_numbers),
             'remaining_sms_balance': current_user.sms_count
         }
         
-        return success_response(f'SMS sent to {sent_count} recipients', result_data)
+        return success_response(f'SMS queued for {len(phone_numbers)} recipients', result_data)
         
+    except InsufficientSmsBalance as e:
+        db.session.rollback()
+        return error_response(str(e), 400)
     except Exception as e:
         db.session.rollback()
         return error_response(f'Failed to send SMS: {str(e)}', 500)
@@ -434,59 +309,52 @@ def send_batch_sms():
         if not phone_numbers:
             return error_response('No valid phone numbers found in selected batches', 400)
         
-        # Send SMS to each recipient (no balance check - API handles it)
-        sent_count = 0
-        failed_count = 0
-        
-        for phone in phone_numbers:
-            # Create SMS log entry
-            sms_log = SmsLog(
-                phone_number=phone,
-                message=message,
-                sent_by=current_user.id,
-                status=SmsStatus.PENDING
-            )
-            
-            # Find user by phone number
-            user = User.query.filter_by(phone=phone).first()
-            if user:
-                sms_log.user_id = user.id
-            
-            # Send SMS
-            result = send_sms_via_api(phone, message)
-            
-            if result['success']:
-                sms_log.status = SmsStatus.SENT
-                sms_log.sent_at = datetime.utcnow()
-                sms_log.api_response = result
-                sms_log.cost = result.get('cost', 1)
-                sent_count += 1
-            else:
-                sms_log.status = SmsStatus.FAILED
-                sms_log.api_response = result
-                failed_count += 1
-            
-            db.session.add(sms_log)
-        
-        # Update user's SMS count
-        current_user.sms_count -= sent_count
-        
+        # Queue one message per recipient; the SMS dispatcher sends them in the background
+        users_by_phone = {student.phoneNumber: student.id for student in students}
+        job_id = enqueue_sms(
+            [{'phone': phone, 'message': message, 'user_id': users_by_phone.get(phone)} for phone in phone_numbers],
+            sent_by=current_user.id,
+            source='batch',
+            charge_sender=True
+        )
         db.session.commit()
         
         result_data = {
+            'job_id': job_id,
             'total_recipients': len(phone_numbers),
-            'sent_count': sent_count,
-            'failed_count': failed_count,
+            'queued': len(phone_numbers),
             'batches': [{'id': b.id, 'name': b.name} for b in batches],
             'remaining_sms_balance': current_user.sms_count
         }
         
-        return success_response(f'Batch SMS sent to {sent_count} recipients', result_data)
+        return success_response(f'Batch SMS queued for {len(phone_numbers)} recipients', result_data)
         
+    except InsufficientSmsBalance as e:
+        db.session.rollback()
+        return error_response(str(e), 400)
     except Exception as e:
         db.session.rollback()
         return error_response(f'Failed to send batch SMS: {str(e)}', 500)
 
+def _user_ref(user):
+    return {'id': user.id, 'full_name': user.full_name} if user else None
+
+
+# ?fields= of the SMS log list
+SMS_LOG_FIELDS = {name: Field(attrgetter(name), columns=(getattr(SmsLog, name),))
+                  for name in ('id', 'phone_number', 'message', 'sent_at', 'created_at')}
+SMS_LOG_FIELDS.update({
+    'status': Field(lambda log: log.status.value, columns=(SmsLog.status,)),
+    'cost': Field(lambda log: float(log.cost) if log.cost else 0, columns=(SmsLog.cost,)),
+    'sent_by_user': Field(lambda log: _user_ref(log.sent_by_user), columns=(SmsLog.sent_by,),
+                          options=(joinedload(SmsLog.sent_by_user).load_only(User.first_name, User.last_name),)),
+    'recipient_user': Field(lambda log: _user_ref(log.user), columns=(SmsLog.user_id,),
+                            options=(joinedload(SmsLog.user).load_only(User.first_name, User.last_name),)),
+})
+
+# Served by idx_sms_logs_created_at
+SMS_LOG_SORT = (SortKey(SmsLog.created_at, descending=True), SortKey(SmsLog.id, descending=True))
+
 @sms_bp.route('/logs', methods=['GET'])
 @login_required
 @require_role(UserRole.TEACHER, UserRole.SUPER_USER)
@@ -531,11 +399,22 @@ def get_sms_logs():
             except ValueError:
                 return error_response('Invalid date_to format. Use YYYY-MM-DD', 400)
         
-        # Join with sender user info
-        query = query.join(User, SmsLog.sent_by == User.id, isouter=True)
+        # ?limit/?cursor pages by keyset, ?fields picks keys (see utils/list_query.py)
+        fields = requested_fields(SMS_LOG_FIELDS)
+        limit, cursor = page_args(default_limit=per_page, max_limit=100)
+        if fields:
+            query = query.options(*field_options(SMS_LOG_FIELDS, fields, SMS_LOG_SORT))
+        else:
+            # Load sender and recipient with the logs
+            query = query.options(joinedload(SmsLog.sent_by_user), joinedload(SmsLog.user))
+        
+        if limit is not None:
+            items, next_cursor = keyset_page(query, SMS_LOG_SORT, limit, cursor)
+            logs = project(items, SMS_LOG_FIELDS, fields or list(SMS_LOG_FIELDS))
+            return cursor_response(logs, limit, next_cursor, "SMS logs retrieved successfully")
         
         # Order by creation time
-        query = query.order_by(SmsLog.created_at.desc())
+        query = query.order_by(SmsLog.created_at.desc(), SmsLog.id.desc())
         
         # Paginate
         pagination = query.paginate(
@@ -544,6 +423,10 @@ def get_sms_logs():
             error_out=False
         )
         
+        if fields:
+            logs = project(pagination.items, SMS_LOG_FIELDS, fields)
+            return paginated_response(logs, page, per_page, pagination.total, "SMS logs retrieved successfully")
+        
         logs = []
         for log in pagination.items:
             log_data = {
@@ -577,6 +460,8 @@ def get_sms_logs():
             "SMS logs retrieved successfully"
         )
         
+    except ListQueryError as e:
+        return error_response(str(e), 400)
     except Exception as e:
         return error_response(f'Failed to retrieve SMS logs: {str(e)}', 500)
 
@@ -626,6 +511,7 @@ def update_sms_template(template_id):
         if template:
             # Update existing template
             template.content = new_message
+            template.is_active = True
             template.updated_at = datetime.utcnow()
         else:
             # Create new template
@@ -639,14 +525,11 @@ def update_sms_template(template_id):
             )
             db.session.add(template)
         
+        # Every worker recompiles its templates on the next lookup
+        invalidate_templates()
         db.session.commit()
+        drop_session_override(template_id)
         
-        # Also update session for immediate use
-        custom_templates = session.get('custom_templates', {})
-        custom_templates[template_id] = new_message
-        session['custom_templates'] = custom_templates
-        session.modified = True
-
         updated_template = build_template_payload(template_def, new_message)
 
         return success_response('Template updated successfully', updated_template)
@@ -696,24 +579,10 @@ def validate_sms_message():
 @login_required
 @require_role(UserRole.TEACHER, UserRole.SUPER_USER)
 def get_sms_balance():
-    """Get SMS balance from local settings"""
+    """Get the system-wide SMS balance from the ledger"""
     try:
-        from models import Settings
-        
-        # Get balance from settings
-        balance_setting = Settings.query.filter_by(key='sms_balance').first()
-        if not balance_setting:
-            # Initialize with 0 balance (super admin will add balance)
-            balance_setting = Settings(
-                key='sms_balance',
-                value={'balance': 0},
-                category='sms',
-                description='Current SMS balance (managed by super admin)'
-            )
-            db.session.add(balance_setting)
-            db.session.commit()
-        
-        balance = balance_setting.value.get('balance', 0) if balance_setting.value else 0
+        balance = get_balance()
+        db.session.commit()
         
         current_user = get_current_user()
         total_sent = SmsLog.query.filter(
@@ -729,7 +598,8 @@ def get_sms_balance():
         ).count()
 
         return success_response('SMS balance retrieved', {
-            'balance': balance,
+            'balance': balance['available'],
+            'reserved': balance['reserved'],
             'total_sent': total_sent,
             'sent_this_month': sent_this_month
         })
@@ -740,24 +610,10 @@ def get_sms_balance():
 
 @sms_bp.route('/balance-check', methods=['GET'])
 def get_sms_balance_noauth():
-    """Get SMS balance from local settings (no auth required)"""
+    """Get the system-wide SMS balance from the ledger (no auth required)"""
     try:
-        from models import Settings
-        
-        # Get balance from settings
-        balance_setting = Settings.query.filter_by(key='sms_balance').first()
-        if not balance_setting:
-            # Initialize with 0 balance (super admin will add balance)
-            balance_setting = Settings(
-                key='sms_balance',
-                value={'balance': 0},
-                category='sms',
-                description='Current SMS balance (managed by super admin)'
-            )
-            db.session.add(balance_setting)
-            db.session.commit()
-        
-        balance = balance_setting.value.get('balance', 0) if balance_setting.value else 0
+        balance = get_balance()
+        db.session.commit()
 
         # Get Sample Teacher for stats
         teacher = User.query.filter_by(first_name='Sample', last_name='Teacher', role=UserRole.TEACHER).first()
@@ -770,7 +626,8 @@ def get_sms_balance_noauth():
             ).count()
 
         return success_response('SMS balance retrieved', {
-            'balance': balance,
+            'balance': balance['available'],
+            'reserved': balance['reserved'],
             'total_sent': total_sent,
             'teacher_name': teacher.full_name if teacher else 'N/A',
             'teacher_phone': teacher.phone if teacher else 'N/A'
@@ -786,8 +643,6 @@ def get_sms_balance_noauth():
 def add_sms_balance():
     """Add SMS balance to system-wide balance (Super user only)"""
     try:
-        from models import Settings
-        
         data = request.get_json()
         amount = data.get('amount')
 
@@ -802,29 +657,14 @@ def add_sms_balance():
         if amount <= 0:
             return error_response('Amount must be a positive integer', 400)
 
-        # Get or create SMS balance setting
-        balance_setting = Settings.query.filter_by(key='sms_balance').first()
-        if not balance_setting:
-            balance_setting = Settings(
-                key='sms_balance',
-                value={'balance': 0},
-                category='sms',
-                description='Current SMS balance (managed by super admin)'
-            )
-            db.session.add(balance_setting)
-        
-        # Add to current balance
-        current_balance = balance_setting.value.get('balance', 0) if balance_setting.value else 0
-        new_balance = current_balance + amount
-        
-        balance_setting.value = {'balance': new_balance}
+        current_user = get_current_user()
+        row = credit(amount, created_by=current_user.id, note=data.get('note'))
         db.session.commit()
 
-        current_user = get_current_user()
         return success_response('SMS balance added successfully', {
-            'previous_balance': current_balance,
+            'previous_balance': row.balance - row.reserved - amount,
             'added_amount': amount,
-            'new_balance': new_balance,
+            'new_balance': row.balance - row.reserved,
             'updated_by': current_user.full_name
         })
 
@@ -832,6 +672,28 @@ def add_sms_balance():
         db.session.rollback()
         return error_response(f'Failed to add SMS balance: {str(e)}', 500)
 
+@sms_bp.route('/ledger/reconciliation', methods=['GET'])
+@login_required
+@require_role(UserRole.SUPER_USER)
+def get_ledger_reconciliation():
+    """Compare ledger usage with SMS log costs (Super user only)"""
+    try:
+        try:
+            start = request.args.get('start')
+            end = request.args.get('end')
+            start = datetime.strptime(start, '%Y-%m-%d').date() if start else None
+            end = datetime.strptime(end, '%Y-%m-%d').date() if end else None
+        except ValueError:
+            return error_response('Dates must use YYYY-MM-DD format', 400)
+
+        report = reconciliation_report(start, end)
+        db.session.commit()
+        return success_response('SMS ledger reconciliation', report)
+
+    except Exception as e:
+        db.session.rollback()
+        return error_response(f'Failed to build reconciliation report: {str(e)}', 500)
+
 @sms_bp.route('/statistics', methods=['GET'])
 @login_required
 @require_role(UserRole.TEACHER, UserRole.SUPER_USER)
@@ -1071,80 +933,25 @@ def send_bulk_sms():
         if not valid_recipients:
             return error_response('No recipients have valid phone numbers', 400)
 
-        # Send SMS to each recipient (no balance check - API handles it)
-        sent_count = 0
-        failed_count = 0
-        failed_recipients = []
-
-        for student, phone in valid_recipients:
-            try:
-                message_to_send = base_message
-                message_to_send = message_to_send.replace('{student_name}', (student.first_name or ''))
-                message_to_send = message_to_send.replace('{batch_name}', batch.name or '')
-                message_to_send = message_to_send.replace('{date}', datetime.now().strftime('%d/%m/%Y'))
-                message_to_send = message_to_send.replace('{total}', str(getattr(student, 'total_marks', '')))
-                message_to_send = message_to_send.replace('{marks}', str(getattr(student, 'obtained_marks', '')))
-                message_to_send = message_to_send.replace('{subject}', getattr(student, 'subject', ''))
-
-                sms_response = send_sms_via_api(phone, message_to_send)
-
-                if sms_response.get('success'):
-                    # Calculate SMS cost based on message content
-                    sms_cost = calculate_sms_cost(message_to_send)
-                    
-                    sms_log = SmsLog(
-                        user_id=student.id,
-                        phone_number=phone,
-                        message=message_to_send,
-                        status=SmsStatus.SENT,
-                        api_response=sms_response,
-                        sent_by=current_user.id,
-                        cost=sms_cost,
-                        sent_at=datetime.utcnow()
-                    )
-                    db.session.add(sms_log)
-                    
-                    # Deduct from local balance
-                    deduct_sms_balance(sms_cost)
-                    sent_count += 1
-                else:
-                    sms_log = SmsLog(
-                        user_id=student.id,
-                        phone_number=phone,
-                        message=message_to_send,
-                        status=SmsStatus.FAILED,
-                        api_response=sms_response,
-                        sent_by=current_user.id,
-                        cost=0,
-                        sent_at=datetime.utcnow()
-                    )
-                    db.session.add(sms_log)
-                    failed_count += 1
-                    failed_recipients.append(student.full_name)
-
-            except Exception as e:
-                sms_log = SmsLog(
-                    user_id=student.id,
-                    phone_number=phone,
-                    message=base_message,
-                    status=SmsStatus.FAILED,
-                    api_response={'error': str(e)},
-                    sent_by=current_user.id,
-                    cost=0,
-                    sent_at=datetime.utcnow()
-                )
-                db.session.add(sms_log)
-                failed_count += 1
-                failed_recipients.append(student.full_name)
-
-        if invalid_recipients:
-            failed_recipients.extend([f'{name} (invalid phone)' for name in invalid_recipients])
-
+        # Compile once, then render per student without further lookups
+        template = compile_template(base_message)
+        today = datetime.now().strftime('%d/%m/%Y')
+        # Queue one message per recipient; the SMS dispatcher sends them in the background
+        job_id = enqueue_sms(
+            [
+                {'phone': phone, 'message': render_bulk_message(template, student, batch, today), 'user_id': student.id}
+                for student, phone in valid_recipients
+            ],
+            sent_by=current_user.id,
+            source='bulk'
+        )
         db.session.commit()
 
+        failed_recipients = [f'{name} (invalid phone)' for name in invalid_recipients]
+
         response_data = {
-            'sent': sent_count,
-            'failed': failed_count,
+            'job_id': job_id,
+            'queued': len(valid_recipients),
             'total_recipients': len(valid_recipients),
             'remaining_balance': current_user.sms_count or 0,
             'failed_recipients': failed_recipients or None,
@@ -1152,15 +959,11 @@ def send_bulk_sms():
             'used_custom_message': use_custom_message
         }
 
-        if sent_count > 0 and failed_count == 0:
-            message_text = f'Successfully sent SMS to all {sent_count} recipients'
-        elif sent_count > 0 and failed_count > 0:
-            message_text = f'Sent SMS to {sent_count} recipients, {failed_count} failed'
-        else:
-            message_text = f'Failed to send SMS to all {failed_count} recipients'
-
-        return success_response(message_text, response_data)
+        return success_response(f'SMS queued for {len(valid_recipients)} recipients', response_data)
         
+    except InsufficientSmsBalance as e:
+        db.session.rollback()
+        return error_response(str(e), 400)
     except Exception as e:
         db.session.rollback()
         return error_response(f'Failed to send bulk SMS: {str(e)}', 500)
@@ -1237,65 +1040,51 @@ def send_bulk_sms_noauth():
         if not valid_recipients:
             return error_response('No recipients have valid phone numbers', 400)
 
-        # Send SMS to each recipient (no balance check - API handles it)
-        sent_count = 0
-        failed_count = 0
-
-        for student, phone in valid_recipients:
-            try:
-                message_to_send = base_message
-                message_to_send = message_to_send.replace('{student_name}', (student.first_name or ''))
-                message_to_send = message_to_send.replace('{batch_name}', batch.name or '')
-                message_to_send = message_to_send.replace('{date}', datetime.now().strftime('%d/%m/%Y'))
-
-                sms_response = send_sms_via_api(phone, message_to_send)
-
-                if sms_response.get('success'):
-                    # Calculate SMS cost based on message content
-                    sms_cost = calculate_sms_cost(message_to_send)
-                    
-                    sms_log = SmsLog(
-                        user_id=student.id,
-                        phone_number=phone,
-                        message=message_to_send,
-                        status=SmsStatus.SENT,
-                        api_response=sms_response,
-                        sent_by=current_user.id,
-                        cost=sms_cost,
-                        sent_at=datetime.utcnow()
-                    )
-                    db.session.add(sms_log)
-                    
-                    # Deduct from local balance
-                    deduct_sms_balance(sms_cost)
-                    sent_count += 1
-                else:
-                    sms_log = SmsLog(
-                        user_id=student.id,
-                        phone_number=phone,
-                        message=message_to_send,
-                        status=SmsStatus.FAILED,
-                        api_response=sms_response,
-                        sent_by=current_user.id,
-                        cost=0,
-                        sent_at=datetime.utcnow()
-                    )
-                    db.session.add(sms_log)
-                    failed_count += 1
-            except Exception as e:
-                failed_count += 1
-
+        # Compile once, then render per student without further lookups
+        template = compile_template(base_message)
+        today = datetime.now().strftime('%d/%m/%Y')
+        # Queue one message per recipient; the SMS dispatcher sends them in the background
+        job_id = enqueue_sms(
+            [
+                {'phone': phone, 'message': render_bulk_message(template, student, batch, today), 'user_id': student.id}
+                for student, phone in valid_recipients
+            ],
+            sent_by=current_user.id,
+            source='bulk'
+        )
         db.session.commit()
 
         response_data = {
-            'sent': sent_count,
-            'failed': failed_count,
+            'job_id': job_id,
+            'queued': len(valid_recipients),
             'total_recipients': len(valid_recipients),
             'remaining_balance': current_user.sms_count or 0,
         }
 
-        return success_response(f'SMS sent to {sent_count} recipients', response_data)
+        return success_response(f'SMS queued for {len(valid_recipients)} recipients', response_data)
         
+    except InsufficientSmsBalance as e:
+        db.session.rollback()
+        return error_response(str(e), 400)
     except Exception as e:
         db.session.rollback()
-        return error_response(f'Failed to send bulk SMS: {str(e)}', 500)
\ No newline at end of file
+        return error_response(f'Failed to send bulk SMS: {str(e)}', 500)
+
+@sms_bp.route('/jobs/<job_id>', methods=['GET'])
+@login_required
+@require_role(UserRole.TEACHER, UserRole.SUPER_USER)
+def get_sms_job_status(job_id):
+    """Get delivery progress of a queued SMS job"""
+    try:
+        current_user = get_current_user()
+        job = get_job_status(job_id)
+        if not job:
+            return error_response('SMS job not found', 404)
+
+        if current_user.role != UserRole.SUPER_USER and job['sent_by'] != current_user.id:
+            return error_response('Access denied', 403)
+
+        return success_response('SMS job status retrieved', job)
+
+    except Exception as e:
+        return error_response(f'Failed to get SMS job status: {str(e)}', 500)
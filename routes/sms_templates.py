@@ -3,9 +3,11 @@ SMS Template Management Routes
 Manage SMS templates for various notifications
 """
 from flask import Blueprint, request, jsonify, session
-from models import db, Settings, User
+from models import db, Settings, User, UserRole
 from utils.auth import login_required, require_role, get_current_user
 from utils.response import success_response, error_response
+from services.sms_template_registry import (DEFAULT_TEMPLATES, compile_template, drop_session_override,
+                                            get_global_templates, invalidate_templates)
 from datetime import datetime
 import logging
 
@@ -15,14 +17,12 @@ sms_templates_bp = Blueprint('sms_templates', __name__)
 
 @sms_templates_bp.route('', methods=['GET'])
 @login_required
-@require_role('TEACHER', 'SUPER_USER')
+@require_role(UserRole.TEACHER, UserRole.SUPER_USER)
 def get_templates():
     """Get all SMS templates"""
     try:
-        # Get templates from database (permanent storage for all teachers)
-        db_templates = Settings.query.filter(
-            Settings.key.like('sms_template_%')
-        ).all()
+        # Saved templates (permanent storage for all teachers), from the per-process registry
+        saved_templates = get_global_templates()
         
         # Hardcoded short templates (not editable)
         hardcoded_templates = {
@@ -88,13 +88,16 @@ def get_templates():
         all_templates = {**hardcoded_templates, **templates}
         
         # Update with saved templates from database (for ALL editable templates)
-        for db_template in db_templates:
-            template_type = db_template.key.replace('sms_template_', '')
+        for template_type, saved_message in saved_templates.items():
             if template_type in all_templates and all_templates[template_type].get('editable', True):
-                saved_message = db_template.value.get('message', '') if db_template.value else ''
                 all_templates[template_type]['saved'] = saved_message
                 all_templates[template_type]['current'] = saved_message  # Show database value as current
         
+        # Worst-case SMS count of each template once its variables are filled
+        for template in all_templates.values():
+            source = template.get('current') or template.get('template') or template.get('default')
+            template['worst_case_sms'] = compile_template(source).max_cost
+        
         return success_response('Templates retrieved successfully', all_templates)
         
     except Exception as e:
@@ -103,7 +106,7 @@ def get_templates():
 
 @sms_templates_bp.route('/<template_type>', methods=['POST', 'PUT'])
 @login_required
-@require_role('TEACHER', 'SUPER_USER')
+@require_role(UserRole.TEACHER, UserRole.SUPER_USER)
 def update_template(template_type):
     """Update SMS template permanently in database"""
     try:
@@ -157,7 +160,10 @@ def update_template(template_type):
             )
             db.session.add(template_setting)
         
+        invalidate_templates()
         db.session.commit()
+        # The saved text replaces the user's legacy session copy
+        drop_session_override(template_type)
         
         return success_response('Template saved permanently to database', {
             'template_type': template_type,
@@ -174,7 +180,7 @@ def update_template(template_type):
 
 @sms_templates_bp.route('/<template_type>/save', methods=['POST', 'PUT'])
 @login_required
-@require_role('TEACHER', 'SUPER_USER')
+@require_role(UserRole.TEACHER, UserRole.SUPER_USER)
 def save_template(template_type):
     """Save SMS template to database permanently"""
     try:
@@ -209,7 +215,10 @@ def save_template(template_type):
             )
             db.session.add(template_setting)
         
+        invalidate_templates()
         db.session.commit()
+        # The saved text replaces the user's legacy session copy
+        drop_session_override(template_type)
         
         return success_response('Template saved successfully', {
             'template_type': template_type,
@@ -223,7 +232,7 @@ def save_template(template_type):
 
 @sms_templates_bp.route('/<template_type>/reset', methods=['POST'])
 @login_required
-@require_role('TEACHER', 'SUPER_USER')
+@require_role(UserRole.TEACHER, UserRole.SUPER_USER)
 def reset_template(template_type):
     """Reset SMS template to default by removing from database"""
     try:
@@ -233,19 +242,12 @@ def reset_template(template_type):
         
         if template_setting:
             db.session.delete(template_setting)
+            invalidate_templates()
             db.session.commit()
+        # Back to the default, not to the user's legacy session copy
+        drop_session_override(template_type)
         
-        # Get default templates
-        default_templates = {
-            'exam_result': "{student_name} পেয়েছে {marks}/{total} ({subject}) {date}",
-            'attendance_present': "{student_name} উপস্থিত ({batch_name})",
-            'attendance_absent': "{student_name} অনুপস্থিত {date} ({batch_name})",
-            'fee_reminder': "{student_name} এর ফি {amount}৳ বকেয়া। শেষ তারিখ {due_date}",
-            'custom_exam': "{student_name} scored {marks}/{total} in {subject} on {date}",
-            'custom_general': "{student_name}: {message} ({date})"
-        }
-        
-        default_message = default_templates.get(template_type, "Template not found")
+        default_message = DEFAULT_TEMPLATES.get(template_type, "Template not found")
         
         return success_response('Template reset to default for all teachers', {
             'template_type': template_type,
@@ -259,7 +261,7 @@ def reset_template(template_type):
 
 @sms_templates_bp.route('/validate-message', methods=['POST'])
 @login_required
-@require_role('TEACHER', 'SUPER_USER')
+@require_role(UserRole.TEACHER, UserRole.SUPER_USER)
 def validate_message():
     """Validate SMS message character count"""
     try:
@@ -295,7 +297,7 @@ def validate_message():
 
 @sms_templates_bp.route('/preview', methods=['POST'])
 @login_required
-@require_role('TEACHER', 'SUPER_USER')
+@require_role(UserRole.TEACHER, UserRole.SUPER_USER)
 def preview_template():
     """Preview SMS template with accurate SMS count calculation"""
     try:
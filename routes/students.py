@@ -6,8 +6,14 @@ from flask import Blueprint, request, session
 from flask_bcrypt import generate_password_hash
 from models import db, User, UserRole, Batch, user_batches
 from utils.auth import login_required, require_role, get_current_user
-from utils.response import success_response, error_response, serialize_user
-from sqlalchemy import or_
+from utils.response import success_response, error_response, cursor_response, serialize_user
+from utils.payloads import BatchRef, student_list_item
+from services.user_search import search_filter, ranked_search
+from services.ranking_cache import invalidate_roster_rankings
+from utils.list_query import (Field, SortKey, ListQueryError, requested_fields, field_options, project,
+                              page_args, keyset_page)
+from sqlalchemy.orm import joinedload, selectinload
+from operator import attrgetter
 import re
 import secrets
 import string
@@ -34,6 +40,56 @@ def validate_phone(phone):
     
     return None
 
+def _batch_refs(student):
+    return [BatchRef(batch.id, batch.name, batch.description) for batch in student.batches]
+
+
+def _column_field(name, column=None):
+    return Field(attrgetter(column or name), columns=(getattr(User, column or name),))
+
+
+_NAME_COLUMNS = (User.first_name, User.last_name)
+_BATCH_OPTIONS = (selectinload(User.batches).load_only(Batch.id, Batch.name, Batch.description),)
+
+# ?fields= of the student lists; keys as in the full StudentListItem rows
+STUDENT_FIELDS = {name: _column_field(name) for name in (
+    'id', 'phoneNumber', 'first_name', 'last_name', 'email', 'profile_image', 'date_of_birth', 'address',
+    'guardian_name', 'guardian_phone', 'mother_name', 'emergency_contact', 'admission_date', 'sms_count',
+    'is_active', 'last_login', 'is_archived', 'archived_at', 'archived_by', 'archive_reason', 'created_at',
+    'updated_at'
+)}
+STUDENT_FIELDS.update({
+    'role': Field(lambda s: s.role.value, columns=(User.role,)),
+    'exam_fee': Field(lambda s: float(s.exam_fee) if s.exam_fee else None, columns=(User.exam_fee,)),
+    'others_fee': Field(lambda s: float(s.others_fee) if s.others_fee else None, columns=(User.others_fee,)),
+    'full_name': Field(attrgetter('full_name'), columns=_NAME_COLUMNS),
+    'batches': Field(_batch_refs, options=_BATCH_OPTIONS),
+    'batch': Field(lambda s: (_batch_refs(s) or [None])[0], options=_BATCH_OPTIONS),
+    'batchId': Field(lambda s: s.batches[0].id if s.batches else None, options=_BATCH_OPTIONS),
+    'batchIds': Field(lambda s: [batch.id for batch in s.batches], options=_BATCH_OPTIONS),
+    'firstName': _column_field('firstName', 'first_name'),
+    'lastName': _column_field('lastName', 'last_name'),
+    'studentId': Field(lambda s: ''),
+    'isActive': _column_field('isActive', 'is_active'),
+    'guardianPhone': _column_field('guardianPhone', 'guardian_phone'),
+    'guardianName': _column_field('guardianName', 'guardian_name'),
+    'motherName': _column_field('motherName', 'mother_name'),
+    'school': _column_field('school', 'address'),
+    'admissionDate': _column_field('admissionDate', 'admission_date'),
+})
+
+# Served by idx_users_role_name
+STUDENT_SORT = (SortKey(User.first_name), SortKey(User.last_name), SortKey(User.id))
+
+ARCHIVED_STUDENT_FIELDS = dict(STUDENT_FIELDS, archived_by_name=Field(
+    lambda s: s.archived_by_user.full_name if s.archived_by_user else 'Unknown',
+    columns=(User.archived_by,),
+    options=(joinedload(User.archived_by_user).load_only(User.first_name, User.last_name),)
+))
+
+# Served by idx_users_archived_at
+ARCHIVED_STUDENT_SORT = (SortKey(User.archived_at, descending=True), SortKey(User.id, descending=True))
+
 @students_bp.route('', methods=['GET'])
 @login_required
 @require_role(UserRole.TEACHER, UserRole.SUPER_USER)
@@ -51,62 +107,65 @@ def get_students():
         
         # Search filter
         if search:
-            search_filter = or_(
-                User.first_name.ilike(f'%{search}%'),
-                User.last_name.ilike(f'%{search}%'),
-                User.phoneNumber.ilike(f'%{search}%'),
-                User.guardian_name.ilike(f'%{search}%'),
-                User.guardian_phone.ilike(f'%{search}%')
-            )
-            query = query.filter(search_filter)
-        
-        students = query.order_by(User.first_name, User.last_name).all()
-        
-        students_data = []
-        for student in students:
-            student_data = serialize_user(student)
-            # Add batch information - include ALL batches
-            if student.batches:
-                # Primary batch (first one for backward compatibility)
-                student_data['batch'] = {
-                    'id': student.batches[0].id,
-                    'name': student.batches[0].name,
-                    'description': student.batches[0].description
-                }
-                student_data['batchId'] = student.batches[0].id
-                
-                # All batches this student is enrolled in
-                student_data['batches'] = [{
-                    'id': batch.id,
-                    'name': batch.name,
-                    'description': batch.description
-                } for batch in student.batches]
-                student_data['batchIds'] = [batch.id for batch in student.batches]
-            else:
-                student_data['batch'] = None
-                student_data['batchId'] = None
-                student_data['batches'] = []
-                student_data['batchIds'] = []
-            
-            # Format for frontend
-            student_data['firstName'] = student_data.get('first_name', '')
-            student_data['lastName'] = student_data.get('last_name', '')
-            student_data['phoneNumber'] = student_data.get('phoneNumber', '')  # Fixed: use phoneNumber not phone
-            student_data['studentId'] = student_data.get('student_id', '')
-            student_data['isActive'] = student_data.get('is_active', True)
-            student_data['guardianPhone'] = student_data.get('guardian_phone', '')
-            student_data['guardianName'] = student_data.get('guardian_name', '')
-            student_data['motherName'] = student_data.get('mother_name', '')
-            student_data['address'] = student_data.get('address', '')
-            student_data['school'] = student_data.get('address', '')
-            
-            students_data.append(student_data)
+            matches = search_filter(search)
+            if matches is not None:
+                query = query.filter(matches)
+        
+        # Sparse fieldsets load only what the requested keys need (see utils/list_query.py)
+        fields = requested_fields(STUDENT_FIELDS)
+        limit, cursor = page_args()
+        if fields:
+            query = query.options(*field_options(STUDENT_FIELDS, fields, STUDENT_SORT))
+        else:
+            query = query.options(selectinload(User.batches))
+        
+        students, next_cursor = keyset_page(query, STUDENT_SORT, limit, cursor)
         
+        if fields:
+            students_data = project(students, STUDENT_FIELDS, fields)
+        else:
+            # Typed rows, encoded straight to JSON (see utils/payloads.py)
+            students_data = [student_list_item(student) for student in students]
+        
+        if limit is not None:
+            return cursor_response(students_data, limit, next_cursor, 'Students retrieved successfully')
         return success_response('Students retrieved successfully', students_data)
         
+    except ListQueryError as e:
+        return error_response(str(e), 400)
     except Exception as e:
         return error_response(f'Failed to retrieve students: {str(e)}', 500)
 
+@students_bp.route('/search', methods=['GET'])
+@login_required
+@require_role(UserRole.TEACHER, UserRole.SUPER_USER)
+def search_students():
+    """Ranked substring search over student and guardian names and phones (see services/user_search.py)"""
+    try:
+        term = request.args.get('q', '').strip()
+        batch_id = request.args.get('batch_id', type=int)
+        limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+        fields = requested_fields(STUDENT_FIELDS)
+        
+        query = User.query.filter(User.role == UserRole.STUDENT, User.is_active == True, User.is_archived == False)
+        if batch_id:
+            query = query.join(user_batches).filter(user_batches.c.batch_id == batch_id)
+        
+        query = ranked_search(query, term)
+        if query is None:
+            return success_response('Students found', [])
+        
+        if fields:
+            query = query.options(*field_options(STUDENT_FIELDS, fields, STUDENT_SORT))
+            return success_response('Students found', project(query.limit(limit).all(), STUDENT_FIELDS, fields))
+        students = query.options(selectinload(User.batches)).limit(limit).all()
+        return success_response('Students found', [student_list_item(student) for student in students])
+        
+    except ListQueryError as e:
+        return error_response(str(e), 400)
+    except Exception as e:
+        return error_response(f'Failed to search students: {str(e)}', 500)
+
 @students_bp.route('', methods=['POST'])
 # @login_required  # Temporarily disabled for testing
 # @require_role(UserRole.TEACHER, UserRole.SUPER_USER)  # Temporarily disabled for testing
@@ -163,6 +222,7 @@ def create_student():
                                 # Check if already in this batch
                                 if batch not in existing_user.batches:
                                     existing_user.batches.append(batch)
+                                    invalidate_roster_rankings([batch.id])
                                     db.session.commit()
                                     
                                     # Prepare response
@@ -210,6 +270,7 @@ def create_student():
                         # Check if already in this batch
                         if batch not in existing_user.batches:
                             existing_user.batches.append(batch)
+                            invalidate_roster_rankings([batch.id])
                             db.session.commit()
                             
                             # Prepare response
@@ -282,6 +343,7 @@ def create_student():
             batch = Batch.query.get(batch_id)
             if batch:
                 student.batches.append(batch)
+                invalidate_roster_rankings([batch.id])
         
         db.session.commit()
         
@@ -342,6 +404,9 @@ def update_student(student_id):
         if not data:
             return error_response('Request data is required', 400)
         
+        # Batches left by a batch change lose the student from their rankings too
+        previous_batch_ids = [batch.id for batch in student.batches]
+        
         # Update basic information
         if 'firstName' in data:
             student.first_name = data['firstName'].strip()
@@ -429,6 +494,7 @@ def update_student(student_id):
                     student.batches.append(batch)
         
         student.updated_at = datetime.utcnow()
+        invalidate_roster_rankings(previous_batch_ids + [batch.id for batch in student.batches])
         db.session.commit()
         
         # Prepare response data
@@ -475,6 +541,7 @@ def delete_student(student_id):
         # Soft delete by deactivating
         student.is_active = False
         student.updated_at = datetime.utcnow()
+        invalidate_roster_rankings([batch.id for batch in student.batches])
         
         db.session.commit()
         
@@ -534,6 +601,7 @@ def bulk_import_students():
         students_data = data['students']
         successful_imports = []
         failed_imports = []
+        imported_batch_ids = set()
         
         for idx, student_data in enumerate(students_data):
             try:
@@ -597,6 +665,7 @@ def bulk_import_students():
                     batch = Batch.query.get(batch_id)
                     if batch:
                         student.batches.append(batch)
+                        imported_batch_ids.add(batch.id)
                 
                 successful_imports.append({
                     'row': idx + 1,
@@ -613,6 +682,7 @@ def bulk_import_students():
                 })
         
         if successful_imports:
+            invalidate_roster_rankings(imported_batch_ids)
             db.session.commit()
         else:
             db.session.rollback()
@@ -656,6 +726,7 @@ def archive_student(student_id):
         student.archived_at = datetime.utcnow()
         student.archived_by = current_user.id
         student.archive_reason = reason
+        invalidate_roster_rankings([batch.id for batch in student.batches])
         
         db.session.commit()
         
@@ -689,6 +760,7 @@ def restore_student(student_id):
         student.archived_at = None
         student.archived_by = None
         student.archive_reason = None
+        invalidate_roster_rankings([batch.id for batch in student.batches])
         
         db.session.commit()
         
@@ -715,45 +787,57 @@ def get_archived_students():
         if batch_id:
             query = query.join(user_batches).filter(user_batches.c.batch_id == batch_id)
         
-        students = query.order_by(User.archived_at.desc()).all()
+        fields = requested_fields(ARCHIVED_STUDENT_FIELDS)
+        limit, cursor = page_args()
+        if fields:
+            query = query.options(*field_options(ARCHIVED_STUDENT_FIELDS, fields, ARCHIVED_STUDENT_SORT))
+        else:
+            query = query.options(selectinload(User.batches).selectinload(Batch.students),
+                                  joinedload(User.archived_by_user))
+        
+        students, next_cursor = keyset_page(query, ARCHIVED_STUDENT_SORT, limit, cursor)
         
-        students_data = []
-        for student in students:
-            student_data = serialize_user(student)
-            student_data['archived_at'] = student.archived_at.isoformat() if student.archived_at else None
-            student_data['archive_reason'] = student.archive_reason
+        if fields:
+            students_data = project(students, ARCHIVED_STUDENT_FIELDS, fields)
+        else:
+            students_data = []
+            for student in students:
+                student_data = serialize_user(student)
+                student_data['archived_at'] = student.archived_at.isoformat() if student.archived_at else None
+                student_data['archive_reason'] = student.archive_reason
             
-            # Get archived by user info
-            if student.archived_by:
-                archived_by_user = User.query.get(student.archived_by)
+                # Get archived by user info
+                archived_by_user = student.archived_by_user
                 student_data['archived_by_name'] = archived_by_user.full_name if archived_by_user else 'Unknown'
-            else:
-                student_data['archived_by_name'] = 'Unknown'
             
-            # Add batch information
-            if student.batches:
-                student_data['batch'] = {
-                    'id': student.batches[0].id,
-                    'name': student.batches[0].name,
-                    'description': student.batches[0].description
-                }
-            else:
-                student_data['batch'] = None
+                # Add batch information
+                if student.batches:
+                    student_data['batch'] = {
+                        'id': student.batches[0].id,
+                        'name': student.batches[0].name,
+                        'description': student.batches[0].description
+                    }
+                else:
+                    student_data['batch'] = None
             
-            # Format for frontend
-            student_data['firstName'] = student_data.get('first_name', '')
-            student_data['lastName'] = student_data.get('last_name', '')
-            student_data['phoneNumber'] = student_data.get('phoneNumber', '')
-            student_data['guardianPhone'] = student_data.get('guardian_phone', '')
-            student_data['guardianName'] = student_data.get('guardian_name', '')
-            student_data['motherName'] = student_data.get('mother_name', '')
-            student_data['address'] = student_data.get('address', '')
-            student_data['school'] = student_data.get('address', '')
+                # Format for frontend
+                student_data['firstName'] = student_data.get('first_name', '')
+                student_data['lastName'] = student_data.get('last_name', '')
+                student_data['phoneNumber'] = student_data.get('phoneNumber', '')
+                student_data['guardianPhone'] = student_data.get('guardian_phone', '')
+                student_data['guardianName'] = student_data.get('guardian_name', '')
+                student_data['motherName'] = student_data.get('mother_name', '')
+                student_data['address'] = student_data.get('address', '')
+                student_data['school'] = student_data.get('address', '')
             
-            students_data.append(student_data)
+                students_data.append(student_data)
         
+        if limit is not None:
+            return cursor_response({'students': students_data}, limit, next_cursor, 'Archived students retrieved')
         return success_response('Archived students retrieved', {'students': students_data})
         
+    except ListQueryError as e:
+        return error_response(str(e), 400)
     except Exception as e:
         return error_response(f'Failed to get archived students: {str(e)}', 500)
 @students_bp.route('/me/batches', methods=['GET'])
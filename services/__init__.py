@@ -1,6 +1,9 @@
 """Service layer package.
 Exports database, sms_service, and AI related helpers.
 Handles legacy path where modules were nested under services/services.
+The legacy modules are imported on first attribute access: praggo_ai pulls
+in the Gemini client and database pulls in pymysql, which every worker
+would otherwise pay for at startup.
 """
 import importlib
 import sys
@@ -18,8 +21,13 @@ def _safe_import(name):
     except ModuleNotFoundError:
         return None
 
-database = _safe_import('database') or _safe_import('services.database')
-sms_service = _safe_import('sms_service') or _safe_import('services.sms_service')
-praggo_ai = _safe_import('praggo_ai') or _safe_import('services.praggo_ai')
+_LAZY_MODULES = ('database', 'sms_service', 'praggo_ai')
+
+def __getattr__(name):
+    if name not in _LAZY_MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = _safe_import(name) or _safe_import(f'services.{name}')
+    globals()[name] = module
+    return module
 
 __all__ = ['database', 'sms_service', 'praggo_ai']
\ No newline at end of file
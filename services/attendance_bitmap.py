@@ -0,0 +1,163 @@
+"""
+Attendance Bitmaps
+A compact copy of the attendance table for monthly sheets: one
+attendance_months row per (batch, year, month, student) holding
+- marked: bit d-1 set when day d has an attendance record
+- codes: the status of day d as a 2-bit code at bits 2(d-1)..2d-1
+  (STATUS_CODES: present 0, absent 1, late 2, holiday 3)
+
+Triggers on attendance keep the rows in sync with every insert, update and
+delete, ORM or not. The table and triggers are created with the schema, and
+an empty attendance_months is rebuilt from attendance in one statement.
+On databases other than SQLite the bitmaps are packed from attendance rows
+on read instead.
+
+A sheet row goes over the wire as 12 bytes, base64 encoded: marked as 4
+bytes and codes as 8 bytes, both little-endian.
+"""
+import base64
+import calendar
+import struct
+from datetime import date
+
+from sqlalchemy import event, text
+
+from models import db, Attendance, AttendanceMonth, AttendanceStatus
+
+STATUS_CODES = {
+    AttendanceStatus.PRESENT: 0,
+    AttendanceStatus.ABSENT: 1,
+    AttendanceStatus.LATE: 2,
+    AttendanceStatus.HOLIDAY: 3,
+}
+CODE_STATUSES = [status.value for status, code in sorted(STATUS_CODES.items(), key=lambda item: item[1])]
+
+ROW_FORMAT = '<IQ'  # marked, codes
+
+_CODE_SQL = 'CASE {status} ' + ' '.join(
+    f"WHEN '{status.name}' THEN {code}" for status, code in STATUS_CODES.items()
+) + ' END'
+
+
+def _parts(row):
+    """year, month, day, code expressions of the new/old attendance row"""
+    return (f"CAST(strftime('%Y', {row}.date) AS INTEGER)", f"CAST(strftime('%m', {row}.date) AS INTEGER)",
+            f"CAST(strftime('%d', {row}.date) AS INTEGER)", _CODE_SQL.format(status=f'{row}.status'))
+
+
+def _set_day(row):
+    year, month, day, code = _parts(row)
+    return f"""INSERT INTO attendance_months (batch_id, year, month, user_id, marked, codes)
+        VALUES ({row}.batch_id, {year}, {month}, {row}.user_id, 1 << ({day} - 1), {code} << (2 * ({day} - 1)))
+        ON CONFLICT (batch_id, year, month, user_id) DO UPDATE SET
+            marked = marked | excluded.marked,
+            codes = (codes & ~(3 << (2 * ({day} - 1)))) | excluded.codes;"""
+
+
+def _clear_day(row):
+    year, month, day, _ = _parts(row)
+    return f"""UPDATE attendance_months SET
+            marked = marked & ~(1 << ({day} - 1)),
+            codes = codes & ~(3 << (2 * ({day} - 1)))
+        WHERE batch_id = {row}.batch_id AND year = {year} AND month = {month} AND user_id = {row}.user_id;"""
+
+
+TRIGGER_STATEMENTS = (
+    f"""CREATE TRIGGER IF NOT EXISTS attendance_months_insert AFTER INSERT ON attendance BEGIN
+        {_set_day('new')}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS attendance_months_update
+        AFTER UPDATE OF user_id, batch_id, date, status ON attendance BEGIN
+        {_clear_day('old')}
+        {_set_day('new')}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS attendance_months_delete AFTER DELETE ON attendance BEGIN
+        {_clear_day('old')}
+    END""",
+)
+
+_YEAR, _MONTH, _DAY, _CODE = _parts('attendance')
+REBUILD_STATEMENTS = (
+    "DELETE FROM attendance_months",
+    # Each (student, batch, date) is unique, so summing the day bits ORs them
+    f"""INSERT INTO attendance_months (batch_id, year, month, user_id, marked, codes)
+        SELECT batch_id, {_YEAR}, {_MONTH}, user_id,
+               SUM(1 << ({_DAY} - 1)), SUM({_CODE} << (2 * ({_DAY} - 1)))
+        FROM attendance
+        GROUP BY batch_id, {_YEAR}, {_MONTH}, user_id""",
+)
+
+
+def create_bitmap_triggers(connection):
+    for statement in TRIGGER_STATEMENTS:
+        connection.execute(text(statement))
+
+
+def rebuild_attendance_bitmaps(connection):
+    """Recompute attendance_months from attendance; returns the number of rows"""
+    for statement in REBUILD_STATEMENTS:
+        connection.execute(text(statement))
+    return connection.execute(text('SELECT count(*) FROM attendance_months')).scalar()
+
+
+def _after_create(target, connection, **kw):
+    if connection.dialect.name != 'sqlite':
+        return
+    create_bitmap_triggers(connection)
+    # Fill a new (or never filled) table from existing attendance
+    if connection.execute(text('SELECT 1 FROM attendance_months LIMIT 1')).first() is None:
+        rebuild_attendance_bitmaps(connection)
+
+
+def pack_days(statuses):
+    """(marked, codes) of {day: AttendanceStatus}"""
+    marked = codes = 0
+    for day, status in statuses.items():
+        marked |= 1 << (day - 1)
+        codes |= STATUS_CODES[status] << (2 * (day - 1))
+    return marked, codes
+
+
+def unpack_days(marked, codes, days):
+    """{day: status value or None} for days 1..days"""
+    return {
+        day: CODE_STATUSES[(codes >> (2 * (day - 1))) & 3] if marked >> (day - 1) & 1 else None
+        for day in range(1, days + 1)
+    }
+
+
+def encode_row(marked, codes):
+    return base64.b64encode(struct.pack(ROW_FORMAT, marked, codes)).decode('ascii')
+
+
+def month_bitmaps(batch_id, year, month, user_ids=None):
+    """{user_id: (marked, codes)} of a batch's month, read in one indexed range"""
+    if db.session.get_bind().dialect.name == 'sqlite':
+        query = db.session.query(AttendanceMonth.user_id, AttendanceMonth.marked, AttendanceMonth.codes).filter(
+            AttendanceMonth.batch_id == batch_id,
+            AttendanceMonth.year == year,
+            AttendanceMonth.month == month
+        )
+        if user_ids is not None:
+            query = query.filter(AttendanceMonth.user_id.in_(list(user_ids)))
+        return {user_id: (marked, codes) for user_id, marked, codes in query}
+
+    # No triggers: pack the month's attendance rows
+    days = calendar.monthrange(year, month)[1]
+    query = db.session.query(Attendance.user_id, Attendance.date, Attendance.status).filter(
+        Attendance.batch_id == batch_id,
+        Attendance.date >= date(year, month, 1),
+        Attendance.date <= date(year, month, days)
+    )
+    if user_ids is not None:
+        query = query.filter(Attendance.user_id.in_(list(user_ids)))
+    by_user = {}
+    for user_id, day, status in query:
+        by_user.setdefault(user_id, {})[day.day] = status
+    return {user_id: pack_days(statuses) for user_id, statuses in by_user.items()}
+
+
+def init_attendance_bitmaps(app, db):
+    """Create the attendance_months triggers whenever the schema is created"""
+    if not event.contains(db.metadata, 'after_create', _after_create):
+        event.listen(db.metadata, 'after_create', _after_create)
@@ -0,0 +1,109 @@
+"""
+Bulk Attendance Marking
+Set-based writes behind the attendance sheet endpoints (/api/attendance/bulk
+and /bulk-absent-sms): one join query validates batch membership of every
+submitted student, and one INSERT ... ON CONFLICT (unique_user_batch_date)
+DO UPDATE per parameter-limit chunk writes the sheet. Rows whose status did
+not change are left alone, so re-saving a sheet writes nothing and only the
+changed rows come back (RETURNING). Marking a batch of any size takes the
+same handful of statements.
+"""
+import logging
+from datetime import datetime
+
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import load_only
+
+from models import db, Attendance, AttendanceStatus, User, user_batches
+from services.bulk_upsert import SQLITE_MAX_PARAMETERS, upsert_rows
+
+logger = logging.getLogger(__name__)
+
+CONFLICT_COLUMNS = ['user_id', 'batch_id', 'date']
+UPDATE_COLUMNS = ['status', 'marked_by', 'updated_at']
+
+
+def parse_attendance_entries(attendance_data):
+    """
+    {user_id: AttendanceStatus} from the sheet's [{userId, status}] list, in
+    submitted order; a repeated user keeps the last status. Raises ValueError
+    on a user ID that is not a number or an unknown status.
+    """
+    entries = {}
+    for student_attendance in attendance_data:
+        user_id = student_attendance.get('userId')
+        if not user_id:
+            continue
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid student ID '{user_id}'")
+        status = student_attendance.get('status', 'present')
+        try:
+            entries[user_id] = AttendanceStatus(status)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid attendance status '{status}'")
+    return entries
+
+
+def batch_members(batch_id, user_ids):
+    """{user_id: User} of the given users enrolled in the batch, in one join query"""
+    if not user_ids:
+        return {}
+    students = User.query.join(user_batches, user_batches.c.user_id == User.id).filter(
+        user_batches.c.batch_id == batch_id,
+        User.id.in_(list(user_ids))
+    ).options(load_only(User.id, User.first_name, User.last_name, User.phoneNumber, User.guardian_phone)).all()
+    members = {student.id: student for student in students}
+    # Keep the submitted order
+    return {user_id: members[user_id] for user_id in user_ids if user_id in members}
+
+
+def mark_batch_attendance(batch_id, attendance_date, statuses, marked_by):
+    """
+    Upsert {user_id: AttendanceStatus} for a batch and date in the current
+    transaction. Returns the changed rows as [{'user_id', 'status', 'action'}]
+    with action 'created' or 'updated'; unchanged rows are not written.
+    """
+    if not statuses:
+        return []
+
+    now = datetime.utcnow()
+    rows = [{
+        'user_id': user_id, 'batch_id': batch_id, 'date': attendance_date, 'status': status,
+        'marked_by': marked_by, 'created_at': now, 'updated_at': now
+    } for user_id, status in statuses.items()]
+
+    if db.session.get_bind().dialect.name != 'sqlite':
+        return _mark_without_returning(batch_id, attendance_date, statuses, rows)
+
+    table = Attendance.__table__
+    chunk_size = max(1, SQLITE_MAX_PARAMETERS // len(rows[0]))
+    changes = []
+    for start in range(0, len(rows), chunk_size):
+        stmt = sqlite.insert(table).values(rows[start:start + chunk_size])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=CONFLICT_COLUMNS,
+            set_={column: stmt.excluded[column] for column in UPDATE_COLUMNS},
+            where=table.c.status != stmt.excluded.status
+        ).returning(table.c.user_id, table.c.status, table.c.created_at)
+        for user_id, status, created_at in db.session.execute(stmt):
+            changes.append({'user_id': user_id, 'status': status,
+                            'action': 'created' if created_at == now else 'updated'})
+
+    logger.debug(f"Attendance for batch {batch_id} on {attendance_date}: "
+                 f"{len(changes)} of {len(rows)} rows changed")
+    return changes
+
+
+def _mark_without_returning(batch_id, attendance_date, statuses, rows):
+    """MySQL: read the current statuses once, then upsert only the changed rows"""
+    existing = dict(db.session.query(Attendance.user_id, Attendance.status).filter(
+        Attendance.batch_id == batch_id,
+        Attendance.date == attendance_date,
+        Attendance.user_id.in_(list(statuses))
+    ).all())
+    changed = [row for row in rows if existing.get(row['user_id']) != row['status']]
+    upsert_rows(Attendance.__table__, changed, CONFLICT_COLUMNS, UPDATE_COLUMNS)
+    return [{'user_id': row['user_id'], 'status': row['status'],
+             'action': 'updated' if row['user_id'] in existing else 'created'} for row in changed]
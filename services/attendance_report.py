@@ -0,0 +1,134 @@
+"""
+Yearly Attendance Report
+Streams a batch's attendance for a whole year, one line per student, for
+GET /api/attendance/yearly/export:
+- csv: student_id, student_name, one column per date (P/A/L/H, empty when
+  not marked), then the present/absent/late/holiday totals
+- ndjson: one YearlyAttendanceRow (utils/payloads.py) per line
+
+Students come in the monthly sheet's order (first name, last name). Their
+attendance is read through a single cursor over attendance ordered the
+same way, fetched in yield_per chunks and merged with the roster as it
+goes, so only one student's year is held at a time: memory stays flat
+however many students and days the export covers.
+"""
+import csv
+import io
+from datetime import date, timedelta
+
+import msgspec
+from sqlalchemy import Integer, String, cast, func, select, type_coerce
+
+from models import db, Attendance, AttendanceStatus, User, UserRole, user_batches
+from utils.payloads import YearlyAttendanceRow
+
+FETCH_SIZE = 2000  # Attendance rows per cursor fetch
+CSV_CODES = {
+    AttendanceStatus.PRESENT: 'P',
+    AttendanceStatus.ABSENT: 'A',
+    AttendanceStatus.LATE: 'L',
+    AttendanceStatus.HOLIDAY: 'H',
+}
+REPORT_FORMATS = ('csv', 'ndjson')
+STATUS_NAMES = {status.name: status for status in AttendanceStatus}
+
+
+def _batch_students(batch_id):
+    """Filter and order of the monthly sheet's students"""
+    return (
+        user_batches.c.batch_id == batch_id,
+        User.role == UserRole.STUDENT,
+        User.is_active == True,
+        User.is_archived == False
+    ), (User.first_name, User.last_name, User.id)
+
+
+def year_dates(year):
+    first = date(year, 1, 1)
+    return [first + timedelta(days=offset) for offset in range((date(year + 1, 1, 1) - first).days)]
+
+
+def yearly_attendance(batch_id, year):
+    """
+    Yield (student_id, student_name, statuses) per enrolled student, where
+    statuses[i] is the AttendanceStatus of day i of the year or None
+    """
+    filters, order = _batch_students(batch_id)
+    days = len(year_dates(year))
+
+    roster = db.session.execute(
+        select(User.id, User.first_name, User.last_name)
+        .join(user_batches, user_batches.c.user_id == User.id)
+        .where(*filters).order_by(*order)
+    ).all()
+
+    # Day of the year and the raw status name: no date or Enum objects per row
+    day_index = (cast(func.strftime('%j', Attendance.date), Integer) - 1).label('day') \
+        if db.session.get_bind().dialect.name == 'sqlite' else (func.dayofyear(Attendance.date) - 1).label('day')
+    records = db.session.execute(
+        select(Attendance.user_id, day_index, type_coerce(Attendance.status, String).label('status'))
+        .join(User, User.id == Attendance.user_id)
+        .join(user_batches, (user_batches.c.user_id == User.id) & (user_batches.c.batch_id == Attendance.batch_id))
+        .where(Attendance.batch_id == batch_id,
+               Attendance.date >= date(year, 1, 1),
+               Attendance.date < date(year + 1, 1, 1),
+               *filters)
+        .order_by(*order, Attendance.date),
+        execution_options={'yield_per': FETCH_SIZE}
+    )
+
+    students = iter(roster)
+    student = next(students, None)
+    statuses = [None] * days
+    for rows in records.partitions():
+        for user_id, day, status in rows:
+            # Both sides are in the same order: students before this row's are complete
+            while student[0] != user_id:
+                yield student[0], f"{student[1]} {student[2]}", statuses
+                student, statuses = next(students), [None] * days
+            statuses[day] = STATUS_NAMES[status]
+    while student is not None:
+        yield student[0], f"{student[1]} {student[2]}", statuses
+        student, statuses = next(students, None), [None] * days
+
+
+def _totals(statuses):
+    return [sum(1 for status in statuses if status == counted) for counted in CSV_CODES]
+
+
+def csv_lines(batch_id, year):
+    """CSV export, one encoded chunk per line"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return line.encode('utf-8')
+
+    writer.writerow(['student_id', 'student_name', *(day.isoformat() for day in year_dates(year)),
+                     *(status.value for status in CSV_CODES)])
+    yield flush()
+    for student_id, name, statuses in yearly_attendance(batch_id, year):
+        writer.writerow([student_id, name, *(CSV_CODES[status] if status else '' for status in statuses),
+                         *_totals(statuses)])
+        yield flush()
+
+
+def ndjson_lines(batch_id, year):
+    """NDJSON export, one encoded chunk per line"""
+    encoder = msgspec.json.Encoder()
+    for student_id, name, statuses in yearly_attendance(batch_id, year):
+        present, absent, late, holiday = _totals(statuses)
+        yield encoder.encode(YearlyAttendanceRow(
+            student_id=student_id,
+            student_name=name,
+            year=year,
+            attendance=[status.value if status else None for status in statuses],
+            present=present, absent=absent, late=late, holiday=holiday
+        )) + b'\n'
+
+
+def export_filename(batch, year, report_format):
+    return f"attendance_{batch.code or batch.id}_{year}.{report_format}"
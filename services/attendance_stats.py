@@ -0,0 +1,228 @@
+"""
+Attendance Monthly Stats
+Per (batch, year, month, student) present/absent/late/holiday counts in
+attendance_monthly_stats, so monthly rankings, monthly results and the
+attendance summary read one row per student and month instead of counting
+attendance rows.
+
+Triggers on attendance adjust the counts inside the writing transaction,
+whether the write comes from the ORM, the bulk sheet upsert or raw SQL. The
+table and triggers are created with the schema, an empty table is filled
+from attendance, and rebuild_attendance_stats.py recomputes it on demand.
+Date ranges that start or end mid-month take those edge months from the
+attendance_months bitmaps. On databases other than SQLite the counts are
+aggregated from attendance on read instead.
+"""
+import calendar
+from dataclasses import dataclass
+from datetime import date
+
+from sqlalchemy import case, event, func, text, tuple_
+
+from models import db, Attendance, AttendanceMonth, AttendanceMonthlyStats, AttendanceStatus
+from services.attendance_bitmap import STATUS_CODES
+
+COUNT_COLUMNS = [status.value for status in AttendanceStatus]  # present, absent, late, holiday
+
+
+@dataclass(frozen=True)
+class AttendanceCounts:
+    """Attendance records of one student by status"""
+    present: int = 0
+    absent: int = 0
+    late: int = 0
+    holiday: int = 0
+
+    @property
+    def total(self):
+        return self.present + self.absent + self.late + self.holiday
+
+    @property
+    def attended(self):
+        """Present or late"""
+        return self.present + self.late
+
+
+def _month_key(row):
+    return (f"CAST(strftime('%Y', {row}.date) AS INTEGER)", f"CAST(strftime('%m', {row}.date) AS INTEGER)")
+
+
+def _add(row):
+    year, month = _month_key(row)
+    flags = ', '.join(f"{row}.status = '{status.name}'" for status in AttendanceStatus)
+    return f"""INSERT INTO attendance_monthly_stats (batch_id, year, month, user_id, {', '.join(COUNT_COLUMNS)})
+        VALUES ({row}.batch_id, {year}, {month}, {row}.user_id, {flags})
+        ON CONFLICT (batch_id, year, month, user_id) DO UPDATE SET
+            {', '.join(f'{column} = {column} + excluded.{column}' for column in COUNT_COLUMNS)};"""
+
+
+def _subtract(row):
+    year, month = _month_key(row)
+    counts = ', '.join(f"{status.value} = {status.value} - ({row}.status = '{status.name}')"
+                       for status in AttendanceStatus)
+    return f"""UPDATE attendance_monthly_stats SET {counts}
+        WHERE batch_id = {row}.batch_id AND year = {year} AND month = {month} AND user_id = {row}.user_id;"""
+
+
+TRIGGER_STATEMENTS = (
+    f"""CREATE TRIGGER IF NOT EXISTS attendance_monthly_stats_insert AFTER INSERT ON attendance BEGIN
+        {_add('new')}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS attendance_monthly_stats_update
+        AFTER UPDATE OF user_id, batch_id, date, status ON attendance BEGIN
+        {_subtract('old')}
+        {_add('new')}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS attendance_monthly_stats_delete AFTER DELETE ON attendance BEGIN
+        {_subtract('old')}
+    END""",
+)
+
+_YEAR, _MONTH = _month_key('attendance')
+REBUILD_STATEMENTS = (
+    "DELETE FROM attendance_monthly_stats",
+    f"""INSERT INTO attendance_monthly_stats (batch_id, year, month, user_id, {', '.join(COUNT_COLUMNS)})
+        SELECT batch_id, {_YEAR}, {_MONTH}, user_id,
+               {', '.join(f"SUM(status = '{status.name}')" for status in AttendanceStatus)}
+        FROM attendance
+        GROUP BY batch_id, {_YEAR}, {_MONTH}, user_id""",
+)
+
+
+def create_stats_triggers(connection):
+    for statement in TRIGGER_STATEMENTS:
+        connection.execute(text(statement))
+
+
+def rebuild_attendance_stats(connection):
+    """Recompute attendance_monthly_stats from attendance; returns the number of rows"""
+    for statement in REBUILD_STATEMENTS:
+        connection.execute(text(statement))
+    return connection.execute(text('SELECT count(*) FROM attendance_monthly_stats')).scalar()
+
+
+def _after_create(target, connection, **kw):
+    if connection.dialect.name != 'sqlite':
+        return
+    create_stats_triggers(connection)
+    # Fill a new (or never filled) table from existing attendance
+    if connection.execute(text('SELECT 1 FROM attendance_monthly_stats LIMIT 1')).first() is None:
+        rebuild_attendance_stats(connection)
+
+
+def _uses_rollup():
+    return db.session.get_bind().dialect.name == 'sqlite'
+
+
+def _attendance_counts(start_date=None, end_date=None, batch_id=None, user_ids=None):
+    """{user_id: AttendanceCounts} aggregated from attendance rows"""
+    query = db.session.query(Attendance.user_id, *[
+        func.sum(case((Attendance.status == status, 1), else_=0)) for status in AttendanceStatus
+    ])
+    if batch_id is not None:
+        query = query.filter(Attendance.batch_id == batch_id)
+    if user_ids is not None:
+        query = query.filter(Attendance.user_id.in_(list(user_ids)))
+    if start_date:
+        query = query.filter(Attendance.date >= start_date)
+    if end_date:
+        query = query.filter(Attendance.date <= end_date)
+    return {user_id: AttendanceCounts(*counts) for user_id, *counts in query.group_by(Attendance.user_id)}
+
+
+def _scoped(query, model, batch_id, user_ids):
+    if batch_id is not None:
+        query = query.filter(model.batch_id == batch_id)
+    if user_ids is not None:
+        query = query.filter(model.user_id.in_(list(user_ids)))
+    return query
+
+
+def month_counts(batch_id, year, month, user_ids=None):
+    """{user_id: AttendanceCounts} of a batch's month; students without records are absent from the map"""
+    if user_ids is not None and not user_ids:
+        return {}
+    if not _uses_rollup():
+        last_day = calendar.monthrange(year, month)[1]
+        return _attendance_counts(date(year, month, 1), date(year, month, last_day), batch_id, user_ids)
+
+    query = _scoped(db.session.query(
+        AttendanceMonthlyStats.user_id,
+        *[getattr(AttendanceMonthlyStats, column) for column in COUNT_COLUMNS]
+    ), AttendanceMonthlyStats, batch_id, user_ids).filter(
+        AttendanceMonthlyStats.year == year,
+        AttendanceMonthlyStats.month == month
+    )
+    return {user_id: AttendanceCounts(*counts) for user_id, *counts in query if any(counts)}
+
+
+def _split_range(start_date, end_date):
+    """
+    Whole months (first, last) as (year, month), None for an open end, and
+    the partial edge months as (year, month, first_day, last_day)
+    """
+    first = (start_date.year, start_date.month) if start_date else None
+    last = (end_date.year, end_date.month) if end_date else None
+    partial = []
+    if start_date and start_date.day != 1:
+        last_day = calendar.monthrange(*first)[1]
+        if last == first:
+            last_day = end_date.day
+        partial.append((*first, start_date.day, last_day))
+        first = (first[0] + 1, 1) if first[1] == 12 else (first[0], first[1] + 1)
+    if end_date and end_date.day != calendar.monthrange(*last)[1]:
+        if not partial or partial[0][:2] != last:
+            partial.append((*last, 1, end_date.day))
+        last = (last[0] - 1, 12) if last[1] == 1 else (last[0], last[1] - 1)
+    return first, last, partial
+
+
+def range_counts(start_date=None, end_date=None, batch_id=None, user_ids=None):
+    """
+    {user_id: AttendanceCounts} over a date range (either end may be open),
+    summed over batches unless batch_id is given
+    """
+    if user_ids is not None and not user_ids:
+        return {}
+    if start_date and end_date and start_date > end_date:
+        return {}
+    if not _uses_rollup():
+        return _attendance_counts(start_date, end_date, batch_id, user_ids)
+
+    totals = {}
+    first, last, partial = _split_range(start_date, end_date)
+
+    if not (first and last and first > last):
+        query = _scoped(db.session.query(
+            AttendanceMonthlyStats.user_id,
+            *[func.sum(getattr(AttendanceMonthlyStats, column)) for column in COUNT_COLUMNS]
+        ), AttendanceMonthlyStats, batch_id, user_ids)
+        month = tuple_(AttendanceMonthlyStats.year, AttendanceMonthlyStats.month)
+        if first:
+            query = query.filter(month >= first)
+        if last:
+            query = query.filter(month <= last)
+        for user_id, *counts in query.group_by(AttendanceMonthlyStats.user_id):
+            totals[user_id] = list(counts)
+
+    # Mid-month edges: count the days inside the range from the bitmaps
+    status_index = {code: COUNT_COLUMNS.index(status.value) for status, code in STATUS_CODES.items()}
+    for year, month, first_day, last_day in partial:
+        query = _scoped(db.session.query(AttendanceMonth.user_id, AttendanceMonth.marked, AttendanceMonth.codes),
+                        AttendanceMonth, batch_id, user_ids).filter(
+            AttendanceMonth.year == year,
+            AttendanceMonth.month == month
+        )
+        for user_id, marked, codes in query:
+            counts = totals.setdefault(user_id, [0] * len(COUNT_COLUMNS))
+            for day in range(first_day, last_day + 1):
+                if marked >> (day - 1) & 1:
+                    counts[status_index[(codes >> (2 * (day - 1))) & 3]] += 1
+
+    return {user_id: AttendanceCounts(*counts) for user_id, counts in totals.items() if any(counts)}
+
+
+def init_attendance_stats(app, db):
+    """Create the attendance_monthly_stats triggers whenever the schema is created"""
+    if not event.contains(db.metadata, 'after_create', _after_create):
+        event.listen(db.metadata, 'after_create', _after_create)
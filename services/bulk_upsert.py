@@ -0,0 +1,47 @@
+"""
+Bulk Upsert Helpers
+Single-statement INSERT ... ON CONFLICT DO UPDATE for SQLite.
+"""
+import logging
+import sqlite3
+
+from sqlalchemy.dialects import sqlite
+
+from models import db
+
+logger = logging.getLogger(__name__)
+
+# SQLite caps bound parameters per statement: 999 before 3.32, 32766 since
+SQLITE_MAX_PARAMETERS = 32766 if sqlite3.sqlite_version_info >= (3, 32, 0) else 999
+
+
+def upsert_rows(table, rows, conflict_columns, update_columns):
+    """
+    Insert rows into a table, updating `update_columns` when a row collides on
+    the unique `conflict_columns`. Runs in the current session transaction and
+    returns the number of statements executed.
+    """
+    if not rows:
+        return 0
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect != 'sqlite':
+        raise ValueError(f'Bulk upsert needs SQLite, not {dialect}')
+    columns_per_row = max(len(row) for row in rows)
+    chunk_size = max(1, SQLITE_MAX_PARAMETERS // columns_per_row)
+
+    statements = 0
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+
+        stmt = sqlite.insert(table).values(chunk)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=conflict_columns,
+            set_={column: stmt.excluded[column] for column in update_columns}
+        )
+
+        db.session.execute(stmt)
+        statements += 1
+
+    logger.debug(f"Upserted {len(rows)} rows into {table.name} in {statements} statement(s)")
+    return statements
@@ -0,0 +1,30 @@
+"""
+Cache Version Counters
+Cross-worker invalidation for per-process caches.
+
+Each cached resource family has a row in cache_versions. Writers call
+bump_version() inside their own transaction; readers compare get_version()
+with the version their in-memory copy was built from and reload on change.
+"""
+from datetime import datetime
+
+from sqlalchemy.dialects import sqlite
+
+from models import db, CacheVersion
+
+
+def get_version(name):
+    """Current version of a cache family (0 before the first bump)"""
+    version = db.session.query(CacheVersion.version).filter(CacheVersion.name == name).scalar()
+    return version or 0
+
+
+def bump_version(name):
+    """Invalidate a cache family for every process; takes effect when the caller commits"""
+    now = datetime.utcnow()
+    stmt = sqlite.insert(CacheVersion).values(name=name, version=1, updated_at=now)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['name'],
+        set_={'version': CacheVersion.version + 1, 'updated_at': now}
+    )
+    db.session.execute(stmt)
@@ -0,0 +1,72 @@
+"""
+Response Compression
+gzip/brotli for large JSON responses when no proxy in front compresses them
+(nginx_gsteaching.conf does not enable gzip).
+
+Brotli is used when the optional `brotli` package is installed and the
+client accepts it, gzip otherwise. A compressed response with a strong ETag
+gets a per-encoding suffix ("<etag>-gzip"), since its bytes differ from the
+identity response; services/http_cache.py accepts all variants.
+"""
+import gzip
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip only
+    brotli = None
+
+ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+ETAG_SUFFIXES = {'br': '-br', 'gzip': '-gzip'}
+
+
+def etag_variants(etag):
+    """The identity ETag and the ETags of its compressed variants"""
+    return [etag] + [etag + ETAG_SUFFIXES[encoding] for encoding in ENCODINGS]
+
+
+def compress(data, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(data, quality=min(level, 11))
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def init_compression(app):
+    """
+    Compress JSON responses of at least COMPRESSION_MIN_SIZE bytes.
+
+    Registered before the other after_request hooks so it runs after them
+    (Flask calls them in reverse order) and sees the final body.
+    """
+    if not app.config.get('COMPRESSION_ENABLED', True):
+        return
+
+    mimetypes = set(app.config.get('COMPRESSION_MIMETYPES', ['application/json']))
+
+    @app.after_request
+    def compress_response(response):
+        if response.mimetype not in mimetypes:
+            return response
+        response.vary.add('Accept-Encoding')
+
+        if (response.direct_passthrough or response.is_streamed or response.status_code != 200
+                or 'Content-Encoding' in response.headers):
+            return response
+        if (response.content_length or 0) < app.config.get('COMPRESSION_MIN_SIZE', 1024):
+            return response
+        encoding = request.accept_encodings.best_match(ENCODINGS)
+        if not encoding:
+            return response
+
+        data = response.get_data()
+        body = compress(data, encoding, app.config.get('COMPRESSION_LEVEL', 6))
+        if len(body) >= len(data):
+            return response
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag + ETAG_SUFFIXES[encoding])
+        return response
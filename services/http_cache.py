@@ -0,0 +1,169 @@
+"""
+HTTP Conditional GET
+Strong ETags for read-heavy JSON endpoints, derived from version counters
+instead of from the response body.
+
+Every write to a table in VERSIONED_TABLES bumps the cache_versions row
+'table:<name>' inside the writing transaction: ORM flushes are inspected
+in after_flush (column and many-to-many collection changes), and bulk
+insert/update/delete statements run through the session are seen in
+do_orm_execute. Each table is bumped at most once per transaction.
+
+An endpoint decorated with @conditional_get('batches', 'users') reads the
+versions of the tables it is built from in one query; the ETag is a hash
+of those versions, the endpoint and its query string. A matching
+If-None-Match is answered with 304 before the view runs. Compressed
+variants (services/compression.py) carry a suffix and match as well.
+"""
+import hashlib
+from datetime import datetime
+from functools import lru_cache, wraps
+
+from flask import current_app, request
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects import sqlite
+
+from models import db, CacheVersion
+from services.compression import etag_variants
+
+# Tables whose writes are tracked; an endpoint can only depend on these
+VERSIONED_TABLES = frozenset([
+    'batches', 'user_batches', 'users', 'documents', 'monthly_exams', 'monthly_rankings'
+])
+
+# Bookkeeping columns whose changes no conditional endpoint shows
+IGNORED_COLUMNS = {
+    'users': frozenset(['last_login'])
+}
+
+VERSION_PREFIX = 'table:'
+BUMPED_KEY = 'http_cache_bumped'
+
+
+@lru_cache(maxsize=None)
+def _mapper_tables(mapper):
+    """(tracked table of the mapper or None, tracked many-to-many tables by relationship key)"""
+    table_name = mapper.local_table.name
+    secondaries = {rel.key: rel.secondary.name for rel in mapper.relationships
+                   if rel.secondary is not None and rel.secondary.name in VERSIONED_TABLES}
+    return (table_name if table_name in VERSIONED_TABLES else None), secondaries
+
+
+def _changed_tables(session):
+    """Tracked tables touched by the objects of the flush in progress"""
+    tables = set()
+    for mapper in {inspect(obj).mapper for obj in session.new | session.deleted}:
+        table_name, secondaries = _mapper_tables(mapper)
+        if table_name:
+            tables.add(table_name)
+        tables.update(secondaries.values())
+
+    for obj in session.dirty:
+        state = inspect(obj)
+        table_name, secondaries = _mapper_tables(state.mapper)
+        if table_name and table_name not in tables:
+            ignored = IGNORED_COLUMNS.get(table_name, ())
+            if any(state.attrs[attr.key].history.has_changes()
+                   for attr in state.mapper.column_attrs if attr.key not in ignored):
+                tables.add(table_name)
+        for key, secondary in secondaries.items():
+            if secondary not in tables and state.attrs[key].history.has_changes():
+                tables.add(secondary)
+
+    return tables
+
+
+def _bump(session, tables):
+    """Bump the version of tables not yet bumped in this transaction"""
+    bumped = session.info.setdefault(BUMPED_KEY, set())
+    pending = sorted(set(tables) - bumped)
+    if not pending:
+        return
+    now = datetime.utcnow()
+    stmt = sqlite.insert(CacheVersion).values([
+        {'name': VERSION_PREFIX + name, 'version': 1, 'updated_at': now} for name in pending
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['name'],
+        set_={'version': CacheVersion.version + 1, 'updated_at': now}
+    )
+    session.connection().execute(stmt)
+    bumped.update(pending)
+
+
+def _after_flush(session, flush_context):
+    tables = _changed_tables(session)
+    if tables:
+        _bump(session, tables)
+
+
+def _do_orm_execute(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = getattr(orm_execute_state.statement, 'table', None)
+    if table is not None and table.name in VERSIONED_TABLES:
+        _bump(orm_execute_state.session, [table.name])
+
+
+def _after_transaction_end(session, transaction):
+    # Any end (commit, rollback, savepoint) forgets what was bumped; bumping twice is harmless
+    session.info.pop(BUMPED_KEY, None)
+
+
+def table_versions(tables):
+    """{table: version} of tracked tables, 0 for tables never written"""
+    rows = db.session.query(CacheVersion.name, CacheVersion.version).filter(
+        CacheVersion.name.in_([VERSION_PREFIX + name for name in tables])
+    ).all()
+    versions = {name[len(VERSION_PREFIX):]: version for name, version in rows}
+    return {name: versions.get(name, 0) for name in tables}
+
+
+def conditional_get(*tables, key=None):
+    """
+    Decorator: ETag/304 for a GET view whose response only depends on `tables`
+    (and the query string). `key` adds a static component, e.g. the hash of
+    a constant the view returns, for views that read no table at all; a
+    callable key is called with the view's arguments on every request, for
+    versions kept outside VERSIONED_TABLES or per-viewer responses.
+    """
+    unknown = set(tables) - VERSIONED_TABLES
+    if unknown:
+        raise ValueError(f"Tables not tracked for ETags: {', '.join(sorted(unknown))}")
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not current_app.config.get('CONDITIONAL_GET_ENABLED', True):
+                return f(*args, **kwargs)
+
+            versions = table_versions(tables) if tables else {}
+            parts = [request.endpoint, request.query_string.decode('latin-1'),
+                     str(key(*args, **kwargs)) if callable(key) else key or '']
+            parts.extend(f'{name}={version}' for name, version in sorted(versions.items()))
+            etag = hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()[:20]
+
+            for variant in etag_variants(etag):
+                if request.if_none_match.contains(variant):
+                    not_modified = current_app.response_class(status=304)
+                    not_modified.set_etag(variant)
+                    not_modified.headers['Cache-Control'] = 'private, no-cache'
+                    not_modified.vary.add('Accept-Encoding')
+                    return not_modified
+
+            response = current_app.make_response(f(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated_function
+    return decorator
+
+
+def init_http_cache(app, db):
+    """Track writes to VERSIONED_TABLES on the shared session"""
+    for name, listener in (('after_flush', _after_flush),
+                           ('do_orm_execute', _do_orm_execute),
+                           ('after_transaction_end', _after_transaction_end)):
+        if not event.contains(db.session, name, listener):
+            event.listen(db.session, name, listener)
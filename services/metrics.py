@@ -0,0 +1,349 @@
+"""
+Application Metrics
+In-process counters and histograms shared across gunicorn workers, served
+in Prometheus text format at /metrics.
+
+Each process keeps its own values in memory and writes them to
+METRICS_DIR/metrics_<pid>.json at most every METRICS_FLUSH_SECONDS. A
+scrape flushes the serving worker, then sums every process file. Files of
+workers that have exited are folded into metrics_archive.json, so counters
+stay monotonic across gunicorn's max_requests restarts. The SMS dispatcher
+writes to the same directory through the same code.
+
+/metrics requires "Authorization: Bearer <METRICS_TOKEN>" when a token is
+set. Without one, METRICS_LOCAL_ONLY (on in production) limits it to
+scrapers on the host itself; requests relayed by nginx are refused.
+"""
+import fcntl
+import glob
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# name -> (type, help, buckets)
+METRICS = {
+    'http_requests_total': ('counter', 'HTTP requests by blueprint, endpoint and status', None),
+    'http_request_duration_seconds': ('histogram', 'HTTP request latency by blueprint and endpoint', DEFAULT_BUCKETS),
+    'http_request_db_seconds': ('histogram', 'Database time spent per HTTP request by blueprint', DEFAULT_BUCKETS),
+    'http_request_db_queries_total': ('counter', 'SQL statements executed by HTTP requests per blueprint', None),
+    'sms_provider_requests_total': ('counter', 'SMS gateway calls by result', None),
+    'sms_provider_request_seconds': ('histogram', 'SMS gateway call latency', DEFAULT_BUCKETS),
+    'online_exam_answers_saved_total': ('counter', 'Online exam answers saved', None),
+    'session_store_seconds': ('histogram', 'Session store latency by operation', DEFAULT_BUCKETS),
+}
+
+ARCHIVE_FILE = 'metrics_archive.json'
+
+
+class MetricsRegistry:
+    """Counters and histograms of one process with periodic file flushes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.directory = None
+        self.flush_seconds = 5
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self.counters = defaultdict(float)  # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> [bucket counts..., +Inf count, sum]
+        self._last_flush = 0.0
+
+    def configure(self, directory, flush_seconds=5):
+        with self._lock:
+            if directory != self.directory:
+                self._reset()
+            self.directory = directory
+            self.flush_seconds = flush_seconds
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _check_fork(self):
+        # A forked worker must not report its parent's values as its own
+        if os.getpid() != self.pid:
+            self._reset()
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._check_fork()
+            self.counters[key] += amount
+        self._maybe_flush()
+
+    def observe(self, name, value, **labels):
+        buckets = METRICS[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._check_fork()
+            series = self.histograms.get(key)
+            if series is None:
+                series = self.histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(buckets)] += 1
+            series[-1] += value
+        self._maybe_flush()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, list(labels), list(series)] for (name, labels), series in self.histograms.items()]
+            }
+
+    def _maybe_flush(self):
+        if self.directory and time.monotonic() - self._last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        """Write this process's values to its file in METRICS_DIR"""
+        if not self.directory:
+            return
+        self._last_flush = time.monotonic()
+        path = os.path.join(self.directory, f'metrics_{os.getpid()}.json')
+        try:
+            _write_json(path, self.snapshot())
+        except OSError as e:
+            logger.warning(f"Could not write metrics file {path}: {e}")
+
+
+registry = MetricsRegistry()
+
+
+def inc(name, amount=1, **labels):
+    registry.inc(name, amount, **labels)
+
+
+def observe(name, value, **labels):
+    registry.observe(name, value, **labels)
+
+
+def _write_json(path, data):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _merge(totals, snapshot):
+    for name, labels, value in snapshot.get('counters', []):
+        totals['counters'][(name, tuple(map(tuple, labels)))] += value
+    for name, labels, series in snapshot.get('histograms', []):
+        key = (name, tuple(map(tuple, labels)))
+        current = totals['histograms'].get(key)
+        totals['histograms'][key] = series if current is None else [a + b for a, b in zip(current, series)]
+
+
+def collect(directory):
+    """Sum the values of every process, folding files of exited processes into the archive"""
+    totals = {'counters': defaultdict(float), 'histograms': {}}
+    with open(os.path.join(directory, 'metrics.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+        archive_path = os.path.join(directory, ARCHIVE_FILE)
+        archive = {'counters': defaultdict(float), 'histograms': {}}
+        _merge(archive, _read_json(archive_path) or {})
+        archive_changed = False
+
+        for path in glob.glob(os.path.join(directory, 'metrics_*.json')):
+            name = os.path.basename(path)
+            if name == ARCHIVE_FILE:
+                continue
+            snapshot = _read_json(path)
+            if snapshot is None:
+                continue
+            pid = int(name[len('metrics_'):-len('.json')])
+            if pid != os.getpid() and not _pid_alive(pid):
+                _merge(archive, snapshot)
+                os.remove(path)
+                archive_changed = True
+            else:
+                _merge(totals, snapshot)
+
+        if archive_changed:
+            _write_json(archive_path, {
+                'counters': [[n, list(l), v] for (n, l), v in archive['counters'].items()],
+                'histograms': [[n, list(l), s] for (n, l), s in archive['histograms'].items()]
+            })
+        for key, value in archive['counters'].items():
+            totals['counters'][key] += value
+        for key, series in archive['histograms'].items():
+            current = totals['histograms'].get(key)
+            totals['histograms'][key] = series if current is None else [a + b for a, b in zip(current, series)]
+    return totals
+
+
+def _format_labels(labels, extra=None):
+    pairs = list(labels) + (extra or [])
+    if not pairs:
+        return ''
+    escaped = [(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for k, v in pairs]
+    return '{' + ','.join(f'{k}="{v}"' for k, v in escaped) + '}'
+
+
+def render_prometheus(totals, gauges=None):
+    """Prometheus text exposition of collected totals plus point-in-time gauges"""
+    lines = []
+    by_name = defaultdict(list)
+    for (name, labels), value in totals['counters'].items():
+        by_name[name].append((labels, value))
+    for (name, labels), series in totals['histograms'].items():
+        by_name[name].append((labels, series))
+
+    for name in sorted(by_name):
+        metric_type, help_text, buckets = METRICS.get(name, ('untyped', name, None))
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        for labels, value in sorted(by_name[name]):
+            if metric_type == 'histogram':
+                cumulative = 0
+                for bound, count in zip(buckets, value):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_format_labels(labels, [("le", repr(float(bound)))])} {cumulative}')
+                cumulative += value[len(buckets)]
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {value[-1]}')
+                lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+            else:
+                lines.append(f'{name}{_format_labels(labels)} {value:g}')
+
+    for name, (help_text, samples) in sorted((gauges or {}).items()):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} gauge')
+        for labels, value in samples:
+            lines.append(f'{name}{_format_labels(sorted(labels.items()))} {value:g}')
+    return '\n'.join(lines) + '\n'
+
+
+def queue_gauges():
+    """Current SMS outbox depth by status, read from the database at scrape time"""
+    from sqlalchemy import func
+    from models import db, SmsOutbox
+
+    rows = db.session.query(SmsOutbox.status, func.count(SmsOutbox.id)).group_by(SmsOutbox.status).all()
+    return {
+        'sms_outbox_messages': ('SMS outbox rows by status', [({'status': status.value}, count) for status, count in rows])
+    }
+
+
+class TimedSessionInterface:
+    """Wraps the Flask-Session interface to time session loads and saves"""
+
+    def __init__(self, interface):
+        self.interface = interface
+
+    def __getattr__(self, name):
+        return getattr(self.interface, name)
+
+    def open_session(self, app, request):
+        started = time.perf_counter()
+        try:
+            return self.interface.open_session(app, request)
+        finally:
+            observe('session_store_seconds', time.perf_counter() - started, operation='open')
+
+    def save_session(self, app, session, response):
+        started = time.perf_counter()
+        try:
+            return self.interface.save_session(app, session, response)
+        finally:
+            observe('session_store_seconds', time.perf_counter() - started, operation='save')
+
+
+def _is_local_request(request):
+    """Sent straight from this host, not relayed by the reverse proxy on its behalf"""
+    if request.headers.get('X-Forwarded-For') or request.headers.get('X-Real-IP'):
+        return False
+    try:
+        return ipaddress.ip_address(request.remote_addr or '').is_loopback
+    except ValueError:
+        return False
+
+
+def metrics_access(config, request):
+    """None when the request may read /metrics, else the refusal (status, message)"""
+    token = config.get('METRICS_TOKEN')
+    if token:
+        supplied = request.headers.get('Authorization', '').encode('utf-8')
+        if not hmac.compare_digest(supplied, f'Bearer {token}'.encode('utf-8')):
+            return 401, 'Unauthorized'
+    elif config.get('METRICS_LOCAL_ONLY') and not _is_local_request(request):
+        return 403, 'Forbidden: set METRICS_TOKEN to scrape from another host'
+    return None
+
+
+def init_metrics(app):
+    """Record request metrics and register the /metrics endpoint"""
+    from flask import Response, g, request
+
+    directory = app.config.get('METRICS_DIR') or os.path.join(app.instance_path, 'metrics')
+    registry.configure(directory, app.config.get('METRICS_FLUSH_SECONDS', 5))
+    app.session_interface = TimedSessionInterface(app.session_interface)
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.get('metrics_started')
+        if started is None or request.endpoint == 'metrics':
+            return response
+        blueprint = request.blueprint or 'app'
+        endpoint = request.endpoint or 'unmatched'
+        observe('http_request_duration_seconds', time.perf_counter() - started,
+                blueprint=blueprint, endpoint=endpoint, method=request.method)
+        inc('http_requests_total', blueprint=blueprint, endpoint=endpoint, status=str(response.status_code))
+
+        sql_stats = g.get('sql_stats')
+        if sql_stats is not None:
+            observe('http_request_db_seconds', sql_stats.duration, blueprint=blueprint)
+            inc('http_request_db_queries_total', sql_stats.count, blueprint=blueprint)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        refusal = metrics_access(app.config, request)
+        if refusal:
+            status, message = refusal
+            return Response(f'{message}\n', status=status, mimetype='text/plain')
+
+        registry.flush()
+        totals = collect(registry.directory)
+        try:
+            gauges = queue_gauges()
+        except Exception as e:
+            logger.warning(f"Could not read queue depths for metrics: {e}")
+            gauges = {}
+        return Response(render_prometheus(totals, gauges), mimetype='text/plain; version=0.0.4')
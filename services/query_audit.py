@@ -0,0 +1,127 @@
+"""
+Query Plan Auditor
+Capture the SQL the app really runs and replay it through EXPLAIN QUERY PLAN.
+
+Set SQL_CAPTURE_FILE to a path and every distinct statement (with the
+parameters of its first execution) is appended there as JSON lines while
+the app serves traffic. audit_queries() replays such a capture against a
+database and flags plans that scan a whole table instead of searching an
+index, so a dropped or unused index shows up before deploy
+(see audit_query_plans.py).
+"""
+import json
+import logging
+import re
+import threading
+
+from sqlalchemy import event, inspect
+
+logger = logging.getLogger(__name__)
+
+AUDITED_PREFIXES = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT')
+
+# Tiny lookup tables where a scan is cheaper than an index
+DEFAULT_ALLOWED_SCANS = frozenset({'settings', 'cache_versions', 'sms_accounts'})
+
+ALIAS_PATTERN = re.compile(r'\b(\w+)\s+AS\s+(\w+)\b', re.IGNORECASE)
+
+_capture_lock = threading.Lock()
+
+
+def _auditable(statement):
+    return statement.lstrip().upper().startswith(AUDITED_PREFIXES)
+
+
+def _first_parameters(parameters, executemany):
+    if executemany:
+        parameters = parameters[0] if parameters else ()
+    if isinstance(parameters, dict):
+        return dict(parameters)
+    return list(parameters or ())
+
+
+def init_query_capture(app, db):
+    """Append each distinct statement to SQL_CAPTURE_FILE when it is configured"""
+    path = app.config.get('SQL_CAPTURE_FILE')
+    if not path:
+        return
+
+    seen = set()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement in seen or not _auditable(statement):
+            return
+        with _capture_lock:
+            if statement in seen:
+                return
+            seen.add(statement)
+            with open(path, 'a', encoding='utf-8') as capture:
+                capture.write(json.dumps({
+                    'statement': statement,
+                    'parameters': _first_parameters(parameters, executemany)
+                }, default=str) + '\n')
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    logger.info(f"Capturing SQL statements to {path}")
+
+
+def load_capture(path):
+    """Read a capture file, keeping the first entry per statement"""
+    queries = {}
+    with open(path, encoding='utf-8') as capture:
+        for line in capture:
+            line = line.strip()
+            if line:
+                entry = json.loads(line)
+                queries.setdefault(entry['statement'], entry)
+    return list(queries.values())
+
+
+def explain(connection, statement, parameters):
+    """EXPLAIN QUERY PLAN detail lines for one statement"""
+    cursor = connection.connection.cursor()
+    try:
+        cursor.execute(f'EXPLAIN QUERY PLAN {statement}', parameters)
+        return [row[3] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def full_scans(plan, statement, tables):
+    """Tables read by a plain SCAN (no index) in a plan"""
+    aliases = {alias: table for table, alias in ALIAS_PATTERN.findall(statement)}
+    scanned = []
+    for detail in plan:
+        if not detail.startswith('SCAN ') or ' USING ' in detail:
+            continue
+        name = detail.split()[1]
+        table = aliases.get(name, name)
+        # Skips CONSTANT ROW, subqueries and CTEs
+        if table in tables:
+            scanned.append(table)
+    return scanned
+
+
+def audit_queries(engine, queries, allowed_scans=DEFAULT_ALLOWED_SCANS):
+    """
+    Replay captured queries through EXPLAIN QUERY PLAN.
+
+    Returns a list of findings, one per statement, each with the plan and
+    the tables it scans in full (`full_scans`, excluding `allowed_scans`).
+    Statements that cannot be explained against this schema get an `error`.
+    """
+    tables = set(inspect(engine).get_table_names())
+    findings = []
+    with engine.connect() as connection:
+        for query in queries:
+            statement = query['statement']
+            parameters = query.get('parameters') or ()
+            try:
+                plan = explain(connection, statement, parameters)
+            except Exception as e:
+                findings.append({'statement': statement, 'plan': [], 'full_scans': [], 'error': str(e)})
+                continue
+            scanned = [t for t in full_scans(plan, statement, tables) if t not in allowed_scans]
+            findings.append({'statement': statement, 'plan': plan, 'full_scans': scanned})
+    return findings
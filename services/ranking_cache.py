@@ -0,0 +1,161 @@
+"""
+Monthly Ranking Cache
+Persistent snapshot of the comprehensive ranking per monthly exam.
+
+Snapshots live in the monthly_ranking_cache table so every gunicorn worker
+shares them. Writes that change marks, attendance or roll numbers call
+invalidate_ranking_cache(), and student and batch writes that change a
+roster call invalidate_roster_rankings(), inside their own transaction; the
+next read rebuilds the snapshot once and every later read is a single
+indexed lookup. The version counter they bump keys the endpoint's ETag.
+"""
+import hashlib
+import logging
+from datetime import datetime
+
+import msgspec
+from sqlalchemy import type_coerce
+from sqlalchemy.exc import IntegrityError
+
+from models import db, MonthlyRankingCache
+from services.ranking_engine import compute_comprehensive_ranking, reorder_saved_rankings
+from utils.payloads import RankingPayload
+
+logger = logging.getLogger(__name__)
+
+_payload_encoder = msgspec.json.Encoder(enc_hook=str)
+_payload_decoder = msgspec.json.Decoder(RankingPayload)
+
+
+def build_ranking_payload(snapshot):
+    """Convert a RankingSnapshot into the JSON document stored in the cache"""
+    return {
+        'individual_exams': [
+            {'id': e.id, 'title': e.title, 'exam_title': e.title, 'subject': e.subject, 'marks': e.marks}
+            for e in snapshot.individual_exams
+        ],
+        'rankings': snapshot.rankings
+    }
+
+
+def _decode_payload(raw):
+    """Stored payload JSON text as a RankingPayload, None when missing or unreadable"""
+    if raw is None or raw == 'null':
+        return None
+    try:
+        return _payload_decoder.decode(raw)
+    except msgspec.ValidationError as e:
+        # Written by an older version of the engine; rebuild it
+        logger.info(f"Discarding ranking cache entry that no longer matches RankingPayload: {e}")
+        return None
+
+
+def get_cached_ranking(monthly_exam):
+    """
+    Return (payload, etag) for a monthly exam's comprehensive ranking.
+
+    payload is a RankingPayload Struct decoded straight from the stored JSON
+    text, which the JSON provider encodes without building dicts. Serves the
+    stored snapshot when it is fresh, otherwise recomputes it with the ranking
+    engine and stores it. A snapshot is only written back if no invalidation
+    happened while it was being computed.
+    """
+    entry = db.session.query(
+        MonthlyRankingCache.id,
+        MonthlyRankingCache.version,
+        MonthlyRankingCache.etag,
+        type_coerce(MonthlyRankingCache.payload, db.Text).label('payload_json')
+    ).filter(MonthlyRankingCache.monthly_exam_id == monthly_exam.id).first()
+    if entry:
+        payload = _decode_payload(entry.payload_json)
+        if payload is not None:
+            return payload, entry.etag
+
+    version = entry.version if entry else 0
+    snapshot = compute_comprehensive_ranking(monthly_exam)
+
+    # Round-trip through JSON so fresh and cached reads return identical documents
+    encoded = _payload_encoder.encode(build_ranking_payload(snapshot))
+    payload = _payload_decoder.decode(encoded)
+    etag = f"r{monthly_exam.id}-{version}-{hashlib.sha1(encoded).hexdigest()[:16]}"
+    document = msgspec.json.decode(encoded)
+
+    try:
+        if entry:
+            MonthlyRankingCache.query.filter_by(id=entry.id, version=version).update({
+                MonthlyRankingCache.payload: document,
+                MonthlyRankingCache.etag: etag,
+                MonthlyRankingCache.computed_at: datetime.utcnow()
+            }, synchronize_session=False)
+        else:
+            db.session.add(MonthlyRankingCache(
+                monthly_exam_id=monthly_exam.id,
+                batch_id=monthly_exam.batch_id,
+                month=monthly_exam.month,
+                year=monthly_exam.year,
+                version=version,
+                payload=document,
+                etag=etag,
+                computed_at=datetime.utcnow()
+            ))
+        db.session.commit()
+    except IntegrityError:
+        # Another worker stored the snapshot first; ours is equally valid to serve
+        db.session.rollback()
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f"Could not store ranking cache for exam {monthly_exam.id}: {e}")
+
+    return payload, etag
+
+
+def invalidate_ranking_cache(batch_id, month=None, year=None):
+    """
+    Mark cached rankings of a batch as stale (batch_id None: every batch).
+
+    Runs inside the caller's transaction, so the invalidation commits together
+    with the write that caused it. Pass month/year to limit it to one month
+    (attendance and holiday writes); exam-level writes invalidate the whole
+    batch because the next month's ranking inherits positions and roll numbers.
+    """
+    query = MonthlyRankingCache.query
+    if batch_id is not None:
+        query = query.filter_by(batch_id=batch_id)
+    if month and year:
+        query = query.filter_by(month=month, year=year)
+    return _mark_stale(query)
+
+
+def invalidate_roster_rankings(batch_ids):
+    """
+    Mark cached rankings of several batches as stale after roster changes:
+    enrolling, removing, renaming, deactivating, archiving or restoring
+    students. Pass every batch the students are in, and those they just left.
+    Saved final rankings are re-sorted too, since a rename can reorder ties.
+    """
+    batch_ids = {batch_id for batch_id in batch_ids if batch_id is not None}
+    if not batch_ids:
+        return 0
+    reorder_saved_rankings(batch_ids)
+    return _mark_stale(MonthlyRankingCache.query.filter(MonthlyRankingCache.batch_id.in_(batch_ids)))
+
+
+def _mark_stale(query):
+    return query.update({
+        MonthlyRankingCache.version: MonthlyRankingCache.version + 1,
+        MonthlyRankingCache.payload: None,
+        MonthlyRankingCache.etag: None
+    }, synchronize_session=False)
+
+
+def ranking_cache_version(monthly_exam_id):
+    """Invalidation count of a monthly exam's cached ranking, 0 before the first snapshot"""
+    version = db.session.query(MonthlyRankingCache.version).filter(
+        MonthlyRankingCache.monthly_exam_id == monthly_exam_id
+    ).scalar()
+    return version or 0
+
+
+def delete_ranking_cache(monthly_exam_id):
+    """Remove the cache entry of a monthly exam that is being deleted"""
+    return MonthlyRankingCache.query.filter_by(monthly_exam_id=monthly_exam_id).delete(synchronize_session=False)
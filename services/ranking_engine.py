@@ -0,0 +1,432 @@
+"""
+Monthly Ranking Engine
+Set-based calculation of comprehensive monthly exam rankings.
+
+All data needed for a batch ranking (students, individual exams, marks,
+attendance counts, existing rankings and previous-month rankings) is loaded
+with a fixed number of grouped queries, and the ranking is then built in
+memory. The number of SQL statements does not depend on the batch size.
+
+Saving marks for a few students does not need a full regeneration either:
+update_rankings_incrementally() recomputes only those students' saved
+MonthlyRanking rows and moves them within the ordered position list.
+That list is the saved rows in position order, so saved positions are kept
+in sort-key order: generation writes them from assign_positions() and
+roster changes (renames) re-sort them with reorder_saved_rankings().
+"""
+from bisect import bisect_left, insort
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import joinedload
+
+from models import (db, MonthlyExam, IndividualExam, MonthlyMark, MonthlyRanking,
+                    User, UserRole, Batch)
+from services.attendance_stats import month_counts
+from services.work_calendar import working_days
+
+
+def calculate_grade_and_gpa(percentage):
+    """Calculate grade and GPA based on percentage"""
+    if percentage >= 80:
+        return 'A+', 5.00
+    elif percentage >= 70:
+        return 'A', 4.00
+    elif percentage >= 60:
+        return 'A-', 3.50
+    elif percentage >= 50:
+        return 'B', 3.00
+    elif percentage >= 40:
+        return 'C', 2.00
+    elif percentage >= 33:
+        return 'D', 1.00
+    else:
+        return 'F', 0.00
+
+
+@dataclass
+class RankingSnapshot:
+    """Result of a comprehensive ranking calculation"""
+    monthly_exam: MonthlyExam
+    individual_exams: List[IndividualExam]
+    students: List[User]
+    rankings: List[Dict]
+    previous_exam: Optional[MonthlyExam] = None
+    previous_roll_numbers: Dict[int, int] = field(default_factory=dict)
+
+
+def get_previous_month_exam(monthly_exam):
+    """Find the monthly exam of the previous month for the same batch"""
+    prev_month = monthly_exam.month - 1 if monthly_exam.month > 1 else 12
+    prev_year = monthly_exam.year if monthly_exam.month > 1 else monthly_exam.year - 1
+    return MonthlyExam.query.filter_by(
+        batch_id=monthly_exam.batch_id,
+        month=prev_month,
+        year=prev_year
+    ).first()
+
+
+def load_batch_students(batch_id, user_ids=None):
+    """Active, non-archived students of a batch (optionally limited to some IDs)"""
+    query = User.query.join(
+        User.batches
+    ).filter(
+        User.role == UserRole.STUDENT,
+        User.is_active == True,
+        User.is_archived == False,
+        Batch.id == batch_id
+    )
+    if user_ids is not None:
+        query = query.filter(User.id.in_(list(user_ids)))
+    return query.all()
+
+
+def load_marks_map(exam_id, student_ids):
+    """Map (user_id, individual_exam_id) -> MonthlyMark for one monthly exam"""
+    if not student_ids:
+        return {}
+    marks = MonthlyMark.query.filter(
+        MonthlyMark.monthly_exam_id == exam_id,
+        MonthlyMark.user_id.in_(student_ids)
+    ).all()
+    return {(mark.user_id, mark.individual_exam_id): mark for mark in marks}
+
+
+def load_present_counts(batch_id, student_ids, year, month):
+    """Map user_id -> number of PRESENT attendance records in a month"""
+    return {user_id: counts.present for user_id, counts in month_counts(batch_id, year, month, student_ids).items()}
+
+
+def build_student_ranking(student, individual_exams, marks_map, attendance_marks,
+                          total_days, existing_ranking=None, prev_ranking=None):
+    """Build the ranking entry for one student from preloaded data (no queries)"""
+    individual_marks = {}
+    total_exam_marks = 0
+    total_possible_marks = 0
+    passed_exams = 0
+
+    for exam in individual_exams:
+        mark = marks_map.get((student.id, exam.id))
+
+        if mark:
+            mark_percentage = (mark.marks_obtained / mark.total_marks * 100) if mark.total_marks > 0 else 0
+            individual_marks[exam.id] = {
+                'exam_title': exam.title,
+                'subject': exam.subject,
+                'marks_obtained': mark.marks_obtained,
+                'total_marks': mark.total_marks,
+                'percentage': round(mark_percentage, 2),
+                'is_absent': mark.is_absent,
+                'grade': calculate_grade_and_gpa(mark_percentage)[0]
+            }
+            if not mark.is_absent:
+                total_exam_marks += mark.marks_obtained
+                if mark.marks_obtained >= (mark.total_marks * 0.4):  # 40% pass mark
+                    passed_exams += 1
+            total_possible_marks += mark.total_marks
+        else:
+            individual_marks[exam.id] = {
+                'exam_title': exam.title,
+                'subject': exam.subject,
+                'marks_obtained': 0,
+                'total_marks': exam.marks,
+                'percentage': 0,
+                'is_absent': True,
+                'grade': 'F'
+            }
+            total_possible_marks += exam.marks
+
+    max_attendance_marks = total_days
+    attendance_percentage = (attendance_marks / total_days * 100) if total_days > 0 else 0
+
+    # Final totals (NO BONUS - just exam marks + attendance marks)
+    final_total = total_exam_marks + attendance_marks
+    total_possible = total_possible_marks + max_attendance_marks
+
+    percentage = (final_total / total_possible * 100) if total_possible > 0 else 0
+    grade, gpa = calculate_grade_and_gpa(percentage)
+    exam_gpa = calculate_grade_and_gpa((total_exam_marks / total_possible_marks * 100) if total_possible_marks > 0 else 0)[1]
+
+    # Previous position: stored value, overridden by previous month's final ranking
+    previous_position = None
+    previous_roll_number = None
+    if existing_ranking and existing_ranking.previous_position:
+        previous_position = existing_ranking.previous_position
+    if prev_ranking:
+        previous_position = prev_ranking.position
+        previous_roll_number = prev_ranking.roll_number
+
+    # Roll number: use existing, or inherit from previous month, or None
+    current_roll_number = None
+    if existing_ranking and existing_ranking.roll_number:
+        current_roll_number = existing_ranking.roll_number
+    elif previous_roll_number:
+        current_roll_number = previous_roll_number
+
+    return {
+        'user_id': student.id,
+        'student_name': student.full_name,
+        'student_phone': student.phoneNumber,
+        'roll_number': current_roll_number,
+        'individual_marks': individual_marks,
+        'total_exam_marks': total_exam_marks,
+        'total_possible_marks': total_possible_marks,
+        'attendance_marks': attendance_marks,
+        'max_attendance_marks': max_attendance_marks,
+        'total_attendance_days': total_days,
+        'attendance_percentage': round(attendance_percentage, 2),
+        'final_total': final_total,
+        'total_possible': total_possible,
+        'percentage': round(percentage, 2),
+        'grade': grade,
+        'gpa': round(gpa, 2),
+        'exam_gpa': round(exam_gpa, 2),
+        'passed_exams': passed_exams,
+        'total_exams': len(individual_exams),
+        'previous_position': previous_position
+    }
+
+
+def assign_positions(rankings):
+    """Sort rankings and assign positions and position trends in place"""
+    # Sort by final percentage (descending), then by total marks, then by name
+    rankings.sort(key=lambda x: (-x['percentage'], -x['final_total'], x['student_name'], x['user_id']))
+
+    for idx, rank in enumerate(rankings):
+        current_position = idx + 1
+        rank['current_position'] = current_position
+        rank['position'] = current_position  # For compatibility
+
+        if rank['previous_position']:
+            rank['position_change'] = rank['previous_position'] - current_position
+            if rank['position_change'] > 0:
+                rank['position_trend'] = 'up'
+            elif rank['position_change'] < 0:
+                rank['position_trend'] = 'down'
+            else:
+                rank['position_trend'] = 'same'
+        else:
+            rank['position_change'] = None
+            rank['position_trend'] = 'new'
+
+    return rankings
+
+
+def compute_comprehensive_ranking(monthly_exam):
+    """
+    Compute the comprehensive ranking for a monthly exam.
+
+    Runs a constant number of queries regardless of batch size:
+    individual exams, batch students, marks, attendance counts, existing
+    rankings, the previous month's exam and its final rankings.
+    """
+    exam_id = monthly_exam.id
+
+    individual_exams = IndividualExam.query.filter_by(
+        monthly_exam_id=exam_id
+    ).order_by(IndividualExam.order_index).all()
+
+    students = load_batch_students(monthly_exam.batch_id)
+    student_ids = [s.id for s in students]
+
+    marks_map = load_marks_map(exam_id, student_ids)
+
+    # Attendance marks: 1 mark per present day in the SAME MONTH as the exam, out of the batch's working days
+    total_days = 0
+    present_counts = {}
+    if monthly_exam.start_date and monthly_exam.end_date:
+        total_days = working_days(monthly_exam.batch_id, monthly_exam.year, monthly_exam.month)
+        present_counts = load_present_counts(monthly_exam.batch_id, student_ids, monthly_exam.year, monthly_exam.month)
+
+    existing_rankings = {
+        r.user_id: r for r in MonthlyRanking.query.filter_by(monthly_exam_id=exam_id).all()
+    }
+
+    prev_exam = get_previous_month_exam(monthly_exam)
+    prev_rankings = {}
+    if prev_exam:
+        prev_rankings = {
+            r.user_id: r for r in MonthlyRanking.query.filter_by(
+                monthly_exam_id=prev_exam.id,
+                is_final=True
+            ).all()
+        }
+
+    rankings = [
+        build_student_ranking(
+            student,
+            individual_exams,
+            marks_map,
+            present_counts.get(student.id, 0),
+            total_days,
+            existing_ranking=existing_rankings.get(student.id),
+            prev_ranking=prev_rankings.get(student.id)
+        )
+        for student in students
+    ]
+    assign_positions(rankings)
+
+    return RankingSnapshot(
+        monthly_exam=monthly_exam,
+        individual_exams=individual_exams,
+        students=students,
+        rankings=rankings,
+        previous_exam=prev_exam,
+        previous_roll_numbers={
+            user_id: r.roll_number for user_id, r in prev_rankings.items() if r.roll_number
+        }
+    )
+
+
+def ranking_sort_key(percentage, final_total, student_name, user_id):
+    """Ordering used for positions: percentage, then total, then name (user_id breaks ties)"""
+    return (-percentage, -final_total, student_name, user_id)
+
+
+def _row_sort_key(row):
+    return ranking_sort_key(row.percentage or 0, row.final_total or 0, row.user.full_name, row.user_id)
+
+
+def _write_positions(rows):
+    """Number rows 1..n in the given order, touching only rows whose position changed"""
+    moved = 0
+    for position, row in enumerate(rows, start=1):
+        if row.position != position:
+            row.position = position
+            moved += 1
+    return moved
+
+
+def reorder_saved_rankings(batch_ids):
+    """
+    Re-sort the saved final rankings of some batches by the ranking key.
+
+    A renamed student can change places with students on the same marks;
+    this keeps the stored positions in key order for
+    update_rankings_incrementally(). Runs inside the caller's transaction;
+    returns the number of rows moved.
+    """
+    batch_ids = {batch_id for batch_id in batch_ids if batch_id is not None}
+    if not batch_ids:
+        return 0
+
+    rows = MonthlyRanking.query.options(
+        joinedload(MonthlyRanking.user)
+    ).join(
+        MonthlyExam, MonthlyRanking.monthly_exam_id == MonthlyExam.id
+    ).filter(
+        MonthlyExam.batch_id.in_(batch_ids),
+        MonthlyRanking.is_final == True
+    ).all()
+
+    rows_by_exam = {}
+    for row in rows:
+        rows_by_exam.setdefault(row.monthly_exam_id, []).append(row)
+    return sum(_write_positions(sorted(exam_rows, key=_row_sort_key)) for exam_rows in rows_by_exam.values())
+
+
+def update_rankings_incrementally(monthly_exam, user_ids):
+    """
+    Refresh saved final rankings after marks change for some students.
+
+    Only the given students' totals, percentages, grades and GPAs are
+    recomputed. Their entries are then moved within the key list, built from
+    the rows in saved position order, with bisect, and only rows whose
+    position actually changed are written. Does
+    nothing until rankings have been generated for the exam. Rows are changed
+    in place before positions are reassigned, so callers run it in a
+    savepoint (db.session.begin_nested()); returns a small stats dict.
+    """
+    stats = {'recomputed': 0, 'created': 0, 'moved': 0}
+    user_ids = set(user_ids)
+    if not user_ids:
+        return stats
+
+    rows = MonthlyRanking.query.options(
+        joinedload(MonthlyRanking.user)
+    ).filter_by(
+        monthly_exam_id=monthly_exam.id,
+        is_final=True
+    ).order_by(MonthlyRanking.position).all()
+    if not rows:
+        return stats
+
+    rows_by_user = {row.user_id: row for row in rows}
+    keys = [_row_sort_key(row) for row in rows]
+
+    # Students with marks but no saved ranking row yet (e.g. joined after generation)
+    missing_ids = user_ids - set(rows_by_user)
+    if missing_ids:
+        previous_roll_numbers = {}
+        prev_exam = get_previous_month_exam(monthly_exam)
+        if prev_exam:
+            previous_roll_numbers = {
+                r.user_id: r.roll_number for r in MonthlyRanking.query.filter(
+                    MonthlyRanking.monthly_exam_id == prev_exam.id,
+                    MonthlyRanking.is_final == True,
+                    MonthlyRanking.user_id.in_(list(missing_ids))
+                ).all()
+            }
+        next_roll = max([row.roll_number or 0 for row in rows] + [0]) + 1
+        for student in load_batch_students(monthly_exam.batch_id, missing_ids):
+            roll_number = previous_roll_numbers.get(student.id)
+            if not roll_number:
+                roll_number = next_roll
+                next_roll += 1
+            row = MonthlyRanking(
+                monthly_exam_id=monthly_exam.id,
+                user_id=student.id,
+                user=student,
+                position=len(rows_by_user) + 1,
+                roll_number=roll_number,
+                is_final=True
+            )
+            db.session.add(row)
+            rows_by_user[student.id] = row
+            insort(keys, ranking_sort_key(0, 0, student.full_name, student.id))
+            stats['created'] += 1
+
+    changed_rows = [rows_by_user[user_id] for user_id in user_ids if user_id in rows_by_user]
+    if not changed_rows:
+        return stats
+    changed_ids = [row.user_id for row in changed_rows]
+
+    individual_exams = IndividualExam.query.filter_by(
+        monthly_exam_id=monthly_exam.id
+    ).order_by(IndividualExam.order_index).all()
+    marks_map = load_marks_map(monthly_exam.id, changed_ids)
+
+    total_days = 0
+    present_counts = {}
+    if monthly_exam.start_date and monthly_exam.end_date:
+        total_days = working_days(monthly_exam.batch_id, monthly_exam.year, monthly_exam.month)
+        present_counts = load_present_counts(monthly_exam.batch_id, changed_ids, monthly_exam.year, monthly_exam.month)
+
+    for row in changed_rows:
+        old_key = _row_sort_key(row)
+        entry = build_student_ranking(
+            row.user,
+            individual_exams,
+            marks_map,
+            present_counts.get(row.user_id, 0),
+            total_days,
+            existing_ranking=row
+        )
+
+        row.total_exam_marks = entry['total_exam_marks']
+        row.total_possible_marks = entry['total_possible_marks']
+        row.attendance_marks = entry['attendance_marks']
+        row.final_total = entry['final_total']
+        row.max_possible_total = entry['total_possible']
+        row.percentage = entry['percentage']
+        row.grade = entry['grade']
+        row.gpa = entry['gpa']
+        row.exam_gpa = entry['exam_gpa']
+        stats['recomputed'] += 1
+
+        # Move the student's key within the ordered list instead of re-sorting
+        del keys[bisect_left(keys, old_key)]
+        insort(keys, _row_sort_key(row))
+
+    stats['moved'] = _write_positions([rows_by_user[key[-1]] for key in keys])
+    return stats
@@ -0,0 +1,222 @@
+"""
+On-Demand Request Profiler
+Lets a super user profile any request against live data.
+
+Send `X-Profile: 1` (or add `?_profile=1`) while logged in as SUPER_USER
+and the request runs under cProfile. The profile is stored in
+PROFILER_DIR (default instance/profiles) as two files:
+    <id>.prof  raw pstats dump (snakeviz, `python -m pstats`)
+    <id>.json  request details, call tree and the SQL timeline
+The id is returned in the X-Profile-Id response header; routes/profiles.py
+lists and serves stored profiles. Other users' flags are ignored.
+
+The SQL timeline comes from the request's SQL instrumentation records
+(services/sql_instrumentation.py), so it is empty when
+SQL_INSTRUMENTATION_ENABLED is off.
+"""
+import cProfile
+import json
+import logging
+import os
+import pstats
+import re
+import time
+import uuid
+from datetime import datetime
+
+from flask import g, request, session
+
+from services.sql_instrumentation import current_sql_stats
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ID_PATTERN = re.compile(r'^[\w.-]+$')
+MAX_STATEMENT_LENGTH = 2000
+CALL_TREE_DEPTH = 30
+CALL_TREE_MIN_SHARE = 0.01  # Hide subtrees under 1% of the request time
+
+
+def profiles_dir(app):
+    return app.config.get('PROFILER_DIR') or os.path.join(app.instance_path, 'profiles')
+
+
+def profiling_requested():
+    """Whether the current request asks to be profiled by a super user"""
+    flag = request.headers.get('X-Profile') or request.args.get('_profile')
+    if flag not in ('1', 'true', 'yes'):
+        return False
+    return session.get('user_role') == 'super_user'
+
+
+def _function_label(func):
+    filename, line, name = func
+    if filename == '~':
+        return name  # built-in
+    return f'{name} ({os.path.relpath(filename) if os.path.isabs(filename) else filename}:{line})'
+
+
+def build_call_tree(stats, total_time):
+    """Nested call tree by cumulative time from a pstats.Stats object"""
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        for caller in callers:
+            callees.setdefault(caller, []).append(func)
+
+    roots = [func for func, (_, _, _, _, callers) in stats.stats.items() if not callers]
+    min_time = total_time * CALL_TREE_MIN_SHARE
+
+    def node(func, path, depth):
+        primitive_calls, calls, own_time, cumulative_time, _ = stats.stats[func]
+        entry = {
+            'function': _function_label(func),
+            'calls': calls,
+            'own_ms': round(own_time * 1000, 3),
+            'cumulative_ms': round(cumulative_time * 1000, 3),
+            'children': []
+        }
+        if depth >= CALL_TREE_DEPTH:
+            return entry
+        children = [child for child in callees.get(func, []) if child not in path]
+        children.sort(key=lambda child: stats.stats[child][3], reverse=True)
+        for child in children:
+            if stats.stats[child][3] < min_time:
+                break
+            entry['children'].append(node(child, path | {child}, depth + 1))
+        return entry
+
+    roots.sort(key=lambda func: stats.stats[func][3], reverse=True)
+    return [node(func, {func}, 0) for func in roots if stats.stats[func][3] >= min_time]
+
+
+def top_functions(stats, limit=30):
+    """Functions with the most own time"""
+    ranked = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+    return [{
+        'function': _function_label(func),
+        'calls': calls,
+        'own_ms': round(own_time * 1000, 3),
+        'cumulative_ms': round(cumulative_time * 1000, 3)
+    } for func, (_, calls, own_time, cumulative_time, _) in ranked]
+
+
+def list_profiles(app):
+    """Stored profile summaries, newest first"""
+    directory = profiles_dir(app)
+    if not os.path.isdir(directory):
+        return []
+    summaries = []
+    for name in os.listdir(directory):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, name), encoding='utf-8') as f:
+                profile = json.load(f)
+        except (OSError, ValueError):
+            continue
+        summaries.append({key: profile.get(key) for key in (
+            'id', 'created_at', 'method', 'path', 'endpoint', 'status', 'user_id',
+            'duration_ms', 'sql_count', 'sql_ms'
+        )})
+    summaries.sort(key=lambda summary: summary['created_at'] or '', reverse=True)
+    return summaries
+
+
+def profile_path(app, profile_id, extension):
+    """Path of a stored profile file, or None for ids that are not ours"""
+    if not PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    path = os.path.join(profiles_dir(app), f'{profile_id}.{extension}')
+    return path if os.path.isfile(path) else None
+
+
+def _prune(directory, keep):
+    profiles = sorted(name[:-len('.json')] for name in os.listdir(directory) if name.endswith('.json'))
+    for profile_id in profiles[:max(0, len(profiles) - keep)]:
+        for extension in ('json', 'prof'):
+            try:
+                os.remove(os.path.join(directory, f'{profile_id}.{extension}'))
+            except FileNotFoundError:
+                pass
+
+
+def sql_timeline(sql_stats):
+    """Profile entries for the statements a request kept, in execution order"""
+    if sql_stats is None or sql_stats.statements is None:
+        return []
+    return [{
+        'offset_ms': round(offset * 1000, 3),
+        'duration_ms': round(elapsed * 1000, 3),
+        'statement': statement[:MAX_STATEMENT_LENGTH]
+    } for offset, elapsed, statement in sql_stats.statements]
+
+
+def _save_profile(app, state, response):
+    duration = time.perf_counter() - state['started']
+    stats = pstats.Stats(state['profiler'])
+    sql = sql_timeline(current_sql_stats())
+
+    directory = profiles_dir(app)
+    os.makedirs(directory, exist_ok=True)
+    created_at = datetime.utcnow()
+    endpoint = request.endpoint or 'unmatched'
+    # Timestamp first so ids sort chronologically
+    profile_id = f"{created_at.strftime('%Y%m%dT%H%M%S')}_{endpoint.replace('.', '-')}_{uuid.uuid4().hex[:8]}"
+
+    stats.dump_stats(os.path.join(directory, f'{profile_id}.prof'))
+    profile = {
+        'id': profile_id,
+        'created_at': created_at.isoformat() + 'Z',
+        'method': request.method,
+        'path': request.full_path.rstrip('?'),
+        'endpoint': endpoint,
+        'status': response.status_code,
+        'user_id': session.get('user_id'),
+        'duration_ms': round(duration * 1000, 2),
+        'sql_count': len(sql),
+        'sql_ms': round(sum(entry['duration_ms'] for entry in sql), 2),
+        'sql': sql,
+        'top_functions': top_functions(stats),
+        'call_tree': build_call_tree(stats, duration)
+    }
+    with open(os.path.join(directory, f'{profile_id}.json'), 'w', encoding='utf-8') as f:
+        json.dump(profile, f, indent=1, default=str)
+
+    _prune(directory, app.config.get('PROFILER_MAX_STORED', 50))
+    logger.info(f"Stored profile {profile_id} for {request.method} {request.path} ({duration * 1000:.0f}ms)")
+    return profile_id
+
+
+def init_request_profiler(app, db):
+    """Attach the per-request profiling hooks (after init_sql_instrumentation)"""
+    if not app.config.get('PROFILER_ENABLED', True):
+        return
+
+    @app.before_request
+    def start_profiler():
+        if not profiling_requested():
+            return
+        sql_stats = current_sql_stats()
+        if sql_stats is not None:
+            sql_stats.keep_statements()
+        profiler = cProfile.Profile()
+        g.profile = {'profiler': profiler, 'started': time.perf_counter()}
+        profiler.enable()
+
+    @app.after_request
+    def save_profile(response):
+        state = g.pop('profile', None)
+        if state is None:
+            return response
+        state['profiler'].disable()
+        try:
+            response.headers['X-Profile-Id'] = _save_profile(app, state, response)
+        except Exception as e:
+            logger.error(f"Failed to store request profile: {e}")
+        return response
+
+    @app.teardown_request
+    def stop_profiler(exc):
+        # Requests that never reached after_request must not leave the profiler on
+        state = g.pop('profile', None)
+        if state is not None:
+            state['profiler'].disable()
@@ -0,0 +1,218 @@
+"""
+SMS Balance Ledger
+Atomic system-wide SMS balance with an append-only history.
+
+The balance lives in a single sms_accounts row that is only ever changed by
+one UPDATE ... RETURNING statement, so concurrent gunicorn workers and SMS
+dispatchers cannot lose updates. Every change appends an sms_ledger entry
+recording the new totals. A send reserves its whole cost when it is queued;
+the dispatcher settles what was actually used and releases the rest.
+
+The legacy Settings['sms_balance'] value is read once, as the opening
+balance. After that the balance only changes through the ledger: super
+admins top up with POST /api/sms/balance/add (credit), and
+init_sms_balance.py / reset_sms_balance.py set it with an adjust entry.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, update
+from sqlalchemy.dialects import sqlite
+
+from models import (db, Settings, SmsAccount, SmsLedgerEntry, SmsLog, SmsOutbox, SmsOutboxStatus,
+                    SmsStatus)
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_ACCOUNT_ID = 1
+
+
+class InsufficientSmsBalance(Exception):
+    """Raised when a reservation exceeds the available SMS balance"""
+
+    def __init__(self, required, available):
+        self.required = required
+        self.available = available
+        super().__init__(f'Insufficient SMS balance: {required} needed, {available} available')
+
+
+def _ensure_account():
+    """Create the system account on first use, opening it with the legacy Settings balance"""
+    if db.session.get(SmsAccount, SYSTEM_ACCOUNT_ID) is not None:
+        return
+
+    legacy = Settings.query.filter_by(key='sms_balance').first()
+    opening = int(legacy.value.get('balance', 0)) if legacy and legacy.value else 0
+
+    now = datetime.utcnow()
+    stmt = sqlite.insert(SmsAccount).values(
+        id=SYSTEM_ACCOUNT_ID, balance=opening, reserved=0, updated_at=now
+    ).on_conflict_do_nothing(index_elements=['id'])
+    if db.session.execute(stmt).rowcount:
+        db.session.add(SmsLedgerEntry(
+            account_id=SYSTEM_ACCOUNT_ID,
+            entry_type='opening',
+            amount=opening,
+            reserved_change=0,
+            balance_after=opening,
+            reserved_after=0,
+            note='Opening balance migrated from settings',
+            created_at=now
+        ))
+
+
+def _apply(entry_type, amount=0, reserved_change=0, job_id=None, note=None, created_by=None,
+           require_available=None):
+    """
+    Change the account in one UPDATE ... RETURNING and append the ledger entry.
+
+    With require_available the update only matches while the available
+    balance covers it; returns None when it did not match.
+    """
+    _ensure_account()
+
+    stmt = update(SmsAccount).where(SmsAccount.id == SYSTEM_ACCOUNT_ID)
+    if require_available is not None:
+        stmt = stmt.where(SmsAccount.balance - SmsAccount.reserved >= require_available)
+    stmt = stmt.values(
+        balance=SmsAccount.balance + amount,
+        reserved=SmsAccount.reserved + reserved_change,
+        updated_at=datetime.utcnow()
+    ).returning(SmsAccount.balance, SmsAccount.reserved)
+
+    row = db.session.execute(stmt, execution_options={'synchronize_session': False}).first()
+    if row is None:
+        return None
+
+    db.session.add(SmsLedgerEntry(
+        account_id=SYSTEM_ACCOUNT_ID,
+        entry_type=entry_type,
+        amount=amount,
+        reserved_change=reserved_change,
+        balance_after=row.balance,
+        reserved_after=row.reserved,
+        job_id=job_id,
+        note=note,
+        created_by=created_by
+    ))
+    return row
+
+
+def get_balance():
+    """Return the settled, reserved and available SMS balance"""
+    _ensure_account()
+    account = db.session.query(SmsAccount.balance, SmsAccount.reserved).filter(
+        SmsAccount.id == SYSTEM_ACCOUNT_ID
+    ).one()
+    return {
+        'balance': account.balance,
+        'reserved': account.reserved,
+        'available': account.balance - account.reserved
+    }
+
+
+def reserve(amount, job_id, created_by=None):
+    """Hold `amount` SMS for a queued job or raise InsufficientSmsBalance"""
+    if amount <= 0:
+        return None
+    row = _apply('reserve', reserved_change=amount, job_id=job_id, created_by=created_by,
+                 require_available=amount)
+    if row is None:
+        raise InsufficientSmsBalance(amount, get_balance()['available'])
+    return row
+
+
+def settle(job_id, reserved_amount, used_amount):
+    """Charge what a job actually used and release `reserved_amount` from the hold"""
+    if not reserved_amount and not used_amount:
+        return None
+    return _apply('settle', amount=-used_amount, reserved_change=-reserved_amount, job_id=job_id)
+
+
+def credit(amount, created_by=None, note=None):
+    """Add SMS to the balance (super admin top-up)"""
+    return _apply('credit', amount=amount, created_by=created_by, note=note)
+
+
+def adjust(balance, created_by=None, note=None):
+    """Set the settled balance to `balance` (maintenance scripts); returns the new totals"""
+    current = get_balance()['balance']
+    return _apply('adjust', amount=balance - current, created_by=created_by, note=note)
+
+
+def reconciliation_report(start=None, end=None):
+    """
+    Compare SMS usage settled in the ledger with SmsLog.cost of sent messages.
+
+    Also checks that the account equals the sum of its ledger entries and that
+    the reserved amount matches the cost held by unfinished outbox rows.
+    Dates are inclusive; by default the report starts at the opening entry.
+    """
+    _ensure_account()
+    if start is None:
+        start = db.session.query(func.min(SmsLedgerEntry.created_at)).scalar().date()
+    end = end or datetime.utcnow().date()
+    window_start = datetime.combine(start, datetime.min.time())
+    window_end = datetime.combine(end, datetime.min.time()) + timedelta(days=1)
+
+    ledger_days = db.session.query(
+        func.date(SmsLedgerEntry.created_at).label('day'),
+        func.sum(-SmsLedgerEntry.amount).label('used')
+    ).filter(
+        SmsLedgerEntry.entry_type == 'settle',
+        SmsLedgerEntry.created_at >= window_start,
+        SmsLedgerEntry.created_at < window_end
+    ).group_by(func.date(SmsLedgerEntry.created_at)).all()
+
+    log_days = db.session.query(
+        func.date(SmsLog.sent_at).label('day'),
+        func.sum(SmsLog.cost).label('cost'),
+        func.count(SmsLog.id).label('messages')
+    ).filter(
+        SmsLog.status == SmsStatus.SENT,
+        SmsLog.sent_at >= window_start,
+        SmsLog.sent_at < window_end
+    ).group_by(func.date(SmsLog.sent_at)).all()
+
+    days = defaultdict(lambda: {'ledger_used': 0, 'sms_log_cost': 0, 'sms_log_messages': 0})
+    for row in ledger_days:
+        days[str(row.day)]['ledger_used'] = int(row.used or 0)
+    for row in log_days:
+        days[str(row.day)]['sms_log_cost'] = int(row.cost or 0)
+        days[str(row.day)]['sms_log_messages'] = row.messages
+
+    daily = []
+    for day in sorted(days):
+        entry = days[day]
+        entry['day'] = day
+        entry['difference'] = entry['ledger_used'] - entry['sms_log_cost']
+        daily.append(entry)
+
+    totals = db.session.query(
+        func.coalesce(func.sum(SmsLedgerEntry.amount), 0),
+        func.coalesce(func.sum(SmsLedgerEntry.reserved_change), 0)
+    ).filter(SmsLedgerEntry.account_id == SYSTEM_ACCOUNT_ID).one()
+    held_by_outbox = db.session.query(func.coalesce(func.sum(SmsOutbox.reserved_cost), 0)).filter(
+        SmsOutbox.status.in_([SmsOutboxStatus.PENDING, SmsOutboxStatus.SENDING])
+    ).scalar()
+
+    account = get_balance()
+    ledger_used = sum(entry['ledger_used'] for entry in daily)
+    sms_log_cost = sum(entry['sms_log_cost'] for entry in daily)
+
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'ledger_used': ledger_used,
+        'sms_log_cost': sms_log_cost,
+        'difference': ledger_used - sms_log_cost,
+        'account': account,
+        'ledger_balance': int(totals[0]),
+        'ledger_reserved': int(totals[1]),
+        'outbox_reserved': int(held_by_outbox),
+        'balanced': (account['balance'] == totals[0] and account['reserved'] == totals[1]
+                     and account['reserved'] == held_by_outbox and ledger_used == sms_log_cost),
+        'days': daily,
+        'mismatched_days': [entry['day'] for entry in daily if entry['difference']]
+    }
@@ -0,0 +1,393 @@
+"""
+SMS Outbox
+Durable queue between the web workers and the SMS provider.
+
+Routes call enqueue_sms() instead of calling BulkSMSBD inside the request: the
+rows and their balance reservation commit with the caller's transaction and
+the request returns a job ID right away. The dispatcher process (sms_dispatcher.py) claims due rows, sends
+them concurrently and retries transient failures with exponential backoff.
+Every message gets its SmsLog row once it reaches a final state.
+"""
+import logging
+import os
+import socket
+import threading
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, case, func, insert, or_, select, update
+
+from models import db, SmsLog, SmsOutbox, SmsOutboxStatus, SmsStatus, User
+from services.sms_ledger import reserve, settle
+from services.sms_provider import format_provider_number, get_sms_client
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_sms(messages, sent_by=None, source=None, charge_sender=False):
+    """
+    Queue SMS messages for the dispatcher and return the job ID.
+
+    `messages` is a list of dicts with `phone`, `message` and an optional
+    `user_id`. Runs inside the caller's transaction, so nothing is sent until
+    the caller commits. The whole cost is reserved in the SMS ledger up front
+    and raises InsufficientSmsBalance when it is not available. With
+    charge_sender the sender's sms_count is reduced for every message that is
+    actually sent.
+    """
+    from routes.sms import calculate_sms_cost
+
+    job_id = uuid.uuid4().hex
+    now = datetime.utcnow()
+    rows = [{
+        'job_id': job_id,
+        'source': source,
+        'user_id': item.get('user_id'),
+        'phone_number': item['phone'],
+        'message': item['message'],
+        'status': SmsOutboxStatus.PENDING,
+        'attempts': 0,
+        'next_attempt_at': now,
+        'charge_sender': charge_sender,
+        'reserved_cost': calculate_sms_cost(item['message']),
+        'sent_by': sent_by,
+        'created_at': now
+    } for item in messages]
+
+    if rows:
+        reserve(sum(row['reserved_cost'] for row in rows), job_id, created_by=sent_by)
+        db.session.execute(insert(SmsOutbox), rows)
+        logger.info(f"Queued {len(rows)} SMS as job {job_id} ({source})")
+    return job_id
+
+
+def get_job_status(job_id):
+    """Return progress counters of an SMS job, or None if the job does not exist"""
+    counts = dict(
+        db.session.query(SmsOutbox.status, func.count(SmsOutbox.id))
+        .filter(SmsOutbox.job_id == job_id)
+        .group_by(SmsOutbox.status)
+        .all()
+    )
+    if not counts:
+        return None
+
+    info = db.session.query(
+        func.min(SmsOutbox.source).label('source'),
+        func.min(SmsOutbox.sent_by).label('sent_by'),
+        func.min(SmsOutbox.created_at).label('created_at'),
+        func.max(SmsOutbox.completed_at).label('completed_at')
+    ).filter(SmsOutbox.job_id == job_id).one()
+
+    failures = SmsOutbox.query.filter(
+        SmsOutbox.job_id == job_id,
+        SmsOutbox.status == SmsOutboxStatus.FAILED
+    ).order_by(SmsOutbox.id).limit(10).all()
+
+    pending = counts.get(SmsOutboxStatus.PENDING, 0)
+    sending = counts.get(SmsOutboxStatus.SENDING, 0)
+    completed = pending == 0 and sending == 0
+
+    return {
+        'job_id': job_id,
+        'source': info.source,
+        'sent_by': info.sent_by,
+        'total': sum(counts.values()),
+        'pending': pending,
+        'sending': sending,
+        'sent': counts.get(SmsOutboxStatus.SENT, 0),
+        'failed': counts.get(SmsOutboxStatus.FAILED, 0),
+        'completed': completed,
+        'created_at': info.created_at.isoformat() if info.created_at else None,
+        'completed_at': info.completed_at.isoformat() if completed and info.completed_at else None,
+        'errors': [{'phone_number': row.phone_number, 'error': row.last_error} for row in failures]
+    }
+
+
+def default_worker_id():
+    """Identify a dispatcher process in locked_by"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_due_messages(worker_id, limit, lease_seconds):
+    """
+    Atomically claim up to `limit` due messages for this worker.
+
+    A single UPDATE ... RETURNING flips due rows to SENDING, so concurrent
+    dispatchers never claim the same row. Rows still SENDING after the lease
+    belong to a dispatcher that died mid-batch and are claimed again
+    (delivery is at-least-once).
+    """
+    now = datetime.utcnow()
+    due_ids = select(SmsOutbox.id).where(or_(
+        and_(SmsOutbox.status == SmsOutboxStatus.PENDING, SmsOutbox.next_attempt_at <= now),
+        and_(SmsOutbox.status == SmsOutboxStatus.SENDING,
+             SmsOutbox.locked_at < now - timedelta(seconds=lease_seconds))
+    )).order_by(SmsOutbox.next_attempt_at, SmsOutbox.id).limit(limit)
+
+    stmt = update(SmsOutbox).where(SmsOutbox.id.in_(due_ids)).values(
+        status=SmsOutboxStatus.SENDING,
+        locked_by=worker_id,
+        locked_at=now,
+        attempts=SmsOutbox.attempts + 1
+    ).returning(SmsOutbox.id, SmsOutbox.phone_number, SmsOutbox.message)
+
+    claimed = db.session.execute(stmt, execution_options={'synchronize_session': False}).all()
+    db.session.commit()
+    return claimed
+
+
+def retry_delay(attempts, base_seconds, max_seconds):
+    """Exponential backoff: base, 2x base, 4x base, ... capped at max_seconds"""
+    return min(max_seconds, base_seconds * (2 ** max(0, attempts - 1)))
+
+
+def _send_one(send_func, phone, message):
+    """Provider call run in a dispatcher thread; never raises"""
+    try:
+        return send_func(phone, message)
+    except Exception as e:
+        return {'success': False, 'error': str(e), 'retryable': True}
+
+
+def _record_results(results, config):
+    """Write SmsLog rows, reschedule retries and charge balances for one batch"""
+    from routes.sms import calculate_sms_cost
+
+    now = datetime.utcnow()
+    rows = SmsOutbox.query.filter(SmsOutbox.id.in_(list(results))).all()
+    stats = {'sent': 0, 'failed': 0, 'retried': 0}
+    settlements = defaultdict(lambda: [0, 0])  # job_id -> [reserved to release, used]
+    charged = Counter()
+    logged = []
+
+    for row in rows:
+        result = results[row.id]
+        row.locked_by = None
+        row.locked_at = None
+
+        if result.get('success'):
+            # A duplicate number shared the delivered message of another row
+            cost = 0 if result.get('deduplicated') else calculate_sms_cost(row.message)
+            sms_log = SmsLog(
+                user_id=row.user_id,
+                phone_number=row.phone_number,
+                message=row.message,
+                status=SmsStatus.SENT,
+                api_response=result,
+                sent_by=row.sent_by,
+                cost=cost,
+                sent_at=now
+            )
+            row.status = SmsOutboxStatus.SENT
+            row.last_error = None
+            row.completed_at = now
+            settlements[row.job_id][0] += row.reserved_cost
+            settlements[row.job_id][1] += cost
+            if row.charge_sender and row.sent_by and cost:
+                charged[row.sent_by] += 1
+            stats['sent'] += 1
+        elif result.get('retryable') and row.attempts < config['max_attempts']:
+            row.status = SmsOutboxStatus.PENDING
+            row.last_error = result.get('error')
+            row.next_attempt_at = now + timedelta(
+                seconds=retry_delay(row.attempts, config['retry_base'], config['retry_max'])
+            )
+            stats['retried'] += 1
+            continue
+        else:
+            sms_log = SmsLog(
+                user_id=row.user_id,
+                phone_number=row.phone_number,
+                message=row.message,
+                status=SmsStatus.FAILED,
+                api_response=result,
+                sent_by=row.sent_by,
+                cost=0
+            )
+            row.status = SmsOutboxStatus.FAILED
+            row.last_error = result.get('error')
+            row.completed_at = now
+            settlements[row.job_id][0] += row.reserved_cost
+            stats['failed'] += 1
+
+        db.session.add(sms_log)
+        logged.append((row, sms_log))
+
+    db.session.flush()
+    for row, sms_log in logged:
+        row.sms_log_id = sms_log.id
+
+    for sender_id, count in charged.items():
+        User.query.filter_by(id=sender_id).update({
+            User.sms_count: case((User.sms_count > count, User.sms_count - count), else_=0)
+        }, synchronize_session=False)
+
+    # One ledger settlement per job and cycle instead of a balance write per message
+    for job_id, (reserved_amount, used_amount) in settlements.items():
+        settle(job_id, reserved_amount, used_amount)
+    db.session.commit()
+    return stats
+
+
+def _dispatch_config(batch_size=None, concurrency=None):
+    config = current_app.config
+    return {
+        'batch_size': batch_size or config.get('SMS_OUTBOX_BATCH_SIZE', 200),
+        'concurrency': concurrency or config.get('SMS_OUTBOX_CONCURRENCY', 8),
+        'max_attempts': config.get('SMS_OUTBOX_MAX_ATTEMPTS', 5),
+        'retry_base': config.get('SMS_OUTBOX_RETRY_BASE_SECONDS', 30),
+        'retry_max': config.get('SMS_OUTBOX_RETRY_MAX_SECONDS', 3600),
+        'lease': config.get('SMS_OUTBOX_LEASE_SECONDS', 300),
+        'max_recipients': config.get('SMS_PROVIDER_MAX_RECIPIENTS', 100)
+    }
+
+
+class CallCounter:
+    """Wraps the send functions to count provider round trips of a cycle"""
+
+    def __init__(self, send_func, send_many_func):
+        self._send = send_func
+        self._send_many = send_many_func
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def _tick(self):
+        with self._lock:
+            self.count += 1
+
+    def send(self, phone, message):
+        self._tick()
+        return self._send(phone, message)
+
+    def send_many(self, phones, message):
+        self._tick()
+        return self._send_many(phones, message)
+
+
+def plan_provider_calls(claimed, max_recipients):
+    """
+    Group claimed rows into provider calls.
+
+    Rows with an identical body are packed into multi-number calls of at most
+    `max_recipients` numbers, and a number queued twice with the same body
+    (e.g. a guardian of two siblings getting a batch notice) is sent once.
+    Returns a list of (message, {provider number: [row ids]}) pairs.
+    """
+    by_body = {}
+    for row in claimed:
+        numbers = by_body.setdefault(row.message, {})
+        numbers.setdefault(format_provider_number(row.phone_number), []).append(row.id)
+
+    calls = []
+    for message, numbers in by_body.items():
+        items = list(numbers.items())
+        for start in range(0, len(items), max_recipients):
+            calls.append((message, dict(items[start:start + max_recipients])))
+    return calls
+
+
+def _send_calls(calls, send_func, send_many_func, executor):
+    """Run the planned provider calls on the executor and return results per row id"""
+    futures = []
+    for message, numbers in calls:
+        if len(numbers) > 1 and send_many_func is not None:
+            futures.append((message, numbers, executor.submit(_send_one, send_many_func, list(numbers), message)))
+        else:
+            for number, row_ids in numbers.items():
+                futures.append((message, {number: row_ids}, executor.submit(_send_one, send_func, number, message)))
+
+    results = {}
+    fallback = []
+    for message, numbers, future in futures:
+        result = future.result()
+        if len(numbers) > 1 and not result.get('success') and not result.get('retryable'):
+            # One bad number can reject a whole multi-number call: retry those numbers one by one
+            fallback.extend((message, {number: row_ids}) for number, row_ids in numbers.items())
+            continue
+        _assign_result(results, numbers, result)
+
+    if fallback:
+        single = [(numbers, executor.submit(_send_one, send_func, number, message))
+                  for message, numbers in fallback for number in numbers]
+        for numbers, future in single:
+            _assign_result(results, numbers, future.result())
+    return results
+
+
+def _assign_result(results, numbers, result):
+    for row_ids in numbers.values():
+        results[row_ids[0]] = result
+        for duplicate_id in row_ids[1:]:
+            results[duplicate_id] = dict(result, deduplicated=True)
+
+
+def dispatch_once(send_func=None, worker_id=None, batch_size=None, concurrency=None, executor=None,
+                  send_many_func=None):
+    """
+    Claim one batch of due messages, send them concurrently and record results.
+
+    `send_func(phone, message)` and `send_many_func(phones, message)` return
+    the provider result dict; both default to the shared BulkSMSBD client.
+    Without a send_many_func every number gets its own call. Returns counters
+    for claimed, sent, failed and retried messages plus provider calls made.
+    """
+    if send_func is None:
+        # Resolved here because the sender threads have no app context
+        client = get_sms_client()
+        send_func = client.send
+        send_many_func = send_many_func or client.send_many
+
+    config = _dispatch_config(batch_size, concurrency)
+    claimed = claim_due_messages(worker_id or default_worker_id(), config['batch_size'], config['lease'])
+    if not claimed:
+        return {'claimed': 0, 'sent': 0, 'failed': 0, 'retried': 0, 'provider_calls': 0}
+
+    calls = plan_provider_calls(claimed, config['max_recipients'])
+    provider_calls = CallCounter(send_func, send_many_func)
+
+    # Only the provider calls run in threads; all database work stays on this thread
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=config['concurrency'])
+    try:
+        results = _send_calls(calls, provider_calls.send, provider_calls.send_many if send_many_func else None, executor)
+    finally:
+        if own_executor:
+            executor.shutdown(wait=True)
+
+    stats = _record_results(results, config)
+    stats['claimed'] = len(claimed)
+    stats['provider_calls'] = provider_calls.count
+    logger.info(f"SMS dispatch: {stats}")
+    return stats
+
+
+def run_dispatcher(stop_event, send_func=None, batch_size=None, concurrency=None, poll_seconds=None,
+                   send_many_func=None):
+    """Drain the outbox until stop_event is set, sleeping when nothing is due"""
+    worker_id = default_worker_id()
+    config = _dispatch_config(batch_size, concurrency)
+    poll_seconds = poll_seconds or current_app.config.get('SMS_DISPATCHER_POLL_SECONDS', 2)
+    logger.info(f"SMS dispatcher {worker_id} started (batch={config['batch_size']}, concurrency={config['concurrency']})")
+
+    with ThreadPoolExecutor(max_workers=config['concurrency']) as executor:
+        while not stop_event.is_set():
+            try:
+                stats = dispatch_once(send_func, worker_id, config['batch_size'], config['concurrency'], executor,
+                                      send_many_func)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"SMS dispatch cycle failed: {e}")
+                stats = {'claimed': 0}
+            finally:
+                db.session.remove()
+
+            # A full batch means more is probably due: go again without sleeping
+            if stats['claimed'] < config['batch_size']:
+                stop_event.wait(poll_seconds)
+
+    logger.info(f"SMS dispatcher {worker_id} stopped")
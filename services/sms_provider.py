@@ -0,0 +1,187 @@
+"""
+BulkSMSBD Provider Client
+Pooled keep-alive HTTP client for the SMS gateway.
+
+One client per process holds a requests.Session, so messages reuse TCP
+connections instead of paying a new connect and DNS lookup each. The API key
+travels in the POST body and is never logged; phone numbers are masked in
+log lines. Point SMS_PROVIDER_URL at a local stub server, or pass a requests
+transport adapter, to run tests and throughput benchmarks without the real
+gateway.
+"""
+import logging
+import threading
+import time
+
+import requests
+from flask import current_app
+from requests.adapters import HTTPAdapter
+
+from services import metrics
+
+logger = logging.getLogger('sms.provider')
+
+DEFAULT_API_URL = 'http://bulksmsbd.net/api/smsapi'
+
+# BulkSMSBD success codes
+SUCCESS_CODES = (200, 202)
+
+_client_lock = threading.Lock()
+
+
+def format_provider_number(phone):
+    """Normalize a phone number to the 8801XXXXXXXXX format the gateway expects"""
+    formatted_phone = phone.strip().replace(' ', '').replace('-', '').replace('+', '')
+    if not formatted_phone.startswith('88'):
+        formatted_phone = '88' + formatted_phone
+    return formatted_phone
+
+
+def mask_number(phone):
+    """Hide the middle digits of a phone number for logs"""
+    if not phone or len(phone) < 7:
+        return '***'
+    return f"{phone[:5]}****{phone[-3:]}"
+
+
+def mask_numbers(numbers):
+    """Mask a comma separated number list, summarizing long ones for logs"""
+    parts = numbers.split(',')
+    if len(parts) == 1:
+        return mask_number(parts[0])
+    return f"{mask_number(parts[0])}+{len(parts) - 1}"
+
+
+class BulkSmsBdClient:
+    """Thread-safe BulkSMSBD client backed by a pooled requests.Session"""
+
+    def __init__(self, api_key, sender_id, api_url=DEFAULT_API_URL, pool_size=10,
+                 connect_timeout=5.0, read_timeout=20.0, transport=None):
+        self.api_key = api_key
+        self.sender_id = sender_id
+        self.api_url = api_url
+        self.timeout = (connect_timeout, read_timeout)
+
+        self.session = requests.Session()
+        # Retries are handled by the SMS outbox, never inside the HTTP layer
+        adapter = transport or HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def __repr__(self):
+        return f'<BulkSmsBdClient {self.api_url} sender={self.sender_id}>'
+
+    def send(self, phone, message):
+        """
+        Send one SMS and return the result dict used throughout the SMS code:
+        success, message_id and cost on success; error and retryable on failure.
+        """
+        return self._post(format_provider_number(phone), message)
+
+    def send_many(self, phones, message):
+        """
+        Send the same text to several numbers in one provider request.
+
+        BulkSMSBD accepts a comma separated number list; the single result
+        applies to every recipient of the call.
+        """
+        return self._post(','.join(format_provider_number(phone) for phone in phones), message)
+
+    def _post(self, number, message):
+        payload = {
+            'api_key': self.api_key,
+            'type': 'text',
+            'number': number,
+            'senderid': self.sender_id,
+            'message': message
+        }
+
+        started = time.perf_counter()
+        try:
+            response = self.session.post(self.api_url, data=payload, timeout=self.timeout)
+        except requests.exceptions.ConnectTimeout:
+            return self._failure(number, started, 'SMS API connect timeout', retryable=True)
+        except requests.exceptions.Timeout:
+            return self._failure(number, started, 'SMS API timeout', retryable=True)
+        except requests.exceptions.ConnectionError:
+            return self._failure(number, started, 'SMS API connection error', retryable=True)
+        except requests.exceptions.RequestException as e:
+            return self._failure(number, started, f'SMS API error: {e.__class__.__name__}', retryable=True)
+
+        return self._parse_response(response, number, started)
+
+    def _parse_response(self, response, number, started):
+        if response.status_code != 200:
+            # Gateway/server errors are worth retrying from the outbox
+            return self._failure(number, started, f'HTTP {response.status_code}: {response.text[:200]}',
+                                 retryable=response.status_code >= 500, http_status=response.status_code)
+
+        try:
+            response_data = response.json()
+        except ValueError:
+            return self._failure(number, started, 'Invalid API response format', http_status=200)
+
+        response_code = response_data.get('response_code')
+        if response_code in SUCCESS_CODES:
+            logger.info(
+                f"sms_send result=ok number={mask_numbers(number)} code={response_code} "
+                f"elapsed_ms={self._elapsed_ms(started)}"
+            )
+            self._record_metrics(started, 'ok')
+            return {
+                'success': True,
+                'message_id': response_data.get('success_message', ''),
+                'response_code': response_code,
+                'cost': 1
+            }
+
+        error_message = response_data.get('error_message') or f"API Error Code: {response_code}"
+        return self._failure(number, started, error_message, http_status=200, response_code=response_code)
+
+    def _failure(self, number, started, error, retryable=False, http_status=None, response_code=None):
+        logger.warning(
+            f"sms_send result=error number={mask_numbers(number)} http={http_status} code={response_code} "
+            f"retryable={retryable} elapsed_ms={self._elapsed_ms(started)} error={error!r}"
+        )
+        self._record_metrics(started, 'retryable_error' if retryable else 'error')
+        result = {'success': False, 'error': error, 'retryable': retryable}
+        if response_code is not None:
+            result['response_code'] = response_code
+        return result
+
+    @staticmethod
+    def _record_metrics(started, result):
+        metrics.observe('sms_provider_request_seconds', time.perf_counter() - started)
+        metrics.inc('sms_provider_requests_total', result=result)
+
+    @staticmethod
+    def _elapsed_ms(started):
+        return int((time.perf_counter() - started) * 1000)
+
+    def close(self):
+        self.session.close()
+
+
+def create_sms_client(config, transport=None):
+    """Build a client from Flask config values"""
+    return BulkSmsBdClient(
+        api_key=config.get('SMS_PROVIDER_API_KEY'),
+        sender_id=config.get('SMS_PROVIDER_SENDER_ID'),
+        api_url=config.get('SMS_PROVIDER_URL', DEFAULT_API_URL),
+        pool_size=config.get('SMS_PROVIDER_POOL_SIZE', 10),
+        connect_timeout=config.get('SMS_PROVIDER_CONNECT_TIMEOUT', 5.0),
+        read_timeout=config.get('SMS_PROVIDER_READ_TIMEOUT', 20.0),
+        transport=transport
+    )
+
+
+def get_sms_client():
+    """Return this process's shared client, creating it on first use"""
+    client = current_app.extensions.get('sms_client')
+    if client is None:
+        with _client_lock:
+            client = current_app.extensions.get('sms_client')
+            if client is None:
+                client = create_sms_client(current_app.config)
+                current_app.extensions['sms_client'] = client
+    return client
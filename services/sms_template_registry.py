@@ -0,0 +1,198 @@
+"""
+SMS Template Registry
+Compiled SMS templates cached per process.
+
+Template text is resolved from the teacher's own saved template, then the
+global sms_template_<id> setting, then the built-in default. For one release
+a copy the old routes kept in session['custom_templates'] is still read where
+they read it: first for attendance templates, after the saved text for
+exam_result. Saving or resetting the template drops that copy. All saved
+templates are loaded in one pass and kept in the app's extensions until the
+'sms_templates' cache version changes, so looking a template up is one
+indexed version read and rendering it for hundreds of students touches the
+database not at all. Every write path calls invalidate_templates().
+
+Templates compile once into literal/slot pairs for `{variable}` placeholders
+and carry their worst-case SMS cost. Placeholders without a value are left
+in the text, like the old chained str.replace() rendering did.
+"""
+import logging
+import re
+import threading
+from functools import lru_cache
+
+from flask import current_app, has_request_context, session
+
+from models import db, Settings, SmsTemplate
+from services.cache_versions import bump_version, get_version
+
+logger = logging.getLogger(__name__)
+
+CACHE_NAME = 'sms_templates'
+SETTING_KEY_PREFIX = 'sms_template_'
+# Per-teacher overrides kept in the Flask session before the registry; read until the next release
+LEGACY_SESSION_KEY = 'custom_templates'
+# Templates whose session copy only ever filled in for a missing saved template
+SESSION_OVERRIDE_LAST = frozenset(['exam_result'])
+
+VARIABLE_PATTERN = re.compile(r'\{(\w+)\}')
+
+# Short Bangla defaults, sized for a single SMS
+DEFAULT_TEMPLATES = {
+    'exam_result': "{student_name} পেয়েছে {marks}/{total} ({subject}) {date}",
+    'attendance_present': "{student_name} উপস্থিত ({batch_name})",
+    'attendance_absent': "{student_name} অনুপস্থিত {date} ({batch_name})",
+    'fee_reminder': "{student_name} এর ফি {amount}৳ বকেয়া। শেষ তারিখ {due_date}",
+    'custom_exam': "{student_name} scored {marks}/{total} in {subject} on {date}",
+    'custom_general': "{student_name}: {message} ({date})",
+    'general': "{student_name}: {message}"
+}
+
+# Longest value expected per variable when estimating a template's worst-case cost
+VARIABLE_MAX_LENGTHS = {
+    'student_name': 25,
+    'full_name': 40,
+    'batch_name': 30,
+    'subject': 30,
+    'exam_title': 50,
+    'date': 10,
+    'due_date': 10,
+    'marks': 5,
+    'total': 5,
+    'percentage': 6,
+    'grade': 2,
+    'amount': 8,
+    'message': 100
+}
+DEFAULT_VARIABLE_MAX_LENGTH = 20
+
+_load_lock = threading.Lock()
+
+
+class CompiledTemplate:
+    """A template split once into literal text and variable slots"""
+
+    __slots__ = ('source', 'variables', 'max_cost', '_head', '_parts')
+
+    def __init__(self, source):
+        pieces = VARIABLE_PATTERN.split(source)
+        self.source = source
+        self._head = pieces[0]
+        # (variable, literal that follows it) for every placeholder
+        self._parts = tuple(zip(pieces[1::2], pieces[2::2]))
+        self.variables = tuple(dict.fromkeys(name for name, _ in self._parts))
+        self.max_cost = self._worst_case_cost()
+
+    def __repr__(self):
+        return f'<CompiledTemplate {self.source[:30]!r} max_cost={self.max_cost}>'
+
+    def render(self, values):
+        """Fill the slots from a dict; missing variables keep their placeholder"""
+        out = [self._head]
+        for name, literal in self._parts:
+            value = values.get(name)
+            out.append('{' + name + '}' if value is None else str(value))
+            out.append(literal)
+        return ''.join(out)
+
+    def _worst_case_cost(self):
+        from routes.sms import calculate_sms_cost
+
+        # Fill every slot to its maximum with English and with Bangla text; mixing
+        # scripts is what pushes a message into more segments
+        costs = []
+        for filler in ('x', 'অ'):
+            text = self._head + ''.join(
+                filler * VARIABLE_MAX_LENGTHS.get(name, DEFAULT_VARIABLE_MAX_LENGTH) + literal
+                for name, literal in self._parts
+            )
+            costs.append(calculate_sms_cost(text))
+        return max(costs)
+
+
+@lru_cache(maxsize=512)
+def compile_template(source):
+    """Compile template text, reusing the compiled form for identical text"""
+    return CompiledTemplate(source)
+
+
+def _load_templates(version):
+    """Read every saved template in two queries"""
+    global_templates = {}
+    for key, value in db.session.query(Settings.key, Settings.value).filter(
+        Settings.key.like(f'{SETTING_KEY_PREFIX}%')
+    ):
+        message = value.get('message') if value else None
+        if message:
+            global_templates[key[len(SETTING_KEY_PREFIX):]] = message
+
+    user_templates = {
+        (created_by, name): content
+        for created_by, name, content in db.session.query(
+            SmsTemplate.created_by, SmsTemplate.name, SmsTemplate.content
+        ).filter(SmsTemplate.is_active == True).order_by(SmsTemplate.id)
+        if content
+    }
+
+    logger.info(f"Loaded {len(global_templates)} global and {len(user_templates)} teacher SMS templates (v{version})")
+    return {'version': version, 'global': global_templates, 'user': user_templates}
+
+
+def _current_templates():
+    """Saved templates for this app, reloaded only when the cache version moved"""
+    version = get_version(CACHE_NAME)
+    cached = current_app.extensions.get('sms_templates')
+    if cached is None or cached['version'] != version:
+        with _load_lock:
+            cached = current_app.extensions.get('sms_templates')
+            if cached is None or cached['version'] != version:
+                cached = _load_templates(version)
+                current_app.extensions['sms_templates'] = cached
+    return cached
+
+
+def get_template(template_id, user_id=None, default=None):
+    """
+    Return the CompiledTemplate for `template_id`.
+
+    Resolution order: the logged-in user's legacy session override (after
+    the saved text for SESSION_OVERRIDE_LAST), the user's saved template,
+    the global setting, then `default` or the built-in default.
+    """
+    templates = _current_templates()
+    override = _session_override(template_id, user_id) if user_id is not None else None
+    source = None if template_id in SESSION_OVERRIDE_LAST else override
+    if not source and user_id is not None:
+        source = templates['user'].get((user_id, template_id))
+    if not source:
+        source = templates['global'].get(template_id) or override
+    if not source:
+        source = default or DEFAULT_TEMPLATES.get(template_id, DEFAULT_TEMPLATES['general'])
+    return compile_template(source)
+
+
+def _session_override(template_id, user_id):
+    if not has_request_context() or session.get('user_id') != user_id:
+        return None
+    return (session.get(LEGACY_SESSION_KEY) or {}).get(template_id)
+
+
+def drop_session_override(template_id):
+    """Forget the legacy session copy of a template the user just saved"""
+    overrides = session.get(LEGACY_SESSION_KEY)
+    if overrides and template_id in overrides:
+        overrides = {key: value for key, value in overrides.items() if key != template_id}
+        if overrides:
+            session[LEGACY_SESSION_KEY] = overrides
+        else:
+            session.pop(LEGACY_SESSION_KEY)
+
+
+def get_global_templates():
+    """Saved global template text by template ID"""
+    return dict(_current_templates()['global'])
+
+
+def invalidate_templates():
+    """Call in the same transaction as any template write"""
+    bump_version(CACHE_NAME)
@@ -0,0 +1,125 @@
+"""
+Per-Request SQL Instrumentation
+Counts the statements each request runs, their total DB time, and how often
+each statement shape repeats.
+
+A shape (fingerprint) is the SQL text with whitespace collapsed and IN
+lists folded, so `User.query.get(id)` in a loop shows up as one shape
+repeated N times. When a shape repeats more than SQL_N_PLUS_ONE_THRESHOLD
+times in one request a warning names the endpoint and the statement.
+Outside production every response carries X-DB-Queries and Server-Timing
+headers, so browser dev tools show the DB cost of each call. A request can
+also keep each statement with its offset and duration (keep_statements());
+the request profiler uses that as its SQL timeline.
+"""
+import logging
+import re
+import time
+from collections import Counter
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger('sql.instrumentation')
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+IN_LIST_PATTERN = re.compile(r'IN \((?:\?|%s|%\(\w+\)s)(?:,\s*(?:\?|%s|%\(\w+\)s))*\)')
+NUMBER_PATTERN = re.compile(r'\b\d+\b')
+
+
+def fingerprint(statement):
+    """Normalize a statement so repeats with different parameters compare equal"""
+    shape = WHITESPACE_PATTERN.sub(' ', statement).strip()
+    shape = IN_LIST_PATTERN.sub('IN (...)', shape)
+    return NUMBER_PATTERN.sub('N', shape)
+
+
+class RequestSqlStats:
+    """SQL activity of one request"""
+
+    __slots__ = ('count', 'duration', 'shapes', 'started', 'statements')
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+        self.started = time.perf_counter()
+        self.statements = None
+
+    def keep_statements(self):
+        """Also keep (offset, elapsed, statement) records, offsets from the start of the request"""
+        if self.statements is None:
+            self.statements = []
+
+    def record(self, statement, elapsed):
+        self.count += 1
+        self.duration += elapsed
+        self.shapes[fingerprint(statement)] += 1
+        if self.statements is not None:
+            self.statements.append((time.perf_counter() - elapsed - self.started, elapsed, statement))
+
+    def repeated(self, threshold):
+        """(shape, count) pairs that ran more than `threshold` times, most frequent first"""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > threshold]
+
+
+def current_sql_stats():
+    """Stats of the request being served, or None outside a request"""
+    if not has_request_context():
+        return None
+    return g.get('sql_stats')
+
+
+def init_sql_instrumentation(app, db):
+    """Attach the engine listeners and the per-request hooks"""
+    if not app.config.get('SQL_INSTRUMENTATION_ENABLED', True):
+        return
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['query_started'].pop()
+        stats = current_sql_stats()
+        if stats is not None:
+            stats.record(statement, time.perf_counter() - started)
+
+    def handle_error(exception_context):
+        # A failing statement never reaches after_cursor_execute
+        conn = exception_context.connection
+        pending = conn.info.get('query_started') if conn is not None else None
+        if not pending:
+            return
+        started = pending.pop()
+        stats = current_sql_stats()
+        if stats is not None and exception_context.statement is not None:
+            stats.record(exception_context.statement, time.perf_counter() - started)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', after_cursor_execute)
+        event.listen(db.engine, 'handle_error', handle_error)
+
+    @app.before_request
+    def start_sql_stats():
+        g.sql_stats = RequestSqlStats()
+
+    @app.after_request
+    def report_sql_stats(response):
+        stats = current_sql_stats()
+        if stats is None:
+            return response
+
+        for shape, count in stats.repeated(app.config.get('SQL_N_PLUS_ONE_THRESHOLD', 10)):
+            logger.warning(
+                f"Possible N+1: {request.method} {request.path} (endpoint={request.endpoint}) ran "
+                f"{count}x: {shape[:300]}"
+            )
+
+        if app.config.get('SQL_INSTRUMENTATION_HEADERS'):
+            total_ms = (time.perf_counter() - stats.started) * 1000
+            response.headers['X-DB-Queries'] = str(stats.count)
+            response.headers['Server-Timing'] = (
+                f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries", app;dur={total_ms:.1f}'
+            )
+        return response
@@ -0,0 +1,209 @@
+"""
+SQLite Tuning
+Named PRAGMA profiles applied to every new SQLite connection.
+
+Gunicorn runs several sync workers against one database file. With the
+default rollback journal a reader blocks writers, so marks and attendance
+saves queue behind every page load. The 'server' profile switches to WAL
+(readers never block the writer), waits on a busy lock instead of failing
+immediately and gives each connection a bigger page cache and a memory map.
+
+A maintenance thread checkpoints the WAL and runs PRAGMA optimize
+periodically. It is started per worker by after_fork() (gunicorn's
+post_worker_init hook, see gunicorn.conf.py), never in the gunicorn master
+that preloads the app; a lock file in the instance folder keeps it to one
+worker per host.
+"""
+import fcntl
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import event, text
+
+logger = logging.getLogger(__name__)
+
+# Lock file and thread of the one process on this host that runs maintenance
+_maintenance_lock = None
+_maintenance_thread = None
+
+SQLITE_PROFILES = {
+    # Driver defaults, for comparison in benchmarks
+    'default': {},
+    'server': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',  # Safe with WAL; only the last commits may roll back on power loss
+        'busy_timeout': 5000,  # ms to wait for the write lock before "database is locked"
+        'cache_size': -64000,  # 64 MB page cache per connection
+        'mmap_size': 268435456,  # 256 MB
+        'temp_store': 'MEMORY',
+        # Off until hard deletes (e.g. batches) clean up their dependent rows
+        'foreign_keys': 'OFF'
+    },
+    'strict': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'cache_size': -64000,
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY',
+        'foreign_keys': 'ON'
+    },
+    # In-memory test databases cannot use WAL or mmap
+    'testing': {
+        'temp_store': 'MEMORY',
+        'foreign_keys': 'OFF'
+    }
+}
+
+# Order matters: journal_mode must be set before anything starts a transaction
+PRAGMA_ORDER = ('busy_timeout', 'journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'temp_store',
+                'foreign_keys')
+
+REPORTED_PRAGMAS = ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size', 'temp_store',
+                    'foreign_keys', 'wal_autocheckpoint')
+
+
+def resolve_profile(config):
+    """Profile name and PRAGMA values from SQLITE_PRAGMA_PROFILE plus SQLITE_PRAGMAS overrides"""
+    name = config.get('SQLITE_PRAGMA_PROFILE', 'default')
+    if name not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLite pragma profile '{name}'")
+    pragmas = dict(SQLITE_PROFILES[name])
+    pragmas.update(config.get('SQLITE_PRAGMAS') or {})
+    return name, pragmas
+
+
+def apply_pragmas(dbapi_connection, pragmas):
+    """Run the PRAGMA statements of a profile on a raw DB-API connection"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in sorted(pragmas, key=lambda p: PRAGMA_ORDER.index(p) if p in PRAGMA_ORDER else len(PRAGMA_ORDER)):
+            cursor.execute(f'PRAGMA {pragma}={pragmas[pragma]}')
+    finally:
+        cursor.close()
+
+
+def install_pragma_listener(engine, pragmas):
+    """Apply `pragmas` to every connection the engine opens"""
+    def on_connect(dbapi_connection, connection_record):
+        apply_pragmas(dbapi_connection, pragmas)
+
+    event.listen(engine, 'connect', on_connect)
+    return on_connect
+
+
+def init_sqlite_tuning(app, db):
+    """Hook the configured profile into the app's engine; must run before the first connection"""
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name != 'sqlite':
+            return
+        name, pragmas = resolve_profile(app.config)
+        if engine.url.database in (None, '', ':memory:'):
+            pragmas = {k: v for k, v in pragmas.items() if k not in ('journal_mode', 'mmap_size')}
+        install_pragma_listener(engine, pragmas)
+        app.extensions['sqlite_profile'] = name
+
+
+def after_fork(app, db):
+    """
+    Set up a forked worker: drop the connections inherited from the parent's
+    pool (without closing them under the parent) and start the maintenance
+    thread if SQLITE_MAINTENANCE_SECONDS is set and no other worker runs it
+    """
+    with app.app_context():
+        db.engine.dispose(close=False)
+    interval = app.config.get('SQLITE_MAINTENANCE_SECONDS', 0)
+    if interval:
+        return start_maintenance_thread(app, db, interval)
+    return None
+
+
+def get_active_pragmas(session):
+    """Current PRAGMA values as seen by a pooled connection"""
+    return {
+        pragma: session.execute(text(f'PRAGMA {pragma}')).scalar()
+        for pragma in REPORTED_PRAGMAS
+    }
+
+
+def run_maintenance(engine):
+    """Checkpoint the WAL back into the database file and refresh query planner statistics"""
+    started = time.perf_counter()
+    with engine.connect() as connection:
+        checkpoint = connection.execute(text('PRAGMA wal_checkpoint(TRUNCATE)')).first()
+        connection.execute(text('PRAGMA optimize'))
+        connection.commit()
+    result = {
+        'checkpoint_busy': checkpoint[0] if checkpoint else None,
+        'wal_pages': checkpoint[1] if checkpoint else None,
+        'checkpointed_pages': checkpoint[2] if checkpoint else None,
+        'elapsed_ms': int((time.perf_counter() - started) * 1000)
+    }
+    logger.info(f"SQLite maintenance {result}")
+    return result
+
+
+def _acquire_maintenance_lock(app):
+    """
+    Non-blocking host-wide lock so only one gunicorn worker runs maintenance;
+    released when that worker exits, so a respawned worker takes it over
+    """
+    os.makedirs(app.instance_path, exist_ok=True)
+    lock_file = open(os.path.join(app.instance_path, 'sqlite_maintenance.lock'), 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+def start_maintenance_thread(app, db, interval):
+    """
+    Run run_maintenance() every `interval` seconds in a daemon thread of one
+    process. Call it after forking: a lock taken before fork is shared with
+    every child.
+    """
+    global _maintenance_lock, _maintenance_thread
+    if _maintenance_thread is not None:
+        return _maintenance_thread
+    _maintenance_lock = _acquire_maintenance_lock(app)
+    if _maintenance_lock is None:
+        return None
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                with app.app_context():
+                    run_maintenance(db.engine)
+            except Exception as e:
+                logger.error(f"SQLite maintenance failed: {e}")
+
+    _maintenance_thread = threading.Thread(target=loop, name='sqlite-maintenance', daemon=True)
+    _maintenance_thread.start()
+    return _maintenance_thread
+
+
+def database_health(db):
+    """Status, active profile and PRAGMA values for /health/db"""
+    from flask import current_app
+
+    db.session.execute(text('SELECT 1'))
+    engine = db.engine
+    health = {
+        'status': 'healthy',
+        'dialect': engine.dialect.name,
+        'profile': current_app.extensions.get('sqlite_profile'),
+    }
+    if engine.dialect.name == 'sqlite':
+        health['pragmas'] = get_active_pragmas(db.session)
+        database = engine.url.database
+        if database and database != ':memory:':
+            wal_path = f'{database}-wal'
+            health['database_bytes'] = os.path.getsize(database) if os.path.exists(database) else None
+            health['wal_bytes'] = os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+    return health
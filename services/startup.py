@@ -0,0 +1,175 @@
+"""
+Application Startup
+Keeps create_app cheap, since every gunicorn worker recycle pays for it.
+
+- ensure_schema(): runs db.create_all() only when the models changed since
+  the database was last brought up to date. A hash of the DDL of every
+  model is kept in SQLite's PRAGMA user_version, so a current database
+  costs one PRAGMA read instead of a table_info round trip per table.
+- register_lazy_blueprint(): mounts a rarely used blueprint at its prefix
+  without importing its module; the first request under the prefix
+  imports it and dispatches to the real view.
+- StartupTimer: per-phase timings, logged as one line and kept in
+  app.extensions['startup_report'].
+"""
+import hashlib
+import importlib
+import logging
+import threading
+import time
+
+from flask import Flask, request
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+logger = logging.getLogger('startup')
+
+LAZY_METHODS = ['GET', 'POST', 'PUT', 'PATCH', 'DELETE']
+
+# Hooks a blueprint can add to the app that registers it; the live app never runs them for a lazy one
+SHADOW_HOOKS = ('before_request_funcs', 'after_request_funcs', 'teardown_request_funcs', 'url_value_preprocessors',
+                'url_default_functions', 'error_handler_spec', 'template_context_processors',
+                'teardown_appcontext_funcs', 'shell_context_processors')
+
+
+class StartupTimer:
+    """Named phase durations of one create_app call"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._mark = self.started
+        self.phases = {}
+        self.notes = []
+
+    def phase(self, name):
+        now = time.perf_counter()
+        self.phases[name] = round((now - self._mark) * 1000, 1)
+        self._mark = now
+
+    def report(self):
+        return {
+            'total_ms': round((time.perf_counter() - self.started) * 1000, 1),
+            'phases_ms': dict(self.phases),
+            'notes': list(self.notes)
+        }
+
+    def log(self):
+        report = self.report()
+        phases = ' '.join(f'{name}={ms}ms' for name, ms in report['phases_ms'].items())
+        notes = f" ({'; '.join(report['notes'])})" if report['notes'] else ''
+        logger.info(f"App started in {report['total_ms']}ms: {phases}{notes}")
+        return report
+
+
+def schema_fingerprint(metadata, dialect):
+    """31-bit hash of the CREATE TABLE/INDEX statements of every model"""
+    digest = hashlib.sha256()
+    for table in metadata.sorted_tables:
+        digest.update(str(CreateTable(table).compile(dialect=dialect)).encode('utf-8'))
+        for index in sorted(table.indexes, key=lambda index: index.name or ''):
+            digest.update(str(CreateIndex(index).compile(dialect=dialect)).encode('utf-8'))
+    return int(digest.hexdigest()[:7], 16)
+
+
+def ensure_schema(db):
+    """
+    Create missing tables unless the database already matches the models.
+
+    Returns True when create_all ran. Databases other than SQLite have no
+    user_version, so they always run create_all as before.
+    """
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        db.create_all()
+        return True
+
+    fingerprint = schema_fingerprint(db.metadata, engine.dialect)
+    with engine.connect() as connection:
+        current = connection.execute(text('PRAGMA user_version')).scalar()
+    if current == fingerprint:
+        return False
+
+    db.create_all()
+    with engine.begin() as connection:
+        connection.execute(text(f'PRAGMA user_version = {fingerprint}'))
+    return True
+
+
+def _hook_functions(value):
+    """Distinct functions in a hook registry: every scope repeats Flask's default context processor"""
+    if isinstance(value, dict):
+        return {function for item in value.values() for function in _hook_functions(item)}
+    if isinstance(value, (list, tuple)):
+        return set(value)
+    return {value}
+
+
+def _registered_hooks(app):
+    """{hook attribute: functions or names} of an app, jinja filters/globals/tests included"""
+    hooks = {name: _hook_functions(getattr(app, name)) for name in SHADOW_HOOKS}
+    for name in ('filters', 'globals', 'tests'):
+        hooks[f'jinja_env.{name}'] = set(getattr(app.jinja_env, name))
+    return hooks
+
+
+class LazyBlueprint:
+    """
+    Imports a blueprint module on the first request under its URL prefix.
+
+    Only the blueprint's routes are served: its rules are matched on a
+    private shadow app and the view is called from the live app's request.
+    Hooks the blueprint registers (before_request/after_request/teardown,
+    errorhandler, context_processor, URL processors, their app_* variants and
+    app template filters) would attach to the shadow app and never run, so
+    load() raises RuntimeError for such a blueprint; register it eagerly in
+    create_app instead.
+    """
+
+    def __init__(self, app, import_name, attribute, url_prefix):
+        self.app = app
+        self.import_name = import_name
+        self.attribute = attribute
+        self.url_prefix = url_prefix
+        self._lock = threading.Lock()
+        self._shadow = None
+
+    def load(self):
+        """Import the blueprint and build its rules; returns the shadow app"""
+        if self._shadow is None:
+            with self._lock:
+                if self._shadow is None:
+                    started = time.perf_counter()
+                    blueprint = getattr(importlib.import_module(self.import_name), self.attribute)
+                    # Rules are built on a private app, the live app is already serving
+                    shadow = Flask(self.app.import_name)
+                    shadow.url_map.strict_slashes = self.app.url_map.strict_slashes
+                    before = _registered_hooks(shadow)
+                    shadow.register_blueprint(blueprint, url_prefix=self.url_prefix)
+                    added = sorted(name for name, hooks in _registered_hooks(shadow).items() if hooks - before[name])
+                    if added:
+                        raise RuntimeError(f"Blueprint {self.import_name}.{self.attribute} registers "
+                                           f"{', '.join(added)}, which a lazily loaded blueprint never runs; "
+                                           f"register it eagerly in create_app")
+                    self._shadow = shadow
+                    logger.info(f"Loaded blueprint {self.import_name} on first use "
+                                f"in {(time.perf_counter() - started) * 1000:.1f}ms")
+        return self._shadow
+
+    def dispatch(self, subpath=None):
+        shadow = self.load()
+        adapter = shadow.url_map.bind_to_environ(request.environ)
+        rule, view_args = adapter.match(return_rule=True)
+        # Let request.endpoint/request.blueprint name the real view for logging and metrics
+        request.url_rule = rule
+        request.view_args = view_args
+        return self.app.ensure_sync(shadow.view_functions[rule.endpoint])(**view_args)
+
+
+def register_lazy_blueprint(app, import_name, attribute, url_prefix):
+    """Mount `import_name.attribute` at `url_prefix`, importing it on first use"""
+    lazy = LazyBlueprint(app, import_name, attribute, url_prefix)
+    endpoint = f'lazy_{attribute}'
+    for rule in (url_prefix, f'{url_prefix}/', f'{url_prefix}/<path:subpath>'):
+        app.add_url_rule(rule, endpoint, lazy.dispatch, methods=LAZY_METHODS)
+    app.extensions.setdefault('lazy_blueprints', {})[attribute] = lazy
+    return lazy
@@ -0,0 +1,176 @@
+"""
+User Search Index
+SQLite FTS5 trigram index over student and guardian names and phone
+numbers, replacing five ILIKE '%term%' scans of the users table.
+
+users_fts is a shadow table with the user id as rowid and four columns:
+name (first + last name), phone, guardian_name and guardian_phone.
+Triggers on users keep it in sync with every insert, update and delete,
+including bulk Core statements and raw SQL. The trigram tokenizer matches
+any substring of three or more characters, case-insensitively and for any
+script, so Bengali names work like Latin ones. Zero-width (non-)joiners,
+which Bengali keyboards insert inconsistently, are dropped on both sides.
+
+The index is created with the users table; existing databases get it from
+migrate_add_user_search_index.py. Until it exists, and on databases other
+than SQLite, searches fall back to the ILIKE filter.
+"""
+import re
+import unicodedata
+
+from flask import current_app
+from sqlalchemy import and_, case, column, event, func, literal_column, or_, select, table, text
+
+from models import db, User
+
+SEARCH_TABLE = 'users_fts'
+MIN_TRIGRAM_LENGTH = 3  # Shorter terms cannot use the trigram index and are matched with LIKE
+
+users_fts = table(SEARCH_TABLE, column('rowid'))
+
+SEARCH_COLUMNS = (User.first_name, User.last_name, User.phoneNumber, User.guardian_name, User.guardian_phone)
+
+# bm25 weights of name, phone, guardian_name, guardian_phone
+BM25_WEIGHTS = (10.0, 5.0, 2.0, 3.0)
+
+_ZERO_WIDTH = {0x200c: None, 0x200d: None}
+_BENGALI_DIGITS = str.maketrans('০১২৩৪৫৬৭৮৯', '0123456789')
+_PHONE_TOKEN = re.compile(r'\+?[\d\-]+')
+
+
+def _clean(expression):
+    return f"replace(replace(coalesce({expression}, ''), char(8204), ''), char(8205), '')"
+
+
+_INDEXED_VALUES = ', '.join([
+    _clean("new.first_name || ' ' || new.last_name"), _clean('new.phoneNumber'),
+    _clean('new.guardian_name'), _clean('new.guardian_phone')
+])
+
+CREATE_STATEMENTS = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE}
+        USING fts5(name, phone, guardian_name, guardian_phone, tokenize='trigram')""",
+    f"""CREATE TRIGGER IF NOT EXISTS users_fts_insert AFTER INSERT ON users BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, name, phone, guardian_name, guardian_phone)
+        VALUES (new.id, {_INDEXED_VALUES});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS users_fts_update
+        AFTER UPDATE OF id, first_name, last_name, phoneNumber, guardian_name, guardian_phone ON users BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id;
+        INSERT INTO {SEARCH_TABLE}(rowid, name, phone, guardian_name, guardian_phone)
+        VALUES (new.id, {_INDEXED_VALUES});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS users_fts_delete AFTER DELETE ON users BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id;
+    END""",
+)
+
+REBUILD_STATEMENTS = (
+    f"DELETE FROM {SEARCH_TABLE}",
+    f"""INSERT INTO {SEARCH_TABLE}(rowid, name, phone, guardian_name, guardian_phone)
+        SELECT id, {_INDEXED_VALUES.replace('new.', '')} FROM users""",
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('optimize')",
+)
+
+
+def create_search_index(connection):
+    """Create users_fts and its triggers if missing, then fill it from users"""
+    for statement in CREATE_STATEMENTS + REBUILD_STATEMENTS:
+        connection.execute(text(statement))
+
+
+def _after_users_create(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        create_search_index(connection)
+
+
+def search_index_available():
+    """Whether users_fts exists; checked once per app"""
+    available = current_app.extensions.get('user_search_index')
+    if available is None:
+        available = db.engine.dialect.name == 'sqlite' and db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': SEARCH_TABLE}
+        ).first() is not None
+        current_app.extensions['user_search_index'] = available
+    return available
+
+
+def search_terms(term):
+    """Normalized whitespace-separated terms; phone numbers lose separators and the 880 prefix"""
+    term = unicodedata.normalize('NFC', term).translate(_ZERO_WIDTH).translate(_BENGALI_DIGITS)
+    if _PHONE_TOKEN.fullmatch(re.sub(r'\s', '', term)):
+        term = re.sub(r'\s', '', term)  # One phone number typed in groups
+    terms = []
+    for token in term.split():
+        if _PHONE_TOKEN.fullmatch(token):
+            token = re.sub(r'\D', '', token)
+            if token.startswith('880') and len(token) > 3:
+                token = token[2:]
+        if token:
+            terms.append(token)
+    return list(dict.fromkeys(terms))
+
+
+def _like(token):
+    return or_(*[search_column.contains(token, autoescape=True) for search_column in SEARCH_COLUMNS])
+
+
+def _match_expression(terms):
+    return ' AND '.join('"' + token.replace('"', '""') + '"' for token in terms)
+
+
+def search_filter(term):
+    """
+    Clause for User queries matching every term of `term` as a substring of
+    a name, phone or guardian field. None when `term` has no terms.
+    """
+    terms = search_terms(term)
+    if not terms:
+        return None
+    indexed = [token for token in terms if len(token) >= MIN_TRIGRAM_LENGTH]
+    if not indexed or not search_index_available():
+        return and_(*[_like(token) for token in terms])
+
+    matches = select(users_fts.c.rowid).where(literal_column(SEARCH_TABLE).match(_match_expression(indexed)))
+    return and_(User.id.in_(matches), *[_like(token) for token in terms if token not in indexed])
+
+
+def ranked_search(query, term):
+    """
+    `query` (over User) narrowed to `term` and ordered best match first:
+    names starting with the first term, then other fields starting with
+    it, then by bm25 relevance. None when `term` has no terms.
+    """
+    terms = search_terms(term)
+    if not terms:
+        return None
+    indexed = [token for token in terms if len(token) >= MIN_TRIGRAM_LENGTH]
+    use_index = bool(indexed) and search_index_available()
+
+    if use_index:
+        query = query.join(users_fts, users_fts.c.rowid == User.id).filter(
+            literal_column(SEARCH_TABLE).match(_match_expression(indexed))
+        )
+    unindexed = [token for token in terms if not use_index or token not in indexed]
+    if unindexed:
+        query = query.filter(and_(*[_like(token) for token in unindexed]))
+
+    first = terms[0]
+    prefix_rank = case(
+        (or_(User.first_name.startswith(first, autoescape=True),
+             User.last_name.startswith(first, autoescape=True)), 0),
+        (or_(User.phoneNumber.startswith(first, autoescape=True),
+             User.guardian_phone.startswith(first, autoescape=True),
+             User.guardian_name.startswith(first, autoescape=True)), 1),
+        else_=2
+    )
+    order = [prefix_rank]
+    if use_index:
+        order.append(func.bm25(literal_column(SEARCH_TABLE), *BM25_WEIGHTS))
+    return query.order_by(*order, User.first_name, User.last_name, User.id)
+
+
+def init_user_search(app, db):
+    """Create users_fts alongside the users table"""
+    if not event.contains(User.__table__, 'after_create', _after_users_create):
+        event.listen(User.__table__, 'after_create', _after_users_create)
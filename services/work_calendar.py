@@ -0,0 +1,177 @@
+"""
+Working-Day Calendar
+The days a batch has classes, for attendance marks and percentages:
+every day of the month except
+- the weekly off-days (WEEKLY_OFF_DAYS, e.g. 'fri,sat')
+- batch_holidays rows of the batch, and those with no batch (all batches)
+
+Saving an attendance sheet records the day in batch_holidays
+(from_attendance) once the stored attendance of every active enrolled
+student is HOLIDAY, and re-marking it drops the row again, so holidays
+taken through the attendance sheet count as well.
+
+working_dates() and working_days() are memoized per app context, so a
+ranking or result calculation computes a batch's month once however many
+students it covers. Holiday writes go through add_holiday()/
+remove_holiday()/sync_attendance_holiday(), which drop the memo.
+"""
+import calendar
+from datetime import date
+from functools import lru_cache
+
+from flask import current_app, g, has_app_context
+from sqlalchemy import case, func, or_
+
+from models import db, Attendance, AttendanceStatus, BatchHoliday, User, UserRole, user_batches
+
+WEEKDAY_NAMES = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+ATTENDANCE_HOLIDAY_REASON = 'Marked holiday in attendance'
+
+
+def parse_off_days(value):
+    """frozenset of weekday numbers (Monday 0) from 'fri,sat' or an iterable of names/numbers"""
+    if isinstance(value, str):
+        value = [part for part in value.replace(' ', '').split(',') if part]
+    days = set()
+    for day in value:
+        if isinstance(day, int):
+            days.add(day % 7)
+        elif day[:3].lower() in WEEKDAY_NAMES:
+            days.add(WEEKDAY_NAMES.index(day[:3].lower()))
+        else:
+            raise ValueError(f"Unknown weekday '{day}' in WEEKLY_OFF_DAYS")
+    return frozenset(days)
+
+
+def weekly_off_days():
+    return current_app.extensions['weekly_off_days']
+
+
+@lru_cache(maxsize=1024)
+def _class_days(year, month, off_days):
+    """Day numbers of a month that are not weekly off-days"""
+    first_weekday, days = calendar.monthrange(year, month)
+    return tuple(day for day in range(1, days + 1) if (first_weekday + day - 1) % 7 not in off_days)
+
+
+def month_holidays(batch_id, year, month):
+    """{day: reason} of a batch's holidays in a month"""
+    last_day = calendar.monthrange(year, month)[1]
+    holidays = {}
+    rows = db.session.query(BatchHoliday.date, BatchHoliday.reason).filter(
+        or_(BatchHoliday.batch_id == batch_id, BatchHoliday.batch_id.is_(None)),
+        BatchHoliday.date >= date(year, month, 1),
+        BatchHoliday.date <= date(year, month, last_day)
+    )
+    for holiday_date, reason in rows:
+        holidays[holiday_date.day] = reason or 'Holiday'
+    return holidays
+
+
+def _memo():
+    if not has_app_context():
+        return {}
+    if 'working_dates' not in g:
+        g.working_dates = {}
+    return g.working_dates
+
+
+def working_dates(batch_id, year, month):
+    """Tuple of the batch's class days (day numbers) in a month"""
+    memo = _memo()
+    key = (batch_id, year, month)
+    if key not in memo:
+        holidays = month_holidays(batch_id, year, month)
+        memo[key] = tuple(day for day in _class_days(year, month, weekly_off_days()) if day not in holidays)
+    return memo[key]
+
+
+def working_days(batch_id, year, month):
+    """Number of class days a batch has in a month"""
+    return len(working_dates(batch_id, year, month))
+
+
+def working_days_between(batch_id, start_date, end_date):
+    """Number of class days a batch has from start_date to end_date, inclusive"""
+    total = 0
+    year, month = start_date.year, start_date.month
+    while (year, month) <= (end_date.year, end_date.month):
+        first = start_date.day if (year, month) == (start_date.year, start_date.month) else 1
+        last = end_date.day if (year, month) == (end_date.year, end_date.month) else 31
+        total += sum(1 for day in working_dates(batch_id, year, month) if first <= day <= last)
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return total
+
+
+def forget_working_days():
+    """Drop the memoized months after holidays change"""
+    if has_app_context():
+        g.pop('working_dates', None)
+
+
+def add_holiday(holiday_date, batch_id=None, reason=None, created_by=None):
+    """Record a holiday (batch_id None: every batch); returns the BatchHoliday row"""
+    holiday = BatchHoliday.query.filter_by(batch_id=batch_id, date=holiday_date).first()
+    if holiday is None:
+        holiday = BatchHoliday(batch_id=batch_id, date=holiday_date, created_by=created_by)
+        db.session.add(holiday)
+    holiday.reason = reason
+    holiday.from_attendance = False
+    db.session.flush()
+    forget_working_days()
+    return holiday
+
+
+def remove_holiday(holiday):
+    db.session.delete(holiday)
+    db.session.flush()
+    forget_working_days()
+
+
+def is_attendance_holiday(batch_id, attendance_date):
+    """
+    True when the stored attendance of (batch, date) marks every active
+    enrolled student holiday; a partial sheet never makes a holiday
+    """
+    roster, holidays = db.session.query(
+        func.count(User.id),
+        func.sum(case((Attendance.status == AttendanceStatus.HOLIDAY, 1), else_=0))
+    ).select_from(User).join(
+        user_batches, user_batches.c.user_id == User.id
+    ).outerjoin(
+        Attendance, (Attendance.user_id == User.id) & (Attendance.batch_id == batch_id)
+        & (Attendance.date == attendance_date)
+    ).filter(
+        user_batches.c.batch_id == batch_id,
+        User.role == UserRole.STUDENT,
+        User.is_active == True,
+        User.is_archived == False
+    ).one()
+    return roster > 0 and holidays == roster
+
+
+def sync_attendance_holiday(batch_id, attendance_date, marked_by=None):
+    """
+    Keep the from_attendance holiday of a day in step with its saved
+    attendance: recorded when is_attendance_holiday(), dropped otherwise.
+    Call after the sheet is written. A holiday entered by hand is left
+    alone. Returns True when the day changed from working day to holiday
+    or back.
+    """
+    is_holiday = is_attendance_holiday(batch_id, attendance_date)
+    holiday = BatchHoliday.query.filter_by(batch_id=batch_id, date=attendance_date).first()
+    if is_holiday and holiday is None:
+        db.session.add(BatchHoliday(batch_id=batch_id, date=attendance_date, reason=ATTENDANCE_HOLIDAY_REASON,
+                                    from_attendance=True, created_by=marked_by))
+    elif not is_holiday and holiday is not None and holiday.from_attendance:
+        db.session.delete(holiday)
+    else:
+        return False
+    db.session.flush()
+    forget_working_days()
+    return True
+
+
+def init_work_calendar(app):
+    """Parse WEEKLY_OFF_DAYS once; a bad value fails at startup instead of on the first ranking"""
+    app.extensions['weekly_off_days'] = parse_off_days(app.config.get('WEEKLY_OFF_DAYS', 'sat,sun'))
@@ -0,0 +1,60 @@
+"""
+SMS Dispatcher
+Background process that sends the SMS queued in the sms_outbox table.
+
+Runs next to gunicorn (see saro_sms_dispatcher.service) so web workers never
+wait on the SMS provider. Several dispatchers may run at once; rows are
+claimed atomically.
+
+Usage:
+    python sms_dispatcher.py                  # run until SIGTERM/SIGINT
+    python sms_dispatcher.py --once           # send one batch of due messages and exit
+"""
+import argparse
+import logging
+import queue
+import signal
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+from app import create_app
+from services.sms_outbox import dispatch_once, run_dispatcher
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Send queued SMS from the sms_outbox table')
+    parser.add_argument('--once', action='store_true', help='Send one batch of due messages and exit')
+    parser.add_argument('--batch-size', type=int, help='Messages claimed per cycle (SMS_OUTBOX_BATCH_SIZE)')
+    parser.add_argument('--concurrency', type=int, help='Parallel provider requests (SMS_OUTBOX_CONCURRENCY)')
+    args = parser.parse_args()
+
+    # Sender threads only put records on a queue; a listener thread does the slow I/O
+    log_queue = queue.Queue(-1)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s [%(name)s] %(message)s'))
+    listener = QueueListener(log_queue, stream_handler)
+    logging.basicConfig(level=logging.INFO, handlers=[QueueHandler(log_queue)])
+    listener.start()
+
+    app = create_app()
+    stop_event = threading.Event()
+
+    def handle_stop(signum, frame):
+        logging.getLogger(__name__).info(f"Received signal {signum}, finishing current batch")
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, handle_stop)
+    signal.signal(signal.SIGINT, handle_stop)
+
+    with app.app_context():
+        if args.once:
+            stats = dispatch_once(batch_size=args.batch_size, concurrency=args.concurrency)
+            print(f"SMS dispatch: {stats}")
+        else:
+            run_dispatcher(stop_event, batch_size=args.batch_size, concurrency=args.concurrency)
+
+    listener.stop()
+
+
+if __name__ == '__main__':
+    main()
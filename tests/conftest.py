@@ -0,0 +1,112 @@
+"""
+Shared pytest fixtures for in-process tests.
+Builds the app against an in-memory SQLite database (see TestingConfig).
+"""
+import os
+import sys
+from contextlib import contextmanager
+from datetime import datetime, date
+
+import pytest
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from models import (db, User, UserRole, Batch, MonthlyExam, IndividualExam)
+
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def login_as(client, user):
+    """Put a user into the test client's session"""
+    with client.session_transaction() as sess:
+        sess['user_id'] = user.id
+        sess['user_role'] = user.role.value
+
+
+@contextmanager
+def count_queries():
+    """Count SQL statements executed on the app engine inside the block"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def make_teacher(phone='01700000000'):
+    teacher = User(phoneNumber=phone, first_name='Test', last_name='Teacher', role=UserRole.TEACHER)
+    db.session.add(teacher)
+    db.session.commit()
+    return teacher
+
+
+def make_batch(name='Batch A'):
+    batch = Batch(name=name, start_date=date(2025, 1, 1))
+    db.session.add(batch)
+    db.session.commit()
+    return batch
+
+
+def make_students(batch, count, start=0):
+    students = []
+    for i in range(start, start + count):
+        student = User(
+            phoneNumber=f'018{i:08d}',
+            first_name=f'Student{i:04d}',
+            last_name='Test',
+            role=UserRole.STUDENT,
+            guardian_phone=f'019{i:08d}'
+        )
+        student.batches.append(batch)
+        students.append(student)
+    db.session.add_all(students)
+    db.session.commit()
+    return students
+
+
+def make_monthly_exam(batch, teacher, month=3, year=2025, subjects=('Physics', 'Chemistry'), marks=50):
+    exam = MonthlyExam(
+        title=f'Monthly {month}/{year}',
+        month=month,
+        year=year,
+        total_marks=marks * len(subjects),
+        pass_marks=0,
+        start_date=datetime(year, month, 1),
+        end_date=datetime(year, month, 28),
+        batch_id=batch.id,
+        created_by=teacher.id
+    )
+    db.session.add(exam)
+    db.session.flush()
+    for idx, subject in enumerate(subjects):
+        db.session.add(IndividualExam(
+            monthly_exam_id=exam.id,
+            title=f'{subject} Test',
+            subject=subject,
+            marks=marks,
+            exam_date=datetime(year, month, 5 + idx),
+            duration=60,
+            order_index=idx + 1
+        ))
+    db.session.commit()
+    return exam
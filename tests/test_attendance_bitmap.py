@@ -0,0 +1,84 @@
+"""
+Tests for the attendance_months bitmaps and the compact monthly sheet
+"""
+import base64
+import struct
+from datetime import date
+
+from conftest import login_as, make_teacher, make_batch, make_students
+from models import db, Attendance, AttendanceMonth, AttendanceStatus
+from services.attendance_bitmap import ROW_FORMAT, rebuild_attendance_bitmaps, unpack_days
+
+
+def sheet_days(client, batch, month=3, year=2025):
+    return client.get(f'/api/attendance/monthly?batch_id={batch.id}&month={month}&year={year}').get_json()['data']
+
+
+def decode(row, days):
+    return unpack_days(*struct.unpack(ROW_FORMAT, base64.b64decode(row)), days)
+
+
+def test_triggers_follow_orm_and_bulk_writes(app, client):
+    teacher = make_teacher()
+    batch = make_batch()
+    students = make_students(batch, 3)
+    login_as(client, teacher)
+
+    client.post('/api/attendance/bulk', json={
+        'batchId': batch.id, 'date': '2025-03-31',
+        'attendanceData': [{'userId': s.id, 'status': 'absent'} for s in students]
+    })
+    db.session.add(Attendance(user_id=students[0].id, batch_id=batch.id, date=date(2025, 3, 1),
+                              status=AttendanceStatus.LATE))
+    db.session.add(Attendance(user_id=students[1].id, batch_id=batch.id, date=date(2025, 4, 1),
+                              status=AttendanceStatus.HOLIDAY))
+    db.session.commit()
+
+    record = Attendance.query.filter_by(user_id=students[2].id).one()
+    record.status = AttendanceStatus.PRESENT
+    db.session.commit()
+    db.session.delete(Attendance.query.filter_by(user_id=students[1].id, date=date(2025, 3, 31)).one())
+    db.session.commit()
+
+    march = {row.user_id: unpack_days(row.marked, row.codes, 31)
+             for row in AttendanceMonth.query.filter_by(batch_id=batch.id, year=2025, month=3)}
+    assert march[students[0].id][1] == 'late' and march[students[0].id][31] == 'absent'
+    assert march[students[1].id][31] is None
+    assert march[students[2].id][31] == 'present'
+    assert AttendanceMonth.query.filter_by(user_id=students[1].id, month=4).one().codes == 3
+
+    # A rebuild from attendance gives the same rows
+    before = sorted((r.user_id, r.month, r.marked, r.codes) for r in AttendanceMonth.query if r.marked)
+    rebuild_attendance_bitmaps(db.session.connection())
+    db.session.expire_all()
+    assert sorted((r.user_id, r.month, r.marked, r.codes) for r in AttendanceMonth.query) == before
+
+
+def test_compact_sheet_matches_the_full_sheet(app, client):
+    teacher = make_teacher()
+    batch = make_batch()
+    students = make_students(batch, 300)
+    statuses = list(AttendanceStatus)
+    db.session.add_all([
+        Attendance(user_id=s.id, batch_id=batch.id, date=date(2025, 3, day), status=statuses[(i + day) % 4])
+        for i, s in enumerate(students) for day in range(1, 32) if (i + day) % 7
+    ])
+    db.session.commit()
+    login_as(client, teacher)
+
+    full = sheet_days(client, batch)
+    response = client.get(f'/api/attendance/monthly/compact?batch_id={batch.id}&month=3&year=2025')
+    compact = response.get_json()['data']
+    assert compact['codes'] == ['present', 'absent', 'late', 'holiday']
+    assert len(response.data) < 16 * 1024
+    assert len(response.data) * 5 < len(client.get(f'/api/attendance/monthly?batch_id={batch.id}&month=3&year=2025').data)
+
+    for full_row, (user_id, name, row) in zip(full['students'], compact['students']):
+        assert (full_row['id'], full_row['name']) == (user_id, name)
+        assert {int(day): status for day, status in full_row['attendance'].items()} == decode(row, 31)
+
+    arrays = client.get(f'/api/attendance/monthly/compact?batch_id={batch.id}&month=3&year=2025'
+                        f'&encoding=array').get_json()['data']['students']
+    first = full['students'][0]['attendance']
+    assert [compact['codes'][code] if code is not None else None for code in arrays[0][2]] == \
+        [first[str(day)] for day in range(1, 32)]
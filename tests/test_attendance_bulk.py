@@ -0,0 +1,92 @@
+"""
+Tests for the set-based attendance sheet upsert (services/attendance_bulk.py)
+"""
+from conftest import login_as, count_queries, make_teacher, make_batch, make_students
+from models import db, Attendance, AttendanceStatus, SmsOutbox
+from services.sms_ledger import credit
+
+
+def sheet(batch, students, status='present', date='2025-03-03'):
+    return {
+        'batchId': batch.id,
+        'date': date,
+        'attendanceData': [{'userId': s.id, 'status': status(s) if callable(status) else status}
+                           for s in students]
+    }
+
+
+def post_sheet(client, batch, students, status='present', url='/api/attendance/bulk'):
+    return client.post(url, json=sheet(batch, students, status))
+
+
+def test_statement_count_does_not_grow_with_the_batch(app, client):
+    teacher = make_teacher()
+    small, large = make_batch('Small'), make_batch('Large')
+    small_students = make_students(small, 20)
+    large_students = make_students(large, 200, start=100)
+    login_as(client, teacher)
+
+    small_sheet, large_sheet = sheet(small, small_students), sheet(large, large_students)
+    db.session.expire_all()
+    with count_queries() as small_statements:
+        assert client.post('/api/attendance/bulk', json=small_sheet).status_code == 200
+    db.session.expire_all()
+    with count_queries() as large_statements:
+        response = client.post('/api/attendance/bulk', json=large_sheet)
+    assert len(large_statements) == len(small_statements)
+    data = response.get_json()['data']
+    assert data['attendance_marked'] == data['attendance_changed'] == 200
+    assert {change['action'] for change in data['changes']} == {'created'}
+    assert Attendance.query.filter_by(batch_id=large.id).count() == 200
+
+
+def test_only_changed_rows_are_written_and_returned(app, client):
+    teacher = make_teacher()
+    batch = make_batch()
+    students = make_students(batch, 5)
+    outsider = make_students(make_batch('Other'), 1, start=50)[0]
+    login_as(client, teacher)
+
+    assert post_sheet(client, batch, students).status_code == 200
+    first_update = Attendance.query.filter_by(user_id=students[0].id).one().updated_at
+
+    # Same sheet again: nothing changes
+    unchanged = post_sheet(client, batch, students).get_json()['data']
+    assert unchanged['attendance_marked'] == 5
+    assert unchanged['attendance_changed'] == 0
+    db.session.expire_all()
+    assert Attendance.query.filter_by(user_id=students[0].id).one().updated_at == first_update
+
+    # One student turns absent; a student of another batch is ignored
+    changed = post_sheet(client, batch, students + [outsider],
+                         status=lambda s: 'absent' if s is students[2] else 'present').get_json()['data']
+    assert changed['attendance_marked'] == 5
+    assert changed['changes'] == [{'userId': students[2].id, 'status': 'absent', 'action': 'updated'}]
+    assert Attendance.query.filter_by(user_id=students[2].id).one().status == AttendanceStatus.ABSENT
+    assert Attendance.query.filter_by(user_id=outsider.id).count() == 0
+
+    response = post_sheet(client, batch, students, status='sick')
+    assert response.status_code == 400
+    assert "Invalid attendance status 'sick'" in response.get_json()['error']
+    bad_id = sheet(batch, students)
+    bad_id['attendanceData'][0]['userId'] = 'abc'
+    response = client.post('/api/attendance/bulk', json=bad_id)
+    assert response.status_code == 400
+    assert "Invalid student ID 'abc'" in response.get_json()['error']
+
+
+def test_absent_sms_goes_out_even_when_the_sheet_was_already_saved(app, client):
+    teacher = make_teacher()
+    batch = make_batch()
+    students = make_students(batch, 3)
+    credit(10)
+    db.session.commit()
+    login_as(client, teacher)
+
+    absent_first = lambda s: 'absent' if s is students[0] else 'present'
+    post_sheet(client, batch, students, status=absent_first)
+    data = post_sheet(client, batch, students, status=absent_first,
+                      url='/api/attendance/bulk-absent-sms').get_json()['data']
+    assert data['attendance_changed'] == 0
+    assert data['absent_count'] == 1
+    assert SmsOutbox.query.filter_by(job_id=data['sms_job_id']).count() == 2
@@ -0,0 +1,85 @@
+"""
+Tests for the streaming yearly attendance export (services/attendance_report.py)
+"""
+import csv
+import io
+import json
+from datetime import date
+
+from conftest import login_as, count_queries, make_teacher, make_batch, make_students
+from models import db, Attendance, AttendanceStatus
+
+
+def add_year(batch, students):
+    statuses = list(AttendanceStatus)
+    db.session.add_all([
+        Attendance(user_id=s.id, batch_id=batch.id, date=date(2024, month, day), status=statuses[(i + day) % 4])
+        for i, s in enumerate(students) for month in (1, 2, 12) for day in range(1, 29) if (i + day) % 3
+    ])
+
+
+def test_csv_export_streams_one_line_per_student(app, client):
+    teacher = make_teacher()
+    batch, other = make_batch(), make_batch('Other')
+    students = make_students(batch, 4)
+    add_year(batch, students)
+    # Other batches and other years stay out of the sheet
+    db.session.add(Attendance(user_id=students[0].id, batch_id=other.id, date=date(2024, 3, 1),
+                              status=AttendanceStatus.PRESENT))
+    db.session.add(Attendance(user_id=students[0].id, batch_id=batch.id, date=date(2025, 1, 1),
+                              status=AttendanceStatus.PRESENT))
+    db.session.commit()
+    login_as(client, teacher)
+
+    response = client.get(f'/api/attendance/yearly/export?batch_id={batch.id}&year=2024')
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == 'text/csv'
+    assert 'attachment' in response.headers['Content-Disposition']
+
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    header, body = rows[0], rows[1:]
+    assert len(header) == 2 + 366 + 4  # 2024 is a leap year
+    assert header[2] == '2024-01-01' and header[-4:] == ['present', 'absent', 'late', 'holiday']
+    assert [int(row[0]) for row in body] == [s.id for s in students]
+
+    for row in body:
+        records = Attendance.query.filter(Attendance.user_id == int(row[0]), Attendance.batch_id == batch.id,
+                                          Attendance.date < date(2025, 1, 1)).all()
+        expected = {record.date.isoformat(): record.status.value[0].upper() for record in records}
+        assert {day: code for day, code in zip(header[2:-4], row[2:-4]) if code} == expected
+        assert int(row[-4]) == sum(1 for record in records if record.status == AttendanceStatus.PRESENT)
+
+
+def test_ndjson_export_matches_the_monthly_sheet(app, client):
+    teacher = make_teacher()
+    batch = make_batch()
+    students = make_students(batch, 3)
+    add_year(batch, students)
+    db.session.commit()
+    login_as(client, teacher)
+
+    lines = client.get(f'/api/attendance/yearly/export?batch_id={batch.id}&year=2024&format=ndjson') \
+        .get_data(as_text=True).splitlines()
+    rows = [json.loads(line) for line in lines]
+    february = client.get(f'/api/attendance/monthly?batch_id={batch.id}&month=2&year=2024') \
+        .get_json()['data']['students']
+    for row, sheet_row in zip(rows, february):
+        assert row['student_id'] == sheet_row['id'] and row['student_name'] == sheet_row['name']
+        assert row['attendance'][31:60] == [sheet_row['attendance'][str(day)] for day in range(1, 30)]
+
+    # The statement count does not depend on the number of students
+    large_batch = make_batch('Large')
+    add_year(large_batch, make_students(large_batch, 40, start=100))
+    large_url = f'/api/attendance/yearly/export?batch_id={large_batch.id}&year=2024&format=ndjson'
+    db.session.commit()
+    db.session.expire_all()
+    with count_queries() as small:
+        client.get(f'/api/attendance/yearly/export?batch_id={batch.id}&year=2024&format=ndjson').get_data()
+    db.session.expire_all()
+    with count_queries() as large:
+        body = client.get(large_url).get_data()
+    assert len(large) == len(small)
+    assert len(body.splitlines()) == 40
+
+    assert client.get(f'/api/attendance/yearly/export?batch_id={batch.id}&year=2024&format=xlsx').status_code == 400
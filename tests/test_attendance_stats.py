@@ -0,0 +1,88 @@
+"""
+Tests for the attendance_monthly_stats rollup (services/attendance_stats.py)
+"""
+from datetime import date, timedelta
+
+from conftest import login_as, make_teacher, make_batch, make_students
+from models import db, Attendance, AttendanceMonthlyStats, AttendanceStatus
+from services.attendance_stats import (AttendanceCounts, month_counts, range_counts, rebuild_attendance_stats,
+                                       _attendance_counts)
+
+
+def stats_rows():
+    return sorted((r.batch_id, r.year, r.month, r.user_id, r.present, r.absent, r.late, r.holiday)
+                  for r in AttendanceMonthlyStats.query if r.present or r.absent or r.late or r.holiday)
+
+
+def test_counts_follow_every_attendance_write(app, client):
+    teacher = make_teacher()
+    batch = make_batch()
+    students = make_students(batch, 3)
+    login_as(client, teacher)
+
+    for day, status in (('2025-03-03', 'present'), ('2025-03-04', 'late'), ('2025-03-05', 'absent')):
+        client.post('/api/attendance/bulk', json={
+            'batchId': batch.id, 'date': day,
+            'attendanceData': [{'userId': s.id, 'status': status} for s in students]
+        })
+    # Re-marking a day moves the count instead of adding one
+    client.post('/api/attendance/bulk', json={
+        'batchId': batch.id, 'date': '2025-03-05',
+        'attendanceData': [{'userId': students[0].id, 'status': 'present'}]
+    })
+    db.session.add(Attendance(user_id=students[1].id, batch_id=batch.id, date=date(2025, 4, 1),
+                              status=AttendanceStatus.HOLIDAY))
+    db.session.commit()
+    record = Attendance.query.filter_by(user_id=students[2].id, date=date(2025, 3, 3)).one()
+    record.date = date(2025, 4, 2)
+    db.session.delete(Attendance.query.filter_by(user_id=students[1].id, date=date(2025, 3, 4)).one())
+    db.session.commit()
+
+    march = month_counts(batch.id, 2025, 3)
+    assert march[students[0].id] == AttendanceCounts(present=2, late=1)
+    assert march[students[1].id] == AttendanceCounts(present=1, absent=1)
+    assert march[students[2].id] == AttendanceCounts(late=1, absent=1)
+    assert month_counts(batch.id, 2025, 4, [students[1].id]) == {students[1].id: AttendanceCounts(holiday=1)}
+    assert month_counts(batch.id, 2025, 4, []) == {}
+
+    # A rebuild from attendance gives the same counts
+    before = stats_rows()
+    rebuild_attendance_stats(db.session.connection())
+    db.session.expire_all()
+    assert stats_rows() == before
+
+
+def test_range_counts_and_summary_match_the_attendance_table(app, client):
+    teacher = make_teacher()
+    batch, other = make_batch(), make_batch('Other')
+    students = make_students(batch, 4)
+    statuses = list(AttendanceStatus)
+    day, rows = date(2025, 1, 20), []
+    while day <= date(2025, 4, 10):
+        rows += [Attendance(user_id=s.id, batch_id=batch.id, date=day, status=statuses[(i + day.day) % 4])
+                 for i, s in enumerate(students) if (i + day.day) % 5]
+        day += timedelta(days=1)
+    rows.append(Attendance(user_id=students[0].id, batch_id=other.id, date=date(2025, 2, 14),
+                           status=AttendanceStatus.PRESENT))
+    db.session.add_all(rows)
+    db.session.commit()
+
+    ranges = [
+        (None, None), (date(2025, 2, 1), date(2025, 3, 31)), (date(2025, 1, 25), date(2025, 3, 31)),
+        (date(2025, 2, 1), date(2025, 4, 5)), (date(2025, 2, 10), date(2025, 2, 20)),
+        (date(2025, 1, 31), None), (None, date(2025, 2, 27)), (date(2025, 3, 5), date(2025, 3, 1)),
+    ]
+    for start, end in ranges:
+        assert range_counts(start, end) == _attendance_counts(start, end), (start, end)
+        assert range_counts(start, end, batch_id=batch.id, user_ids=[students[0].id]) == \
+            _attendance_counts(start, end, batch.id, [students[0].id]), (start, end)
+
+    login_as(client, teacher)
+    summary = client.get(f'/api/attendance/summary?batch_id={batch.id}'
+                         f'&start_date=2025-02-10&end_date=2025-03-15').get_json()['data']
+    expected = _attendance_counts(date(2025, 2, 10), date(2025, 3, 15), batch.id)
+    assert [row['student_id'] for row in summary] == [s.id for s in students]
+    for row in summary:
+        counts = expected[row['student_id']]
+        assert (row['total_days'], row['present_days'], row['absent_days']) == \
+            (counts.total, counts.present, counts.absent)
@@ -0,0 +1,88 @@
+"""
+Tests for version-keyed ETags (services/http_cache.py) and response compression
+"""
+import gzip
+import json
+from datetime import datetime
+
+from conftest import login_as, count_queries, make_teacher, make_batch, make_students
+from models import db, User, UserRole
+
+
+def test_active_batches_revalidate_until_a_tracked_table_changes(app, client):
+    teacher = make_teacher()
+    batch = make_batch()
+    make_students(batch, 3)
+    login_as(client, teacher)
+
+    first = client.get('/api/batches/active')
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+
+    with count_queries() as statements:
+        not_modified = client.get('/api/batches/active', headers={'If-None-Match': etag})
+    assert not_modified.status_code == 304
+    assert not any('FROM batches' in statement for statement in statements)
+
+    # Bookkeeping columns do not invalidate
+    teacher.last_login = datetime.utcnow()
+    db.session.commit()
+    assert client.get('/api/batches/active', headers={'If-None-Match': etag}).status_code == 304
+
+    # A many-to-many change does
+    make_students(batch, 1, start=10)
+    changed = client.get('/api/batches/active', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert changed.get_json()['data']['batches'][0]['student_count'] == 4
+
+
+def test_bulk_updates_through_the_session_invalidate(app, client):
+    teacher = make_teacher()
+    make_students(make_batch(), 2)
+    login_as(client, teacher)
+
+    etag = client.get('/api/dashboard/stats').headers['ETag']
+    User.query.filter(User.role == UserRole.STUDENT).update({User.is_archived: True}, synchronize_session=False)
+    db.session.commit()
+
+    response = client.get('/api/dashboard/stats', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['totalStudents'] == 0
+
+
+def test_large_json_is_gzipped_and_compressed_etags_revalidate(app, client):
+    teacher = make_teacher()
+    make_students(make_batch(), 40)
+    login_as(client, teacher)
+
+    plain = client.get('/api/students')
+    assert len(plain.data) > app.config['COMPRESSION_MIN_SIZE']
+    assert 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.headers['Vary']
+
+    zipped = client.get('/api/students', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(zipped.data))['data'] == plain.get_json()['data']
+
+    app.config['COMPRESSION_MIN_SIZE'] = 64
+    identity_etag = client.get('/api/dashboard/stats').headers['ETag']
+    stats = client.get('/api/dashboard/stats', headers={'Accept-Encoding': 'gzip'})
+    assert stats.headers['Content-Encoding'] == 'gzip'
+    assert stats.headers['ETag'] == identity_etag[:-1] + '-gzip"'
+
+    revalidated = client.get('/api/dashboard/stats',
+                             headers={'Accept-Encoding': 'gzip', 'If-None-Match': stats.headers['ETag']})
+    assert revalidated.status_code == 304
+    assert revalidated.headers['ETag'] == stats.headers['ETag']
+
+    # Below COMPRESSION_MIN_SIZE the body is sent as is
+    app.config['COMPRESSION_MIN_SIZE'] = 1024 * 1024
+    assert 'Content-Encoding' not in client.get('/api/students', headers={'Accept-Encoding': 'gzip'}).headers
+
+
+def test_static_curriculum_etag(app, client):
+    login_as(client, make_teacher())
+    first = client.get('/api/ai/curriculum/full')
+    assert first.status_code == 200
+    assert client.get('/api/ai/curriculum/full', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
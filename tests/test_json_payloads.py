@@ -0,0 +1,127 @@
+"""
+Tests for the msgspec JSON provider and the typed response payloads
+"""
+import json
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from conftest import login_as, make_teacher, make_batch, make_students, make_monthly_exam
+from models import (db, Fee, FeeStatus, MonthlyRankingCache, OnlineExam, OnlineQuestion)
+from utils.response import serialize_data, serialize_user
+
+
+def legacy_student_row(student):
+    """The dict GET /api/students built before the typed payloads"""
+    data = serialize_user(student)
+    batches = [{'id': b.id, 'name': b.name, 'description': b.description} for b in student.batches]
+    data.update({
+        'batch': batches[0] if batches else None,
+        'batchId': batches[0]['id'] if batches else None,
+        'batches': batches,
+        'batchIds': [b['id'] for b in batches],
+        'firstName': data.get('first_name', ''),
+        'lastName': data.get('last_name', ''),
+        'studentId': data.get('student_id', ''),
+        'isActive': data.get('is_active', True),
+        'guardianPhone': data.get('guardian_phone', ''),
+        'guardianName': data.get('guardian_name', ''),
+        'motherName': data.get('mother_name', ''),
+        'school': data.get('address', '')
+    })
+    return json.loads(json.dumps(serialize_data(data)))
+
+
+def test_student_list_matches_legacy_serialization(app, client):
+    teacher = make_teacher()
+    batch = make_batch()
+    batch.description = 'Class 9 - Physics'
+    first, second = make_students(batch, 2)
+    first.admission_date = date(2025, 1, 15)
+    first.exam_fee = Decimal('150.50')
+    first.address = 'Dhaka'
+    db.session.commit()
+    login_as(client, teacher)
+
+    response = client.get('/api/students')
+    assert response.status_code == 200
+    rows = response.get_json()['data']
+    assert rows == [legacy_student_row(first), legacy_student_row(second)]
+    assert rows[0]['admissionDate'] == '2025-01-15'
+    assert 'admissionDate' not in rows[1]
+
+
+def test_fee_grid_and_attendance_sheet_shapes(app, client):
+    teacher = make_teacher()
+    batch = make_batch()
+    student = make_students(batch, 1)[0]
+    db.session.add(Fee(user_id=student.id, batch_id=batch.id, amount=Decimal('500'), tf_amount=Decimal('500'),
+                       due_date=date(2025, 2, 1), paid_date=date(2025, 2, 3), status=FeeStatus.PAID))
+    db.session.commit()
+    login_as(client, teacher)
+
+    fees = client.get(f'/api/fees/load-monthly?batch_id={batch.id}&year=2025').get_json()['data']['fees']
+    months = fees[0]['months']
+    assert list(months) == [str(month) for month in range(1, 13)]
+    assert months['2'] == {'jf_amount': 0, 'tf_amount': 500.0, 'amount': 500.0, 'fee_id': 1,
+                           'status': 'paid', 'paid_date': '2025-02-03'}
+    assert months['3'] == {'jf_amount': 0, 'tf_amount': 0, 'amount': 0, 'fee_id': None,
+                           'status': None, 'paid_date': None}
+
+    sheet = client.get(f'/api/attendance/monthly?batch_id={batch.id}&month=2&year=2025').get_json()['data']
+    row = sheet['students'][0]
+    assert row['id'] == student.id and row['student_id'].startswith('STU')
+    assert list(row['attendance']) == [str(day) for day in sheet['days']]
+
+
+def test_ranking_is_served_from_stored_json_and_rebuilt_when_unreadable(app, client):
+    teacher = make_teacher()
+    batch = make_batch()
+    students = make_students(batch, 6)
+    exam = make_monthly_exam(batch, teacher)
+    url = f'/api/monthly-exams/{exam.id}/comprehensive-ranking'
+    login_as(client, teacher)
+
+    rankings = client.get(url).get_json()['data']['rankings']
+    assert [r['position'] for r in rankings] == list(range(1, 7))
+
+    login_as(client, students[0])
+    mine = client.get(url).get_json()['data']
+    assert mine['total_students'] == 6
+    assert students[0].id in [r['user_id'] for r in mine['nearby_rankings']]
+
+    # An entry in a shape the Structs no longer accept is recomputed, not served
+    MonthlyRankingCache.query.filter_by(monthly_exam_id=exam.id).update({
+        MonthlyRankingCache.payload: {'rankings': [{'user_id': 'x'}]}
+    })
+    db.session.commit()
+    assert client.get(url).get_json()['data']['total_students'] == 6
+
+
+def test_question_sets_and_provider_round_trip(app, client):
+    teacher = make_teacher()
+    exam = OnlineExam(title='Quiz', class_name='Class 9', book_name='Physics', chapter_name='Motion',
+                      duration=10, total_questions=1, created_by=teacher.id, is_published=True)
+    db.session.add(exam)
+    db.session.flush()
+    db.session.add(OnlineQuestion(exam_id=exam.id, question_text='2 + 2?', option_a='3', option_b='4',
+                                  option_c='5', option_d='22', correct_answer='B', question_order=1))
+    db.session.commit()
+    login_as(client, teacher)
+
+    question = client.get(f'/api/online-exams/{exam.id}').get_json()['data']['questions'][0]
+    assert question['correct_answer'] == 'B' and question['explanation'] is None
+
+    student = make_students(make_batch('Batch B'), 1)[0]
+    login_as(client, student)
+    started = client.post(f'/api/online-exams/{exam.id}/start').get_json()['data']
+    assert started['questions'][0]['option_b'] == '4'
+    assert 'correct_answer' not in started['questions'][0]
+    assert 'explanation' not in started['questions'][0]
+
+    # get_json() maps decode errors to ValueError, which Flask turns into a 400
+    with pytest.raises(ValueError):
+        app.json.loads('{"phone": ')
+    assert app.json.loads(b'{"phone": "01700000000"}') == {'phone': '01700000000'}
+    assert app.json.dumps({'fee': Decimal('10.50'), 'day': date(2025, 1, 2)}) == '{"fee":"10.50","day":"2025-01-02"}'
@@ -0,0 +1,83 @@
+"""
+Tests for keyset pagination and sparse fieldsets (utils/list_query.py)
+"""
+from datetime import datetime, timedelta
+
+from conftest import login_as, count_queries, make_teacher, make_batch, make_students
+from models import db, User, SmsLog, SmsStatus
+
+
+def test_student_pages_cover_the_roster_once_in_order(app, client):
+    login_as(client, make_teacher())
+    batch = make_batch()
+    make_students(batch, 7)
+    # Same names: only the id key separates them
+    twins = make_students(batch, 3, start=20)
+    for twin in twins:
+        twin.first_name, twin.last_name = 'Same', 'Name'
+    db.session.commit()
+
+    full = [row['id'] for row in client.get('/api/students').get_json()['data']]
+    seen, cursor = [], None
+    while True:
+        url = '/api/students?limit=3' + (f'&cursor={cursor}' if cursor else '')
+        body = client.get(url).get_json()
+        assert len(body['data']) <= 3
+        seen.extend(row['id'] for row in body['data'])
+        cursor = body['pagination']['next_cursor']
+        assert body['pagination']['has_next'] == (cursor is not None)
+        if not cursor:
+            break
+    assert seen == full
+    assert len(full) == 10
+
+
+def test_sparse_student_fields_skip_the_batches(app, client):
+    login_as(client, make_teacher())
+    make_students(make_batch(), 30)
+
+    with count_queries() as statements:
+        response = client.get('/api/students?fields=id,full_name')
+    rows = response.get_json()['data']
+    assert len(rows) == 30
+    assert set(rows[0]) == {'id', 'full_name'}
+    assert rows[0]['full_name'] == 'Student0000 Test'
+    assert not any('batches' in statement for statement in statements)
+
+    with_batch = client.get('/api/students?fields=id,batchId&limit=5').get_json()['data']
+    assert all(row['batchId'] for row in with_batch)
+
+
+def test_archived_students_and_sms_logs_page_by_newest_first(app, client):
+    teacher = make_teacher()
+    login_as(client, teacher)
+    students = make_students(make_batch(), 4)
+    now = datetime.utcnow()
+    for offset, student in enumerate(students):
+        student.is_archived = True
+        student.archived_at = now - timedelta(days=offset)
+        student.archived_by = teacher.id
+        db.session.add(SmsLog(phone_number=student.phoneNumber, message='Hi', status=SmsStatus.SENT,
+                              user_id=student.id, sent_by=teacher.id, created_at=now - timedelta(hours=offset)))
+    students[3].archived_at = None
+    db.session.commit()
+
+    first = client.get('/api/students/archived?limit=2&fields=id,archived_by_name').get_json()
+    assert [row['id'] for row in first['data']['students']] == [students[0].id, students[1].id]
+    assert first['data']['students'][0]['archived_by_name'] == 'Test Teacher'
+    rest = client.get(f"/api/students/archived?limit=2&cursor={first['pagination']['next_cursor']}").get_json()
+    assert [row['id'] for row in rest['data']['students']] == [students[2].id, students[3].id]
+    assert rest['pagination']['has_next'] is False
+
+    logs = client.get('/api/sms/logs?limit=3&fields=id,recipient_user').get_json()
+    assert [row['recipient_user']['id'] for row in logs['data']] == [s.id for s in students[:3]]
+    more = client.get(f"/api/sms/logs?limit=3&cursor={logs['pagination']['next_cursor']}").get_json()
+    assert [row['id'] for row in more['data']] == [SmsLog.query.filter_by(user_id=students[3].id).one().id]
+
+
+def test_invalid_list_arguments_are_rejected(app, client):
+    login_as(client, make_teacher())
+    assert client.get('/api/students?fields=id,password_hash').status_code == 400
+    assert client.get('/api/students?cursor=not-a-cursor').status_code == 400
+    assert client.get('/api/students?limit=ten').status_code == 400
+    assert client.get('/api/documents/?fields=file_path').status_code == 400
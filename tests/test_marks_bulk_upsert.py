@@ -0,0 +1,85 @@
+"""
+Tests for bulk saving of individual exam marks
+"""
+from conftest import (login_as, count_queries, make_teacher, make_batch,
+                      make_students, make_monthly_exam)
+from models import db, MonthlyMark
+
+
+def marks_url(exam, individual_exam):
+    return f'/api/monthly-exams/{exam.id}/individual-exams/{individual_exam.id}/marks'
+
+
+def test_marks_are_saved_with_constant_statement_count(app, client):
+    teacher = make_teacher()
+    batch = make_batch()
+    students = make_students(batch, 200)
+    exam = make_monthly_exam(batch, teacher)
+    individual_exam = exam.individual_exams[0]
+    login_as(client, teacher)
+
+    payload = {'students': [{'user_id': s.id, 'marks_obtained': i % 50} for i, s in enumerate(students)]}
+    with count_queries() as statements:
+        response = client.post(marks_url(exam, individual_exam), json=payload)
+    assert response.status_code == 200
+    assert response.get_json()['data']['saved_count'] == 200
+    assert response.get_json()['data']['created_count'] == 200
+
+    inserts = [s for s in statements if s.startswith('INSERT INTO monthly_marks')]
+    assert len(inserts) == 1
+    assert 'ON CONFLICT' in inserts[0]
+    assert len(statements) < 20
+    assert MonthlyMark.query.filter_by(individual_exam_id=individual_exam.id).count() == 200
+
+
+def test_resubmission_updates_changed_marks_only(app, client):
+    teacher = make_teacher()
+    batch = make_batch()
+    students = make_students(batch, 3)
+    exam = make_monthly_exam(batch, teacher)
+    individual_exam = exam.individual_exams[0]
+    login_as(client, teacher)
+
+    first = {'students': [{'user_id': s.id, 'marks_obtained': 20} for s in students]}
+    assert client.post(marks_url(exam, individual_exam), json=first).status_code == 200
+
+    second = {'students': [{'user_id': students[0].id, 'marks_obtained': 45},
+                           {'user_id': students[1].id, 'marks_obtained': 20}]}
+    response = client.post(marks_url(exam, individual_exam), json=second)
+    data = response.get_json()['data']
+    assert data['saved_count'] == 2
+    assert data['updated_count'] == 1
+    assert data['created_count'] == 0
+
+    db.session.expire_all()
+    mark = MonthlyMark.query.filter_by(individual_exam_id=individual_exam.id, user_id=students[0].id).one()
+    assert mark.marks_obtained == 45
+    assert mark.grade == 'A+'
+    assert MonthlyMark.query.filter_by(individual_exam_id=individual_exam.id).count() == 3
+
+
+def test_invalid_entries_are_reported_per_row(app, client):
+    teacher = make_teacher()
+    batch = make_batch()
+    students = make_students(batch, 2)
+    exam = make_monthly_exam(batch, teacher)
+    individual_exam = exam.individual_exams[0]
+    login_as(client, teacher)
+
+    payload = {'students': [
+        {'user_id': students[0].id, 'marks_obtained': 30},
+        {'user_id': students[1].id, 'marks_obtained': 80},
+        {'user_id': 99999, 'marks_obtained': 10},
+        {'user_id': students[1].id},
+    ]}
+    response = client.post(marks_url(exam, individual_exam), json=payload)
+    assert response.status_code == 200
+    data = response.get_json()['data']
+    assert data['saved_count'] == 1
+    errors = data['validation_errors']
+    assert any(e.startswith('Student entry 2: marks (80.0) cannot exceed') for e in errors)
+    assert 'Student entry 3: student not found (ID: 99999)' in errors
+    assert 'Student entry 4: marks_obtained is required' in errors
+
+    bad_only = {'students': [{'user_id': 99999, 'marks_obtained': 10}]}
+    assert client.post(marks_url(exam, individual_exam), json=bad_only).status_code == 400
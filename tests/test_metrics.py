@@ -0,0 +1,90 @@
+"""
+Tests for the file-backed metrics registry and the /metrics endpoint
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import login_as, make_teacher
+from services import metrics
+from test_sms_provider import make_client
+
+
+@pytest.fixture
+def metrics_dir(app, tmp_path):
+    metrics.registry.configure(str(tmp_path), 0)
+    return tmp_path
+
+
+def exited_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def test_collect_sums_processes_and_archives_exited_workers(metrics_dir):
+    metrics.inc('online_exam_answers_saved_total', 2)
+    metrics.observe('sms_provider_request_seconds', 0.2)
+    metrics.registry.flush()
+
+    # A worker that has since exited left its last flush behind
+    dead_file = metrics_dir / f'metrics_{exited_pid()}.json'
+    dead_file.write_text(json.dumps({
+        'counters': [['online_exam_answers_saved_total', [], 3]],
+        'histograms': [['sms_provider_request_seconds', [], [0] * 5 + [1] + [0] * 7 + [0.3]]]
+    }))
+
+    totals = metrics.collect(str(metrics_dir))
+    assert totals['counters'][('online_exam_answers_saved_total', ())] == 5
+    assert not dead_file.exists()
+    assert (metrics_dir / metrics.ARCHIVE_FILE).exists()
+
+    # Archived values keep counting after the file is gone
+    text = metrics.render_prometheus(metrics.collect(str(metrics_dir)))
+    assert 'online_exam_answers_saved_total 5' in text
+    assert 'sms_provider_request_seconds_bucket{le="0.25"} 2' in text
+    assert 'sms_provider_request_seconds_count 2' in text
+
+
+def test_metrics_endpoint_reports_requests_sessions_and_queues(app, client, metrics_dir):
+    teacher = make_teacher()
+    login_as(client, teacher)
+    assert client.get('/api/sms/balance').status_code == 200
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    assert 'http_requests_total{blueprint="sms",endpoint="sms.get_sms_balance",status="200"} 1' in text
+    assert 'http_request_duration_seconds_count{blueprint="sms",endpoint="sms.get_sms_balance",method="GET"} 1' in text
+    assert 'http_request_db_seconds_count{blueprint="sms"} 1' in text
+    assert 'session_store_seconds_count{operation="open"}' in text
+    assert '# TYPE sms_outbox_messages gauge' in text
+
+    # Production without a token: the host itself only, not clients relayed by nginx
+    app.config['METRICS_LOCAL_ONLY'] = True
+    assert client.get('/metrics').status_code == 200
+    assert client.get('/metrics', headers={'X-Forwarded-For': '203.0.113.7'}).status_code == 403
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '203.0.113.7'}).status_code == 403
+
+    app.config['METRICS_TOKEN'] = 'scrape-token'
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer scrape-tokem'}).status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer scrape-token',
+                                           'X-Forwarded-For': '203.0.113.7'}).status_code == 200
+
+
+def test_sms_provider_records_latency_and_errors(metrics_dir):
+    responses = iter([(200, {'response_code': 202}), (503, 'unavailable'), (200, {'response_code': 1007})])
+    client, _ = make_client(lambda request: next(responses))
+    for _ in range(3):
+        client.send('01812345678', 'Hello')
+
+    totals = metrics.collect(str(metrics_dir))
+    assert totals['counters'][('sms_provider_requests_total', (('result', 'ok'),))] == 1
+    assert totals['counters'][('sms_provider_requests_total', (('result', 'retryable_error'),))] == 1
+    assert totals['counters'][('sms_provider_requests_total', (('result', 'error'),))] == 1
+    assert sum(totals['histograms'][('sms_provider_request_seconds', ())][:-1]) == 3
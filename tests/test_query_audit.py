@@ -0,0 +1,52 @@
+"""
+Tests for hot-path indexes and the EXPLAIN QUERY PLAN auditor
+"""
+from conftest import login_as, make_teacher, make_batch, make_students
+from models import db
+from services.query_audit import audit_queries, init_query_capture, load_capture
+
+
+def plan_for(statement):
+    return audit_queries(db.engine, [{'statement': statement, 'parameters': [1, '2025-03-03']}])[0]
+
+
+def test_hot_path_queries_use_the_new_indexes(app):
+    assert 'idx_attendance_batch_date_status' in ' '.join(
+        plan_for('SELECT * FROM attendance WHERE batch_id = ? AND date = ?')['plan'])
+    assert 'idx_sms_logs_sent_by_created_at' in ' '.join(
+        plan_for('SELECT * FROM sms_logs WHERE sent_by = ? AND created_at >= ?')['plan'])
+    assert 'idx_fees_batch_due_date' in ' '.join(
+        plan_for('SELECT * FROM fees WHERE batch_id = ? AND due_date < ?')['plan'])
+    assert 'idx_user_batches_batch_id' in ' '.join(
+        plan_for('SELECT user_id FROM user_batches WHERE batch_id = ? AND enrollment_date < ?')['plan'])
+
+
+def test_full_scans_are_flagged_through_aliases(app):
+    finding = audit_queries(db.engine, [
+        {'statement': 'SELECT users_1.id FROM users AS users_1 WHERE users_1.guardian_name = ?', 'parameters': ['A']},
+        {'statement': 'SELECT * FROM settings WHERE value = ?', 'parameters': ['x']},
+        {'statement': 'SELECT * FROM missing_table', 'parameters': []},
+    ])
+    assert finding[0]['full_scans'] == ['users']
+    assert finding[1]['full_scans'] == []  # Small table on the allow list
+    assert 'error' in finding[2]
+
+
+def test_captured_requests_replay_without_full_scans_on_attendance(app, client, tmp_path):
+    capture = tmp_path / 'queries.jsonl'
+    app.config['SQL_CAPTURE_FILE'] = str(capture)
+    init_query_capture(app, db)
+
+    teacher = make_teacher()
+    batch = make_batch()
+    teacher.batches.append(batch)
+    make_students(batch, 3)
+    db.session.commit()
+    login_as(client, teacher)
+    assert client.get(f'/api/attendance?batch_id={batch.id}&date=2025-03-03').status_code == 200
+
+    queries = load_capture(capture)
+    attendance_queries = [q for q in queries if 'FROM attendance' in q['statement']]
+    assert attendance_queries
+    for finding in audit_queries(db.engine, attendance_queries):
+        assert 'attendance' not in finding['full_scans'], finding['plan']
@@ -0,0 +1,111 @@
+"""
+Tests for the persistent comprehensive ranking cache
+"""
+from conftest import (login_as, count_queries, make_teacher, make_batch,
+                      make_students, make_monthly_exam)
+from models import db, MonthlyRankingCache
+
+
+def ranking_url(exam):
+    return f'/api/monthly-exams/{exam.id}/comprehensive-ranking'
+
+
+def test_second_read_is_served_from_cache_with_etag(app, client):
+    teacher = make_teacher()
+    batch = make_batch()
+    make_students(batch, 20)
+    exam = make_monthly_exam(batch, teacher)
+    login_as(client, teacher)
+
+    first = client.get(ranking_url(exam))
+    assert first.status_code == 200
+    assert first.headers['ETag']
+
+    with count_queries() as statements:
+        second = client.get(ranking_url(exam))
+    assert second.status_code == 200
+    assert second.headers['ETag'] == first.headers['ETag']
+    assert second.get_json()['data']['rankings'] == first.get_json()['data']['rankings']
+    assert not any('monthly_marks' in statement for statement in statements)
+
+    not_modified = client.get(ranking_url(exam), headers={'If-None-Match': first.headers['ETag']})
+    assert not_modified.status_code == 304
+
+
+def test_marks_submission_invalidates_cache(app, client):
+    teacher = make_teacher()
+    batch = make_batch()
+    students = make_students(batch, 2)
+    exam = make_monthly_exam(batch, teacher)
+    login_as(client, teacher)
+
+    before = client.get(ranking_url(exam))
+    individual_exam = exam.individual_exams[0]
+    response = client.post(
+        f'/api/monthly-exams/{exam.id}/individual-exams/{individual_exam.id}/marks',
+        json={'students': [{'user_id': students[1].id, 'marks_obtained': 45}]}
+    )
+    assert response.status_code == 200
+    assert MonthlyRankingCache.query.filter_by(monthly_exam_id=exam.id).one().payload is None
+
+    after = client.get(ranking_url(exam))
+    assert after.headers['ETag'] != before.headers['ETag']
+    assert after.get_json()['data']['rankings'][0]['user_id'] == students[1].id
+
+    revalidated = client.get(ranking_url(exam), headers={'If-None-Match': before.headers['ETag']})
+    assert revalidated.status_code == 200
+
+
+def test_attendance_invalidates_only_that_month(app, client):
+    teacher = make_teacher()
+    batch = make_batch()
+    students = make_students(batch, 2)
+    march = make_monthly_exam(batch, teacher, month=3)
+    april = make_monthly_exam(batch, teacher, month=4)
+    login_as(client, teacher)
+    client.get(ranking_url(march))
+    client.get(ranking_url(april))
+
+    response = client.post('/api/attendance/bulk', json={
+        'batchId': batch.id,
+        'date': '2025-03-10',
+        'attendanceData': [{'userId': s.id, 'status': 'present'} for s in students]
+    })
+    assert response.status_code == 200
+
+    db.session.expire_all()
+    assert MonthlyRankingCache.query.filter_by(monthly_exam_id=march.id).one().payload is None
+    assert MonthlyRankingCache.query.filter_by(monthly_exam_id=april.id).one().payload is not None
+    rankings = client.get(ranking_url(march)).get_json()['data']['rankings']
+    assert all(r['attendance_marks'] == 1 for r in rankings)
+
+
+def test_roster_changes_invalidate_cache_and_etag(app, client):
+    teacher = make_teacher()
+    batch = make_batch()
+    students = make_students(batch, 2)
+    newcomer = make_students(make_batch('Other'), 1, start=2)[0]
+    exam = make_monthly_exam(batch, teacher)
+    login_as(client, teacher)
+
+    def ranking():
+        response = client.get(ranking_url(exam))
+        return response.headers['ETag'], [r['student_name'] for r in response.get_json()['data']['rankings']]
+
+    etag, names = ranking()
+    assert len(names) == 2
+
+    assert client.post(f'/api/batches/{batch.id}/students', json={'student_id': newcomer.id}).status_code == 200
+    enrolled_etag, names = ranking()
+    assert enrolled_etag != etag and len(names) == 3
+
+    assert client.put(f'/api/students/{students[0].id}', json={'firstName': 'Renamed'}).status_code == 200
+    renamed_etag, names = ranking()
+    assert renamed_etag != enrolled_etag and 'Renamed Test' in names
+
+    assert client.post(f'/api/students/{students[1].id}/archive', json={}).status_code == 200
+    archived_etag, names = ranking()
+    assert archived_etag != renamed_etag and len(names) == 2
+
+    assert client.get(ranking_url(exam), headers={'If-None-Match': archived_etag}).status_code == 304
+    assert client.get(ranking_url(exam), headers={'If-None-Match': etag}).status_code == 200
@@ -0,0 +1,199 @@
+"""
+Tests for the set-based monthly ranking engine
+"""
+from datetime import date
+
+from conftest import (login_as, count_queries, make_teacher, make_batch,
+                      make_students, make_monthly_exam)
+from models import (db, MonthlyMark, MonthlyRanking, Attendance, AttendanceStatus)
+from services import ranking_engine
+from services.ranking_engine import compute_comprehensive_ranking
+
+
+def add_marks(exam, students, scores):
+    for student, score in zip(students, scores):
+        for individual_exam in exam.individual_exams:
+            db.session.add(MonthlyMark(
+                monthly_exam_id=exam.id,
+                individual_exam_id=individual_exam.id,
+                user_id=student.id,
+                marks_obtained=score,
+                total_marks=individual_exam.marks,
+                percentage=score / individual_exam.marks * 100
+            ))
+    db.session.commit()
+
+
+def test_ranking_orders_by_percentage_and_counts_attendance(app):
+    teacher = make_teacher()
+    batch = make_batch()
+    students = make_students(batch, 3)
+    exam = make_monthly_exam(batch, teacher)
+    add_marks(exam, students, [30, 45, 20])
+
+    # Two present days for the weakest student lift only their attendance marks
+    for day in (3, 4):
+        db.session.add(Attendance(user_id=students[2].id, batch_id=batch.id,
+                                  date=date(2025, 3, day), status=AttendanceStatus.PRESENT))
+    db.session.commit()
+
+    snapshot = compute_comprehensive_ranking(exam)
+    by_user = {r['user_id']: r for r in snapshot.rankings}
+
+    assert [r['user_id'] for r in snapshot.rankings] == [students[1].id, students[0].id, students[2].id]
+    assert [r['position'] for r in snapshot.rankings] == [1, 2, 3]
+    assert by_user[students[1].id]['total_exam_marks'] == 90
+    assert by_user[students[2].id]['attendance_marks'] == 2
+    assert by_user[students[2].id]['max_attendance_marks'] == 21  # Mon-Fri in March 2025
+    assert by_user[students[0].id]['position_trend'] == 'new'
+
+
+def test_roll_numbers_inherit_from_previous_month(app):
+    teacher = make_teacher()
+    batch = make_batch()
+    students = make_students(batch, 2)
+    previous = make_monthly_exam(batch, teacher, month=2)
+    current = make_monthly_exam(batch, teacher, month=3)
+    db.session.add(MonthlyRanking(monthly_exam_id=previous.id, user_id=students[0].id,
+                                  position=4, roll_number=7, is_final=True))
+    db.session.commit()
+
+    snapshot = compute_comprehensive_ranking(current)
+    by_user = {r['user_id']: r for r in snapshot.rankings}
+
+    assert snapshot.previous_exam.id == previous.id
+    assert snapshot.previous_roll_numbers == {students[0].id: 7}
+    assert by_user[students[0].id]['roll_number'] == 7
+    assert by_user[students[0].id]['previous_position'] == 4
+    assert by_user[students[1].id]['roll_number'] is None
+
+
+def test_query_count_is_independent_of_batch_size(app):
+    teacher = make_teacher()
+    small_batch = make_batch('Small')
+    large_batch = make_batch('Large')
+    small_exam = make_monthly_exam(small_batch, teacher, subjects=('A', 'B', 'C', 'D', 'E', 'F'))
+    large_exam = make_monthly_exam(large_batch, teacher, subjects=('A', 'B', 'C', 'D', 'E', 'F'))
+    add_marks(small_exam, make_students(small_batch, 5), [25] * 5)
+    add_marks(large_exam, make_students(large_batch, 120, start=100), [25] * 120)
+    db.session.expire_all()
+
+    with count_queries() as small_queries:
+        compute_comprehensive_ranking(small_exam)
+    db.session.expire_all()
+    with count_queries() as large_queries:
+        compute_comprehensive_ranking(large_exam)
+
+    assert len(large_queries) == len(small_queries)
+    assert len(large_queries) <= 8
+
+
+def test_generate_ranking_endpoint_persists_engine_result(app, client):
+    teacher = make_teacher()
+    batch = make_batch()
+    students = make_students(batch, 3)
+    exam = make_monthly_exam(batch, teacher)
+    add_marks(exam, students, [10, 40, 25])
+    login_as(client, teacher)
+
+    response = client.get(f'/api/monthly-exams/{exam.id}/comprehensive-ranking')
+    assert response.status_code == 200
+    assert [r['user_id'] for r in response.get_json()['data']['rankings']] == [
+        students[1].id, students[2].id, students[0].id]
+
+    response = client.post(f'/api/monthly-exams/{exam.id}/generate-ranking')
+    assert response.status_code == 200
+    assert response.get_json()['data']['rankings_count'] == 3
+
+    saved = MonthlyRanking.query.filter_by(monthly_exam_id=exam.id).order_by(MonthlyRanking.position).all()
+    assert [r.user_id for r in saved] == [students[1].id, students[2].id, students[0].id]
+    assert all(r.is_final for r in saved)
+
+
+def test_marks_submission_updates_generated_rankings_incrementally(app, client):
+    teacher = make_teacher()
+    batch = make_batch()
+    students = make_students(batch, 30)
+    exam = make_monthly_exam(batch, teacher)
+    add_marks(exam, students, [i % 40 for i in range(30)])
+    login_as(client, teacher)
+    assert client.post(f'/api/monthly-exams/{exam.id}/generate-ranking').status_code == 200
+
+    # Lift the last-placed student to the top in one subject
+    last = MonthlyRanking.query.filter_by(monthly_exam_id=exam.id).order_by(MonthlyRanking.position.desc()).first()
+    last_user_id, last_roll, last_total = last.user_id, last.roll_number, last.total_exam_marks
+    individual_exam = exam.individual_exams[0]
+    with count_queries() as statements:
+        response = client.post(
+            f'/api/monthly-exams/{exam.id}/individual-exams/{individual_exam.id}/marks',
+            json={'students': [{'user_id': last_user_id, 'marks_obtained': 50}]}
+        )
+    assert response.status_code == 200
+    ranking_updates = [s for s in statements if s.startswith('UPDATE monthly_rankings')]
+    assert 0 < len(ranking_updates) < 30
+    assert not any(s.startswith('DELETE FROM monthly_rankings') for s in statements)
+
+    db.session.expire_all()
+    saved = MonthlyRanking.query.filter_by(monthly_exam_id=exam.id).order_by(MonthlyRanking.position).all()
+    expected = compute_comprehensive_ranking(exam).rankings
+    assert [r.user_id for r in saved] == [r['user_id'] for r in expected]
+    assert [r.position for r in saved] == list(range(1, 31))
+    moved = next(r for r in saved if r.user_id == last_user_id)
+    assert moved.total_exam_marks == 50 + last_total / 2
+    assert moved.roll_number == last_roll
+
+
+def test_rename_keeps_saved_rankings_in_key_order(app, client):
+    teacher = make_teacher()
+    batch = make_batch()
+    students = make_students(batch, 4)
+    exam = make_monthly_exam(batch, teacher)
+    add_marks(exam, students, [30, 30, 30, 10])
+    login_as(client, teacher)
+    assert client.post(f'/api/monthly-exams/{exam.id}/generate-ranking').status_code == 200
+
+    # A rename moves the first student behind its equals
+    assert client.put(f'/api/students/{students[0].id}', json={'firstName': 'Student9999'}).status_code == 200
+    db.session.expire_all()
+    saved = MonthlyRanking.query.filter_by(monthly_exam_id=exam.id).order_by(MonthlyRanking.position).all()
+    assert [r.user_id for r in saved] == [students[1].id, students[2].id, students[0].id, students[3].id]
+
+    individual_exam = exam.individual_exams[0]
+    assert client.post(
+        f'/api/monthly-exams/{exam.id}/individual-exams/{individual_exam.id}/marks',
+        json={'students': [{'user_id': students[3].id, 'marks_obtained': 20}]}
+    ).status_code == 200
+
+    db.session.expire_all()
+    saved = MonthlyRanking.query.filter_by(monthly_exam_id=exam.id).order_by(MonthlyRanking.position).all()
+    assert [r.user_id for r in saved] == [students[1].id, students[2].id, students[0].id, students[3].id]
+    assert [r.user_id for r in saved] == [r['user_id'] for r in compute_comprehensive_ranking(exam).rankings]
+
+
+def test_failed_incremental_update_leaves_saved_rankings_untouched(app, client, monkeypatch):
+    teacher = make_teacher()
+    batch = make_batch()
+    students = make_students(batch, 3)
+    exam = make_monthly_exam(batch, teacher)
+    add_marks(exam, students, [30, 20, 10])
+    login_as(client, teacher)
+    assert client.post(f'/api/monthly-exams/{exam.id}/generate-ranking').status_code == 200
+    last = MonthlyRanking.query.filter_by(monthly_exam_id=exam.id, user_id=students[2].id).one()
+    last_total = last.final_total
+
+    def fail(keys, key):
+        raise ValueError('lost key')
+
+    monkeypatch.setattr(ranking_engine, 'insort', fail)
+    individual_exam = exam.individual_exams[0]
+    assert client.post(
+        f'/api/monthly-exams/{exam.id}/individual-exams/{individual_exam.id}/marks',
+        json={'students': [{'user_id': students[2].id, 'marks_obtained': 50}]}
+    ).status_code == 200
+
+    db.session.expire_all()
+    # The marks are saved; the ranking row keeps its old total and position
+    assert MonthlyMark.query.filter_by(individual_exam_id=individual_exam.id,
+                                       user_id=students[2].id).one().marks_obtained == 50
+    last = MonthlyRanking.query.filter_by(monthly_exam_id=exam.id, user_id=students[2].id).one()
+    assert (last.final_total, last.position) == (last_total, 3)
@@ -0,0 +1,63 @@
+"""
+Tests for the super-user request profiler and the profile admin routes
+"""
+import os
+
+import pytest
+
+from conftest import login_as, make_teacher
+from models import db, User, UserRole
+
+
+@pytest.fixture
+def profile_dir(app, tmp_path):
+    app.config['PROFILER_DIR'] = str(tmp_path)
+    return tmp_path
+
+
+def make_super_user():
+    user = User(phoneNumber='01900000000', first_name='Super', last_name='User', role=UserRole.SUPER_USER)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def test_super_user_profile_is_stored_and_listed(app, client, profile_dir):
+    login_as(client, make_super_user())
+
+    response = client.get('/api/sms/balance', headers={'X-Profile': '1'})
+    assert response.status_code == 200
+    profile_id = response.headers['X-Profile-Id']
+    assert (profile_dir / f'{profile_id}.prof').exists()
+
+    listing = client.get('/api/profiles').get_json()['data']
+    assert [p['id'] for p in listing['profiles']] == [profile_id]
+    assert listing['profiles'][0]['endpoint'] == 'sms.get_sms_balance'
+
+    profile = client.get(f'/api/profiles/{profile_id}').get_json()['data']
+    assert profile['sql_count'] == len(profile['sql']) >= 1
+    assert all(entry['offset_ms'] >= 0 for entry in profile['sql'])
+    assert profile['call_tree'] and profile['top_functions']
+
+    download = client.get(f'/api/profiles/{profile_id}/download')
+    assert download.status_code == 200
+    assert download.data
+
+    assert client.delete(f'/api/profiles/{profile_id}').status_code == 200
+    assert os.listdir(profile_dir) == []
+
+
+def test_profile_flag_is_ignored_for_other_roles(app, client, profile_dir):
+    login_as(client, make_teacher())
+
+    response = client.get('/api/sms/balance?_profile=1')
+    assert response.status_code == 200
+    assert 'X-Profile-Id' not in response.headers
+    assert os.listdir(profile_dir) == []
+    assert client.get('/api/profiles').status_code == 403
+
+
+def test_profile_ids_cannot_escape_the_profile_directory(app, client, profile_dir):
+    login_as(client, make_super_user())
+    assert client.get('/api/profiles/..%2Fsecret').status_code == 404
+    assert client.get('/api/profiles/missing/download').status_code == 404
@@ -0,0 +1,109 @@
+"""
+Tests for the SMS balance ledger
+"""
+from datetime import date
+
+import pytest
+
+from conftest import login_as, make_teacher, make_batch, make_students
+from models import db, Settings, SmsLedgerEntry, SmsOutbox, UserRole, User
+from services.sms_ledger import (InsufficientSmsBalance, adjust, credit, get_balance, reconciliation_report,
+                                 reserve, settle)
+from services.sms_outbox import dispatch_once, enqueue_sms
+
+
+def test_opening_balance_is_migrated_from_settings(app):
+    db.session.add(Settings(key='sms_balance', value={'balance': 40}, category='sms'))
+    db.session.commit()
+
+    assert get_balance() == {'balance': 40, 'reserved': 0, 'available': 40}
+    opening = SmsLedgerEntry.query.one()
+    assert opening.entry_type == 'opening'
+    assert opening.amount == 40
+
+    # Later edits to the legacy setting no longer move the balance
+    Settings.query.filter_by(key='sms_balance').one().value = {'balance': 999}
+    db.session.commit()
+    assert get_balance()['balance'] == 40
+
+
+def test_reserve_and_settle_keep_ledger_and_account_in_step(app):
+    credit(10)
+    reserve(6, 'job-a')
+    with pytest.raises(InsufficientSmsBalance):
+        reserve(5, 'job-b')
+    assert get_balance() == {'balance': 10, 'reserved': 6, 'available': 4}
+
+    # Four used, two released back
+    settle('job-a', 6, 4)
+    db.session.commit()
+    assert get_balance() == {'balance': 6, 'reserved': 0, 'available': 6}
+
+    entries = SmsLedgerEntry.query.order_by(SmsLedgerEntry.id).all()
+    assert [e.entry_type for e in entries] == ['opening', 'credit', 'reserve', 'settle']
+    assert sum(e.amount for e in entries) == 6
+    assert sum(e.reserved_change for e in entries) == 0
+    assert entries[-1].balance_after == 6
+
+
+def test_send_is_rejected_when_balance_is_insufficient(app, client):
+    teacher = make_teacher()
+    credit(2)
+    db.session.commit()
+    login_as(client, teacher)
+
+    response = client.post('/api/sms/send', json={
+        'recipients': ['01811111111', '01822222222', '01833333333'],
+        'message': 'Hello'
+    })
+    assert response.status_code == 400
+    assert 'Insufficient SMS balance' in response.get_json()['error']
+    assert SmsOutbox.query.count() == 0
+    assert get_balance()['reserved'] == 0
+
+
+def test_reconciliation_matches_sms_log_costs(app, client):
+    teacher = make_teacher()
+    batch = make_batch()
+    students = make_students(batch, 4)
+    credit(20)
+    enqueue_sms([{'phone': s.phoneNumber, 'message': 'Fee reminder', 'user_id': s.id} for s in students],
+                sent_by=teacher.id, source='test')
+    db.session.commit()
+
+    bad_number = students[0].phoneNumber
+
+    def send(phone, message):
+        if phone.endswith(bad_number):
+            return {'success': False, 'error': 'Invalid number'}
+        return {'success': True}
+
+    dispatch_once(send_func=send)
+
+    report = reconciliation_report()
+    assert report['ledger_used'] == 3
+    assert report['sms_log_cost'] == 3
+    assert report['account'] == {'balance': 17, 'reserved': 0, 'available': 17}
+    assert report['balanced'] is True
+    assert report['mismatched_days'] == []
+
+    admin = User(phoneNumber='01700000099', first_name='Super', last_name='Admin', role=UserRole.SUPER_USER)
+    db.session.add(admin)
+    db.session.commit()
+    login_as(client, admin)
+    response = client.get(f'/api/sms/ledger/reconciliation?start={date.today().isoformat()}')
+    assert response.status_code == 200
+    assert response.get_json()['data']['balanced'] is True
+    assert client.get('/api/sms/ledger/reconciliation?start=yesterday').status_code == 400
+
+
+def test_adjust_sets_the_settled_balance(app):
+    credit(10)
+    reserve(4, 'job-a')
+    adjust(25, note='Set by script')
+    db.session.commit()
+    assert get_balance() == {'balance': 25, 'reserved': 4, 'available': 21}
+
+    entry = SmsLedgerEntry.query.filter_by(entry_type='adjust').one()
+    assert (entry.amount, entry.balance_after) == (15, 25)
+    assert reconciliation_report()['ledger_balance'] == 25
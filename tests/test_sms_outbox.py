@@ -0,0 +1,209 @@
+"""
+Tests for the durable SMS outbox and its dispatcher
+"""
+from datetime import datetime
+
+import pytest
+
+from conftest import login_as, make_teacher, make_batch, make_students
+from models import db, SmsLog, SmsStatus, SmsOutbox, SmsOutboxStatus
+from services.sms_ledger import credit, get_balance
+from services.sms_outbox import dispatch_once, enqueue_sms, retry_delay
+
+
+@pytest.fixture
+def no_provider(monkeypatch):
+    """Fail loudly if a route tries to call the SMS provider inline"""
+    def fail(phone, message):
+        raise AssertionError('SMS provider called inside the request')
+    monkeypatch.setattr('routes.sms.send_sms_via_api', fail)
+
+
+def set_balance(amount):
+    credit(amount)
+    db.session.commit()
+
+
+def test_bulk_send_queues_and_returns_job_id(app, client, no_provider):
+    teacher = make_teacher()
+    batch = make_batch()
+    teacher.batches.append(batch)
+    students = make_students(batch, 5)
+    set_balance(10)
+    login_as(client, teacher)
+
+    response = client.post('/api/sms/send-bulk', json={
+        'batch_id': batch.id,
+        'recipient_type': 'individual',
+        'student_ids': [s.id for s in students],
+        'use_custom_message': True,
+        'custom_message': 'Hello {student_name}'
+    })
+    assert response.status_code == 200
+    data = response.get_json()['data']
+    assert data['queued'] == 5
+    assert SmsOutbox.query.filter_by(job_id=data['job_id'], status=SmsOutboxStatus.PENDING).count() == 5
+    assert SmsLog.query.count() == 0
+
+    status = client.get(f"/api/sms/jobs/{data['job_id']}").get_json()['data']
+    assert status['total'] == 5
+    assert status['pending'] == 5
+    assert status['completed'] is False
+
+
+def test_dispatcher_sends_logs_and_charges_balance(app, client):
+    teacher = make_teacher()
+    teacher.sms_count = 10
+    batch = make_batch()
+    students = make_students(batch, 3)
+    set_balance(100)
+    job_id = enqueue_sms(
+        [{'phone': s.phoneNumber, 'message': 'Result published', 'user_id': s.id} for s in students],
+        sent_by=teacher.id, source='test', charge_sender=True
+    )
+    db.session.commit()
+
+    calls = []
+
+    def fake_send(phone, message):
+        calls.append(phone)
+        return {'success': True, 'message_id': 'ok'}
+
+    stats = dispatch_once(send_func=fake_send, concurrency=2)
+    assert stats == {'claimed': 3, 'sent': 3, 'failed': 0, 'retried': 0, 'provider_calls': 3}
+    assert sorted(calls) == sorted('88' + s.phoneNumber for s in students)
+
+    logs = SmsLog.query.filter_by(status=SmsStatus.SENT).all()
+    assert sorted(log.user_id for log in logs) == sorted(s.id for s in students)
+    assert all(row.sms_log_id for row in SmsOutbox.query.filter_by(job_id=job_id))
+
+    db.session.expire_all()
+    assert get_balance() == {'balance': 97, 'reserved': 0, 'available': 97}
+    assert teacher.sms_count == 7
+
+    # Nothing left to claim
+    assert dispatch_once(send_func=fake_send)['claimed'] == 0
+
+    login_as(client, teacher)
+    status = client.get(f'/api/sms/jobs/{job_id}').get_json()['data']
+    assert status['sent'] == 3
+    assert status['completed'] is True
+
+
+def test_transient_failures_are_retried_with_backoff(app):
+    teacher = make_teacher()
+    set_balance(10)
+    enqueue_sms([{'phone': '01811111111', 'message': 'a'}, {'phone': '01822222222', 'message': 'b'}],
+                sent_by=teacher.id)
+    db.session.commit()
+
+    def flaky_send(phone, message):
+        if phone.endswith('01811111111'):
+            return {'success': False, 'error': 'SMS API timeout', 'retryable': True}
+        return {'success': False, 'error': 'Invalid number'}
+
+    before = datetime.utcnow()
+    stats = dispatch_once(send_func=flaky_send)
+    assert stats['retried'] == 1
+    assert stats['failed'] == 1
+
+    retry = SmsOutbox.query.filter_by(phone_number='01811111111').one()
+    assert retry.status == SmsOutboxStatus.PENDING
+    assert retry.attempts == 1
+    assert retry.next_attempt_at >= before
+    assert retry.last_error == 'SMS API timeout'
+
+    failed = SmsOutbox.query.filter_by(phone_number='01822222222').one()
+    assert failed.status == SmsOutboxStatus.FAILED
+    assert SmsLog.query.filter_by(status=SmsStatus.FAILED).count() == 1
+
+    # Not due yet, so the next cycle claims nothing
+    assert dispatch_once(send_func=flaky_send)['claimed'] == 0
+    assert retry_delay(1, 30, 3600) == 30
+    assert retry_delay(4, 30, 3600) == 240
+    assert retry_delay(20, 30, 3600) == 3600
+
+
+def test_absent_sms_route_queues_messages(app, client, no_provider):
+    teacher = make_teacher()
+    batch = make_batch()
+    students = make_students(batch, 3)
+    set_balance(10)
+    login_as(client, teacher)
+
+    response = client.post('/api/attendance/bulk-absent-sms', json={
+        'batchId': batch.id,
+        'date': '2025-03-03',
+        'attendanceData': [
+            {'userId': students[0].id, 'status': 'absent'},
+            {'userId': students[1].id, 'status': 'present'},
+            {'userId': students[2].id, 'status': 'absent'}
+        ]
+    })
+    assert response.status_code == 200
+    data = response.get_json()['data']
+    # Guardian and student phone for each absent student
+    assert data['sms_queued'] == 4
+    assert SmsOutbox.query.filter_by(job_id=data['sms_job_id']).count() == 4
+
+
+def test_job_status_is_private_to_sender(app, client):
+    owner = make_teacher('01700000001')
+    other = make_teacher('01700000002')
+    set_balance(10)
+    job_id = enqueue_sms([{'phone': '01811111111', 'message': 'a'}], sent_by=owner.id)
+    db.session.commit()
+
+    login_as(client, other)
+    assert client.get(f'/api/sms/jobs/{job_id}').status_code == 403
+    assert client.get('/api/sms/jobs/missing').status_code == 404
+
+
+def test_identical_bodies_are_packed_into_multi_number_calls(app):
+    teacher = make_teacher()
+    set_balance(1000)
+    enqueue_sms([{'phone': f'018{i:08d}', 'message': 'Class is off tomorrow'} for i in range(250)],
+                sent_by=teacher.id, source='notice')
+    # Same guardian queued twice, plus a personalised message
+    enqueue_sms([{'phone': '01900000001', 'message': 'Class is off tomorrow'},
+                 {'phone': '+8801900000001', 'message': 'Class is off tomorrow'},
+                 {'phone': '01900000002', 'message': 'Rahim was absent'}], sent_by=teacher.id)
+    db.session.commit()
+
+    many_calls = []
+
+    def fake_send_many(phones, message):
+        many_calls.append(len(phones))
+        return {'success': True}
+
+    stats = dispatch_once(send_func=lambda phone, message: {'success': True}, send_many_func=fake_send_many,
+                          batch_size=300)
+    assert stats['sent'] == 253
+    # 251 distinct numbers for the notice in chunks of 100, plus the single personal message
+    assert sorted(many_calls) == [51, 100, 100]
+    assert stats['provider_calls'] == 4
+
+    assert SmsLog.query.filter_by(status=SmsStatus.SENT).count() == 253
+    charged = db.session.query(db.func.sum(SmsLog.cost)).scalar()
+    assert charged == 252
+
+
+def test_rejected_multi_number_call_falls_back_to_single_sends(app):
+    teacher = make_teacher()
+    set_balance(10)
+    enqueue_sms([{'phone': p, 'message': 'Notice'} for p in ('01811111111', '01822222222', '01833333333')],
+                sent_by=teacher.id)
+    db.session.commit()
+
+    def reject_many(phones, message):
+        return {'success': False, 'error': 'Invalid number in list'}
+
+    def send_single(phone, message):
+        if phone.endswith('22222222'):
+            return {'success': False, 'error': 'Invalid number'}
+        return {'success': True}
+
+    stats = dispatch_once(send_func=send_single, send_many_func=reject_many)
+    assert stats['sent'] == 2
+    assert stats['failed'] == 1
+    assert stats['provider_calls'] == 4
@@ -0,0 +1,79 @@
+"""
+Tests for the pooled BulkSMSBD provider client
+"""
+import json
+import logging
+from urllib.parse import parse_qs
+
+import requests
+from requests.adapters import BaseAdapter
+
+from services.sms_provider import BulkSmsBdClient, mask_number
+
+
+class FakeTransport(BaseAdapter):
+    """requests transport that answers from a callback instead of the network"""
+
+    def __init__(self, respond):
+        super().__init__()
+        self.respond = respond
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append((request, kwargs))
+        status, body = self.respond(request)
+        response = requests.Response()
+        response.status_code = status
+        response._content = json.dumps(body).encode('utf-8') if isinstance(body, dict) else body.encode('utf-8')
+        response.request = request
+        response.url = request.url
+        return response
+
+    def close(self):
+        pass
+
+
+def make_client(respond):
+    transport = FakeTransport(respond)
+    client = BulkSmsBdClient('secret-key', '8809600000000', api_url='http://stub.local/api/smsapi',
+                             connect_timeout=2, read_timeout=7, transport=transport)
+    return client, transport
+
+
+def test_send_posts_form_and_parses_success():
+    client, transport = make_client(lambda request: (200, {'response_code': 202, 'success_message': 'ok'}))
+
+    result = client.send('01812345678', 'Hello')
+    assert result['success'] is True
+    assert result['message_id'] == 'ok'
+
+    request, kwargs = transport.requests[0]
+    params = parse_qs(request.body)
+    assert request.method == 'POST'
+    assert params['number'] == ['8801812345678']
+    assert params['api_key'] == ['secret-key']
+    assert 'secret-key' not in request.url
+    assert kwargs['timeout'] == (2, 7)
+
+
+def test_errors_are_classified_for_retry():
+    client, _ = make_client(lambda request: (503, 'busy'))
+    assert client.send('01812345678', 'Hi')['retryable'] is True
+
+    client, _ = make_client(lambda request: (200, {'response_code': 1001, 'error_message': 'Invalid number'}))
+    result = client.send('01812345678', 'Hi')
+    assert result == {'success': False, 'error': 'Invalid number', 'retryable': False, 'response_code': 1001}
+
+    def refuse(request):
+        raise requests.exceptions.ConnectionError('refused')
+    client, _ = make_client(refuse)
+    assert client.send('01812345678', 'Hi')['retryable'] is True
+
+
+def test_logs_never_contain_api_key_or_full_number(caplog):
+    client, _ = make_client(lambda request: (200, {'response_code': 202}))
+    with caplog.at_level(logging.DEBUG):
+        client.send('01812345678', 'Hello')
+    assert 'secret-key' not in caplog.text
+    assert '8801812345678' not in caplog.text
+    assert mask_number('8801812345678') in caplog.text
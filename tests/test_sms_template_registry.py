@@ -0,0 +1,124 @@
+"""
+Tests for the compiled SMS template registry
+"""
+from flask import session
+
+from conftest import login_as, count_queries, make_teacher, make_batch, make_students
+from models import db, Settings, SmsOutbox
+from services.cache_versions import bump_version
+from services.sms_ledger import credit
+from services.sms_template_registry import CompiledTemplate, compile_template, get_template, invalidate_templates
+
+
+def test_compiled_template_renders_slots_and_keeps_unknown_placeholders():
+    template = CompiledTemplate('{student_name} scored {marks}/{total} in {subject}, {student_name}!')
+    assert template.variables == ('student_name', 'marks', 'total', 'subject')
+    assert template.render({'student_name': 'Rahim', 'marks': 45, 'total': 50}) == \
+        'Rahim scored 45/50 in {subject}, Rahim!'
+    assert CompiledTemplate('No variables { here }').render({}) == 'No variables { here }'
+    assert compile_template('{student_name}: {message}') is compile_template('{student_name}: {message}')
+
+
+def test_worst_case_cost_accounts_for_variable_length():
+    assert CompiledTemplate('Class is off today').max_cost == 1
+    # A Bangla name in an English sentence makes the message mixed
+    assert CompiledTemplate('Dear Parent, {student_name} was ABSENT today in {batch_name} on {date}.').max_cost == 2
+    assert CompiledTemplate('{student_name}: {message} ({date})').max_cost >= 3
+
+
+def test_bulk_rendering_does_no_database_reads(app):
+    teacher = make_teacher()
+    batch = make_batch()
+    names = [s.first_name for s in make_students(batch, 300)]
+    teacher_id, batch_name = teacher.id, batch.name
+    get_template('attendance_absent')
+
+    with count_queries() as statements:
+        template = get_template('attendance_absent', user_id=teacher_id)
+        messages = [template.render({'student_name': name, 'date': '03/03', 'batch_name': batch_name})
+                    for name in names]
+    # Only the cache version check
+    assert len(statements) == 1
+    assert 'cache_versions' in statements[0]
+    assert messages[0] == f'{names[0]} অনুপস্থিত 03/03 ({batch_name})'
+
+
+def test_version_bump_reloads_templates_in_every_worker(app):
+    assert get_template('exam_result').source.startswith('{student_name} পেয়েছে')
+
+    # Another worker saves a template; without the version bump this process keeps its copy
+    db.session.add(Settings(key='sms_template_exam_result', value={'message': 'Result: {marks}/{total}'}))
+    db.session.commit()
+    assert get_template('exam_result').source.startswith('{student_name} পেয়েছে')
+
+    bump_version('sms_templates')
+    db.session.commit()
+    assert get_template('exam_result').source == 'Result: {marks}/{total}'
+
+
+def test_saved_teacher_template_is_used_for_attendance_sms(app, client):
+    teacher = make_teacher()
+    batch = make_batch()
+    students = make_students(batch, 2)
+    credit(10)
+    db.session.commit()
+    login_as(client, teacher)
+
+    response = client.put('/api/sms/templates/attendance_absent',
+                          json={'message': '{student_name} absent on {date}'})
+    assert response.status_code == 200
+    assert response.get_json()['data']['max_sms'] == 1
+
+    response = client.post('/api/attendance/bulk-absent-sms', json={
+        'batchId': batch.id,
+        'date': '2025-03-03',
+        'attendanceData': [{'userId': students[0].id, 'status': 'absent'}]
+    })
+    assert response.status_code == 200
+    messages = {row.message for row in SmsOutbox.query.all()}
+    assert messages == {f'{students[0].full_name} absent on 03/03/2025'}
+
+
+def test_legacy_session_override_comes_first_until_the_template_is_saved(app, client):
+    teacher = make_teacher()
+    login_as(client, teacher)
+    with client.session_transaction() as sess:
+        sess['custom_templates'] = {'attendance_absent': 'Session: {student_name}', 'exam_result': 'Kept'}
+
+    def absent_message():
+        templates = client.get('/api/sms/templates').get_json()
+        return next(t['message'] for t in templates if t['id'] == 'attendance_absent')
+
+    assert absent_message() == 'Session: {student_name}'
+    assert client.put('/api/sms/templates/attendance_absent',
+                      json={'message': 'Saved: {student_name}'}).status_code == 200
+    assert absent_message() == 'Saved: {student_name}'
+    with client.session_transaction() as sess:
+        assert sess['custom_templates'] == {'exam_result': 'Kept'}
+
+
+def test_session_copy_ranks_where_the_old_routes_read_it(app, client):
+    teacher = make_teacher()
+    login_as(client, teacher)
+    db.session.add(Settings(key='sms_template_exam_result', value={'message': 'Global: {marks}'}))
+    db.session.add(Settings(key='sms_template_attendance_absent', value={'message': 'Global absent'}))
+    invalidate_templates()
+    db.session.commit()
+    with client.session_transaction() as sess:
+        sess['custom_templates'] = {'exam_result': 'Session: {marks}', 'attendance_absent': 'Session absent'}
+
+    with app.test_request_context():
+        session.update(user_id=teacher.id, custom_templates={'exam_result': 'Session: {marks}',
+                                                             'attendance_absent': 'Session absent'})
+        # Exam results read the saved global template first, attendance the session copy
+        assert get_template('exam_result', user_id=teacher.id).source == 'Global: {marks}'
+        assert get_template('attendance_absent', user_id=teacher.id).source == 'Session absent'
+
+    # Saving or resetting through /api/sms/templates/<type>/... drops the session copy
+    assert client.post('/api/sms/templates/attendance_absent/save',
+                       json={'message': 'Saved absent'}).status_code == 200
+    with client.session_transaction() as sess:
+        assert sess['custom_templates'] == {'exam_result': 'Session: {marks}'}
+    assert client.post('/api/sms/templates/exam_result/reset').status_code == 200
+    with client.session_transaction() as sess:
+        assert 'custom_templates' not in sess
@@ -0,0 +1,74 @@
+"""
+Tests for per-request SQL instrumentation and the N+1 warning
+"""
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from conftest import login_as, make_teacher, make_batch, make_students
+from models import db, User
+from services.sql_instrumentation import RequestSqlStats, fingerprint
+
+
+def test_fingerprint_folds_parameters_and_in_lists():
+    assert fingerprint('SELECT * FROM users\n WHERE id IN (?, ?, ?)  LIMIT 5') == \
+        fingerprint('SELECT * FROM users WHERE id IN (?) LIMIT 10')
+
+    stats = RequestSqlStats()
+    for _ in range(4):
+        stats.record('SELECT * FROM users WHERE id = ?', 0.001)
+    stats.record('SELECT * FROM batches', 0.002)
+    assert stats.count == 5
+    assert stats.repeated(3) == [('SELECT * FROM users WHERE id = ?', 4)]
+    assert stats.statements is None
+
+    # The profiler asks for the statement records as well
+    stats.keep_statements()
+    stats.record('SELECT * FROM batches', 0.0)
+    [(offset, elapsed, statement)] = stats.statements
+    assert offset >= 0 and elapsed == 0.0 and statement == 'SELECT * FROM batches'
+
+
+def test_headers_report_query_count_and_db_time(app, client):
+    teacher = make_teacher()
+    login_as(client, teacher)
+
+    response = client.get('/api/sms/balance')
+    assert response.status_code == 200
+    assert int(response.headers['X-DB-Queries']) >= 1
+    assert response.headers['Server-Timing'].startswith('db;dur=')
+    assert 'app;dur=' in response.headers['Server-Timing']
+
+
+def test_repeated_statement_shape_logs_n_plus_one_warning(app, client, caplog):
+    app.config['SQL_N_PLUS_ONE_THRESHOLD'] = 5
+    batch = make_batch()
+    ids = [s.id for s in make_students(batch, 8)]
+
+    @app.route('/_test/n-plus-one')
+    def n_plus_one():
+        db.session.expire_all()
+        return {'names': [db.session.get(User, user_id).first_name for user_id in ids]}
+
+    with caplog.at_level(logging.WARNING, logger='sql.instrumentation'):
+        response = client.get('/_test/n-plus-one')
+    assert response.status_code == 200
+    assert int(response.headers['X-DB-Queries']) >= 8
+    assert 'Possible N+1: GET /_test/n-plus-one' in caplog.text
+    assert 'ran 8x' in caplog.text
+
+
+def test_failing_statement_is_counted_and_releases_its_timer(app, client):
+    @app.route('/_test/failing-query')
+    def failing_query():
+        try:
+            db.session.execute(text('SELECT * FROM no_such_table'))
+        except OperationalError:
+            db.session.rollback()
+        return {'pending': len(db.session.connection().info.get('query_started', []))}
+
+    response = client.get('/_test/failing-query')
+    assert response.status_code == 200
+    assert response.get_json()['pending'] == 0
+    assert int(response.headers['X-DB-Queries']) >= 1
@@ -0,0 +1,72 @@
+"""
+Tests for SQLite PRAGMA profiles and the /health/db report
+"""
+import pytest
+from sqlalchemy import create_engine, text
+
+from app import create_app
+from config import TestingConfig
+from models import db
+from services import sqlite_tuning
+from services.sqlite_tuning import (SQLITE_PROFILES, after_fork, install_pragma_listener, resolve_profile,
+                                    run_maintenance)
+
+
+def test_health_reports_active_profile_and_pragmas(app, client):
+    response = client.get('/health/db')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['status'] == 'healthy'
+    assert data['profile'] == 'testing'
+    assert data['pragmas']['temp_store'] == 2  # MEMORY
+    assert 'busy_timeout' in data['pragmas']
+
+
+def test_server_profile_is_applied_to_every_connection(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    install_pragma_listener(engine, SQLITE_PROFILES['server'])
+
+    with engine.begin() as connection:
+        connection.execute(text('CREATE TABLE t (id INTEGER PRIMARY KEY)'))
+        connection.execute(text('INSERT INTO t DEFAULT VALUES'))
+    for _ in range(2):
+        with engine.connect() as connection:
+            assert connection.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+            assert connection.execute(text('PRAGMA synchronous')).scalar() == 1  # NORMAL
+            assert connection.execute(text('PRAGMA busy_timeout')).scalar() == 5000
+            assert connection.execute(text('PRAGMA cache_size')).scalar() == -64000
+        engine.dispose()
+
+    result = run_maintenance(engine)
+    assert result['checkpoint_busy'] == 0
+    assert (tmp_path / 'app.db-wal').stat().st_size == 0
+
+
+def test_profile_overrides_and_unknown_profile():
+    name, pragmas = resolve_profile({'SQLITE_PRAGMA_PROFILE': 'server', 'SQLITE_PRAGMAS': {'busy_timeout': 10000}})
+    assert name == 'server'
+    assert pragmas['busy_timeout'] == 10000
+    assert pragmas['journal_mode'] == 'WAL'
+
+    with pytest.raises(ValueError):
+        resolve_profile({'SQLITE_PRAGMA_PROFILE': 'fast'})
+
+
+def test_maintenance_starts_after_fork_not_in_the_preloading_master(tmp_path, monkeypatch):
+    monkeypatch.setattr(sqlite_tuning, '_maintenance_lock', None)
+    monkeypatch.setattr(sqlite_tuning, '_maintenance_thread', None)
+    monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'app.db'}")
+    monkeypatch.setattr(TestingConfig, 'SQLITE_PRAGMA_PROFILE', 'server')
+    monkeypatch.setattr(TestingConfig, 'SQLITE_MAINTENANCE_SECONDS', 3600)
+    app = create_app('testing')
+    app.instance_path = str(tmp_path)
+    assert sqlite_tuning._maintenance_thread is None
+
+    with app.app_context():
+        inherited_pool = db.engine.pool
+    thread = after_fork(app, db)
+    assert thread.is_alive() and (tmp_path / 'sqlite_maintenance.lock').exists()
+    assert after_fork(app, db) is thread
+    with app.app_context():
+        assert db.engine.pool is not inherited_pool
+        db.engine.dispose()
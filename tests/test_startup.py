@@ -0,0 +1,80 @@
+"""
+Tests for the startup schema check and lazily imported blueprints
+"""
+import sys
+import types
+
+import pytest
+from flask import Blueprint, Flask, request
+
+from conftest import login_as, make_teacher
+
+from models import db
+from services.startup import ensure_schema, register_lazy_blueprint, schema_fingerprint
+
+
+def test_create_all_is_skipped_when_schema_is_current(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'startup.db'}"
+    db.init_app(app)
+    with app.app_context():
+        assert ensure_schema(db) is True
+        assert ensure_schema(db) is False
+        # A model change (new fingerprint) runs create_all again
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql('PRAGMA user_version = 1')
+        assert ensure_schema(db) is True
+        assert schema_fingerprint(db.metadata, db.engine.dialect) == \
+            db.session.execute(db.text('PRAGMA user_version')).scalar()
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_lazy_blueprint_dispatches_to_real_view(app, client):
+    assert 'ai_bp' in app.extensions['lazy_blueprints']
+    seen = {}
+
+    @app.after_request
+    def capture_endpoint(response):
+        seen['endpoint'] = request.endpoint
+        seen['blueprint'] = request.blueprint
+        return response
+
+    login_as(client, make_teacher())
+    response = client.get('/api/ai/curriculum/classes')
+    assert response.status_code == 200
+    assert response.get_json()['success'] is True
+    assert seen == {'endpoint': 'ai.get_curriculum_classes', 'blueprint': 'ai'}
+
+    assert client.get('/api/debug/ping').get_json()['message'] == 'pong'
+    assert client.get('/api/debug/missing').status_code == 404
+    assert client.post('/api/debug/ping').status_code == 405
+    # Login-protected lazy views keep their decorators
+    with client.session_transaction() as sess:
+        sess.clear()
+    assert client.get('/api/documents/').status_code == 200
+    assert client.delete('/api/documents/1').status_code == 401
+
+
+def test_health_reports_startup_timings(client):
+    startup = client.get('/health').get_json()['startup']
+    assert startup['total_ms'] > 0
+    assert {'extensions', 'blueprints', 'schema'} <= set(startup['phases_ms'])
+
+
+def test_every_lazy_blueprint_loads_without_hooks(app):
+    for lazy in app.extensions['lazy_blueprints'].values():
+        assert lazy.load().view_functions
+
+
+def test_lazy_blueprint_with_hooks_is_refused(app, monkeypatch):
+    hooked = Blueprint('hooked', __name__)
+    hooked.route('/ping')(lambda: 'pong')
+    hooked.before_request(lambda: None)
+    module = types.ModuleType('hooked_routes')
+    module.hooked_bp = hooked
+    monkeypatch.setitem(sys.modules, 'hooked_routes', module)
+
+    lazy = register_lazy_blueprint(app, 'hooked_routes', 'hooked_bp', '/api/hooked')
+    with pytest.raises(RuntimeError, match='before_request_funcs'):
+        lazy.load()
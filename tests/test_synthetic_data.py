@@ -0,0 +1,35 @@
+"""
+Tests for the seeded synthetic data generator used by the benchmarks
+"""
+from app import create_app
+from benchmarks.synthetic_data import generate
+from models import db, Attendance, MonthlyMark, User, UserRole
+
+
+def attendance_fingerprint():
+    return [(a.user_id, a.date.isoformat(), a.status.value)
+            for a in Attendance.query.order_by(Attendance.user_id, Attendance.date).limit(200)]
+
+
+def test_generate_fills_schema_at_requested_scale(app):
+    data = generate('tiny', seed=7)
+
+    assert User.query.filter_by(role=UserRole.STUDENT).count() == 24
+    assert len(data['batch_ids']) == 2
+    assert len(data['monthly_exam_ids']) == 2 * 2
+    # 3 subjects per monthly exam, every enrolled student has a mark
+    assert MonthlyMark.query.count() == 24 * 2 * 3
+    assert data['counts']['attendance'] == Attendance.query.count() > 0
+    assert data['counts']['online_student_answers'] == 24 * 1 * 5
+
+
+def test_same_seed_produces_same_data(app):
+    generate('tiny', seed=7)
+    first = attendance_fingerprint()
+
+    other = create_app('testing')
+    with other.app_context():
+        generate('tiny', seed=7)
+        assert attendance_fingerprint() == first
+        db.session.remove()
+        db.drop_all()
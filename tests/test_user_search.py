@@ -0,0 +1,75 @@
+"""
+Tests for the FTS5 trigram student search index (services/user_search.py)
+"""
+from sqlalchemy import update
+
+from conftest import login_as, count_queries, make_teacher, make_batch, make_students
+from models import db, User, UserRole
+from services.user_search import search_terms
+
+
+def add_student(batch, phone, first_name, last_name, **kwargs):
+    student = User(phoneNumber=phone, first_name=first_name, last_name=last_name, role=UserRole.STUDENT,
+                   **kwargs)
+    student.batches.append(batch)
+    db.session.add(student)
+    db.session.commit()
+    return student
+
+
+def names(response):
+    return [row['full_name'] for row in response.get_json()['data']]
+
+
+def test_index_follows_inserts_updates_and_deletes(app, client):
+    login_as(client, make_teacher())
+    batch = make_batch()
+    rahim = add_student(batch, '01711111111', 'Rahim', 'Uddin', guardian_name='Karim Uddin')
+    add_student(batch, '01722222222', 'Fatema', 'Akter', guardian_phone='01933333333')
+
+    with count_queries() as statements:
+        assert names(client.get('/api/students?search=ahim')) == ['Rahim Uddin']
+    assert not any('LIKE' in statement.upper() for statement in statements)
+    assert names(client.get('/api/students?search=karim')) == ['Rahim Uddin']
+    assert names(client.get('/api/students?search=3333')) == ['Fatema Akter']
+
+    # Bulk Core updates go through the triggers too
+    db.session.execute(update(User).where(User.id == rahim.id).values(first_name='Rafi'))
+    db.session.commit()
+    assert names(client.get('/api/students?search=ahim')) == []
+    assert names(client.get('/api/students?search=rafi uddin')) == ['Rafi Uddin']
+
+    db.session.delete(rahim)
+    db.session.commit()
+    assert names(client.get('/api/students?search=uddin')) == []
+
+
+def test_ranked_search_prefers_name_prefixes(app, client):
+    login_as(client, make_teacher())
+    batch = make_batch()
+    add_student(batch, '01711111111', 'Nusrat', 'Hasan')
+    add_student(batch, '01722222222', 'Hasan', 'Mahmud')
+    add_student(batch, '01733333333', 'Mim', 'Das', guardian_name='Hasan Ali')
+
+    response = client.get('/api/students/search?q=hasan&fields=id,full_name')
+    assert names(response) == ['Hasan Mahmud', 'Nusrat Hasan', 'Mim Das']
+    assert set(response.get_json()['data'][0]) == {'id', 'full_name'}
+
+    # Short terms fall back to LIKE
+    assert names(client.get('/api/students/search?q=has ma')) == ['Hasan Mahmud']
+    assert client.get('/api/students/search?q=').get_json()['data'] == []
+
+
+def test_bengali_names_and_phone_formats(app, client):
+    login_as(client, make_teacher())
+    batch = make_batch()
+    add_student(batch, '01712345678', 'রহিম', 'উদ্দিন')
+    make_students(batch, 3)
+
+    assert names(client.get('/api/students/search?q=হিম')) == ['রহিম উদ্দিন']
+    # Zero-width joiners typed by some keyboards do not matter
+    assert names(client.get('/api/students/search?q=\u0989\u09a6\u09cd\u200d\u09a6\u09bf\u09a8')) == ['রহিম উদ্দিন']
+    assert names(client.get('/api/students/search?q=%2B880 1712-345')) == ['রহিম উদ্দিন']
+    assert names(client.get('/api/students/search?q=০১৭১২৩')) == ['রহিম উদ্দিন']
+    assert search_terms('+8801712  Rahim') == ['01712', 'Rahim']
+    assert search_terms('880 1712 345') == ['01712345']
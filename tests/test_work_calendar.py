@@ -0,0 +1,87 @@
+"""
+Tests for the working-day calendar (services/work_calendar.py)
+"""
+from datetime import date
+
+from flask import g
+
+from conftest import login_as, count_queries, make_teacher, make_batch, make_students, make_monthly_exam
+from models import db
+from services.ranking_engine import compute_comprehensive_ranking
+from services.work_calendar import (add_holiday, forget_working_days, parse_off_days, working_days,
+                                    working_days_between)
+
+
+def sheet(client, batch, day, statuses):
+    return client.post('/api/attendance/bulk', json={
+        'batchId': batch.id, 'date': day,
+        'attendanceData': [{'userId': student.id, 'status': status} for student, status in statuses]
+    })
+
+
+def test_working_days_skip_off_days_and_holidays(app, client):
+    teacher = make_teacher()
+    batch, other = make_batch(), make_batch('Other')
+    students = make_students(batch, 2)
+    login_as(client, teacher)
+    assert working_days(batch.id, 2025, 3) == 21  # Mon-Fri in March 2025
+
+    add_holiday(date(2025, 3, 26), reason='Independence Day')  # Every batch
+    add_holiday(date(2025, 3, 10), batch_id=other.id)
+    add_holiday(date(2025, 3, 8), batch_id=batch.id)  # A Saturday: no change
+    db.session.commit()
+    # A sheet marked holiday for everyone is a holiday; a mixed sheet is not
+    sheet(client, batch, '2025-03-17', [(s, 'holiday') for s in students])
+    sheet(client, batch, '2025-03-18', [(students[0], 'holiday'), (students[1], 'present')])
+    # A partial sheet is no holiday, however it is marked, until the stored rows cover the roster
+    sheet(client, batch, '2025-03-19', [(students[0], 'holiday')])
+    forget_working_days()
+    assert working_days(batch.id, 2025, 3) == 19
+    sheet(client, batch, '2025-03-19', [(students[1], 'holiday')])
+    forget_working_days()
+    assert working_days(batch.id, 2025, 3) == 18
+    sheet(client, batch, '2025-03-19', [(students[1], 'present')])
+    forget_working_days()
+
+    assert working_days(batch.id, 2025, 3) == 19
+    assert working_days(other.id, 2025, 3) == 19
+    assert working_days_between(batch.id, date(2025, 3, 15), date(2025, 4, 4)) == 13
+
+    # Re-marking the sheet gives the day back
+    sheet(client, batch, '2025-03-17', [(students[0], 'present'), (students[1], 'holiday')])
+    assert working_days(batch.id, 2025, 3) == 20
+    # Memoized for the rest of the app context
+    with count_queries() as queries:
+        assert working_days(batch.id, 2025, 3) == 20
+    assert queries == [] and g.working_dates[(batch.id, 2025, 3)][0] == 3
+
+    app.extensions['weekly_off_days'] = parse_off_days('fri,sat')
+    forget_working_days()
+    assert working_days(make_batch('Third').id, 2025, 3) == 21  # Sun-Thu, less 26 March
+    assert parse_off_days('Friday, sat') == parse_off_days([4, 5])
+
+
+def test_holidays_set_the_maximum_attendance_marks(app, client):
+    teacher = make_teacher()
+    batch = make_batch()
+    make_students(batch, 2)
+    exam = make_monthly_exam(batch, teacher)
+    login_as(client, teacher)
+
+    response = client.post('/api/attendance/holidays', json={'batchId': batch.id, 'date': '2025-03-26',
+                                                            'reason': 'Independence Day'})
+    assert response.status_code == 201
+    holiday_id = response.get_json()['data']['id']
+
+    data = client.get(f'/api/attendance/holidays?batch_id={batch.id}&month=3&year=2025').get_json()['data']
+    assert data['working_days'] == 20
+    assert 26 not in data['working_dates']
+    assert [holiday['reason'] for holiday in data['holidays']] == ['Independence Day']
+
+    forget_working_days()
+    snapshot = compute_comprehensive_ranking(exam)
+    assert {r['max_attendance_marks'] for r in snapshot.rankings} == {20}
+
+    assert client.delete(f'/api/attendance/holidays/{holiday_id}').status_code == 200
+    assert client.get(f'/api/attendance/holidays?batch_id={batch.id}&month=3&year=2025') \
+        .get_json()['data']['working_days'] == 21
@@ -0,0 +1,155 @@
+"""
+List Query Helpers
+Keyset (cursor) pagination and sparse fieldsets for list endpoints.
+
+- Pagination is opt-in: ?limit=N returns the first N rows plus a
+  next_cursor; ?cursor=<next_cursor>&limit=N continues after the last row.
+  Each page is an indexed range scan, however deep, unlike OFFSET. Without
+  limit/cursor an endpoint keeps returning every row.
+- ?fields=id,full_name returns only those keys per row. Every Field names
+  the columns and loader options it needs, so only those columns are
+  loaded and unrequested relationships are never touched.
+"""
+import base64
+from typing import Optional, Tuple
+
+import msgspec
+from flask import request
+from sqlalchemy import and_, false, or_, tuple_
+from sqlalchemy.orm import load_only
+
+
+class ListQueryError(ValueError):
+    """Invalid fields/limit/cursor argument; endpoints answer 400"""
+
+
+class SortKey:
+    """One column of a keyset ordering; the last key of an ordering must be unique"""
+
+    def __init__(self, column, descending=False, nullable=None):
+        self.column = column
+        self.descending = descending
+        # Defaults to the column's own nullability
+        self.nullable = column.expression.nullable if nullable is None else nullable
+
+    @property
+    def python_type(self):
+        python_type = self.column.type.python_type
+        return Optional[python_type] if self.nullable else python_type
+
+    def order_by(self):
+        return self.column.desc() if self.descending else self.column.asc()
+
+    def equal(self, value):
+        return self.column.is_(None) if value is None else self.column == value
+
+    def after(self, value):
+        """Rows that sort after `value` on this column (NULLs sort first, as in SQLite and MySQL)"""
+        if self.descending:
+            if value is None:
+                return None  # NULLs come last when descending
+            return or_(self.column < value, self.column.is_(None)) if self.nullable else self.column < value
+        if value is None:
+            return self.column.isnot(None)
+        return self.column > value
+
+
+class Field:
+    """A selectable output key: how to read it and what it needs loaded"""
+
+    __slots__ = ('get', 'columns', 'options')
+
+    def __init__(self, get, columns=(), options=()):
+        self.get = get
+        self.columns = columns
+        self.options = options
+
+
+def requested_fields(available):
+    """Field names of ?fields= in request order, or None for the full rows"""
+    raw = request.args.get('fields', '').strip()
+    if not raw:
+        return None
+    names = list(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ListQueryError(f"Unknown fields: {', '.join(unknown)}")
+    return names
+
+
+def field_options(available, names, sort_keys=()):
+    """Loader options for the requested fields: load_only their columns and their relationships"""
+    columns = [key.column for key in sort_keys]
+    options = []
+    for name in names:
+        field = available[name]
+        columns.extend(column for column in field.columns if not any(column is c for c in columns))
+        options.extend(option for option in field.options if not any(option is o for o in options))
+    return [load_only(*columns)] + options if columns else options
+
+
+def project(rows, available, names):
+    """Rows as dicts holding only the requested fields"""
+    getters = [(name, available[name].get) for name in names]
+    return [{name: get(row) for name, get in getters} for row in rows]
+
+
+def page_args(default_limit=50, max_limit=500):
+    """(limit, cursor) from the query string; limit is None when the caller did not paginate"""
+    cursor = request.args.get('cursor')
+    limit = request.args.get('limit')
+    if limit is None and cursor is None:
+        return None, None
+    try:
+        limit = int(limit) if limit else default_limit
+    except ValueError:
+        raise ListQueryError('limit must be an integer')
+    return max(1, min(limit, max_limit)), cursor or None
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(msgspec.json.encode(values)).rstrip(b'=').decode('ascii')
+
+
+def decode_cursor(cursor, sort_keys):
+    """Sort key values of the last row of the previous page"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        return msgspec.json.decode(raw, type=Tuple[tuple(key.python_type for key in sort_keys)])
+    except (ValueError, msgspec.DecodeError):
+        raise ListQueryError('Invalid cursor')
+
+
+def keyset_filter(sort_keys, values):
+    """WHERE clause selecting the rows after `values` in sort_keys order"""
+    if len({key.descending for key in sort_keys}) == 1 and not any(key.nullable for key in sort_keys):
+        # One row-value comparison, which SQLite turns into an index range
+        columns, values = tuple_(*[key.column for key in sort_keys]), tuple_(*values)
+        return columns < values if sort_keys[0].descending else columns > values
+    branches = []
+    for index, key in enumerate(sort_keys):
+        after = key.after(values[index])
+        if after is None:
+            continue
+        equal = [sort_keys[i].equal(values[i]) for i in range(index)]
+        branches.append(and_(*equal, after) if equal else after)
+    return or_(*branches) if branches else false()
+
+
+def keyset_page(query, sort_keys, limit, cursor=None):
+    """
+    One page of `query` in sort_keys order.
+
+    Returns (rows, next_cursor); next_cursor is None on the last page. The
+    query must not be ordered yet. A None limit returns every row.
+    """
+    if limit is None:
+        return query.order_by(*[key.order_by() for key in sort_keys]).all(), None
+    if cursor:
+        query = query.filter(keyset_filter(sort_keys, decode_cursor(cursor, sort_keys)))
+    rows = query.order_by(*[key.order_by() for key in sort_keys]).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor([getattr(last, key.column.key) for key in sort_keys])
@@ -0,0 +1,251 @@
+"""
+Typed Response Payloads
+msgspec Structs for the largest API responses: the student list, the
+comprehensive ranking, the fee grid, the monthly attendance sheet, the
+yearly attendance export and online exam question sets.
+
+Structs pass through serialize_data() untouched and are encoded directly by
+the msgspec JSON provider (utils/json_provider.py), so building a response
+costs one small object per row instead of a dict that is later deep-copied
+and walked again by the encoder. Field names are the JSON keys the frontend
+already reads; fields left UNSET are omitted from the output.
+"""
+from datetime import date, datetime
+from typing import Dict, List, Optional, Union
+
+import msgspec
+from msgspec import UNSET, UnsetType
+
+Number = Union[int, float]
+
+
+def _money(value):
+    """Decimal column as float, None when empty or zero (as serialize_model does)"""
+    return float(value) if value else None
+
+
+# Student list (GET /api/students)
+
+class BatchRef(msgspec.Struct):
+    id: int
+    name: str
+    description: Optional[str]
+
+
+class StudentListItem(msgspec.Struct):
+    # User columns, as serialize_model() returned them
+    id: int
+    phoneNumber: str
+    first_name: str
+    last_name: str
+    email: Optional[str]
+    role: str
+    profile_image: Optional[str]
+    date_of_birth: Optional[date]
+    address: Optional[str]
+    guardian_name: Optional[str]
+    guardian_phone: Optional[str]
+    mother_name: Optional[str]
+    emergency_contact: Optional[str]
+    admission_date: Optional[date]
+    exam_fee: Optional[float]
+    others_fee: Optional[float]
+    sms_count: Optional[int]
+    is_active: Optional[bool]
+    last_login: Optional[datetime]
+    is_archived: bool
+    archived_at: Optional[datetime]
+    archived_by: Optional[int]
+    archive_reason: Optional[str]
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+    full_name: str
+    batches: List[BatchRef]
+    batch: Optional[BatchRef]
+    batchId: Optional[int]
+    batchIds: List[int]
+    # camelCase aliases read by the student management page
+    firstName: str
+    lastName: str
+    studentId: str
+    isActive: Optional[bool]
+    guardianPhone: Optional[str]
+    guardianName: Optional[str]
+    motherName: Optional[str]
+    school: Optional[str]
+    admissionDate: Union[date, UnsetType] = UNSET
+
+
+def student_list_item(student):
+    """Build the student list row of a User (batches should be eager loaded)"""
+    batches = [BatchRef(batch.id, batch.name, batch.description) for batch in student.batches]
+    return StudentListItem(
+        id=student.id,
+        phoneNumber=student.phoneNumber,
+        first_name=student.first_name,
+        last_name=student.last_name,
+        email=student.email,
+        role=student.role.value,
+        profile_image=student.profile_image,
+        date_of_birth=student.date_of_birth,
+        address=student.address,
+        guardian_name=student.guardian_name,
+        guardian_phone=student.guardian_phone,
+        mother_name=student.mother_name,
+        emergency_contact=student.emergency_contact,
+        admission_date=student.admission_date,
+        exam_fee=_money(student.exam_fee),
+        others_fee=_money(student.others_fee),
+        sms_count=student.sms_count,
+        is_active=student.is_active,
+        last_login=student.last_login,
+        is_archived=student.is_archived,
+        archived_at=student.archived_at,
+        archived_by=student.archived_by,
+        archive_reason=student.archive_reason,
+        created_at=student.created_at,
+        updated_at=student.updated_at,
+        full_name=student.full_name,
+        batches=batches,
+        batch=batches[0] if batches else None,
+        batchId=batches[0].id if batches else None,
+        batchIds=[batch.id for batch in batches],
+        firstName=student.first_name,
+        lastName=student.last_name,
+        studentId='',
+        isActive=student.is_active,
+        guardianPhone=student.guardian_phone,
+        guardianName=student.guardian_name,
+        motherName=student.mother_name,
+        school=student.address,
+        admissionDate=student.admission_date or UNSET
+    )
+
+
+# Comprehensive ranking (GET /api/monthly-exams/<id>/comprehensive-ranking)
+
+class RankingExam(msgspec.Struct):
+    id: int
+    title: str
+    exam_title: str
+    subject: Optional[str]
+    marks: Number
+
+
+class RankingMark(msgspec.Struct):
+    exam_title: str
+    subject: Optional[str]
+    marks_obtained: Number
+    total_marks: Number
+    percentage: Number
+    is_absent: bool
+    grade: str
+
+
+class RankingEntry(msgspec.Struct):
+    user_id: int
+    student_name: str
+    student_phone: Optional[str]
+    roll_number: Optional[int]
+    individual_marks: Dict[str, RankingMark]
+    total_exam_marks: Number
+    total_possible_marks: Number
+    attendance_marks: Number
+    max_attendance_marks: Number
+    total_attendance_days: int
+    attendance_percentage: Number
+    final_total: Number
+    total_possible: Number
+    percentage: Number
+    grade: str
+    gpa: Number
+    exam_gpa: Number
+    passed_exams: int
+    total_exams: int
+    previous_position: Optional[int]
+    current_position: int
+    position: int
+    position_change: Optional[int]
+    position_trend: str
+
+
+class RankingPayload(msgspec.Struct):
+    individual_exams: List[RankingExam]
+    rankings: List[RankingEntry]
+
+
+# Fee grid (GET /api/fees/load-monthly)
+
+class FeeMonth(msgspec.Struct):
+    jf_amount: Number = 0
+    tf_amount: Number = 0
+    amount: Number = 0
+    fee_id: Optional[int] = None
+    status: Optional[str] = None
+    paid_date: Optional[date] = None
+
+
+# Months without a fee record; shared, never mutated
+EMPTY_FEE_MONTH = FeeMonth()
+
+
+class FeeGridRow(msgspec.Struct):
+    student_id: int
+    student_name: str
+    exam_fee: Number
+    other_fee: Number
+    months: Dict[str, FeeMonth]
+
+
+# Monthly attendance sheet (GET /api/attendance/monthly)
+
+class AttendanceSheetRow(msgspec.Struct):
+    id: int
+    name: str
+    student_id: Optional[str]
+    attendance: Dict[int, Optional[str]]
+
+
+class YearlyAttendanceRow(msgspec.Struct):
+    """One NDJSON line of GET /api/attendance/yearly/export"""
+    student_id: int
+    student_name: str
+    year: int
+    attendance: List[Optional[str]]  # Index 0 is 1 January
+    present: int
+    absent: int
+    late: int
+    holiday: int
+
+
+# Online exam question sets
+
+class ExamQuestion(msgspec.Struct):
+    id: int
+    question_text: str
+    option_a: str
+    option_b: str
+    option_c: str
+    option_d: str
+    correct_answer: Union[str, UnsetType] = UNSET
+    explanation: Union[Optional[str], UnsetType] = UNSET
+    question_order: Optional[int] = None
+    marks: Optional[int] = None
+
+
+def exam_question(question, include_answer=False):
+    """Question of an online exam; the answer and explanation only for teachers"""
+    item = ExamQuestion(
+        id=question.id,
+        question_text=question.question_text,
+        option_a=question.option_a,
+        option_b=question.option_b,
+        option_c=question.option_c,
+        option_d=question.option_d,
+        question_order=question.question_order,
+        marks=question.marks
+    )
+    if include_answer:
+        item.correct_answer = question.correct_answer
+        item.explanation = question.explanation
+    return item
@@ -7,6 +7,8 @@ from datetime import datetime, date
 from decimal import Decimal
 from functools import wraps
 
+import msgspec
+
 def success_response(message="Success", data=None, status_code=200):
     """Create a standardized success response"""
     response = {
@@ -53,9 +55,27 @@ def paginated_response(data, page, per_page, total, message="Data retrieved succ
     
     return jsonify(response), 200
 
+def cursor_response(data, limit, next_cursor, message="Data retrieved successfully"):
+    """Create a keyset-paginated response (see utils/list_query.py)"""
+    response = {
+        'success': True,
+        'message': message,
+        'data': serialize_data(data),
+        'pagination': {
+            'limit': limit,
+            'next_cursor': next_cursor,
+            'has_next': next_cursor is not None
+        },
+        'timestamp': datetime.utcnow().isoformat()
+    }
+    
+    return jsonify(response), 200
+
 def serialize_data(data):
     """Serialize data for JSON response"""
-    if isinstance(data, (datetime, date)):
+    if isinstance(data, msgspec.Struct):
+        return data  # Typed payload, encoded as-is by the JSON provider
+    elif isinstance(data, (datetime, date)):
         return data.isoformat()
     elif isinstance(data, Decimal):
         return float(data)